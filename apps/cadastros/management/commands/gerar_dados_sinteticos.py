@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import calendar
+import csv
+import io
+import itertools
+import math
+import random
+import time
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.cadastros.models import Cliente, Motorista, Romaneiador, TipoMadeira
+from apps.core.versoes import incrementar_tudo
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import QTD_M3_STEP, VALOR_STEP, ItemRomaneio, Romaneio, UnidadeRomaneio, calcular_m3
+
+# clientes, tipos de madeira, motoristas, romaneiadores, romaneios, itens, unidades, pagamentos
+PRESETS = {
+    "mini": dict(clientes=50, tipos=20, motoristas=20, romaneiadores=5,
+                 romaneios=1_000, itens=3_000, unidades=20_000, pagamentos=1_500),
+    "pequeno": dict(clientes=500, tipos=40, motoristas=60, romaneiadores=10,
+                    romaneios=20_000, itens=80_000, unidades=600_000, pagamentos=30_000),
+    "medio": dict(clientes=2_000, tipos=60, motoristas=150, romaneiadores=20,
+                  romaneios=200_000, itens=1_000_000, unidades=8_000_000, pagamentos=300_000),
+    "producao": dict(clientes=10_000, tipos=80, motoristas=400, romaneiadores=40,
+                     romaneios=1_000_000, itens=5_000_000, unidades=50_000_000, pagamentos=2_000_000),
+}
+
+FRACAO_DETALHADO = 0.4
+FRACAO_COM_FRETE = 0.3
+TIPOS_PAGAMENTO = ["PIX", "TRANSFERENCIA", "DINHEIRO", "DEPOSITO", "CHEQUE", "OUTROS"]
+PESOS_PAGAMENTO = [45, 25, 12, 10, 5, 3]
+
+CENT = Decimal("0.01")
+
+
+# Pesos acumulados: random.choices(cum_weights=...) sorteia em O(log n)
+def _pesos_zipf(n: int, s: float = 1.1) -> list[float]:
+    """Poucos clientes/madeiras concentram a maior parte do volume."""
+    return list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+def _pesos_meses(meses: list[tuple[int, int]]) -> list[float]:
+    """Sazonalidade: mais movimento na seca (jun–nov), crescimento leve ao longo do período."""
+    pesos = []
+    for i, (_ano, mes) in enumerate(meses):
+        sazonal = 1.0 + 0.35 * math.sin((mes - 3) / 12 * 2 * math.pi)
+        pesos.append(sazonal * (1.0 + 0.01 * i))
+    return list(itertools.accumulate(pesos))
+
+
+def _fmt(n) -> str:
+    return f"{n:,.0f}".replace(",", ".")
+
+
+def _decimal_cm(rng: random.Random, minimo: int, maximo: int) -> Decimal:
+    """Valor em centésimos (duas casas) uniforme em [minimo, maximo]."""
+    return Decimal(rng.randint(minimo, maximo)).scaleb(-2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera massa de dados sintética (clientes, madeiras, romaneios, itens, unidades e pagamentos) "
+        "para testes de carga/benchmark. Determinística por --seed; usa bulk_create ou COPY (PostgreSQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--preset", choices=sorted(PRESETS), default="mini")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--meses", type=int, default=36, help="Meses de histórico até hoje (padrão 36).")
+        parser.add_argument("--prefixo", default="S", help="Prefixo de número de romaneio e nomes (padrão 'S').")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Romaneios por transação (padrão 2000).")
+        parser.add_argument(
+            "--metodo",
+            choices=["auto", "bulk", "copy"],
+            default="auto",
+            help="auto: COPY no PostgreSQL (psycopg2), bulk_create nos demais.",
+        )
+        for campo in PRESETS["mini"]:
+            parser.add_argument(f"--{campo}", type=int, default=None, help=f"Sobrescreve a quantidade de {campo}.")
+
+    # -------------------------------------------------------------------------
+    # Escrita (ids pré-alocados: bulk_create e COPY usam o mesmo caminho)
+    # -------------------------------------------------------------------------
+    def _proximo_id(self, model) -> int:
+        return (model.objects.aggregate(m=Max("id"))["m"] or 0) + 1
+
+    def _escrever(self, model, colunas: tuple[str, ...], linhas: list[tuple]):
+        if not linhas:
+            return
+        if self.usar_copy:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for linha in linhas:
+                writer.writerow(["" if v is None else v for v in linha])
+            buf.seek(0)
+            cols = ", ".join(connection.ops.quote_name(c) for c in colunas)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {connection.ops.quote_name(model._meta.db_table)} ({cols}) FROM STDIN WITH (FORMAT csv)",
+                    buf,
+                )
+        else:
+            model.objects.bulk_create(
+                [model(**dict(zip(colunas, linha))) for linha in linhas],
+                batch_size=1000,
+            )
+
+    def _resetar_sequencias(self, models):
+        """Ids foram informados explicitamente: ajusta as sequences (PostgreSQL)."""
+        sqls = connection.ops.sequence_reset_sql(no_style(), models)
+        if sqls:
+            with connection.cursor() as cursor:
+                for sql in sqls:
+                    cursor.execute(sql)
+
+    # -------------------------------------------------------------------------
+    # Cadastros
+    # -------------------------------------------------------------------------
+    def _gerar_cadastros(self, rng: random.Random, qtd: dict, agora):
+        p = self.prefixo
+
+        self.cliente_ids = list(range(self._proximo_id(Cliente), self._proximo_id(Cliente) + qtd["clientes"]))
+        self._escrever(
+            Cliente,
+            ("id", "nome", "cpf_cnpj", "telefone", "ativo", "data_cadastro"),
+            [
+                (pk, f"Cliente {p}{i:06d}", None, f"(94) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+                 rng.random() > 0.05, agora)
+                for i, pk in enumerate(self.cliente_ids, start=1)
+            ],
+        )
+
+        self.tipos = []  # (id, preco_normal, preco_com_frete)
+        linhas = []
+        inicio = self._proximo_id(TipoMadeira)
+        for i in range(qtd["tipos"]):
+            normal = _decimal_cm(rng, 9_000, 45_000)
+            frete = (normal + _decimal_cm(rng, 2_000, 6_000)).quantize(CENT)
+            self.tipos.append((inicio + i, normal, frete))
+            linhas.append((inicio + i, f"Madeira {p}{i + 1:04d}", normal, frete, True, agora))
+        self._escrever(TipoMadeira, ("id", "nome", "preco_normal", "preco_com_frete", "ativo", "data_cadastro"), linhas)
+
+        self.motorista_ids = list(range(self._proximo_id(Motorista), self._proximo_id(Motorista) + qtd["motoristas"]))
+        self._escrever(
+            Motorista,
+            ("id", "nome", "placa_veiculo", "ativo", "data_cadastro"),
+            [
+                (pk, f"Motorista {p}{i:05d}", f"{p[:1] or 'X'}{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{i % 10000:04d}",
+                 True, agora)
+                for i, pk in enumerate(self.motorista_ids, start=1)
+            ],
+        )
+
+        self.romaneiador_ids = list(
+            range(self._proximo_id(Romaneiador), self._proximo_id(Romaneiador) + qtd["romaneiadores"])
+        )
+        self._escrever(
+            Romaneiador,
+            ("id", "nome", "ativo", "data_cadastro"),
+            [(pk, f"Romaneiador {p}{i:04d}", True, agora) for i, pk in enumerate(self.romaneiador_ids, start=1)],
+        )
+
+    # -------------------------------------------------------------------------
+    # Romaneios (com itens e unidades) — totais calculados aqui, com as
+    # mesmas regras de ItemRomaneio/Romaneio.atualizar_totais()
+    # -------------------------------------------------------------------------
+    def _gerar_bloco_romaneios(self, rng: random.Random, inicio: int, fim: int, ctx: dict, agora):
+        romaneios, itens, unidades = [], [], []
+
+        for n in range(inicio, fim):
+            romaneio_id = ctx["romaneio_id0"] + n
+            ano, mes = rng.choices(ctx["meses"], cum_weights=ctx["pesos_meses"])[0]
+            ultimo_dia = calendar.monthrange(ano, mes)[1]
+            if (ano, mes) == (ctx["hoje"].year, ctx["hoje"].month):
+                ultimo_dia = ctx["hoje"].day
+            data_romaneio = date(ano, mes, rng.randint(1, ultimo_dia))
+
+            detalhado = rng.random() < FRACAO_DETALHADO
+            com_frete = rng.random() < FRACAO_COM_FRETE
+            desconto = Decimal("0.00") if rng.random() < 0.8 else _decimal_cm(rng, 100, 1_000)
+            fator = Romaneio(desconto=desconto)._get_fator_desconto()
+
+            # nº de itens ~ média itens/romaneios, sem repetir madeira
+            n_itens = max(1, min(len(self.tipos), round(rng.expovariate(1 / ctx["itens_por_romaneio"])) or 1))
+            if n_itens * 2 > len(self.tipos):
+                escolhidos = set(rng.sample(range(len(self.tipos)), n_itens))
+            else:
+                escolhidos = set()
+                while len(escolhidos) < n_itens:
+                    escolhidos.add(rng.choices(range(len(self.tipos)), cum_weights=ctx["pesos_tipos"])[0])
+
+            m3_total = Decimal("0.000")
+            bruto = Decimal("0.00")
+            for idx in sorted(escolhidos):
+                tipo_id, preco_normal, preco_frete = self.tipos[idx]
+                item_id = ctx["proximo_item"]
+                ctx["proximo_item"] += 1
+                valor_unitario = preco_frete if com_frete else preco_normal
+
+                if detalhado:
+                    n_unid = max(1, round(rng.expovariate(1 / ctx["unidades_por_item"])))
+                    soma = Decimal("0.000")
+                    for _ in range(n_unid):
+                        comprimento = _decimal_cm(rng, 250, 600)
+                        rodo = _decimal_cm(rng, 12_000, 26_000)
+                        d1 = d2 = Decimal("0.00")
+                        if rng.random() < 0.2:
+                            d1 = _decimal_cm(rng, 500, 2_000)
+                            d2 = _decimal_cm(rng, 500, 2_000)
+                        m3 = calcular_m3(comprimento, rodo, d1, d2)
+                        if m3 <= 0:
+                            d1 = d2 = Decimal("0.00")
+                            m3 = calcular_m3(comprimento, rodo)
+                        soma += m3
+                        unidades.append((ctx["proximo_unidade"], item_id, comprimento, rodo, d1, d2, m3))
+                        ctx["proximo_unidade"] += 1
+                    qtd_m3 = soma.quantize(QTD_M3_STEP, rounding=ROUND_HALF_UP)
+                else:
+                    qtd_m3 = Decimal(rng.randint(500, 30_000)).scaleb(-3)
+
+                valor_total = (qtd_m3 * valor_unitario).quantize(VALOR_STEP, rounding=ROUND_HALF_UP)
+                itens.append((item_id, romaneio_id, tipo_id, valor_unitario, qtd_m3, valor_total))
+                m3_total += qtd_m3
+                bruto += valor_total
+
+            bruto = bruto.quantize(VALOR_STEP, rounding=ROUND_HALF_UP)
+            romaneios.append((
+                romaneio_id,
+                f"{self.prefixo}{n + 1:07d}",
+                data_romaneio,
+                rng.choices(self.cliente_ids, cum_weights=ctx["pesos_clientes"])[0],
+                rng.choice(self.motorista_ids) if self.motorista_ids and rng.random() < 0.9 else None,
+                rng.choice(self.romaneiador_ids) if self.romaneiador_ids and rng.random() < 0.7 else None,
+                "COM_FRETE" if com_frete else "NORMAL",
+                "DETALHADO" if detalhado else "SIMPLES",
+                desconto,
+                m3_total.quantize(QTD_M3_STEP, rounding=ROUND_HALF_UP),
+                bruto,
+                (bruto * fator).quantize(VALOR_STEP, rounding=ROUND_HALF_UP),
+                agora,
+                agora,
+            ))
+            ctx["valor_vendido"] += romaneios[-1][11]
+
+        with transaction.atomic():
+            self._escrever(
+                Romaneio,
+                ("id", "numero_romaneio", "data_romaneio", "cliente_id", "motorista_id", "romaneiador_id",
+                 "tipo_romaneio", "modalidade", "desconto", "m3_total", "valor_bruto", "valor_total",
+                 "data_cadastro", "data_atualizacao"),
+                romaneios,
+            )
+            self._escrever(
+                ItemRomaneio,
+                ("id", "romaneio_id", "tipo_madeira_id", "valor_unitario", "quantidade_m3_total", "valor_total"),
+                itens,
+            )
+            self._escrever(
+                UnidadeRomaneio,
+                ("id", "item_id", "comprimento", "rodo", "desconto_1", "desconto_2", "quantidade_m3"),
+                unidades,
+            )
+        return len(itens), len(unidades)
+
+    def _gerar_pagamentos(self, rng: random.Random, total: int, ctx: dict, agora):
+        if not total:
+            return
+        # Pagamentos cobrem ~90% do vendido (alguns clientes ficam devendo)
+        media = max(Decimal("50.00"), (ctx["valor_vendido"] * Decimal("0.9") / total).quantize(CENT))
+        dias = (ctx["hoje"] - ctx["inicio"]).days
+        pk = self._proximo_id(Pagamento)
+
+        for inicio in range(0, total, self.chunk_size * 5):
+            linhas = []
+            for _ in range(inicio, min(total, inicio + self.chunk_size * 5)):
+                valor = (media * Decimal(str(round(rng.lognormvariate(0, 0.6), 4)))).quantize(CENT)
+                linhas.append((
+                    pk,
+                    ctx["inicio"] + timedelta(days=rng.randint(0, dias)),
+                    rng.choices(self.cliente_ids, cum_weights=ctx["pesos_clientes"])[0],
+                    max(valor, CENT),
+                    rng.choices(TIPOS_PAGAMENTO, weights=PESOS_PAGAMENTO)[0],
+                    None,
+                    agora,
+                    agora,
+                ))
+                pk += 1
+            with transaction.atomic():
+                self._escrever(
+                    Pagamento,
+                    ("id", "data_pagamento", "cliente_id", "valor", "tipo_pagamento", "descricao",
+                     "data_cadastro", "data_atualizacao"),
+                    linhas,
+                )
+
+    # -------------------------------------------------------------------------
+    def handle(self, *args, **options):
+        qtd = dict(PRESETS[options["preset"]])
+        for campo in qtd:
+            if options.get(campo) is not None:
+                qtd[campo] = max(0, options[campo])
+        if qtd["clientes"] < 1 or qtd["tipos"] < 1:
+            raise CommandError("É preciso ao menos 1 cliente e 1 tipo de madeira.")
+
+        self.prefixo = options["prefixo"]
+        self.chunk_size = max(1, options["chunk_size"])
+
+        metodo = options["metodo"]
+        pode_copy = connection.vendor == "postgresql" and hasattr(connection.cursor().cursor, "copy_expert")
+        if metodo == "copy" and not pode_copy:
+            raise CommandError("COPY disponível apenas no PostgreSQL com psycopg2.")
+        self.usar_copy = metodo == "copy" or (metodo == "auto" and pode_copy)
+
+        if Romaneio.objects.filter(numero_romaneio__startswith=self.prefixo).exists() or Cliente.objects.filter(
+            nome__startswith=f"Cliente {self.prefixo}"
+        ).exists():
+            raise CommandError(f"Já existem dados com o prefixo '{self.prefixo}'. Use outro --prefixo.")
+
+        hoje = timezone.localdate()
+        meses = []
+        ano, mes = hoje.year, hoje.month
+        for _ in range(max(1, options["meses"])):
+            meses.append((ano, mes))
+            ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+        meses.reverse()
+
+        agora = timezone.now()
+        seed = options["seed"]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"==== Dados sintéticos: preset={options['preset']} seed={seed} "
+            f"({'COPY' if self.usar_copy else 'bulk_create'}) ===="
+        ))
+        self.stdout.write(", ".join(f"{k}={_fmt(v)}" for k, v in qtd.items()))
+
+        inicio_exec = time.monotonic()
+        with transaction.atomic():
+            self._gerar_cadastros(random.Random(seed), qtd, agora)
+
+        romaneios = qtd["romaneios"]
+        itens_por_romaneio = max(1.0, qtd["itens"] / romaneios) if romaneios else 1.0
+        itens_detalhados = max(1.0, qtd["itens"] * FRACAO_DETALHADO)
+        ctx = {
+            "hoje": hoje,
+            "inicio": date(meses[0][0], meses[0][1], 1),
+            "meses": meses,
+            "pesos_meses": _pesos_meses(meses),
+            "pesos_clientes": _pesos_zipf(len(self.cliente_ids)),
+            "pesos_tipos": _pesos_zipf(len(self.tipos), 0.9),
+            "itens_por_romaneio": itens_por_romaneio,
+            "unidades_por_item": max(1.0, qtd["unidades"] / itens_detalhados),
+            "romaneio_id0": self._proximo_id(Romaneio),
+            "proximo_item": self._proximo_id(ItemRomaneio),
+            "proximo_unidade": self._proximo_id(UnidadeRomaneio),
+            "valor_vendido": Decimal("0.00"),
+        }
+
+        total_itens = total_unidades = 0
+        for bloco, inicio in enumerate(range(0, romaneios, self.chunk_size)):
+            # Um gerador por bloco: o resultado não depende do tamanho dos blocos anteriores
+            rng = random.Random(f"{seed}:romaneios:{bloco}")
+            fim = min(romaneios, inicio + self.chunk_size)
+            n_itens, n_unidades = self._gerar_bloco_romaneios(rng, inicio, fim, ctx, agora)
+            total_itens += n_itens
+            total_unidades += n_unidades
+
+            decorrido = max(time.monotonic() - inicio_exec, 1e-6)
+            self.stdout.write(
+                f"  romaneios {_fmt(fim)}/{_fmt(romaneios)} — itens {_fmt(total_itens)}, "
+                f"unidades {_fmt(total_unidades)} ({_fmt((fim + total_itens + total_unidades) / decorrido)} linhas/s)"
+            )
+
+        self.stdout.write("Gerando pagamentos...")
+        self._gerar_pagamentos(random.Random(f"{seed}:pagamentos"), qtd["pagamentos"], ctx, agora)
+
+        self._resetar_sequencias(
+            [Cliente, TipoMadeira, Motorista, Romaneiador, Romaneio, ItemRomaneio, UnidadeRomaneio, Pagamento]
+        )
+        incrementar_tudo()  # gravação em lote não dispara post_save
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído em {time.monotonic() - inicio_exec:.1f}s: {_fmt(romaneios)} romaneios, {_fmt(total_itens)} itens, "
+            f"{_fmt(total_unidades)} unidades, {_fmt(qtd['pagamentos'])} pagamentos."
+        ))
@@ -0,0 +1,514 @@
+from __future__ import annotations
+
+import csv
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.cadastros.models import Cliente, Motorista, Romaneiador, TipoMadeira
+from apps.core.models import CheckpointImportacao
+from apps.core.versoes import incrementar_tudo
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import ItemRomaneio, Romaneio, UnidadeRomaneio
+from apps.romaneio.services import recalcular_totais_em_lote
+
+# Ordem de importação (cada etapa depende das anteriores)
+ETAPAS = ("clientes", "tipos_madeira", "romaneios", "itens", "unidades", "pagamentos")
+
+TIPOS_PAGAMENTO = {k for k, _ in Pagamento.TIPO_PAGAMENTO_CHOICES}
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+# =============================================================================
+# Conversões (aceita formato brasileiro e valores nativos do openpyxl)
+# =============================================================================
+def _texto(valor) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def _decimal(valor, campo: str, *, obrigatorio: bool = False) -> Decimal | None:
+    if valor is None or _texto(valor) == "":
+        if obrigatorio:
+            raise LinhaInvalida(f"{campo} é obrigatório")
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor))
+    s = _texto(valor).replace("R$", "").replace(" ", "")
+    if "," in s:  # 1.234,56
+        s = s.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(s)
+    except InvalidOperation:
+        raise LinhaInvalida(f"{campo} inválido: {valor!r}")
+
+
+def _data(valor, campo: str) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = _texto(valor)
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    raise LinhaInvalida(f"{campo} inválido: {valor!r}")
+
+
+def _bool(valor, padrao: bool = True) -> bool:
+    s = _texto(valor).lower()
+    if not s:
+        return padrao
+    return s in {"1", "s", "sim", "true", "verdadeiro", "x", "ativo"}
+
+
+def _numero(valor) -> str:
+    # Planilhas costumam trazer número do romaneio como float (11613.0)
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return _texto(valor)
+
+
+# =============================================================================
+# Leitura das fontes
+# =============================================================================
+def _ler_xlsx(caminho: Path, etapa: str):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        if etapa not in wb.sheetnames:
+            return
+        linhas = wb[etapa].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if not cabecalho:
+            return
+        nomes = [_texto(c).lower() for c in cabecalho]
+        for linha in linhas:
+            if linha is None or all(v is None or _texto(v) == "" for v in linha):
+                continue
+            yield dict(zip(nomes, linha))
+    finally:
+        wb.close()
+
+
+def _ler_csv(caminho: Path, delimitador: str | None):
+    with open(caminho, newline="", encoding="utf-8-sig") as fh:
+        if not delimitador:
+            amostra = fh.read(4096)
+            fh.seek(0)
+            try:
+                delimitador = csv.Sniffer().sniff(amostra, delimiters=";,\t").delimiter
+            except csv.Error:
+                delimitador = ";"
+        reader = csv.DictReader(fh, delimiter=delimitador)
+        reader.fieldnames = [_texto(n).lower() for n in (reader.fieldnames or [])]
+        for linha in reader:
+            if not any(_texto(v) for v in linha.values()):
+                continue
+            yield linha
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa histórico de planilhas (XLSX com abas clientes, tipos_madeira, romaneios, itens, "
+        "unidades, pagamentos — ou CSVs com esses nomes) usando bulk_create em blocos, "
+        "com checkpoint para retomar e totais recalculados uma vez por romaneio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fontes", nargs="+", help="Arquivo .xlsx, arquivos .csv ou diretório com os CSVs.")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Linhas por transação (padrão 5000).")
+        parser.add_argument(
+            "--checkpoint",
+            default="",
+            help="Nome do checkpoint, guardado no banco (padrão: caminho da primeira fonte).",
+        )
+        parser.add_argument("--reiniciar", action="store_true", help="Ignora o checkpoint existente.")
+        parser.add_argument("--delimitador", default="", help="Delimitador dos CSVs (padrão: detecta).")
+        parser.add_argument(
+            "--criar-faltantes",
+            action="store_true",
+            help="Cria clientes/motoristas/romaneiadores citados que não existem (em vez de rejeitar a linha).",
+        )
+        parser.add_argument("--max-erros", type=int, default=20, help="Quantos erros de linha exibir.")
+
+    # -------------------------------------------------------------------------
+    # Fontes / checkpoint
+    # -------------------------------------------------------------------------
+    def _resolver_fontes(self, fontes: list[str]) -> dict[str, Path]:
+        """Mapa etapa -> arquivo (XLSX serve para todas as etapas)."""
+        mapa: dict[str, Path] = {}
+        arquivos: list[Path] = []
+        for f in fontes:
+            p = Path(f)
+            if p.is_dir():
+                arquivos.extend(sorted(p.glob("*.csv")))
+            elif p.exists():
+                arquivos.append(p)
+            else:
+                raise CommandError(f"Fonte não encontrada: {f}")
+
+        for p in arquivos:
+            if p.suffix.lower() in {".xlsx", ".xlsm"}:
+                for etapa in ETAPAS:
+                    mapa.setdefault(etapa, p)
+            elif p.suffix.lower() == ".csv":
+                if p.stem.lower() not in ETAPAS:
+                    raise CommandError(f"CSV '{p.name}' não corresponde a nenhuma etapa ({', '.join(ETAPAS)}).")
+                mapa[p.stem.lower()] = p
+            else:
+                raise CommandError(f"Formato não suportado: {p.name}")
+        return mapa
+
+    def _linhas(self, etapa: str, fontes: dict[str, Path]):
+        caminho = fontes.get(etapa)
+        if caminho is None:
+            return iter(())
+        if caminho.suffix.lower() == ".csv":
+            return _ler_csv(caminho, self.delimitador)
+        return _ler_xlsx(caminho, etapa)
+
+    def _carregar_checkpoint(self, chave: str, assinatura: list[str], reiniciar: bool) -> dict:
+        vazio = {"fontes": assinatura, "etapas": {}, "totais_pendentes": [], "concluido": False}
+        cp = CheckpointImportacao.objects.filter(chave=chave).values_list("dados", flat=True).first()
+        if reiniciar or cp is None:
+            return vazio
+        if cp.get("fontes") != assinatura:
+            raise CommandError(
+                f"Checkpoint {chave} pertence a outras fontes. Use --reiniciar ou --checkpoint."
+            )
+        if cp.get("concluido"):
+            self.stdout.write(self.style.WARNING("Checkpoint indica importação já concluída (use --reiniciar)."))
+        return cp
+
+    def _salvar_checkpoint(self):
+        """Grava o checkpoint no banco; dentro do atomic do bloco, é confirmado junto com ele."""
+        CheckpointImportacao.objects.update_or_create(chave=self.checkpoint_chave, defaults={"dados": self.checkpoint})
+
+    # -------------------------------------------------------------------------
+    # Mapas nome -> id
+    # -------------------------------------------------------------------------
+    def _carregar_mapas(self):
+        self.clientes = dict(Cliente.objects.values_list("nome", "id"))
+        self.tipos = {nome: (pk, pn, pf) for pk, nome, pn, pf in TipoMadeira.objects.values_list(
+            "id", "nome", "preco_normal", "preco_com_frete"
+        )}
+        self.motoristas = dict(Motorista.objects.values_list("nome", "id"))
+        self.romaneiadores = dict(Romaneiador.objects.values_list("nome", "id"))
+        self.romaneios = {
+            numero: (pk, tipo, modalidade)
+            for pk, numero, tipo, modalidade in Romaneio.objects.values_list(
+                "id", "numero_romaneio", "tipo_romaneio", "modalidade"
+            )
+        }
+        self.itens = None  # carregado sob demanda (após a etapa de itens)
+
+    def _carregar_itens(self):
+        self.itens = {
+            (numero, tipo_id): pk
+            for pk, numero, tipo_id in ItemRomaneio.objects.values_list(
+                "id", "romaneio__numero_romaneio", "tipo_madeira_id"
+            )
+        }
+
+    def _id_cadastro(self, mapa: dict, model, nome: str, rotulo: str, *, opcional: bool = False) -> int | None:
+        if not nome:
+            if opcional:
+                return None
+            raise LinhaInvalida(f"{rotulo} é obrigatório")
+        pk = mapa.get(nome)
+        if pk is None:
+            if not self.criar_faltantes:
+                raise LinhaInvalida(f"{rotulo} '{nome}' não cadastrado")
+            pk = model.objects.create(nome=nome).pk
+            mapa[nome] = pk
+        return pk
+
+    def _tipo_madeira(self, nome: str):
+        tipo = self.tipos.get(nome)
+        if tipo is None:
+            raise LinhaInvalida(f"tipo de madeira '{nome}' não cadastrado")
+        return tipo
+
+    # -------------------------------------------------------------------------
+    # Conversão linha -> instância (por etapa)
+    # -------------------------------------------------------------------------
+    def _cliente(self, row):
+        nome = _texto(row.get("nome"))
+        if not nome:
+            raise LinhaInvalida("nome é obrigatório")
+        if nome in self.clientes:
+            return None
+        self.clientes[nome] = None  # reserva (evita duplicado no mesmo bloco)
+        return Cliente(
+            nome=nome,
+            cpf_cnpj=_texto(row.get("cpf_cnpj")) or None,
+            telefone=_texto(row.get("telefone")) or None,
+            endereco=_texto(row.get("endereco")) or None,
+            ativo=_bool(row.get("ativo")),
+        )
+
+    def _tipo(self, row):
+        nome = _texto(row.get("nome"))
+        if not nome:
+            raise LinhaInvalida("nome é obrigatório")
+        if nome in self.tipos:
+            return None
+        preco_normal = _decimal(row.get("preco_normal"), "preco_normal", obrigatorio=True)
+        preco_com_frete = _decimal(row.get("preco_com_frete"), "preco_com_frete") or preco_normal
+        self.tipos[nome] = (None, preco_normal, preco_com_frete)
+        return TipoMadeira(
+            nome=nome, preco_normal=preco_normal, preco_com_frete=preco_com_frete, ativo=_bool(row.get("ativo"))
+        )
+
+    def _romaneio(self, row):
+        numero = _numero(row.get("numero_romaneio"))
+        if not numero:
+            raise LinhaInvalida("numero_romaneio é obrigatório")
+        if numero in self.romaneios:
+            return None
+
+        tipo = (_texto(row.get("tipo_romaneio")) or "NORMAL").upper().replace(" ", "_")
+        if tipo not in {"NORMAL", "COM_FRETE"}:
+            raise LinhaInvalida(f"tipo_romaneio inválido: {tipo}")
+        modalidade = (_texto(row.get("modalidade")) or "SIMPLES").upper()
+        if modalidade not in {"SIMPLES", "DETALHADO"}:
+            raise LinhaInvalida(f"modalidade inválida: {modalidade}")
+
+        desconto = _decimal(row.get("desconto"), "desconto") or Decimal("0.00")
+        if not (Decimal("0") <= desconto <= Decimal("100")):
+            raise LinhaInvalida(f"desconto fora de 0–100: {desconto}")
+
+        romaneio = Romaneio(
+            numero_romaneio=numero,
+            data_romaneio=_data(row.get("data_romaneio"), "data_romaneio"),
+            cliente_id=self._id_cadastro(self.clientes, Cliente, _texto(row.get("cliente")), "cliente"),
+            motorista_id=self._id_cadastro(
+                self.motoristas, Motorista, _texto(row.get("motorista")), "motorista", opcional=True
+            ),
+            romaneiador_id=self._id_cadastro(
+                self.romaneiadores, Romaneiador, _texto(row.get("romaneiador")), "romaneiador", opcional=True
+            ),
+            tipo_romaneio=tipo,
+            modalidade=modalidade,
+            desconto=desconto,
+        )
+        self.romaneios[numero] = (None, tipo, modalidade)
+        return romaneio
+
+    def _romaneio_existente(self, row):
+        numero = _numero(row.get("numero_romaneio"))
+        dados = self.romaneios.get(numero)
+        if dados is None or dados[0] is None:
+            raise LinhaInvalida(f"romaneio '{numero}' não encontrado")
+        return numero, dados
+
+    def _item(self, row):
+        numero, (romaneio_id, tipo_romaneio, _modalidade) = self._romaneio_existente(row)
+        tipo_id, preco_normal, preco_com_frete = self._tipo_madeira(_texto(row.get("tipo_madeira")))
+        if (numero, tipo_id) in self.itens:
+            return None
+
+        valor_unitario = _decimal(row.get("valor_unitario"), "valor_unitario") or (
+            preco_com_frete if tipo_romaneio == "COM_FRETE" else preco_normal
+        )
+        self.itens[(numero, tipo_id)] = None
+        self.pendentes.add(romaneio_id)
+        return ItemRomaneio(
+            romaneio_id=romaneio_id,
+            tipo_madeira_id=tipo_id,
+            valor_unitario=valor_unitario,
+            quantidade_m3_total=_decimal(row.get("quantidade_m3_total"), "quantidade_m3_total") or Decimal("0.000"),
+        )
+
+    def _unidade(self, row):
+        numero, (romaneio_id, _tipo, _modalidade) = self._romaneio_existente(row)
+        tipo_id = self._tipo_madeira(_texto(row.get("tipo_madeira")))[0]
+        item_id = self.itens.get((numero, tipo_id))
+        if item_id is None:
+            raise LinhaInvalida(f"item '{row.get('tipo_madeira')}' do romaneio '{numero}' não encontrado")
+
+        unidade = UnidadeRomaneio(
+            item_id=item_id,
+            comprimento=_decimal(row.get("comprimento"), "comprimento"),
+            rodo=_decimal(row.get("rodo"), "rodo"),
+            desconto_1=_decimal(row.get("desconto_1"), "desconto_1") or Decimal("0.00"),
+            desconto_2=_decimal(row.get("desconto_2"), "desconto_2") or Decimal("0.00"),
+            quantidade_m3=_decimal(row.get("quantidade_m3"), "quantidade_m3"),
+        )
+        # Mesma regra de UnidadeRomaneio.save(): m³ pela fórmula se vier vazio/zerado
+        if unidade.quantidade_m3 is None or unidade.quantidade_m3 <= 0:
+            unidade.quantidade_m3 = unidade.calcular_m3_detalhado()
+        if unidade.quantidade_m3 is None or unidade.quantidade_m3 <= 0:
+            raise LinhaInvalida("quantidade_m3 ausente e sem medidas para calcular")
+
+        self.pendentes.add(romaneio_id)
+        return unidade
+
+    def _pagamento(self, row):
+        valor = _decimal(row.get("valor"), "valor", obrigatorio=True)
+        if valor <= 0:
+            raise LinhaInvalida("valor deve ser positivo")
+        tipo = (_texto(row.get("tipo_pagamento")) or "DINHEIRO").upper()
+        if tipo not in TIPOS_PAGAMENTO:
+            tipo = "OUTROS"
+        return Pagamento(
+            data_pagamento=_data(row.get("data_pagamento"), "data_pagamento"),
+            cliente_id=self._id_cadastro(self.clientes, Cliente, _texto(row.get("cliente")), "cliente"),
+            valor=valor,
+            tipo_pagamento=tipo,
+            descricao=_texto(row.get("descricao")) or None,
+        )
+
+    def _pos_bloco(self, etapa: str, criados: list):
+        """
+        Atualiza os mapas com os ids do bloco recém-gravado (bulk_create devolve
+        os pks no PostgreSQL/SQLite; sem isso, consulta só as chaves do bloco).
+        """
+        if not criados:
+            return
+        sem_pk = any(obj.pk is None for obj in criados)
+
+        if etapa == "clientes":
+            if sem_pk:
+                criados = Cliente.objects.filter(nome__in=[c.nome for c in criados]).only("id", "nome")
+            self.clientes.update({c.nome: c.pk for c in criados})
+        elif etapa == "tipos_madeira":
+            if sem_pk:
+                criados = TipoMadeira.objects.filter(nome__in=[t.nome for t in criados])
+            self.tipos.update({t.nome: (t.pk, t.preco_normal, t.preco_com_frete) for t in criados})
+        elif etapa == "romaneios":
+            if sem_pk:
+                criados = Romaneio.objects.filter(numero_romaneio__in=[r.numero_romaneio for r in criados]).only(
+                    "id", "numero_romaneio", "tipo_romaneio", "modalidade"
+                )
+            for r in criados:
+                self.romaneios[r.numero_romaneio] = (r.pk, r.tipo_romaneio, r.modalidade)
+        elif etapa == "itens":
+            if sem_pk:
+                self._carregar_itens()
+                return
+            numeros = {pk: numero for numero, (pk, _t, _m) in self.romaneios.items()}
+            for item in criados:
+                self.itens[(numeros[item.romaneio_id], item.tipo_madeira_id)] = item.pk
+
+    # -------------------------------------------------------------------------
+    # Execução
+    # -------------------------------------------------------------------------
+    def _importar_etapa(self, etapa: str, fontes: dict[str, Path]):
+        conversor = {
+            "clientes": (self._cliente, Cliente),
+            "tipos_madeira": (self._tipo, TipoMadeira),
+            "romaneios": (self._romaneio, Romaneio),
+            "itens": (self._item, ItemRomaneio),
+            "unidades": (self._unidade, UnidadeRomaneio),
+            "pagamentos": (self._pagamento, Pagamento),
+        }[etapa]
+        converter, model = conversor
+
+        if etapa == "unidades" and self.itens is None:
+            self._carregar_itens()
+        if etapa == "itens" and self.itens is None:
+            self._carregar_itens()
+
+        ja_feitas = int(self.checkpoint["etapas"].get(etapa, 0))
+        inicio = time.monotonic()
+        lidas = gravadas = 0
+        bloco: list = []
+
+        def gravar(ate_linha: int):
+            nonlocal gravadas, bloco
+            # Bloco e checkpoint na mesma transação: unidades e pagamentos não têm chave
+            # natural, então reprocessar um bloco já confirmado os duplicaria
+            with transaction.atomic():
+                if bloco:
+                    model.objects.bulk_create(bloco, batch_size=1000)
+                self.checkpoint["etapas"][etapa] = ate_linha
+                self.checkpoint["totais_pendentes"] = sorted(self.pendentes)
+                self._salvar_checkpoint()
+            gravadas += len(bloco)
+            self._pos_bloco(etapa, bloco)
+            bloco = []
+
+            decorrido = max(time.monotonic() - inicio, 1e-6)
+            self.stdout.write(
+                f"  [{etapa}] linha {ate_linha:,} — {gravadas:,} gravadas "
+                f"({lidas / decorrido:,.0f} linhas/s)".replace(",", ".")
+            )
+
+        numero_linha = 0
+        for numero_linha, row in enumerate(self._linhas(etapa, fontes), start=1):
+            if numero_linha <= ja_feitas:
+                continue
+            lidas += 1
+            try:
+                obj = converter(row)
+            except LinhaInvalida as exc:
+                self.erros += 1
+                if self.erros <= self.max_erros:
+                    self.stderr.write(f"  [{etapa}] linha {numero_linha + 1}: {exc}")
+                continue
+            if obj is not None:
+                bloco.append(obj)
+            if lidas % self.chunk_size == 0:
+                gravar(numero_linha)
+
+        if bloco or numero_linha > int(self.checkpoint["etapas"].get(etapa, 0)):
+            gravar(numero_linha)
+        elif ja_feitas:
+            self.stdout.write(f"  [{etapa}] já importada (checkpoint).")
+
+    def handle(self, *args, **options):
+        self.chunk_size = max(1, options["chunk_size"])
+        self.delimitador = options["delimitador"] or None
+        self.criar_faltantes = options["criar_faltantes"]
+        self.max_erros = options["max_erros"]
+        self.erros = 0
+
+        fontes = self._resolver_fontes(options["fontes"])
+        if not fontes:
+            raise CommandError("Nenhuma planilha/CSV reconhecido.")
+
+        assinatura = sorted(str(p.resolve()) for p in set(fontes.values()))
+        self.checkpoint_chave = options["checkpoint"] or str(Path(options["fontes"][0]).resolve())
+        self.checkpoint = self._carregar_checkpoint(self.checkpoint_chave, assinatura, options["reiniciar"])
+        self.pendentes = set(self.checkpoint.get("totais_pendentes") or [])
+
+        self.stdout.write(self.style.MIGRATE_HEADING("==== Importação de histórico ===="))
+        self.stdout.write(f"Checkpoint: {self.checkpoint_chave}")
+
+        inicio = time.monotonic()
+        self._carregar_mapas()
+
+        for etapa in ETAPAS:
+            if etapa not in fontes:
+                continue
+            self.stdout.write(self.style.MIGRATE_LABEL(f"Etapa: {etapa}"))
+            self._importar_etapa(etapa, fontes)
+
+        if self.pendentes:
+            self.stdout.write(self.style.MIGRATE_LABEL(f"Recalculando totais de {len(self.pendentes)} romaneios..."))
+            with transaction.atomic():
+                recalcular_totais_em_lote(self.pendentes)
+                self.checkpoint["totais_pendentes"] = []
+                self._salvar_checkpoint()
+            self.pendentes = set()
+
+        self.checkpoint["concluido"] = True
+        self._salvar_checkpoint()
+        incrementar_tudo()  # bulk_create não dispara post_save
+
+        decorrido = time.monotonic() - inicio
+        msg = f"Importação concluída em {decorrido:.1f}s."
+        if self.erros:
+            msg += f" {self.erros} linha(s) rejeitada(s)."
+        self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import Romaneio, UnidadeRomaneio
+from apps.romaneio.services import recalcular_totais_em_lote
+
+
+class GerarDadosSinteticosTests(TestCase):
+    PARAMS = dict(
+        clientes=10, tipos=5, motoristas=3, romaneiadores=2,
+        romaneios=60, itens=150, unidades=600, pagamentos=40,
+    )
+
+    def _gerar(self, prefixo: str, seed: int = 7):
+        call_command(
+            "gerar_dados_sinteticos",
+            prefixo=prefixo, seed=seed, chunk_size=25, metodo="bulk", stdout=StringIO(), **self.PARAMS
+        )
+        return list(
+            Romaneio.objects.filter(numero_romaneio__startswith=prefixo)
+            .order_by("numero_romaneio")
+            .values_list("modalidade", "m3_total", "valor_bruto", "valor_total")
+        )
+
+    def test_totais_coerentes_com_regras_do_model(self):
+        gerados = self._gerar("A")
+        self.assertEqual(len(gerados), 60)
+        self.assertTrue(UnidadeRomaneio.objects.exists())
+        self.assertEqual(Pagamento.objects.count(), 40)
+
+        # Recalcular pelas regras do sistema não pode alterar nada
+        recalcular_totais_em_lote(Romaneio.objects.values_list("id", flat=True))
+        recalculados = list(
+            Romaneio.objects.filter(numero_romaneio__startswith="A")
+            .order_by("numero_romaneio")
+            .values_list("modalidade", "m3_total", "valor_bruto", "valor_total")
+        )
+        self.assertEqual(gerados, recalculados)
+
+    def test_mesma_seed_gera_mesmos_dados(self):
+        self.assertEqual(self._gerar("A"), self._gerar("B"))
+
+    def test_prefixo_repetido_e_rejeitado(self):
+        self._gerar("A")
+        with self.assertRaises(CommandError):
+            self._gerar("A")
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.cadastros.management.commands.importar_historico import Command
+from apps.cadastros.models import Cliente
+from apps.core.models import CheckpointImportacao
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import Romaneio, UnidadeRomaneio
+
+
+class ImportarHistoricoTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+
+        self._csv("clientes", "nome;telefone\nCliente Import;9999\n")
+        self._csv("tipos_madeira", "nome;preco_normal;preco_com_frete\nIPE IMPORT;10,00;15,00\n")
+        self._csv(
+            "romaneios",
+            "numero_romaneio;data_romaneio;cliente;tipo_romaneio;modalidade;desconto\n"
+            "5001;10/01/2024;Cliente Import;NORMAL;SIMPLES;10\n"
+            "5002;11/01/2024;Cliente Import;COM_FRETE;DETALHADO;0\n"
+            "5003;11/01/2024;Cliente Inexistente;NORMAL;SIMPLES;0\n",
+        )
+        self._csv(
+            "itens",
+            "numero_romaneio;tipo_madeira;valor_unitario;quantidade_m3_total\n"
+            "5001;IPE IMPORT;;2,000\n"
+            "5002;IPE IMPORT;;\n",
+        )
+        self._csv(
+            "unidades",
+            "numero_romaneio;tipo_madeira;comprimento;rodo;quantidade_m3\n"
+            "5002;IPE IMPORT;4,00;30,00;0,500\n"
+            "5002;IPE IMPORT;4,00;400,00;\n",
+        )
+        self._csv("pagamentos", "data_pagamento;cliente;valor;tipo_pagamento\n2024-01-15;Cliente Import;1.000,00;PIX\n")
+
+    def _csv(self, nome: str, conteudo: str):
+        (self.dir / f"{nome}.csv").write_text(conteudo, encoding="utf-8")
+
+    def _importar(self, *args) -> str:
+        out, err = StringIO(), StringIO()
+        call_command("importar_historico", str(self.dir), *args, stdout=out, stderr=err)
+        return out.getvalue() + err.getvalue()
+
+    def test_importa_e_recalcula_totais(self):
+        saida = self._importar("--chunk-size", "1")
+
+        self.assertIn("Cliente Inexistente", saida)  # linha rejeitada e reportada
+        self.assertFalse(Romaneio.objects.filter(numero_romaneio="5003").exists())
+
+        simples = Romaneio.objects.get(numero_romaneio="5001")
+        self.assertEqual(simples.valor_bruto, Decimal("20.00"))
+        self.assertEqual(simples.valor_total, Decimal("18.00"))  # desconto 10%
+
+        detalhado = Romaneio.objects.get(numero_romaneio="5002")
+        self.assertEqual(detalhado.m3_total, Decimal("0.540"))  # 0.500 + 0.040 (fórmula)
+        self.assertEqual(detalhado.valor_total, Decimal("8.10"))  # preço com frete
+
+        self.assertEqual(Pagamento.objects.get().valor, Decimal("1000.00"))
+
+    def test_retoma_do_checkpoint_sem_duplicar(self):
+        self._importar()
+        self.assertEqual(UnidadeRomaneio.objects.count(), 2)
+
+        checkpoint = CheckpointImportacao.objects.get(chave=str(self.dir.resolve()))
+        self.assertTrue(checkpoint.dados["concluido"])
+
+        # Simula queda depois das unidades: pagamentos ainda não gravados
+        Pagamento.objects.all().delete()
+        checkpoint.dados["etapas"].pop("pagamentos")
+        checkpoint.dados["concluido"] = False
+        checkpoint.save()
+
+        self._importar()
+        self.assertEqual(UnidadeRomaneio.objects.count(), 2)
+        self.assertEqual(Pagamento.objects.count(), 1)
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_queda_no_bloco_desfaz_bloco_e_checkpoint(self):
+        salvar = Command._salvar_checkpoint
+
+        def cair_nos_pagamentos(comando):
+            if "pagamentos" in comando.checkpoint["etapas"]:
+                raise RuntimeError("queda")
+            salvar(comando)
+
+        with mock.patch.object(Command, "_salvar_checkpoint", cair_nos_pagamentos), self.assertRaises(RuntimeError):
+            self._importar()
+        self.assertFalse(Pagamento.objects.exists())
+        self.assertEqual(UnidadeRomaneio.objects.count(), 2)
+
+        # Retomada: as unidades já confirmadas não voltam, o bloco de pagamentos sim
+        self._importar()
+        self.assertEqual(UnidadeRomaneio.objects.count(), 2)
+        self.assertEqual(Pagamento.objects.count(), 1)
+
+    def test_le_xlsx(self):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "clientes"
+        ws.append(["nome", "ativo"])
+        ws.append(["Cliente XLSX", "sim"])
+        caminho = self.dir / "historico.xlsx"
+        wb.save(caminho)
+
+        out = StringIO()
+        call_command("importar_historico", str(caminho), stdout=out)
+        self.assertTrue(Cliente.objects.filter(nome="Cliente XLSX").exists())
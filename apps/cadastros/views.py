@@ -7,6 +7,7 @@ from django.db.models.functions import Coalesce
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 
+from apps.core.paginacao import KeysetPaginationMixin
 from apps.financeiro.models import Pagamento
 from apps.romaneio.models import Romaneio
 
@@ -43,15 +44,22 @@ class StaffRequiredMixin(UserPassesTestMixin):
 
 # ========== CLIENTES ==========
 
-class ClienteListView(LoginRequiredMixin, ListView):
+class ClienteListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Cliente
     template_name = "cadastros/cliente_list.html"
     context_object_name = "clientes"
     paginate_by = 20
 
+    ORDENACOES = {
+        "saldo": ("saldo_calc", "nome", "id"),
+        "saldo_desc": ("-saldo_calc", "nome", "id"),
+    }
+
+    def get_ordenacao_keyset(self):
+        return self.ORDENACOES.get(self.request.GET.get("ordenar"), ("nome", "id"))
+
     def get_queryset(self):
         busca = self.request.GET.get("q")
-        ordenar = self.request.GET.get("ordenar", "nome")
         filtro_saldo = self.request.GET.get("saldo")
 
         qs = Cliente.objects.all()
@@ -99,15 +107,8 @@ class ClienteListView(LoginRequiredMixin, ListView):
         elif filtro_saldo == "zerados":
             qs = qs.filter(saldo_calc=0)
 
-        # Ordenação
-        if ordenar == "saldo":
-            qs = qs.order_by("saldo_calc", "nome")
-        elif ordenar == "saldo_desc":
-            qs = qs.order_by("-saldo_calc", "nome")
-        else:
-            qs = qs.order_by("nome")
-
-        return qs
+        # Ordenação (a mesma usada como chave da paginação)
+        return qs.order_by(*self.get_ordenacao_keyset())
 
 
 class ClienteCreateView(LoginRequiredMixin, CreateView):
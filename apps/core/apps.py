@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "apps.core"
+    verbose_name = "Core"
+
+    def ready(self):
+        from .versoes import conectar_sinais
+
+        conectar_sinais()
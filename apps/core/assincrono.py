@@ -0,0 +1,115 @@
+"""
+Suporte às views assíncronas (deploy ASGI: config/asgi.py).
+
+- `em_paralelo`: consultas independentes ao mesmo tempo, cada uma numa thread de um pool
+  limitado (ASYNC_QUERY_THREADS), com a conexão de banco própria daquela thread;
+- `renderizar`: geração de Excel/PDF (openpyxl/WeasyPrint) num segundo pool, também limitado
+  (REPORT_RENDER_THREADS): um export longo não segura o loop nem as threads das consultas;
+- `login_obrigatorio` / `LoginObrigatorioMixin`: login_required / LoginRequiredMixin para
+  views async (o Django 4.2 não tem versão async deles).
+
+Cada consulta em paralelo roda em autocommit na sua conexão: os resultados de tarefas
+diferentes podem refletir instantes ligeiramente diferentes (ok para painéis e relatórios).
+O RequestMetricsMiddleware só enxerga o SQL da thread da requisição.
+
+Com 0 threads (settings_test) tudo roda em sequência na thread "sync" da requisição, onde a
+transação do TestCase é visível.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+
+_pools: dict[tuple[str, int], ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def _pool(nome: str, tamanho: int) -> ThreadPoolExecutor | None:
+    """Pool por (nome, tamanho), criado na primeira chamada; None = sem threads extras."""
+    if tamanho <= 0:
+        return None
+    with _lock:
+        pool = _pools.get((nome, tamanho))
+        if pool is None:
+            pool = _pools[(nome, tamanho)] = ThreadPoolExecutor(
+                max_workers=tamanho, thread_name_prefix=f"romaneios-{nome}"
+            )
+    return pool
+
+
+def _com_conexao(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Descarta conexões vencidas/quebradas da thread do pool antes e depois da tarefa (CONN_MAX_AGE)."""
+
+    @functools.wraps(fn)
+    def executar(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return executar
+
+
+# =============================================================================
+# Consultas e renderização
+# =============================================================================
+async def em_paralelo(**tarefas: Callable[[], Any]) -> dict[str, Any]:
+    """
+    Executa as tarefas (callables sem argumentos, síncronos) e devolve {nome: resultado}.
+    As tarefas devem devolver dados já materializados (list(qs), dicts): QuerySet preguiçoso
+    seria avaliado depois, fora do pool.
+    """
+    pool = _pool("consultas", int(getattr(settings, "ASYNC_QUERY_THREADS", 4)))
+    if pool is None:
+        return await sync_to_async(lambda: {nome: fn() for nome, fn in tarefas.items()})()
+
+    resultados = await asyncio.gather(*(
+        sync_to_async(_com_conexao(fn), thread_sensitive=False, executor=pool)() for fn in tarefas.values()
+    ))
+    return dict(zip(tarefas, resultados))
+
+
+async def renderizar(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Roda `fn(*args, **kwargs)` (montagem de planilha/PDF) no pool de renderização."""
+    pool = _pool("render", int(getattr(settings, "REPORT_RENDER_THREADS", 2)))
+    if pool is None:
+        return await sync_to_async(fn)(*args, **kwargs)
+    return await sync_to_async(_com_conexao(fn), thread_sensitive=False, executor=pool)(*args, **kwargs)
+
+
+# =============================================================================
+# Autenticação
+# =============================================================================
+async def usuario_autenticado(request) -> bool:
+    # request.user é preguiçoso (sessão + consulta ao usuário): resolve fora do loop
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+def login_obrigatorio(view):
+    """login_required para views `async def`."""
+
+    @functools.wraps(view)
+    async def _view(request, *args, **kwargs):
+        if not await usuario_autenticado(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return _view
+
+
+class LoginObrigatorioMixin:
+    """LoginRequiredMixin para class-based views com handlers `async def`."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not await usuario_autenticado(request):
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
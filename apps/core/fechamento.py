@@ -0,0 +1,70 @@
+"""
+Períodos fechados (core.FechamentoPeriodo): bloqueio de edição e leitura dos snapshots.
+
+Romaneios e pagamentos com data num mês fechado não podem ser criados, alterados (nem
+movidos para fora do mês) ou excluídos: os forms e as views de exclusão chamam
+validar_aberto() com a data nova e a antiga. Para corrigir, reabre-se o mês.
+
+Fechar/reabrir e gravar os snapshots: apps.relatorios.fechamento (comando fechar_mes).
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+from functools import reduce
+from operator import or_
+from typing import Iterable
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import FechamentoPeriodo, SnapshotRelatorio
+
+
+def mensagem(data: date) -> str:
+    return f"O mês {data:%m/%Y} está fechado. Reabra o período para alterar lançamentos dele."
+
+
+def _meses(datas: Iterable[date | None]) -> set[tuple[int, int]]:
+    return {(d.year, d.month) for d in datas if d is not None}
+
+
+def mes_fechado(data: date | None) -> bool:
+    if data is None:
+        return False
+    return FechamentoPeriodo.objects.filter(ano=data.year, mes=data.month).exists()
+
+
+def validar_aberto(*datas: date | None) -> None:
+    """ValidationError (code="periodo_fechado") se alguma das datas cai num mês fechado. Uma consulta."""
+    meses = _meses(datas)
+    if not meses:
+        return
+    filtro = reduce(or_, (Q(ano=ano, mes=mes) for ano, mes in meses))
+    fechado = FechamentoPeriodo.objects.filter(filtro).order_by("ano", "mes").values_list("ano", "mes").first()
+    if fechado:
+        raise ValidationError(mensagem(date(fechado[0], fechado[1], 1)), code="periodo_fechado")
+
+
+# =============================================================================
+# Snapshots
+# =============================================================================
+def snapshot(ano: int, mes: int, relatorio: str, formato: str) -> SnapshotRelatorio | None:
+    """Snapshot do relatório no mês fechado (None se o mês está aberto ou não há esse formato)."""
+    return (
+        SnapshotRelatorio.objects.select_related("fechamento__fechado_por")
+        .filter(fechamento__ano=ano, fechamento__mes=mes, relatorio=relatorio, formato=formato)
+        .first()
+    )
+
+
+def snapshots_json(relatorio: str, meses: Iterable[date]) -> dict[date, dict]:
+    """{primeiro dia do mês: dados} dos meses fechados com snapshot json do relatório. Uma consulta."""
+    meses = _meses(meses)
+    if not meses:
+        return {}
+    filtro = reduce(or_, (Q(fechamento__ano=ano, fechamento__mes=mes) for ano, mes in meses))
+    linhas = SnapshotRelatorio.objects.filter(filtro, relatorio=relatorio, formato="json").values_list(
+        "fechamento__ano", "fechamento__mes", "conteudo"
+    )
+    return {date(ano, mes, 1): json.loads(bytes(conteudo)) for ano, mes, conteudo in linhas}
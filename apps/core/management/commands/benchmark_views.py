@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.cadastros.management.commands.gerar_dados_sinteticos import PRESETS
+from apps.cadastros.models import Cliente, TipoMadeira
+from apps.romaneio.forms import ItemRomaneioFormSet
+from apps.romaneio.models import Romaneio
+
+# Modos de cache medidos: (timeout dos caches de relatório/fragmento/série, limpar o cache antes de cada
+# requisição). "sem_cache" é o padrão — com os caches ligados as repetições seriam só leituras do cache.
+MODOS_CACHE = {
+    "sem_cache": (0, False),
+    "cache_frio": (600, True),
+    "cache_quente": (600, False),
+}
+
+
+def _caches(timeout: int) -> override_settings:
+    """Liga (timeout > 0) ou desliga os caches de relatórios, fragmentos e séries durante a medição."""
+    return override_settings(
+        REPORT_CACHE_TIMEOUT=timeout, FRAGMENT_CACHE_TIMEOUT=timeout, SERIES_CACHE_TIMEOUT=timeout
+    )
+
+
+def _modos(valor: str) -> list[str]:
+    modos = [m.strip() for m in valor.split(",") if m.strip()]
+    invalidos = [m for m in modos if m not in MODOS_CACHE]
+    if not modos or invalidos:
+        raise CommandError(f"--modos aceita {', '.join(MODOS_CACHE)} (recebido: {valor!r}).")
+    return modos
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    """Percentil por interpolação linear (p em 0..100)."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(ordenados) - 1)
+    return ordenados[f] + (ordenados[c] - ordenados[f]) * (k - f)
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark das principais telas (dashboard, relatórios, lista de clientes, criação/edição de romaneio) "
+        "sobre massas de dados de tamanho fixo. Mede nº de queries e latência p50/p95; grava JSON."
+    )
+
+    CENARIOS_GET = (
+        ("dashboard", "relatorios:dashboard", True),
+        ("core_dashboard", "core:dashboard", True),
+        ("ficha_romaneios", "relatorios:ficha_romaneios", True),
+        ("ficha_madeiras", "relatorios:ficha_madeiras", True),
+        ("fluxo_financeiro", "relatorios:fluxo_financeiro", True),
+        ("saldo_clientes", "relatorios:saldo_clientes", False),
+        ("cliente_list", "cadastros:cliente_list", False),
+        ("romaneio_create_form", "romaneio:romaneio_create", False),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanhos",
+            default="mini",
+            help=f"Presets de massa separados por vírgula ({', '.join(sorted(PRESETS))}). Padrão: mini.",
+        )
+        parser.add_argument(
+            "--escala",
+            type=float,
+            default=1.0,
+            help="Multiplica as quantidades do preset (ex.: 0.1 para rodar rápido).",
+        )
+        parser.add_argument("--repeticoes", type=int, default=10, help="Requisições medidas por cenário.")
+        parser.add_argument("--aquecimento", type=int, default=1, help="Requisições descartadas antes de medir.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--saida", default="", help="Arquivo JSON de saída (padrão: benchmarks/views-<data>.json).")
+        parser.add_argument("--comparar", default="", help="JSON de uma execução anterior para mostrar a variação.")
+        parser.add_argument("--cenarios", default="", help="Filtra cenários (nomes separados por vírgula).")
+        parser.add_argument(
+            "--modos",
+            default="sem_cache",
+            help=(
+                f"Modos de cache das telas de leitura, separados por vírgula ({', '.join(MODOS_CACHE)}). "
+                "Padrão: sem_cache. As gravações são sempre medidas sem cache."
+            ),
+        )
+        parser.add_argument(
+            "--banco-atual",
+            action="store_true",
+            help="Usa o banco configurado em vez de criar um banco de teste (os dados existentes são APAGADOS).",
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Mantém o banco de teste entre execuções.")
+
+    # -------------------------------------------------------------------------
+    # Massa de dados
+    # -------------------------------------------------------------------------
+    def _semear(self, preset: str, escala: float, seed: int) -> dict:
+        call_command("flush", interactive=False, verbosity=0)
+        qtd = {k: max(1, int(v * escala)) for k, v in PRESETS[preset].items()}
+        call_command("gerar_dados_sinteticos", seed=seed, prefixo="B", stdout=StringIO(), **qtd)
+        return qtd
+
+    # -------------------------------------------------------------------------
+    # Medição
+    # -------------------------------------------------------------------------
+    def _medir(self, nome: str, executar, repeticoes: int, aquecimento: int, limpar: bool = False) -> dict:
+        for i in range(aquecimento):
+            executar(-(i + 1))
+
+        tempos, queries, status = [], [], None
+        for i in range(repeticoes):
+            if limpar:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                resp = executar(i)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(len(ctx.captured_queries))
+            status = resp.status_code
+
+        return {
+            "cenario": nome,
+            "status": status,
+            "n": repeticoes,
+            "queries": max(queries) if queries else 0,
+            "queries_min": min(queries) if queries else 0,
+            "p50_ms": round(_percentil(tempos, 50), 2),
+            "p95_ms": round(_percentil(tempos, 95), 2),
+            "min_ms": round(min(tempos), 2) if tempos else 0,
+            "max_ms": round(max(tempos), 2) if tempos else 0,
+            "media_ms": round(statistics.fmean(tempos), 2) if tempos else 0,
+        }
+
+    def _cenarios(self, client: Client, filtro: set[str]):
+        hoje = timezone.localdate()
+        periodo = {"mes": hoje.month, "ano": hoje.year}
+
+        for nome, url_name, com_periodo in self.CENARIOS_GET:
+            if filtro and nome not in filtro:
+                continue
+            url = reverse(url_name)
+            params = periodo if com_periodo else {}
+            yield nome, (lambda i, url=url, params=params: client.get(url, params))
+
+        cliente = Cliente.objects.order_by("id").first()
+        tipos = list(TipoMadeira.objects.order_by("id").values_list("id", flat=True)[:3])
+        prefixo = ItemRomaneioFormSet().prefix
+
+        def payload(numero: str, modalidade: str, itens: list[dict]) -> dict:
+            data = {
+                "numero_romaneio": numero,
+                "data_romaneio": hoje.isoformat(),
+                "cliente": str(cliente.pk),
+                "motorista": "",
+                "tipo_romaneio": "NORMAL",
+                "modalidade": modalidade,
+                f"{prefixo}-TOTAL_FORMS": str(len(itens)),
+                f"{prefixo}-INITIAL_FORMS": str(sum(1 for it in itens if it.get("id"))),
+                f"{prefixo}-MIN_NUM_FORMS": "1",
+                f"{prefixo}-MAX_NUM_FORMS": "1000",
+            }
+            for i, item in enumerate(itens):
+                if item.get("id"):
+                    data[f"{prefixo}-{i}-id"] = str(item["id"])
+                data[f"{prefixo}-{i}-tipo_madeira"] = str(item["tipo_madeira"])
+                data[f"{prefixo}-{i}-quantidade_m3_total"] = item.get("m3", "0.001")
+                data[f"{prefixo}-{i}-valor_unitario"] = "100.00"
+                unidades = item.get("unidades", 0)
+                data.update({
+                    f"unidades-{i}-TOTAL_FORMS": str(unidades),
+                    f"unidades-{i}-INITIAL_FORMS": "0",
+                    f"unidades-{i}-MIN_NUM_FORMS": "0",
+                    f"unidades-{i}-MAX_NUM_FORMS": "1000",
+                })
+                for u in range(unidades):
+                    data.update({
+                        f"unidades-{i}-{u}-comprimento": "4.00",
+                        f"unidades-{i}-{u}-rodo": "200.00",
+                        f"unidades-{i}-{u}-desconto_1": "0.00",
+                        f"unidades-{i}-{u}-desconto_2": "0.00",
+                        f"unidades-{i}-{u}-quantidade_m3": "0.010",
+                    })
+            return data
+
+        if cliente is None or not tipos:
+            return
+
+        create_url = reverse("romaneio:romaneio_create")
+        if not filtro or "romaneio_create_simples" in filtro:
+            yield "romaneio_create_simples", lambda i: client.post(
+                create_url,
+                payload(f"BS{i}", "SIMPLES", [{"tipo_madeira": t, "m3": "5.000"} for t in tipos]),
+            )
+        if not filtro or "romaneio_create_detalhado" in filtro:
+            yield "romaneio_create_detalhado", lambda i: client.post(
+                create_url,
+                payload(f"BD{i}", "DETALHADO", [{"tipo_madeira": t, "unidades": 20} for t in tipos]),
+            )
+
+        alvo = Romaneio.objects.filter(modalidade="SIMPLES").order_by("id").first()
+        if alvo is not None and (not filtro or "romaneio_update" in filtro):
+            itens = [
+                {"id": pk, "tipo_madeira": tm}
+                for pk, tm in alvo.itens.order_by("id").values_list("id", "tipo_madeira_id")
+            ]
+            update_url = reverse("romaneio:romaneio_update", kwargs={"pk": alvo.pk})
+
+            def atualizar(i):
+                for item in itens:
+                    item["m3"] = f"{1 + (i % 7)}.000"
+                return client.post(update_url, payload(alvo.numero_romaneio, "SIMPLES", itens))
+
+            yield "romaneio_update", atualizar
+
+    # -------------------------------------------------------------------------
+    def _comparar(self, atual: dict, anterior_path: str):
+        anterior = json.loads(Path(anterior_path).read_text(encoding="utf-8"))
+        base = {(r["tamanho"], r["cenario"], r.get("modo")): r for r in anterior.get("resultados", [])}
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Comparação com {anterior_path} ({anterior['meta'].get('commit')})"))
+        for r in atual["resultados"]:
+            # Execuções antigas (sem "modo") mediam com o cache ligado: não são comparáveis
+            b = base.get((r["tamanho"], r["cenario"], r["modo"]))
+            if not b:
+                continue
+            delta = (r["p50_ms"] - b["p50_ms"]) / b["p50_ms"] * 100 if b["p50_ms"] else 0.0
+            estilo = self.style.ERROR if delta > 10 else (self.style.SUCCESS if delta < -10 else (lambda s: s))
+            self.stdout.write(estilo(
+                f"  {r['tamanho']:>8} {r['cenario']:<28} {r['modo']:<13} "
+                f"p50 {b['p50_ms']:>9.1f} → {r['p50_ms']:>9.1f} ms "
+                f"({delta:+.0f}%)  queries {b['queries']} → {r['queries']}"
+            ))
+
+    def handle(self, *args, **options):
+        tamanhos = [t.strip() for t in options["tamanhos"].split(",") if t.strip()]
+        invalidos = [t for t in tamanhos if t not in PRESETS]
+        if invalidos:
+            raise CommandError(f"Preset(s) desconhecido(s): {', '.join(invalidos)}")
+        filtro = {c.strip() for c in options["cenarios"].split(",") if c.strip()}
+        modos = _modos(options["modos"])
+        leituras = {nome for nome, _, _ in self.CENARIOS_GET}
+
+        # Mesmo ambiente do test runner (ALLOWED_HOSTS com 'testserver', e-mail em memória).
+        # Dentro da suíte de testes o ambiente já está montado.
+        try:
+            setup_test_environment()
+            montou_ambiente = True
+        except RuntimeError:
+            montou_ambiente = False
+
+        nome_banco_original = None
+        if not options["banco_atual"]:
+            nome_banco_original = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+
+        try:
+            resultado = {
+                "meta": {
+                    "commit": _commit_atual(),
+                    "data": datetime.now().isoformat(timespec="seconds"),
+                    "banco": connection.vendor,
+                    "django": django.get_version(),
+                    "python": platform.python_version(),
+                    "repeticoes": options["repeticoes"],
+                    "escala": options["escala"],
+                    "seed": options["seed"],
+                    "modos": modos,
+                },
+                "tamanhos": {},
+                "resultados": [],
+            }
+
+            User = get_user_model()
+            for tamanho in tamanhos:
+                self.stdout.write(self.style.MIGRATE_LABEL(f"Semeando massa '{tamanho}'..."))
+                inicio = time.monotonic()
+                resultado["tamanhos"][tamanho] = self._semear(tamanho, options["escala"], options["seed"])
+                self.stdout.write(f"  pronto em {time.monotonic() - inicio:.1f}s")
+
+                user = User.objects.create_superuser("benchmark", "benchmark@example.com", "benchmark")
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+
+                for nome, executar in self._cenarios(client, filtro):
+                    for modo in modos if nome in leituras else ["sem_cache"]:
+                        timeout, limpar = MODOS_CACHE[modo]
+                        cache.clear()
+                        with _caches(timeout):
+                            r = self._medir(nome, executar, options["repeticoes"], options["aquecimento"], limpar)
+                        r.update({"tamanho": tamanho, "modo": modo})
+                        resultado["resultados"].append(r)
+                        estilo = self.style.SUCCESS if r["status"] in (200, 302) else self.style.ERROR
+                        self.stdout.write(estilo(
+                            f"  {nome:<28} {modo:<13} status {r['status']}  queries {r['queries']:>5}  "
+                            f"p50 {r['p50_ms']:>9.1f} ms  p95 {r['p95_ms']:>9.1f} ms"
+                        ))
+        finally:
+            cache.clear()
+            if nome_banco_original is not None:
+                connection.creation.destroy_test_db(nome_banco_original, verbosity=0, keepdb=options["keepdb"])
+            if montou_ambiente:
+                teardown_test_environment()
+
+        saida = Path(options["saida"] or f"benchmarks/views-{datetime.now():%Y%m%d-%H%M%S}.json")
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {saida}"))
+
+        if options["comparar"]:
+            self._comparar(resultado, options["comparar"])
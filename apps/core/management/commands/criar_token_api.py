@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import TokenApi
+from apps.core.tokens import criar_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria um token da API para o usuário e exibe a chave uma única vez. Com --escrita, o "
+        "token também grava romaneios pela API JSON. Com --revogar <prefixo>, desativa o token "
+        "do usuário com esse prefixo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Usuário dono do token.")
+        parser.add_argument("--nome", default="BI", help="Identificação do token (ex.: nome da ferramenta).")
+        parser.add_argument(
+            "--escrita", action="store_true", help="Permite gravar romaneios (API JSON); padrão: só leitura."
+        )
+        parser.add_argument("--revogar", metavar="PREFIXO", help="Desativa o token com este prefixo.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            usuario = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário não encontrado: {options['username']}")
+
+        if options["revogar"]:
+            qtd = TokenApi.objects.filter(usuario=usuario, prefixo=options["revogar"], ativo=True).update(ativo=False)
+            if not qtd:
+                raise CommandError(f"Nenhum token ativo com o prefixo {options['revogar']}.")
+            self.stdout.write(self.style.SUCCESS(f"Token {options['revogar']}… revogado."))
+            return
+
+        token, chave = criar_token(usuario, options["nome"], escrita=options["escrita"])
+        self.stdout.write(self.style.SUCCESS(f"Token '{token.nome}' criado para {usuario.username}."))
+        self.stdout.write("Guarde a chave (não é exibida de novo):")
+        self.stdout.write(chave)
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import re
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("apps.core.requests")
+
+# Métricas da requisição corrente (None fora de uma requisição instrumentada)
+_metricas_atuais: ContextVar["MetricasRequisicao | None"] = ContextVar("metricas_requisicao", default=None)
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA_IN = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def assinatura_sql(sql: str) -> str:
+    """
+    Normaliza o SQL para agrupar queries "iguais" (mesma forma, parâmetros diferentes):
+    literais viram `?` e listas `IN (...)` de qualquer tamanho ficam iguais.
+    Muitas execuções da mesma assinatura numa requisição = suspeita de N+1.
+    """
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA_IN.sub("(...)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+@dataclass
+class _EstatisticaSql:
+    sql: str  # primeiro SQL visto com a assinatura (amostra)
+    vezes: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+
+@dataclass
+class MetricasRequisicao:
+    request_id: str
+    inicio: float = field(default_factory=time.perf_counter)
+    sql_qtd: int = 0
+    sql_ms: float = 0.0
+    template_ms: float = 0.0
+    sql_em_template_ms: float = 0.0
+    renderizando: int = 0
+    por_assinatura: dict[str, _EstatisticaSql] = field(default_factory=dict)
+
+    def registrar_sql(self, sql: str, ms: float):
+        self.sql_qtd += 1
+        self.sql_ms += ms
+        if self.renderizando:
+            self.sql_em_template_ms += ms
+
+        chave = assinatura_sql(sql)
+        est = self.por_assinatura.get(chave)
+        if est is None:
+            est = self.por_assinatura[chave] = _EstatisticaSql(sql=sql)
+        est.vezes += 1
+        est.total_ms += ms
+        est.max_ms = max(est.max_ms, ms)
+
+    @property
+    def duplicadas(self) -> int:
+        """Execuções repetidas (além da primeira) de uma mesma assinatura."""
+        return sum(e.vezes - 1 for e in self.por_assinatura.values())
+
+    def top_sql(self, limite: int) -> list[dict]:
+        ordenadas = sorted(self.por_assinatura.values(), key=lambda e: e.total_ms, reverse=True)
+        return [
+            {
+                "sql": e.sql[:1000],
+                "vezes": e.vezes,
+                "total_ms": round(e.total_ms, 2),
+                "max_ms": round(e.max_ms, 2),
+            }
+            for e in ordenadas[:limite]
+        ]
+
+    def n_mais_1(self, minimo: int, limite: int) -> list[dict]:
+        repetidas = [e for e in self.por_assinatura.values() if e.vezes >= minimo]
+        repetidas.sort(key=lambda e: e.vezes, reverse=True)
+        return [{"sql": e.sql[:500], "vezes": e.vezes, "total_ms": round(e.total_ms, 2)} for e in repetidas[:limite]]
+
+
+def _wrapper_sql(execute, sql, params, many, context):
+    metricas = _metricas_atuais.get()
+    if metricas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metricas.registrar_sql(sql, (time.perf_counter() - inicio) * 1000)
+
+
+_template_instrumentado = False
+
+
+def _instrumentar_templates():
+    """
+    Envolve o render dos templates do backend Django (render_to_string, TemplateResponse, render()).
+    Só é instalado quando as métricas estão ligadas; fora de uma requisição instrumentada é repasse direto.
+    """
+    global _template_instrumentado
+    if _template_instrumentado:
+        return
+
+    from django.template.backends.django import Template
+
+    render_original = Template.render
+
+    def render(self, context=None, request=None):
+        metricas = _metricas_atuais.get()
+        if metricas is None:
+            return render_original(self, context, request)
+        metricas.renderizando += 1
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, context, request)
+        finally:
+            metricas.renderizando -= 1
+            if not metricas.renderizando:  # conta só o template de fora (include/extends já estão dentro)
+                metricas.template_ms += (time.perf_counter() - inicio) * 1000
+
+    Template.render = render
+    _template_instrumentado = True
+
+
+class RequestMetricsMiddleware:
+    """
+    Instrumentação por requisição: nº de queries, tempo de SQL, queries repetidas (N+1),
+    tempo de template e tempo total.
+
+    - Cabeçalho `Server-Timing` (aparece no DevTools do navegador) e `X-Request-ID`;
+    - Uma linha de log JSON por requisição (logger `apps.core.requests`);
+    - Acima de REQUEST_METRICS_SLOW_MS o log sobe para WARNING com as queries mais caras
+      e as assinaturas repetidas.
+
+    Desligado (REQUEST_METRICS_ENABLED=False) o Django descarta o middleware na carga
+    (MiddlewareNotUsed): custo zero por requisição.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = float(getattr(settings, "REQUEST_METRICS_SLOW_MS", 1000))
+        self.top_sql = int(getattr(settings, "REQUEST_METRICS_TOP_SQL", 5))
+        self.minimo_n_mais_1 = int(getattr(settings, "REQUEST_METRICS_N_PLUS_ONE_MIN", 3))
+        _instrumentar_templates()
+
+    def _request_id(self, request) -> str:
+        recebido = (request.headers.get("X-Request-ID") or "").strip()
+        return recebido if _RE_REQUEST_ID.match(recebido) else uuid.uuid4().hex
+
+    def __call__(self, request):
+        metricas = MetricasRequisicao(request_id=self._request_id(request))
+        request.request_id = metricas.request_id
+        token = _metricas_atuais.set(metricas)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_wrapper_sql))
+                response = self.get_response(request)
+        finally:
+            _metricas_atuais.reset(token)
+
+        total_ms = (time.perf_counter() - metricas.inicio) * 1000
+        # Python "puro" = total - SQL - (template sem o SQL disparado dentro dele)
+        python_ms = max(0.0, total_ms - metricas.sql_ms - (metricas.template_ms - metricas.sql_em_template_ms))
+
+        response["Server-Timing"] = ", ".join([
+            f'sql;dur={metricas.sql_ms:.1f};desc="{metricas.sql_qtd} queries"',
+            f"tpl;dur={metricas.template_ms:.1f}",
+            f"app;dur={python_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ])
+        response["X-Request-ID"] = metricas.request_id
+
+        registro = {
+            "request_id": metricas.request_id,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "user_id": getattr(getattr(request, "user", None), "pk", None),
+            "total_ms": round(total_ms, 2),
+            "sql_ms": round(metricas.sql_ms, 2),
+            "sql_qtd": metricas.sql_qtd,
+            "sql_duplicadas": metricas.duplicadas,
+            "template_ms": round(metricas.template_ms, 2),
+            "python_ms": round(python_ms, 2),
+        }
+        lenta = total_ms >= self.slow_ms
+        if lenta:
+            registro["lenta"] = True
+            registro["top_sql"] = metricas.top_sql(self.top_sql)
+            registro["n_mais_1"] = metricas.n_mais_1(self.minimo_n_mais_1, self.top_sql)
+
+        logger.log(logging.WARNING if lenta else logging.INFO, json.dumps(registro, ensure_ascii=False, default=str))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Perfila UMA requisição (cProfile + tracemalloc) quando um staff manda um token válido
+    em `?_profile=` ou no cabeçalho `X-Profile-Token` (ver apps.core.profiling).
+
+    Requisições sem o parâmetro/cabeçalho só pagam uma consulta a dicionário.
+    Precisa ficar depois do AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from . import profiling
+
+        token = request.GET.get(profiling.PARAMETRO) or request.headers.get(profiling.CABECALHO)
+        if not token or not profiling.token_valido(request.user, token):
+            return self.get_response(request)
+
+        ja_rastreando = tracemalloc.is_tracing()
+        if not ja_rastreando:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+
+        inicio = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:  # outro profiler já ativo nesta thread
+            profiler = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            total_ms = (time.perf_counter() - inicio) * 1000
+            snapshot = tracemalloc.take_snapshot()
+            _, pico = tracemalloc.get_traced_memory()
+            if not ja_rastreando:
+                tracemalloc.stop()
+
+        if profiler is None:
+            return response
+
+        meta = {
+            "request_id": getattr(request, "request_id", ""),
+            "method": request.method,
+            "path": request.path,
+            "query": {k: v for k, v in request.GET.items() if k != profiling.PARAMETRO},
+            "status": response.status_code,
+            "usuario": request.user.get_username(),
+            "total_ms": round(total_ms, 2),
+            "memoria_pico_kb": round(pico / 1024, 1),
+        }
+        try:
+            nome = profiling.salvar_perfil(
+                profiler,
+                meta,
+                profiling.top_memoria(snapshot, int(getattr(settings, "PROFILING_TOP_N", 30))),
+            )
+        except OSError:
+            logger.exception("Falha ao gravar o perfil da requisição %s", request.path)
+            return response
+
+        response["X-Profile-Id"] = nome
+        return response
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=100, unique=True, verbose_name='Escopo')),
+                ('versao', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+                ('atualizado_em', models.DateTimeField(verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados',
+                'verbose_name_plural': 'Versões dos Dados',
+                'ordering': ['escopo'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-19 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_versaodados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenApi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, verbose_name='Nome')),
+                ('prefixo', models.CharField(max_length=8, verbose_name='Prefixo')),
+                ('chave_hash', models.CharField(max_length=64, unique=True, verbose_name='Hash da chave')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('ultimo_uso', models.DateTimeField(blank=True, null=True, verbose_name='Último uso')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_api', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token de API',
+                'verbose_name_plural': 'Tokens de API',
+                'ordering': ['usuario', 'nome'],
+            },
+        ),
+    ]
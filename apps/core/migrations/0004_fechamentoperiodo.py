@@ -0,0 +1,57 @@
+# Generated by Django 4.2.27 on 2026-10-19 06:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_tokenapi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FechamentoPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField(verbose_name='Ano')),
+                ('mes', models.PositiveSmallIntegerField(verbose_name='Mês')),
+                ('fechado_em', models.DateTimeField(auto_now_add=True, verbose_name='Fechado em')),
+                ('fechado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fechamentos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fechamento de Período',
+                'verbose_name_plural': 'Fechamentos de Período',
+                'ordering': ['-ano', '-mes'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('relatorio', models.CharField(max_length=50, verbose_name='Relatório')),
+                ('formato', models.CharField(max_length=10, verbose_name='Formato')),
+                ('conteudo', models.BinaryField(verbose_name='Conteúdo')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Content-Type')),
+                ('content_disposition', models.CharField(blank=True, max_length=200, verbose_name='Content-Disposition')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('fechamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.fechamentoperiodo')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Relatório',
+                'verbose_name_plural': 'Snapshots de Relatórios',
+                'ordering': ['fechamento', 'relatorio', 'formato'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotrelatorio',
+            constraint=models.UniqueConstraint(fields=('fechamento', 'relatorio', 'formato'), name='snapshot_relatorio_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='fechamentoperiodo',
+            constraint=models.UniqueConstraint(fields=('ano', 'mes'), name='fechamento_ano_mes_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_fechamentoperiodo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenapi',
+            name='escrita',
+            field=models.BooleanField(default=False, help_text='Pode gravar pela API JSON de romaneios.', verbose_name='Escrita'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_tokenapi_escrita'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointImportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=500, unique=True, verbose_name='Chave')),
+                ('dados', models.JSONField(default=dict, verbose_name='Dados')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Importação',
+                'verbose_name_plural': 'Checkpoints de Importação',
+                'ordering': ['chave'],
+            },
+        ),
+    ]
@@ -47,4 +47,127 @@ class ConfiguracaoGeral(models.Model):
         ordering = ['nome']
 
     def __str__(self):
-        return f"{self.nome}: {self.valor}"
\ No newline at end of file
+        return f"{self.nome}: {self.valor}"
+
+class VersaoDados(models.Model):
+    """
+    Contador de versão por escopo (ver apps.core.versoes).
+
+    Escopos: um por model (ex.: "romaneio.romaneio") e um por cliente/mês
+    (ex.: "cliente:12:2026-03"). O contador é incrementado na mesma transação da
+    gravação, então versão e dados sempre aparecem juntos para quem lê.
+    """
+    escopo = models.CharField("Escopo", max_length=100, unique=True)
+    versao = models.PositiveBigIntegerField("Versão", default=0)
+    atualizado_em = models.DateTimeField("Atualizado em")
+
+    class Meta:
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+        ordering = ['escopo']
+
+    def __str__(self):
+        return f"{self.escopo}: v{self.versao}"
+
+
+class CheckpointImportacao(models.Model):
+    """
+    Progresso do comando importar_historico (linhas gravadas por etapa, romaneios com
+    totais a recalcular). Gravado na mesma transação de cada bloco: bloco e checkpoint
+    são confirmados juntos, e a retomada nunca grava o mesmo bloco duas vezes.
+    """
+    chave = models.CharField("Chave", max_length=500, unique=True)
+    dados = models.JSONField("Dados", default=dict)
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
+
+    class Meta:
+        verbose_name = "Checkpoint de Importação"
+        verbose_name_plural = "Checkpoints de Importação"
+        ordering = ['chave']
+
+    def __str__(self):
+        return self.chave
+
+
+class TokenApi(models.Model):
+    """
+    Token de acesso às APIs por usuário: leitura (NDJSON/Parquet, ferramentas de BI) e,
+    com `escrita`, gravação de romaneios (balança, tablets).
+
+    Só o hash SHA-256 do token fica no banco; o valor aparece uma única vez, na criação
+    (comando criar_token_api). O prefixo identifica o token nas listagens.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="tokens_api",
+    )
+    nome = models.CharField("Nome", max_length=100)
+    prefixo = models.CharField("Prefixo", max_length=8)
+    chave_hash = models.CharField("Hash da chave", max_length=64, unique=True)
+    ativo = models.BooleanField("Ativo", default=True)
+    escrita = models.BooleanField("Escrita", default=False, help_text="Pode gravar pela API JSON de romaneios.")
+    criado_em = models.DateTimeField("Criado em", auto_now_add=True)
+    ultimo_uso = models.DateTimeField("Último uso", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Token de API"
+        verbose_name_plural = "Tokens de API"
+        ordering = ['usuario', 'nome']
+
+    def __str__(self):
+        return f"{self.nome} ({self.prefixo}…)"
+
+
+class FechamentoPeriodo(models.Model):
+    """
+    Mês fechado (ver apps.core.fechamento e apps.relatorios.fechamento).
+
+    Enquanto o registro existir, romaneios e pagamentos com data no mês não podem ser
+    criados, alterados nem excluídos, e os relatórios do mês (sem filtros extras) saem dos
+    snapshots gravados no fechamento. Reabrir = apagar o registro (e os snapshots junto).
+    """
+    ano = models.PositiveSmallIntegerField("Ano")
+    mes = models.PositiveSmallIntegerField("Mês")
+    fechado_em = models.DateTimeField("Fechado em", auto_now_add=True)
+    fechado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name="fechamentos",
+    )
+
+    class Meta:
+        verbose_name = "Fechamento de Período"
+        verbose_name_plural = "Fechamentos de Período"
+        ordering = ['-ano', '-mes']
+        constraints = [models.UniqueConstraint(fields=["ano", "mes"], name="fechamento_ano_mes_unico")]
+
+    def __str__(self):
+        return f"{self.mes:02d}/{self.ano}"
+
+
+class SnapshotRelatorio(models.Model):
+    """
+    Relatório de um mês fechado, congelado no fechamento: o bloco de resultados da tela
+    (html), os exports (xlsx/pdf) ou os agregados do dashboard (json). Nunca é alterado;
+    some com o fechamento quando o mês é reaberto.
+    """
+    fechamento = models.ForeignKey(FechamentoPeriodo, on_delete=models.CASCADE, related_name="snapshots")
+    relatorio = models.CharField("Relatório", max_length=50)
+    formato = models.CharField("Formato", max_length=10)
+    conteudo = models.BinaryField("Conteúdo")
+    content_type = models.CharField("Content-Type", max_length=100)
+    content_disposition = models.CharField("Content-Disposition", max_length=200, blank=True)
+    criado_em = models.DateTimeField("Criado em", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Snapshot de Relatório"
+        verbose_name_plural = "Snapshots de Relatórios"
+        ordering = ['fechamento', 'relatorio', 'formato']
+        constraints = [
+            models.UniqueConstraint(fields=["fechamento", "relatorio", "formato"], name="snapshot_relatorio_unico")
+        ]
+
+    def __str__(self):
+        return f"{self.relatorio}.{self.formato} ({self.fechamento})"
@@ -0,0 +1,311 @@
+"""
+Paginação por chave (keyset / cursor).
+
+No lugar de OFFSET (o banco lê e descarta todas as linhas anteriores, cada página mais
+funda fica mais lenta), a próxima página começa DEPOIS da última linha exibida:
+WHERE (a, b, id) > (va, vb, vid) na ordenação da lista, com LIMIT. O custo não depende
+de quão funda é a página.
+
+O cursor é a tupla de valores da ordenação da linha de referência, assinada
+(django.core.signing) para não ser adulterada pela URL:
+  - ?depois=<cursor>: página seguinte
+  - ?antes=<cursor>: página anterior (ordenação invertida e resultado revertido)
+  - ?ultima=1: última página (as N últimas linhas, N = contagem % tamanho, para
+    manter as mesmas fronteiras de página da navegação para frente)
+
+A ordenação precisa terminar num campo único (normalmente "id") e os campos não podem
+ser nulos (NULL não entra nas comparações > / <).
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import Count, Q
+
+from .parcial import PARAM_PARCIAL
+
+SALT = "apps.core.paginacao"
+
+# Parâmetros do GET que carregam o cursor (removidos ao montar os links de página)
+PARAMS_CURSOR = ("depois", "antes", "ultima", "page")
+
+
+@dataclass
+class PaginaKeyset:
+    """
+    Página de uma lista paginada por keyset. Expõe também a interface de
+    django.core.paginator.Page/Paginator usada nos templates (page_obj.has_next,
+    page_obj.number, paginator.num_pages, paginator.count), para o ListView.
+    """
+    itens: list = field(default_factory=list)
+    proximo: str | None = None  # cursor para ?depois=
+    anterior: str | None = None  # cursor para ?antes=
+    numero: int = 1
+    count: int | None = None  # total de linhas (se contado)
+    count_aproximado: bool = False
+    tamanho: int = 0
+
+    @property
+    def tem_proximo(self) -> bool:
+        return self.proximo is not None
+
+    @property
+    def tem_anterior(self) -> bool:
+        return self.anterior is not None
+
+    # ----- interface de Page/Paginator -----
+    def has_next(self) -> bool:
+        return self.tem_proximo
+
+    def has_previous(self) -> bool:
+        return self.tem_anterior
+
+    def has_other_pages(self) -> bool:
+        return self.tem_proximo or self.tem_anterior
+
+    @property
+    def number(self) -> int:
+        return self.numero
+
+    @property
+    def num_pages(self) -> int | None:
+        if self.count is None or not self.tamanho:
+            return None
+        return max(1, -(-self.count // self.tamanho), self.numero)
+
+    @property
+    def paginator(self) -> "PaginaKeyset":
+        return self
+
+    @property
+    def object_list(self) -> list:
+        return self.itens
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self) -> int:
+        return len(self.itens)
+
+
+def _campo(ordem: str) -> tuple[str, bool]:
+    """("-romaneio__data_romaneio") -> ("romaneio__data_romaneio", desc=True)."""
+    return (ordem[1:], True) if ordem.startswith("-") else (ordem, False)
+
+
+def _inverter(ordem: str) -> str:
+    return ordem[1:] if ordem.startswith("-") else f"-{ordem}"
+
+
+def _valor(obj, campo: str) -> Any:
+    """Valor de `campo` (com __ para relações) numa instância ou num dict de .values()."""
+    if isinstance(obj, dict):
+        return obj[campo]
+    for parte in campo.split("__"):
+        obj = getattr(obj, parte)
+        if obj is None:
+            break
+    return obj
+
+
+def cursor(obj, ordenacao: Sequence[str], numero: int = 1) -> str:
+    """Cursor da linha `obj` (valores da ordenação) + número da página que ele abre."""
+    valores = [_valor(obj, _campo(ordem)[0]) for ordem in ordenacao]
+    dados = {"v": [None if v is None else str(v) for v in valores], "n": numero}
+    return signing.dumps(dados, salt=SALT, compress=True)
+
+
+def _ler(valor: str | None, ordenacao: Sequence[str]) -> tuple[list, int] | None:
+    if not valor:
+        return None
+    try:
+        dados = signing.loads(valor, salt=SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(dados, dict) or not isinstance(dados.get("v"), list) or len(dados["v"]) != len(ordenacao):
+        return None
+    try:
+        numero = max(1, int(dados.get("n") or 1))
+    except (TypeError, ValueError):
+        numero = 1
+    return dados["v"], numero
+
+
+def ler_cursor(valor: str | None, ordenacao: Sequence[str]) -> list | None:
+    """Valores do cursor, ou None se ausente/inválido/de outra ordenação (volta à primeira página)."""
+    lido = _ler(valor, ordenacao)
+    return lido[0] if lido else None
+
+
+def filtro_apos(ordenacao: Sequence[str], valores: Sequence, *, inverter: bool = False) -> Q:
+    """
+    Linhas estritamente depois de `valores` na ordenação (comparação lexicográfica,
+    respeitando a direção de cada campo):
+      (a > va) OR (a = va AND b > vb) OR (a = va AND b = vb AND id > vid)
+    """
+    filtro = Q()
+    iguais = Q()
+    for ordem, valor in zip(ordenacao, valores):
+        campo, desc = _campo(ordem)
+        if inverter:
+            desc = not desc
+        filtro |= iguais & Q(**{f"{campo}__{'lt' if desc else 'gt'}": valor})
+        iguais &= Q(**{campo: valor})
+    return filtro
+
+
+def paginar_keyset(
+    qs,
+    ordenacao: Sequence[str],
+    tamanho: int,
+    *,
+    depois: str | None = None,
+    antes: str | None = None,
+) -> PaginaKeyset:
+    """
+    Uma página de `tamanho` linhas de `qs` na `ordenacao`, depois/antes do cursor.
+    Uma consulta (LIMIT tamanho + 1: a linha a mais só diz se existe outra página).
+    """
+    ordenacao = list(ordenacao)
+    lido = _ler(antes or depois, ordenacao)
+    valores, numero = lido if lido else (None, 1)
+    para_tras = bool(antes) and valores is not None
+
+    filtrado = qs.filter(filtro_apos(ordenacao, valores, inverter=para_tras)) if valores is not None else qs
+    ordem = [_inverter(o) for o in ordenacao] if para_tras else ordenacao
+    itens = list(filtrado.order_by(*ordem)[: tamanho + 1])
+    mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+
+    if para_tras:
+        if not mais:
+            # Voltou até o começo: exibe a primeira página cheia
+            return paginar_keyset(qs, ordenacao, tamanho)
+        itens.reverse()
+        return PaginaKeyset(
+            itens=itens,
+            proximo=cursor(itens[-1], ordenacao, numero + 1),
+            anterior=cursor(itens[0], ordenacao, max(1, numero - 1)),
+            numero=numero,
+            tamanho=tamanho,
+        )
+
+    return PaginaKeyset(
+        itens=itens,
+        proximo=cursor(itens[-1], ordenacao, numero + 1) if mais else None,
+        anterior=cursor(itens[0], ordenacao, max(1, numero - 1)) if valores is not None and itens else None,
+        numero=numero,
+        tamanho=tamanho,
+    )
+
+
+def paginar_ultima(qs, ordenacao: Sequence[str], tamanho: int, count: int) -> PaginaKeyset:
+    """Última página de uma lista com `count` linhas (uma consulta, na ordenação invertida)."""
+    ordenacao = list(ordenacao)
+    numero = max(1, -(-count // tamanho))
+    restantes = count - (numero - 1) * tamanho
+    itens = list(qs.order_by(*[_inverter(o) for o in ordenacao])[:restantes])
+    itens.reverse()
+    return PaginaKeyset(
+        itens=itens,
+        anterior=cursor(itens[0], ordenacao, numero - 1) if numero > 1 and itens else None,
+        numero=numero,
+        count=count,
+        tamanho=tamanho,
+    )
+
+
+# =============================================================================
+# Contagem + totais da lista (uma consulta)
+# =============================================================================
+def contagem_estimada(qs) -> int | None:
+    """
+    Linhas estimadas pelo planejador do PostgreSQL (EXPLAIN, sem executar a consulta).
+    None em outros bancos.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = qs.order_by().query.sql_with_params()
+    with connection.cursor() as cur:
+        cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plano = cur.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+def resumo_lista(qs, **agregados) -> dict:
+    """
+    Contagem (chave "qtd") e os `agregados` (totais do período) da lista filtrada, num único
+    aggregate. Sem agregados, acima de KEYSET_APPROX_COUNT_THRESHOLD linhas estimadas
+    (PostgreSQL) usa a estimativa do planejador no lugar do COUNT(*) ("qtd_aproximada").
+    """
+    qs = qs.order_by()
+    if not agregados:
+        limite = getattr(settings, "KEYSET_APPROX_COUNT_THRESHOLD", 0)
+        estimada = contagem_estimada(qs) if limite else None
+        if estimada is not None and estimada >= limite:
+            return {"qtd": estimada, "qtd_aproximada": True}
+    resumo = qs.aggregate(qtd=Count("pk"), **agregados)
+    resumo["qtd_aproximada"] = False
+    return resumo
+
+
+class KeysetPaginationMixin:
+    """
+    Para ListView: troca Paginator (OFFSET + COUNT(*) à parte) por paginar_keyset, e calcula
+    contagem + totais do período numa consulta (self.resumo).
+
+    - ordenacao_keyset / get_ordenacao_keyset(): ordenação da lista, terminando em campo único
+    - get_resumo_agregados(): agregados extras do período (ex.: {"total": Sum("valor")})
+    """
+    ordenacao_keyset: Sequence[str] = ("-id",)
+
+    def get_ordenacao_keyset(self) -> Sequence[str]:
+        return self.ordenacao_keyset
+
+    def get_resumo_agregados(self) -> dict:
+        return {}
+
+    def paginate_queryset(self, queryset, page_size):
+        self.resumo = resumo_lista(queryset, **self.get_resumo_agregados())
+        ordenacao = self.get_ordenacao_keyset()
+
+        if self.request.GET.get("ultima") and not self.resumo["qtd_aproximada"] and self.resumo["qtd"]:
+            pagina = paginar_ultima(queryset, ordenacao, page_size, self.resumo["qtd"])
+        else:
+            pagina = paginar_keyset(
+                queryset,
+                ordenacao,
+                page_size,
+                depois=self.request.GET.get("depois"),
+                antes=self.request.GET.get("antes"),
+            )
+            pagina.count = self.resumo["qtd"]
+        pagina.count_aproximado = self.resumo["qtd_aproximada"]
+        return pagina, pagina, pagina.itens, pagina.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filtros_qs"] = querystring_sem_cursor(self.request)
+        return context
+
+
+def querystring_sem_cursor(request) -> str:
+    """
+    GET atual sem os parâmetros de página (nem o ?partial=1 do fragmento), para montar os
+    links ?<filtros>&depois=...
+    """
+    pares = [
+        (chave, valor)
+        for chave in request.GET.keys()
+        if chave not in PARAMS_CURSOR and chave != PARAM_PARCIAL
+        for valor in request.GET.getlist(chave)
+    ]
+    return urlencode(pares)
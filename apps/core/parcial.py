@@ -0,0 +1,64 @@
+"""
+Renderização parcial (fragmento) das listas e relatórios.
+
+Ao trocar um filtro ou de página, o navegador pede só o bloco de resultados (totais, tabela
+e paginação) com o cabeçalho "HX-Request: true" (o mesmo do htmx) ou ?partial=1. A view
+devolve então apenas `template_fragmento` (o include que o template completo também usa),
+sem base.html/menu e sem montar as opções dos filtros (clientes, tipos de madeira, anos...),
+que só o formulário usa. Ver templates/includes/parcial.html (troca do bloco no navegador).
+"""
+from __future__ import annotations
+
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+
+PARAM_PARCIAL = "partial"
+CABECALHO_PARCIAL = "HX-Request"
+
+
+def pedido_parcial(request) -> bool:
+    """True se o request pede só o fragmento de resultados."""
+    return (
+        request.headers.get(CABECALHO_PARCIAL, "").lower() == "true"
+        or request.GET.get(PARAM_PARCIAL) == "1"
+    )
+
+
+def sem_filtros(request) -> bool:
+    """Primeira visita (nenhum parâmetro além do pedido de fragmento)."""
+    return not any(chave != PARAM_PARCIAL for chave in request.GET)
+
+
+class FragmentoMixin:
+    """
+    Para ListView/TemplateView com bloco de resultados recarregável:
+
+    - template_fragmento: template só com os resultados (incluído pelo template completo)
+    - get_contexto_filtros(): opções dos selects do formulário; só na página completa
+    """
+    template_fragmento: str = ""
+
+    @cached_property
+    def parcial(self) -> bool:
+        return bool(self.template_fragmento) and pedido_parcial(self.request)
+
+    def get_contexto_filtros(self) -> dict:
+        return {}
+
+    def get_template_names(self):
+        if self.parcial:
+            return [self.template_fragmento]
+        return super().get_template_names()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["parcial"] = self.parcial
+        if not self.parcial:
+            context.update(self.get_contexto_filtros())
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # Mesma URL, dois corpos: o cache do navegador/proxy não pode trocar um pelo outro
+        patch_vary_headers(response, (CABECALHO_PARCIAL,))
+        return response
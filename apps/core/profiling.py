@@ -0,0 +1,134 @@
+"""
+Profiling sob demanda (cProfile + tracemalloc) de uma única requisição.
+
+Fluxo:
+  1. Um usuário staff gera um token na página de perfis (assinado, amarrado ao usuário e com validade);
+  2. Acrescenta `?_profile=<token>` à URL lenta (ou envia o cabeçalho `X-Profile-Token`);
+  3. O ProfilingMiddleware perfila só essa requisição e grava o dump num diretório com
+     no máximo PROFILING_MAX_DUMPS perfis (os mais antigos são apagados).
+"""
+from __future__ import annotations
+
+import io
+import json
+import pstats
+import re
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+PARAMETRO = "_profile"
+CABECALHO = "X-Profile-Token"
+
+_SALT = "apps.core.profiling"
+_RE_NOME = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9]{6}-[0-9a-f]{8}$")
+
+
+# =============================================================================
+# Token
+# =============================================================================
+def gerar_token(user) -> str:
+    return signing.TimestampSigner(salt=_SALT).sign(str(user.pk))
+
+
+def token_valido(user, token: str) -> bool:
+    """Token assinado, dentro da validade e do próprio usuário (que precisa ser staff)."""
+    if not token or not getattr(user, "is_authenticated", False) or not user.is_staff:
+        return False
+    try:
+        valor = signing.TimestampSigner(salt=_SALT).unsign(
+            token, max_age=getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)
+        )
+    except signing.BadSignature:  # inclui SignatureExpired
+        return False
+    return valor == str(user.pk)
+
+
+# =============================================================================
+# Armazenamento (anel limitado em disco)
+# =============================================================================
+def diretorio() -> Path:
+    return Path(getattr(settings, "PROFILING_DIR", Path(settings.BASE_DIR) / "profiles"))
+
+
+def nome_valido(nome: str) -> bool:
+    return bool(_RE_NOME.match(nome or ""))
+
+
+def top_memoria(snapshot: tracemalloc.Snapshot, limite: int) -> list[dict]:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    return [
+        {"local": str(stat.traceback), "kb": round(stat.size / 1024, 1), "blocos": stat.count}
+        for stat in snapshot.statistics("lineno")[:limite]
+    ]
+
+
+def resumo_pstats(stats: pstats.Stats, limite: int) -> str:
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.sort_stats("cumulative").print_stats(limite)
+    return buf.getvalue()
+
+
+def salvar_perfil(profiler, meta: dict, memoria: list[dict]) -> str:
+    """Grava `<nome>.prof` (pstats) e `<nome>.json` (metadados + resumos) e poda o anel."""
+    pasta = diretorio()
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    # data/hora com microssegundos na frente: ordem lexicográfica = ordem cronológica
+    nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:8]}"
+    limite = int(getattr(settings, "PROFILING_TOP_N", 30))
+
+    profiler.dump_stats(str(pasta / f"{nome}.prof"))
+    stats = pstats.Stats(str(pasta / f"{nome}.prof"))
+    meta = {
+        **meta,
+        "nome": nome,
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "chamadas": stats.total_calls,
+        "resumo": resumo_pstats(stats, limite),
+        "memoria": memoria,
+    }
+    (pasta / f"{nome}.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    _podar(pasta, int(getattr(settings, "PROFILING_MAX_DUMPS", 20)))
+    return nome
+
+
+def _podar(pasta: Path, maximo: int):
+    nomes = sorted({p.stem for p in pasta.glob("*.json") if nome_valido(p.stem)})
+    for nome in nomes[: max(0, len(nomes) - maximo)]:
+        for sufixo in (".json", ".prof"):
+            (pasta / f"{nome}{sufixo}").unlink(missing_ok=True)
+
+
+def listar_perfis() -> list[dict]:
+    pasta = diretorio()
+    if not pasta.exists():
+        return []
+    perfis = []
+    for caminho in sorted(pasta.glob("*.json"), reverse=True):
+        if not nome_valido(caminho.stem):
+            continue
+        try:
+            perfis.append(json.loads(caminho.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return perfis
+
+
+def carregar_perfil(nome: str) -> dict | None:
+    if not nome_valido(nome):
+        return None
+    caminho = diretorio() / f"{nome}.json"
+    if not caminho.exists():
+        return None
+    return json.loads(caminho.read_text(encoding="utf-8"))
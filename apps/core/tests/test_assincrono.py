@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import threading
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.assincrono import em_paralelo, renderizar
+from apps.tests.factories import create_user
+
+
+class EmParaleloTests(SimpleTestCase):
+    @override_settings(ASYNC_QUERY_THREADS=2)
+    def test_tarefas_rodam_ao_mesmo_tempo(self):
+        # As duas tarefas só passam da barreira se estiverem rodando simultaneamente
+        barreira = threading.Barrier(2, timeout=5)
+
+        def tarefa(valor):
+            barreira.wait()
+            return valor
+
+        dados = async_to_sync(em_paralelo)(a=lambda: tarefa(1), b=lambda: tarefa(2))
+        self.assertEqual(dados, {"a": 1, "b": 2})
+
+    @override_settings(ASYNC_QUERY_THREADS=0, REPORT_RENDER_THREADS=0)
+    def test_sem_threads_roda_na_thread_da_requisicao(self):
+        atual = threading.get_ident()
+        dados = async_to_sync(em_paralelo)(thread=threading.get_ident)
+        self.assertEqual(dados["thread"], atual)
+        self.assertEqual(async_to_sync(renderizar)(threading.get_ident), atual)
+
+    @override_settings(REPORT_RENDER_THREADS=1)
+    def test_renderizar_no_pool(self):
+        thread = async_to_sync(renderizar)(lambda: threading.current_thread().name)
+        self.assertTrue(thread.startswith("romaneios-render"))
+
+
+class ViewsAsyncTests(TestCase):
+    def test_export_exige_login(self):
+        url = reverse("relatorios:fluxo_financeiro_export_excel")
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("/accounts/login/", resp["Location"])
+
+        create_user(username="async_user", password="12345678")
+        self.client.login(username="async_user", password="12345678")
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("spreadsheetml", resp["Content-Type"])
+
+    def test_dashboard_exige_login(self):
+        resp = self.client.get(reverse("relatorios:dashboard"))
+        self.assertEqual(resp.status_code, 302)
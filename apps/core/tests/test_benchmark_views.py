@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+
+class BenchmarkViewsCommandTests(TestCase):
+    def _rodar(self, *args) -> dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = Path(tmp) / "views.json"
+            call_command(
+                "benchmark_views",
+                "--banco-atual",
+                "--escala", "0.02",
+                "--repeticoes", "2",
+                "--aquecimento", "1",
+                "--saida", str(saida),
+                *args,
+                stdout=StringIO(),
+            )
+            return json.loads(saida.read_text(encoding="utf-8"))
+
+    def test_grava_json_com_queries_e_percentis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = Path(tmp) / "views.json"
+            call_command(
+                "benchmark_views",
+                "--banco-atual",
+                "--escala", "0.02",
+                "--repeticoes", "2",
+                "--aquecimento", "0",
+                "--cenarios", "cliente_list,romaneio_create_simples",
+                "--saida", str(saida),
+                stdout=StringIO(),
+            )
+            dados = json.loads(saida.read_text(encoding="utf-8"))
+
+        self.assertEqual(dados["meta"]["banco"], "sqlite")
+        self.assertIn("mini", dados["tamanhos"])
+        por_cenario = {r["cenario"]: r for r in dados["resultados"]}
+        self.assertEqual(por_cenario["cliente_list"]["status"], 200)
+        self.assertEqual(por_cenario["romaneio_create_simples"]["status"], 302)
+        for r in dados["resultados"]:
+            self.assertGreater(r["queries"], 0)
+            self.assertLessEqual(r["p50_ms"], r["p95_ms"])
+
+    def test_sem_cache_mesmo_com_os_caches_ligados(self):
+        desligado = self._rodar("--cenarios", "fluxo_financeiro")
+        with override_settings(REPORT_CACHE_TIMEOUT=600, FRAGMENT_CACHE_TIMEOUT=86400, SERIES_CACHE_TIMEOUT=604800):
+            ligado = self._rodar("--cenarios", "fluxo_financeiro", "--modos", "sem_cache,cache_quente")
+
+        por_modo = {r["modo"]: r for r in ligado["resultados"]}
+        # As repetições medidas consultam o banco como com os caches desligados
+        self.assertEqual(por_modo["sem_cache"]["queries_min"], desligado["resultados"][0]["queries_min"])
+        self.assertLess(por_modo["cache_quente"]["queries"], por_modo["sem_cache"]["queries_min"])
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.middleware import assinatura_sql
+from apps.tests.factories import create_cliente, create_user
+
+
+class AssinaturaSqlTests(SimpleTestCase):
+    def test_agrupa_mesma_forma_com_parametros_diferentes(self):
+        a = assinatura_sql('SELECT * FROM "t" WHERE "id" = 10 AND "nome" = \'x\'')
+        b = assinatura_sql('SELECT  * FROM "t" WHERE "id" = 25 AND "nome" = \'abc\'')
+        self.assertEqual(a, b)
+        self.assertEqual(
+            assinatura_sql('SELECT 1 FROM "t" WHERE "id" IN (%s, %s)'),
+            assinatura_sql('SELECT 1 FROM "t" WHERE "id" IN (%s, %s, %s, %s)'),
+        )
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        create_user(username="metricas", password="12345678")
+        self.client.login(username="metricas", password="12345678")
+        for i in range(3):
+            create_cliente(nome=f"Cliente Métrica {i}")
+
+    def test_desligado_nao_altera_resposta(self):
+        resp = self.client.get(reverse("cadastros:cliente_list"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Server-Timing", resp)
+
+    @override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SLOW_MS=100_000)
+    def test_server_timing_e_log_json(self):
+        with self.assertLogs("apps.core.requests", level="INFO") as logs:
+            resp = self.client.get(reverse("cadastros:cliente_list"), HTTP_X_REQUEST_ID="abc-123")
+
+        self.assertEqual(resp["X-Request-ID"], "abc-123")
+        self.assertRegex(resp["Server-Timing"], r'sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+')
+
+        registro = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(registro["request_id"], "abc-123")
+        self.assertEqual(registro["status"], 200)
+        self.assertGreater(registro["sql_qtd"], 0)
+        self.assertGreater(registro["template_ms"], 0)
+        self.assertNotIn("top_sql", registro)
+
+    @override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SLOW_MS=0)
+    def test_requisicao_lenta_loga_top_sql(self):
+        with self.assertLogs("apps.core.requests", level="WARNING") as logs:
+            self.client.get(reverse("cadastros:cliente_list"))
+
+        registro = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(registro["lenta"])
+        self.assertTrue(registro["top_sql"])
+        self.assertIn("sql", registro["top_sql"][0])
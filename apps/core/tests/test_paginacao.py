@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.paginacao import ler_cursor, paginar_keyset, querystring_sem_cursor, resumo_lista
+from apps.romaneio.models import Romaneio
+from apps.tests.factories import create_cliente, create_romaneio, create_user
+
+
+class PaginarKeysetTests(TestCase):
+    ORDEM = ["-data_romaneio", "-id"]
+
+    def setUp(self):
+        cliente = create_cliente(nome="Keyset")
+        # duas linhas com a mesma data: o desempate é o id
+        datas = [date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 2), date(2026, 1, 3), date(2026, 1, 4)]
+        self.romaneios = [
+            create_romaneio(numero_romaneio=f"ks-{i}", cliente=cliente, data_romaneio=d) for i, d in enumerate(datas)
+        ]
+        self.esperado = sorted(self.romaneios, key=lambda r: (r.data_romaneio, r.pk), reverse=True)
+        self.qs = Romaneio.objects.all()
+
+    def test_percorre_para_frente_e_para_tras(self):
+        with self.assertNumQueries(1):
+            p1 = paginar_keyset(self.qs, self.ORDEM, 2)
+        p2 = paginar_keyset(self.qs, self.ORDEM, 2, depois=p1.proximo)
+        p3 = paginar_keyset(self.qs, self.ORDEM, 2, depois=p2.proximo)
+
+        self.assertEqual(p1.itens + p2.itens + p3.itens, self.esperado)
+        self.assertFalse(p1.tem_anterior)
+        self.assertFalse(p3.tem_proximo)
+
+        self.assertEqual(paginar_keyset(self.qs, self.ORDEM, 2, antes=p3.anterior).itens, p2.itens)
+        # voltando do meio para o começo mostra a primeira página cheia
+        self.assertEqual(paginar_keyset(self.qs, self.ORDEM, 2, antes=p2.anterior).itens, p1.itens)
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        self.assertIsNone(ler_cursor("lixo", self.ORDEM))
+        self.assertEqual(paginar_keyset(self.qs, self.ORDEM, 2, depois="lixo").itens, self.esperado[:2])
+        # cursor de outra ordenação (número diferente de campos)
+        proximo = paginar_keyset(self.qs, self.ORDEM, 2).proximo
+        self.assertIsNone(ler_cursor(proximo, ["-data_romaneio", "numero_romaneio", "-id"]))
+
+    def test_querystring_sem_cursor(self):
+        request = RequestFactory().get("/", {"q": "a b", "depois": "x", "page": "2", "ordenar": "nome"})
+        self.assertEqual(querystring_sem_cursor(request), "q=a+b&ordenar=nome")
+
+
+class KeysetListViewsTests(TestCase):
+    def setUp(self):
+        create_user(username="keyset_user", password="12345678")
+        self.client.login(username="keyset_user", password="12345678")
+        cliente = create_cliente(nome="Lista Keyset")
+        hoje = timezone.localdate()
+        for i in range(45):
+            create_romaneio(numero_romaneio=f"kl-{i}", cliente=cliente, data_romaneio=hoje)
+
+    def test_resumo_conta_e_soma_numa_consulta(self):
+        with self.assertNumQueries(1):
+            resumo = resumo_lista(Romaneio.objects.all(), total=Sum("valor_total"))
+        self.assertEqual(resumo["qtd"], 45)
+        self.assertFalse(resumo["qtd_aproximada"])
+
+    def test_lista_de_romaneios_navega_por_cursor(self):
+        url = reverse("romaneio:romaneio_list")
+        vistos = []
+        resp = self.client.get(url)
+        while True:
+            page = resp.context["page_obj"]
+            vistos += [r.pk for r in resp.context["romaneios"]]
+            self.assertEqual(page.paginator.num_pages, 3)
+            if not page.has_next():
+                break
+            resp = self.client.get(url + f"?{resp.context['filtros_qs']}&depois={page.proximo}")
+
+        esperado = list(Romaneio.objects.order_by("-data_romaneio", "-id").values_list("pk", flat=True))
+        self.assertEqual(vistos, esperado)
+        self.assertEqual(page.number, 3)
+
+        ultima = self.client.get(url, {"ultima": "1"}).context["page_obj"]
+        self.assertEqual(ultima.number, 3)
+        self.assertEqual([r.pk for r in ultima], esperado[40:])
+        anterior = self.client.get(url, {"antes": ultima.anterior}).context["page_obj"]
+        self.assertEqual(([r.pk for r in anterior], anterior.number), (esperado[20:40], 2))
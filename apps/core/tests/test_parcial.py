@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+    create_user,
+)
+
+FRAGMENTOS = {
+    "romaneio:romaneio_list": "romaneio/_romaneio_list_resultados.html",
+    "relatorios:ficha_romaneios": "relatorios/_ficha_romaneios_resultados.html",
+    "relatorios:ficha_madeiras": "relatorios/_ficha_madeiras_resultados.html",
+    "relatorios:fluxo_financeiro": "relatorios/_fluxo_financeiro_resultados.html",
+}
+
+
+class FragmentoViewsTests(TestCase):
+    def setUp(self):
+        create_user(username="parcial_user", password="12345678")
+        self.client.login(username="parcial_user", password="12345678")
+
+        self.hoje = timezone.localdate()
+        self.cliente = create_cliente(nome="Cliente Parcial")
+        tm = create_tipo_madeira(nome="PARCIAL MADEIRA", preco_normal=Decimal("10.00"))
+        for numero, data in (("pa-1", self.hoje), ("pa-2", self.hoje - timedelta(days=400))):
+            rom = create_romaneio(numero_romaneio=numero, cliente=self.cliente, data_romaneio=data)
+            create_item_romaneio(
+                romaneio=rom, tipo_madeira=tm, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("1.000")
+            )
+        create_pagamento(cliente=self.cliente, valor=Decimal("5.00"), data_pagamento=self.hoje)
+
+    def test_fragmento_sem_layout_e_sem_opcoes_dos_filtros(self):
+        for nome, fragmento in FRAGMENTOS.items():
+            with self.subTest(nome):
+                resp = self.client.get(reverse(nome), HTTP_HX_REQUEST="true")
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual([t.name for t in resp.templates][0], fragmento)
+                self.assertNotIn("<html", resp.content.decode())
+                self.assertNotIn("clientes", resp.context)
+                self.assertNotIn("anos", resp.context)
+                self.assertIn("HX-Request", resp["Vary"])
+
+                completa = self.client.get(reverse(nome))
+                self.assertIn("<html", completa.content.decode())
+                self.assertIn("clientes", completa.context)
+                self.assertIn('id="resultados"', completa.content.decode())
+
+    def test_parametro_partial_e_menos_consultas(self):
+        url = reverse("relatorios:ficha_romaneios")
+        with CaptureQueriesContext(connection) as completa:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as parcial:
+            resp = self.client.get(url, {"partial": "1"})
+
+        self.assertTrue(resp.context["parcial"])
+        self.assertLess(len(parcial), len(completa))
+
+    def test_partial_nao_conta_como_filtro_nem_vai_para_os_links(self):
+        # Sem outros parâmetros a lista continua no mês corrente
+        resp = self.client.get(reverse("romaneio:romaneio_list"), {"partial": "1"})
+        self.assertEqual([r.numero_romaneio for r in resp.context["romaneios"]], ["pa-1"])
+        self.assertEqual(resp.context["filtros_qs"], "")
+
+        resp = self.client.get(reverse("relatorios:fluxo_financeiro"), {"cliente_id": self.cliente.pk, "partial": "1"})
+        self.assertContains(resp, "Cliente: <b>Cliente Parcial</b>")
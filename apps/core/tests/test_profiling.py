@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.core import profiling
+from apps.tests.factories import create_user
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PROFILING_DIR=self.tmp.name, PROFILING_MAX_DUMPS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.staff = create_user(username="perf_staff", password="12345678", is_staff=True)
+        self.comum = create_user(username="perf_comum", password="12345678")
+
+    def _perfilar(self, token):
+        return self.client.get(reverse("cadastros:cliente_list"), {profiling.PARAMETRO: token})
+
+    def test_staff_com_token_grava_perfil(self):
+        self.client.login(username="perf_staff", password="12345678")
+        resp = self._perfilar(profiling.gerar_token(self.staff))
+        self.assertEqual(resp.status_code, 200)
+
+        nome = resp["X-Profile-Id"]
+        perfil = profiling.carregar_perfil(nome)
+        self.assertEqual(perfil["path"], reverse("cadastros:cliente_list"))
+        self.assertIn("cumulative", perfil["resumo"])
+        self.assertTrue(perfil["memoria"])
+
+        lista = self.client.get(reverse("core:profiling_list"))
+        self.assertContains(lista, nome)
+        detalhe = self.client.get(reverse("core:profiling_detail", kwargs={"nome": nome}))
+        self.assertEqual(detalhe.status_code, 200)
+        download = self.client.get(reverse("core:profiling_download", kwargs={"nome": nome}))
+        self.assertEqual(download.status_code, 200)
+
+    def test_token_de_outro_usuario_ou_sem_staff_nao_perfila(self):
+        self.client.login(username="perf_comum", password="12345678")
+        resp = self._perfilar(profiling.gerar_token(self.comum))
+        self.assertNotIn("X-Profile-Id", resp)
+
+        self.client.login(username="perf_staff", password="12345678")
+        outro = create_user(username="perf_staff2", password="12345678", is_staff=True)
+        resp = self._perfilar(profiling.gerar_token(outro))
+        self.assertNotIn("X-Profile-Id", resp)
+        self.assertEqual(profiling.listar_perfis(), [])
+
+    def test_anel_mantem_so_os_mais_recentes(self):
+        self.client.login(username="perf_staff", password="12345678")
+        token = profiling.gerar_token(self.staff)
+        nomes = [self._perfilar(token)["X-Profile-Id"] for _ in range(3)]
+
+        restantes = {p["nome"] for p in profiling.listar_perfis()}
+        self.assertEqual(len(restantes), 2)
+        self.assertIn(nomes[-1], restantes)
+
+    def test_pagina_restrita_a_staff(self):
+        self.client.login(username="perf_comum", password="12345678")
+        resp = self.client.get(reverse("core:profiling_list"))
+        self.assertEqual(resp.status_code, 302)
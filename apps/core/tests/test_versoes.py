@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.test import RequestFactory, TestCase
+
+from apps.core import versoes
+from apps.core.models import VersaoDados
+from apps.romaneio.services import recalcular_totais_em_lote
+from apps.tests.factories import create_cliente, create_item_romaneio, create_pagamento, create_romaneio
+
+
+def _versao(escopo: str) -> int:
+    return VersaoDados.objects.filter(escopo=escopo).values_list("versao", flat=True).first() or 0
+
+
+class VersoesGravacaoTests(TestCase):
+    def setUp(self):
+        self.cliente = create_cliente(nome="Cliente Versão")
+
+    def test_romaneio_incrementa_model_e_cliente_mes(self):
+        escopo_mes = versoes.escopo_cliente_mes(self.cliente.pk, date(2026, 3, 10))
+        create_romaneio(cliente=self.cliente, data_romaneio=date(2026, 3, 10))
+
+        self.assertGreater(_versao(versoes.ROMANEIO), 0)
+        self.assertEqual(_versao(escopo_mes), 1)
+        self.assertEqual(_versao(versoes.escopo_mes(date(2026, 3, 1))), 1)
+        self.assertEqual(_versao(versoes.escopo_cliente_mes(self.cliente.pk, date(2026, 4, 1))), 0)
+
+    def test_mudar_data_incrementa_mes_antigo_e_novo(self):
+        romaneio = create_romaneio(cliente=self.cliente, data_romaneio=date(2026, 3, 10))
+        marco = versoes.escopo_cliente_mes(self.cliente.pk, date(2026, 3, 1))
+        abril = versoes.escopo_cliente_mes(self.cliente.pk, date(2026, 4, 1))
+        antes = _versao(marco)
+
+        romaneio.data_romaneio = date(2026, 4, 2)
+        romaneio.save()
+
+        self.assertEqual(_versao(marco), antes + 1)
+        self.assertEqual(_versao(abril), 1)
+
+    def test_item_e_lote_incrementam_romaneio(self):
+        romaneio = create_romaneio(cliente=self.cliente)
+        antes = _versao(versoes.ROMANEIO)
+        create_item_romaneio(romaneio=romaneio)
+        depois_item = _versao(versoes.ROMANEIO)
+        self.assertGreater(depois_item, antes)
+
+        recalcular_totais_em_lote([romaneio.pk])
+        self.assertGreater(_versao(versoes.ROMANEIO), depois_item)
+
+    def test_pagamento_e_carimbo(self):
+        escopo_mes = versoes.escopo_cliente_mes(self.cliente.pk, date(2025, 12, 5))
+        antes = versoes.carimbo(versoes.PAGAMENTO, escopo_mes)
+
+        create_pagamento(cliente=self.cliente, data_pagamento=date(2025, 12, 5))
+
+        depois = versoes.carimbo(versoes.PAGAMENTO, escopo_mes)
+        self.assertNotEqual(antes.etag, depois.etag)
+        self.assertIsNotNone(depois.ultima_modificacao)
+        self.assertEqual(dict(depois.versoes)[escopo_mes], 1)
+
+
+class RespostaCondicionalTests(TestCase):
+    def test_304_com_etag_atual(self):
+        create_pagamento(cliente=create_cliente(nome="Cliente 304"))
+        c = versoes.carimbo(versoes.PAGAMENTO, extra="u1")
+        rf = RequestFactory()
+
+        self.assertIsNone(versoes.resposta_condicional(rf.get("/"), c))
+        resp = versoes.resposta_condicional(rf.get("/", HTTP_IF_NONE_MATCH=c.etag), c)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], c.etag)
+
+        # extra diferente (outro usuário/formato) = outro ETag
+        self.assertNotEqual(versoes.carimbo(versoes.PAGAMENTO, extra="u2").etag, c.etag)
@@ -0,0 +1,88 @@
+"""
+Autenticação das APIs por token (apps.core.models.TokenApi).
+
+O cliente envia "Authorization: Bearer <token>". Todo token lê (API NDJSON/Parquet); só
+token criado com escrita=True grava (API JSON de romaneios: balança, tablets). O token é aleatório (secrets) e só o
+SHA-256 dele fica no banco: a busca é por igualdade no hash (índice único), sem
+comparar segredos em Python. Sessão/cookies não são usados nessas rotas.
+"""
+from __future__ import annotations
+
+import hashlib
+import secrets
+from datetime import timedelta
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import TokenApi
+
+# Gravar o último uso no máximo uma vez por intervalo (não escreve a cada requisição)
+INTERVALO_ULTIMO_USO = timedelta(minutes=5)
+
+
+def _hash(chave: str) -> str:
+    return hashlib.sha256(chave.encode()).hexdigest()
+
+
+def criar_token(usuario, nome: str, escrita: bool = False) -> tuple[TokenApi, str]:
+    """Cria o token e devolve (registro, chave em texto). A chave não é recuperável depois."""
+    chave = secrets.token_urlsafe(32)
+    token = TokenApi.objects.create(
+        usuario=usuario, nome=nome, prefixo=chave[:8], chave_hash=_hash(chave), escrita=escrita
+    )
+    return token, chave
+
+
+def token_do_request(request) -> TokenApi | None:
+    """Token ativo (de usuário ativo) do cabeçalho Authorization, ou None."""
+    tipo, _, chave = (request.headers.get("Authorization") or "").partition(" ")
+    chave = chave.strip()
+    if tipo.lower() != "bearer" or not chave:
+        return None
+    token = (
+        TokenApi.objects.select_related("usuario")
+        .filter(chave_hash=_hash(chave), ativo=True, usuario__is_active=True)
+        .first()
+    )
+    if token is None:
+        return None
+
+    agora = timezone.now()
+    if token.ultimo_uso is None or agora - token.ultimo_uso >= INTERVALO_ULTIMO_USO:
+        TokenApi.objects.filter(pk=token.pk).update(ultimo_uso=agora)
+        token.ultimo_uso = agora
+    return token
+
+
+def _exigir_token(view_func, *, escrita: bool):
+    @wraps(view_func)
+    def _view(request, *args, **kwargs):
+        token = token_do_request(request)
+        if token is None:
+            response = JsonResponse({"success": False, "error": "Token de API inválido ou ausente."}, status=401)
+            response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+        if escrita and not token.escrita:
+            return JsonResponse({"success": False, "error": "Token de API sem permissão de escrita."}, status=403)
+        request.user = token.usuario
+        request.token_api = token
+        return view_func(request, *args, **kwargs)
+
+    return _view
+
+
+def token_api_obrigatorio(view_func):
+    """Exige token de API válido; request.user passa a ser o dono do token. Sem token: 401 JSON."""
+    return _exigir_token(view_func, escrita=False)
+
+
+def token_escrita_obrigatorio(view_func):
+    """
+    Como token_api_obrigatorio, mas o token precisa ter escrita (403 JSON se não tiver).
+    A view não usa sessão, então vai com csrf_exempt: o token no cabeçalho não é enviado
+    pelo navegador sozinho, como o cookie.
+    """
+    return csrf_exempt(_exigir_token(view_func, escrita=True))
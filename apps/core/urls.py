@@ -7,6 +7,11 @@ urlpatterns = [
     # Rota principal: dashboard do núcleo/core do sistema
     path('', views.DashboardView.as_view(), name='dashboard'),
 
+    # Profiling sob demanda (somente staff)
+    path('profiling/', views.ProfilingListView.as_view(), name='profiling_list'),
+    path('profiling/<str:nome>/', views.ProfilingDetailView.as_view(), name='profiling_detail'),
+    path('profiling/<str:nome>/download/', views.ProfilingDownloadView.as_view(), name='profiling_download'),
+
     # Exemplos para expansão futura:
     # path('login/', views.LoginView.as_view(), name='login'),
     # path('logout/', views.LogoutView.as_view(), name='logout'),
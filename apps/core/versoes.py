@@ -0,0 +1,262 @@
+"""
+Registro de versões dos dados (carimbos para cache e GET condicional).
+
+Cada gravação relevante incrementa, NA MESMA TRANSAÇÃO, o contador do model e o do
+cliente/mês afetado (tabela core.VersaoDados). Quem lê pega os contadores dos escopos
+que interessam numa única consulta pela chave única — sem varrer romaneios/pagamentos —
+e deriva daí:
+
+  - ETag / Last-Modified (e o 304 Not Modified) das telas e exports;
+  - a chave de invalidação dos caches de relatórios.
+
+Escopos:
+  - model:       "romaneio.romaneio", "financeiro.pagamento", "cadastros.cliente", ...
+                 (itens e unidades fazem parte do romaneio: incrementam "romaneio.romaneio")
+  - cliente/mês: "cliente:<id>:<AAAA-MM>" (data do romaneio/pagamento)
+  - mês:         "mes:<AAAA-MM>" (qualquer romaneio/pagamento do mês; cache por mês das séries)
+  - romaneio:    "romaneio:<id>" (cabeçalho, itens e unidades de um romaneio; validador do
+                 detalhe e dos exports de um romaneio)
+  - GERAL:       cargas em lote (importação, dados sintéticos); entra em todo carimbo.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import VersaoDados
+
+GERAL = "geral"
+
+ROMANEIO = "romaneio.romaneio"
+PAGAMENTO = "financeiro.pagamento"
+CLIENTE = "cadastros.cliente"
+TIPO_MADEIRA = "cadastros.tipomadeira"
+MOTORISTA = "cadastros.motorista"
+ROMANEIADOR = "cadastros.romaneiador"
+
+
+def escopo_model(model) -> str:
+    return model._meta.label_lower
+
+
+def escopo_cliente_mes(cliente_id, data: date | None) -> str | None:
+    if not cliente_id or data is None:
+        return None
+    return f"cliente:{cliente_id}:{data:%Y-%m}"
+
+
+def escopo_mes(data: date | None) -> str | None:
+    return f"mes:{data:%Y-%m}" if data is not None else None
+
+
+def escopos_periodo(cliente_id, data: date | None) -> tuple[str | None, str | None]:
+    """Escopos afetados por um romaneio/pagamento do cliente na data: cliente/mês e mês."""
+    return escopo_cliente_mes(cliente_id, data), escopo_mes(data)
+
+
+def escopo_romaneio(romaneio_id) -> str | None:
+    return f"romaneio:{romaneio_id}" if romaneio_id else None
+
+
+# =============================================================================
+# Escrita
+# =============================================================================
+def incrementar(*escopos: str | None) -> None:
+    """
+    Incrementa os contadores (cria os que não existem). Deve rodar na transação da gravação:
+    se ela for desfeita, a versão volta junto.
+    """
+    agora = timezone.now()
+    # Ordem fixa: duas transações incrementando os mesmos escopos não se travam mutuamente
+    for escopo in sorted({e for e in escopos if e}):
+        atualizados = VersaoDados.objects.filter(escopo=escopo).update(versao=F("versao") + 1, atualizado_em=agora)
+        if atualizados:
+            continue
+        try:
+            with transaction.atomic():
+                VersaoDados.objects.create(escopo=escopo, versao=1, atualizado_em=agora)
+        except IntegrityError:  # criado por outra transação no meio do caminho
+            VersaoDados.objects.filter(escopo=escopo).update(versao=F("versao") + 1, atualizado_em=agora)
+
+
+def incrementar_tudo() -> None:
+    """Para gravações em lote que não passam pelos signals (bulk_create, COPY, UPDATE em massa)."""
+    incrementar(GERAL)
+
+
+def incrementar_romaneios(romaneio_ids: Iterable[int]) -> None:
+    """Romaneios alterados por UPDATE em lote: model, cada romaneio e cada cliente/mês e mês envolvido (uma consulta)."""
+    from apps.romaneio.models import Romaneio
+
+    ids = list(romaneio_ids)
+    if not ids:
+        return
+    pares = Romaneio.objects.filter(pk__in=ids).order_by().values_list("cliente_id", "data_romaneio").distinct()
+    incrementar(
+        ROMANEIO,
+        *(escopo_romaneio(pk) for pk in ids),
+        *(escopo for cliente_id, data in pares for escopo in escopos_periodo(cliente_id, data)),
+    )
+
+
+# =============================================================================
+# Leitura
+# =============================================================================
+@dataclass(frozen=True)
+class Carimbo:
+    versoes: tuple[tuple[str, int], ...]
+    ultima_modificacao: datetime | None
+    extra: str = ""
+
+    @property
+    def versao(self) -> str:
+        """Resumo só das versões (sem `extra`): chave dos caches do lado do servidor."""
+        base = ";".join(f"{escopo}={versao}" for escopo, versao in self.versoes)
+        return hashlib.sha1(base.encode("utf-8")).hexdigest()[:20]
+
+    @property
+    def etag(self) -> str:
+        return '"%s"' % hashlib.sha1(f"{self.versao}|{self.extra}".encode("utf-8")).hexdigest()[:32]
+
+
+def carimbo(*escopos: str | None, extra: str = "") -> Carimbo:
+    """
+    Versões dos escopos pedidos (+ GERAL) numa consulta. Escopo nunca gravado = versão 0.
+    `extra` entra só no ETag (ex.: pk do usuário, filtros, formato do export).
+    """
+    pedidos = sorted({e for e in escopos if e} | {GERAL})
+    linhas = {
+        escopo: (versao, atualizado_em)
+        for escopo, versao, atualizado_em in VersaoDados.objects.filter(escopo__in=pedidos).values_list(
+            "escopo", "versao", "atualizado_em"
+        )
+    }
+    datas = [atualizado_em for _versao, atualizado_em in linhas.values()]
+    return Carimbo(
+        versoes=tuple((escopo, linhas.get(escopo, (0, None))[0]) for escopo in pedidos),
+        ultima_modificacao=max(datas) if datas else None,
+        extra=extra,
+    )
+
+
+# =============================================================================
+# GET condicional
+# =============================================================================
+def resposta_condicional(request, c: Carimbo):
+    """304 (ou 412) se o cliente já tem esta versão; None para seguir e montar a resposta."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    ultima = int(c.ultima_modificacao.timestamp()) if c.ultima_modificacao else None
+    resposta = get_conditional_response(request, etag=c.etag, last_modified=ultima)
+    if resposta is not None:
+        aplicar_validadores(resposta, c)
+    return resposta
+
+
+def aplicar_validadores(response, c: Carimbo):
+    """ETag/Last-Modified + revalidação obrigatória (o navegador guarda, mas sempre pergunta)."""
+    response["ETag"] = c.etag
+    if c.ultima_modificacao:
+        response["Last-Modified"] = http_date(c.ultima_modificacao.timestamp())
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# =============================================================================
+# Signals (conectados em CoreConfig.ready)
+# =============================================================================
+def _guardar_anterior(campo_data: str):
+    """pre_save: lembra cliente/data antigos (se podem ter mudado) para incrementar o mês antigo também."""
+
+    def receiver(sender, instance, update_fields=None, **kwargs):
+        instance._versao_escopos_anteriores = ()
+        if instance.pk is None or kwargs.get("raw"):
+            return
+        if update_fields is not None and not {"cliente", "cliente_id", campo_data} & set(update_fields):
+            return
+        anterior = sender.objects.filter(pk=instance.pk).values_list("cliente_id", campo_data).first()
+        if anterior and anterior != (instance.cliente_id, getattr(instance, campo_data)):
+            instance._versao_escopos_anteriores = escopos_periodo(*anterior)
+
+    return receiver
+
+
+def _ao_gravar_com_cliente(escopo: str, campo_data: str, *, por_registro: bool = False):
+    def receiver(sender, instance, **kwargs):
+        incrementar(
+            escopo,
+            escopo_romaneio(instance.pk) if por_registro else None,
+            *escopos_periodo(instance.cliente_id, getattr(instance, campo_data)),
+            *getattr(instance, "_versao_escopos_anteriores", ()),
+        )
+
+    return receiver
+
+
+def _ao_gravar_item(sender, instance, **kwargs):
+    from apps.romaneio.models import Romaneio
+
+    if sender.romaneio.is_cached(instance):
+        romaneio = instance.romaneio
+        par = (romaneio.cliente_id, romaneio.data_romaneio)
+    else:
+        par = Romaneio.objects.filter(pk=instance.romaneio_id).values_list("cliente_id", "data_romaneio").first()
+    incrementar(ROMANEIO, escopo_romaneio(instance.romaneio_id), *(escopos_periodo(*par) if par else ()))
+
+
+def _ao_gravar_unidade(sender, instance, **kwargs):
+    from apps.romaneio.models import ItemRomaneio
+
+    if sender.item.is_cached(instance):
+        _ao_gravar_item(ItemRomaneio, instance.item)
+        return
+    linha = (
+        ItemRomaneio.objects.filter(pk=instance.item_id)
+        .values_list("romaneio_id", "romaneio__cliente_id", "romaneio__data_romaneio")
+        .first()
+    )
+    if linha:
+        incrementar(ROMANEIO, escopo_romaneio(linha[0]), *escopos_periodo(linha[1], linha[2]))
+
+
+def _ao_gravar_cadastro(sender, instance, **kwargs):
+    incrementar(escopo_model(sender))
+
+
+_gravar_romaneio = _ao_gravar_com_cliente(ROMANEIO, "data_romaneio", por_registro=True)
+_gravar_pagamento = _ao_gravar_com_cliente(PAGAMENTO, "data_pagamento")
+_anterior_romaneio = _guardar_anterior("data_romaneio")
+_anterior_pagamento = _guardar_anterior("data_pagamento")
+
+
+def conectar_sinais() -> None:
+    """
+    Não há post_delete em item/unidade (manteria o fast-delete do CASCADE): o delete()
+    deles recalcula e salva o romaneio, e o delete do romaneio incrementa por si.
+    Gravações em lote de itens/unidades passam por incrementar_romaneios().
+    """
+    ligacoes = (
+        ("romaneio.Romaneio", {pre_save: _anterior_romaneio, post_save: _gravar_romaneio, post_delete: _gravar_romaneio}),
+        ("romaneio.ItemRomaneio", {post_save: _ao_gravar_item}),
+        ("romaneio.UnidadeRomaneio", {post_save: _ao_gravar_unidade}),
+        (
+            "financeiro.Pagamento",
+            {pre_save: _anterior_pagamento, post_save: _gravar_pagamento, post_delete: _gravar_pagamento},
+        ),
+        ("cadastros.Cliente", {post_save: _ao_gravar_cadastro, post_delete: _ao_gravar_cadastro}),
+        ("cadastros.TipoMadeira", {post_save: _ao_gravar_cadastro, post_delete: _ao_gravar_cadastro}),
+        ("cadastros.Motorista", {post_save: _ao_gravar_cadastro, post_delete: _ao_gravar_cadastro}),
+        ("cadastros.Romaneiador", {post_save: _ao_gravar_cadastro, post_delete: _ao_gravar_cadastro}),
+    )
+    for model, receivers in ligacoes:
+        for signal, receiver in receivers.items():
+            signal.connect(receiver, sender=model, dispatch_uid=f"core-versoes-{id(signal)}-{model}")
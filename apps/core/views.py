@@ -1,8 +1,15 @@
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.views import View
 from django.views.generic import TemplateView
-from django.db.models import Sum
+from django.views.generic.base import ContextMixin, TemplateResponseMixin
 from datetime import datetime
-from apps.romaneio.models import Romaneio
-from apps.cadastros.models import Cliente
+from functools import partial
+from apps.cadastros.views import StaffRequiredMixin
+from apps.relatorios import services as dashboard
+
+from . import profiling
+from .assincrono import em_paralelo
 
 def get_mes_ano(request):
     """Obtém mês/ano via GET, padrão é atual."""
@@ -17,54 +24,76 @@ def get_mes_ano(request):
         ano = now.year
     return mes, ano
 
-class DashboardView(TemplateView):
+class DashboardView(TemplateResponseMixin, ContextMixin, View):
+    """Dashboard simples (público); usa o mesmo serviço de dados do dashboard de relatórios."""
     template_name = 'core/dashboard.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
+    async def get(self, request, *args, **kwargs):
         # Permite ajustar mes/ano via URL ?mes=5&ano=2024
-        mes, ano = get_mes_ano(self.request)
+        mes, ano = get_mes_ano(request)
 
-        # Romaneios do mês
-        romaneios_mes = Romaneio.objects.filter(
-            data_romaneio__month=mes,
-            data_romaneio__year=ano
+        dados = await em_paralelo(
+            kpis=partial(dashboard.kpis_mes, mes, ano),
+            devedores=dashboard.devedores,
         )
+        kpis = dados['kpis']
 
-        # Total vendido em m³
-        context['total_m3_mes'] = romaneios_mes.aggregate(
-            total_m3=Sum('m3_total')
-        )['total_m3'] or 0
+        context = self.get_context_data(
+            total_m3_mes=kpis.mes.m3,
+            total_faturado_mes=kpis.mes.faturamento,
+            qtd_romaneios_mes=kpis.mes.romaneios,
+            # Saldo total a receber = soma dos saldos negativos absolutos
+            saldo_total_receber=dashboard.saldo_a_receber(dados['devedores']),
+            # Top 5 maiores devedores
+            maiores_devedores=dados['devedores'][:5],
+            # Informações de período para o template
+            mes=mes,
+            ano=ano,
+        )
 
-        # Total faturado
-        context['total_faturado_mes'] = romaneios_mes.aggregate(
-            total_valor=Sum('valor_total')
-        )['total_valor'] or 0
+        # Futuras métricas: vendas por madeira, top clientes, gráficos
+        # context['vendas_por_madeira'] = ...
+        # context['top_clientes_mes'] = ...
 
-        # Quantidade de romaneios
-        context['qtd_romaneios_mes'] = romaneios_mes.count()
+        return self.render_to_response(context)
 
-        # Clientes e saldo
-        todos_clientes = Cliente.objects.all()
-        saldos_negativos = [c.saldo_atual for c in todos_clientes if c.saldo_atual < 0]
 
-        # Saldo total a receber = soma dos saldos negativos absolutos
-        context['saldo_total_receber'] = abs(sum(saldos_negativos)) if saldos_negativos else 0
+# ========== PROFILING (staff) ==========
 
-        # Top 5 maiores devedores
-        devedores = sorted(
-            [c for c in todos_clientes if c.saldo_atual < 0],
-            key=lambda c: c.saldo_atual
-        )[:5]
-        context['maiores_devedores'] = devedores
+class ProfilingListView(StaffRequiredMixin, TemplateView):
+    """Perfis gravados pelo ProfilingMiddleware + token para perfilar uma nova requisição."""
+    template_name = 'core/profiling_list.html'
 
-        # Informações de período para o template
-        context['mes'] = mes
-        context['ano'] = ano
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['perfis'] = profiling.listar_perfis()
+        context['token'] = profiling.gerar_token(self.request.user)
+        context['parametro'] = profiling.PARAMETRO
+        context['cabecalho'] = profiling.CABECALHO
+        context['validade_min'] = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600) // 60
+        context['max_perfis'] = getattr(settings, 'PROFILING_MAX_DUMPS', 20)
+        return context
 
-        # Futuras métricas: vendas por madeira, top clientes, gráficos
-        # context['vendas_por_madeira'] = ...
-        # context['top_clientes_mes'] = ...
 
-        return context
\ No newline at end of file
+class ProfilingDetailView(StaffRequiredMixin, TemplateView):
+    template_name = 'core/profiling_detail.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        perfil = profiling.carregar_perfil(self.kwargs['nome'])
+        if perfil is None:
+            raise Http404('Perfil não encontrado.')
+        context['perfil'] = perfil
+        return context
+
+
+class ProfilingDownloadView(StaffRequiredMixin, View):
+    """Baixa o dump .prof (abrir com `python -m pstats` ou snakeviz)."""
+
+    def get(self, request, nome):
+        if not profiling.nome_valido(nome):
+            raise Http404('Perfil não encontrado.')
+        caminho = profiling.diretorio() / f'{nome}.prof'
+        if not caminho.exists():
+            raise Http404('Perfil não encontrado.')
+        return FileResponse(open(caminho, 'rb'), as_attachment=True, filename=f'{nome}.prof')
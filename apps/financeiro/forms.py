@@ -1,6 +1,7 @@
 from django import forms
 from .models import Pagamento
 from apps.cadastros.models import Cliente
+from apps.core.fechamento import validar_aberto
 from decimal import Decimal
 
 class PagamentoForm(forms.ModelForm):
@@ -45,4 +46,14 @@ class PagamentoForm(forms.ModelForm):
         valor = self.cleaned_data.get('valor')
         if valor is None or valor <= Decimal('0.00'):
             raise forms.ValidationError('Informe um valor de pagamento válido (maior que zero).')
-        return valor
\ No newline at end of file
+        return valor
+
+    def clean(self):
+        cleaned = super().clean()
+        # Mês fechado: a data nova e a antiga (a instância só muda depois do clean)
+        data_anterior = self.instance.data_pagamento if self.instance.pk else None
+        try:
+            validar_aberto(cleaned.get('data_pagamento'), data_anterior)
+        except forms.ValidationError as exc:
+            self.add_error('data_pagamento', exc)
+        return cleaned
@@ -4,22 +4,26 @@ from datetime import datetime
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
 from django.db.models import Sum
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView
 
 from apps.cadastros.models import Cliente
+from apps.core.fechamento import validar_aberto
+from apps.core.paginacao import KeysetPaginationMixin
 
 from .forms import PagamentoForm
 from .models import Pagamento
 
 
-class PagamentoListView(LoginRequiredMixin, ListView):
+class PagamentoListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Pagamento
     template_name = "financeiro/pagamento_list.html"
     context_object_name = "pagamentos"
     paginate_by = 20
+    ordenacao_keyset = ("-data_pagamento", "-id")
 
     def get_queryset(self):
         qs = super().get_queryset().select_related("cliente")
@@ -52,13 +56,16 @@ class PagamentoListView(LoginRequiredMixin, ListView):
 
         return qs
 
+    def get_resumo_agregados(self):
+        return {"total": Sum("valor")}
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         context["clientes"] = Cliente.objects.filter(ativo=True).order_by("nome")
 
-        # total do período em cima do queryset já filtrado/paginado pelo ListView
-        context["total_periodo"] = self.object_list.aggregate(total=Sum("valor")).get("total") or 0
+        # total do período (filtros do ListView), na mesma consulta da contagem
+        context["total_periodo"] = self.resumo["total"] or 0
 
         return context
 
@@ -99,6 +106,14 @@ class PagamentoDeleteView(LoginRequiredMixin, DeleteView):
     template_name = "financeiro/pagamento_confirm_delete.html"
     success_url = reverse_lazy("financeiro:pagamento_list")
 
+    def form_valid(self, form):
+        try:
+            validar_aberto(self.object.data_pagamento)
+        except ValidationError as exc:
+            messages.error(self.request, exc.messages[0])
+            return redirect(self.get_success_url())
+        return super().form_valid(form)
+
     def delete(self, request, *args, **kwargs):
         messages.success(request, "Pagamento excluído com sucesso!")
         return super().delete(request, *args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class RelatoriosConfig(AppConfig):
+    name = "apps.relatorios"
+    verbose_name = "Relatórios"
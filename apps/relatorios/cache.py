@@ -0,0 +1,72 @@
+"""
+Cache de resultados dos relatórios.
+
+Chave = relatório + filtros do GET normalizados (+ mês corrente, quando o período vem
+implícito) + carimbo de versões dos dados (apps.core.versoes). Qualquer gravação em romaneio/item/unidade/pagamento/cadastros
+incrementa as versões na própria transação, então entradas antigas simplesmente deixam
+de ser lidas e expiram sozinhas.
+
+O mesmo contexto calculado (KPIs, linhas, totais) é reaproveitado pela tela HTML e pelos
+exports Excel/PDF com os mesmos filtros.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core import versoes
+from apps.core.parcial import PARAM_PARCIAL
+
+# Parâmetros que não mudam o resultado calculado (paginação, profiling, fragmento, etc.)
+PARAMS_IGNORADOS = frozenset({"page", "_profile", PARAM_PARCIAL})
+
+# Escopos cujas versões invalidam os relatórios (nomes de cliente/madeira aparecem nas linhas)
+ESCOPOS = (versoes.ROMANEIO, versoes.PAGAMENTO, versoes.CLIENTE, versoes.TIPO_MADEIRA)
+
+
+def filtros_normalizados(request) -> str:
+    """
+    Filtros do GET em forma canônica (ordem das chaves e dos valores não importa).
+    Valor vazio é mantido: no fluxo, `mes=` significa "Todos", diferente de ausente.
+    """
+    partes = []
+    for chave in sorted(request.GET.keys()):
+        if chave in PARAMS_IGNORADOS:
+            continue
+        for valor in sorted(v.strip() for v in request.GET.getlist(chave)):
+            partes.append(f"{chave}={valor}")
+    return "&".join(partes)
+
+
+def _periodo_implicito(request) -> str:
+    """
+    Ano-mês corrente (AAAA-MM) quando mes/ano faltam no GET ou não são números; "" caso contrário.
+    Nesses casos as views caem no mês/ano atual, então a mesma URL muda de período na virada do mês.
+    """
+    if all(request.GET.get(p, "").strip().isdigit() for p in ("mes", "ano")):
+        return ""
+    return timezone.localdate().isoformat()[:7]
+
+
+def chave(nome: str, request) -> str:
+    base = f"{filtros_normalizados(request)}|{_periodo_implicito(request)}"
+    filtros = hashlib.sha1(base.encode("utf-8")).hexdigest()
+    return f"relatorios:{nome}:{versoes.carimbo(*ESCOPOS).versao}:{filtros}"
+
+
+def contexto_em_cache(nome: str, request, calcular: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """Retorna o contexto do relatório `nome` para os filtros do request (calcula só se não houver)."""
+    timeout = getattr(settings, "REPORT_CACHE_TIMEOUT", 600)
+    if not timeout:
+        return calcular()
+
+    k = chave(nome, request)
+    dados = cache.get(k)
+    if dados is None:
+        dados = calcular()
+        cache.set(k, dados, timeout)
+    return dados
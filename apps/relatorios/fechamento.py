@@ -0,0 +1,342 @@
+"""
+Fechamento de período: relatórios de um mês congelados em snapshots (core.SnapshotRelatorio).
+
+fechar_mes(ano, mes) grava o core.FechamentoPeriodo (a partir daí romaneios e pagamentos
+do mês ficam bloqueados, ver apps.core.fechamento) e, para o mês sem outros filtros:
+
+  - ficha_romaneios, ficha_madeiras, fluxo_financeiro: o bloco de resultados da tela (html,
+    o mesmo fragmento do ?partial=1) e os exports xlsx e pdf;
+  - dashboard: os agregados do mês (KPIs, top clientes, vendas por madeira), json.
+
+Os snapshots são as respostas das próprias views para "?mes=M&ano=A", chamadas aqui com o
+usuário que fechou: guardam exatamente o que a tela e os exports mostravam no fechamento.
+Um formato que falhar (ex.: WeasyPrint indisponível) fica sem snapshot e continua sendo
+calculado na hora.
+
+Servir: mês fechado e pedido só com mes/ano (o pedido de fragmento não conta) -> as telas
+(SnapshotMixin), os exports (@exportacao_congelada) e o dashboard devolvem o snapshot sem
+consultar romaneios/pagamentos. Com qualquer outro filtro, ordenação ou página o cálculo é
+o normal, e dá o mesmo resultado: o mês fechado não muda.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.safestring import mark_safe
+
+from apps.core import fechamento as periodos
+from apps.core.models import FechamentoPeriodo, SnapshotRelatorio
+from apps.core.parcial import CABECALHO_PARCIAL, PARAM_PARCIAL
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import Romaneio
+
+from . import services
+
+DASHBOARD = "dashboard"
+
+# Relatório -> formato -> rota capturada no fechamento
+RELATORIOS = {
+    "ficha_romaneios": {
+        "html": "relatorios:ficha_romaneios",
+        "xlsx": "relatorios:ficha_romaneios_export_excel",
+        "pdf": "relatorios:ficha_romaneios_export_pdf",
+    },
+    "ficha_madeiras": {
+        "html": "relatorios:ficha_madeiras",
+        "xlsx": "relatorios:ficha_madeiras_export_excel",
+        "pdf": "relatorios:ficha_madeiras_export_pdf",
+    },
+    "fluxo_financeiro": {
+        "html": "relatorios:fluxo_financeiro",
+        "xlsx": "relatorios:fluxo_financeiro_export_excel",
+        "pdf": "relatorios:fluxo_financeiro_export_pdf",
+    },
+}
+
+# Não mudam o conteúdo do snapshot (o fragmento é o próprio html guardado)
+PARAMS_IGNORADOS = frozenset({PARAM_PARCIAL, "_profile"})
+
+
+class FechamentoInvalido(ValueError):
+    pass
+
+
+def _mes_passado(ano: int, mes: int) -> bool:
+    try:
+        return date(ano, mes, 1) < timezone.localdate().replace(day=1)
+    except ValueError:
+        return False
+
+
+# =============================================================================
+# Fechar / reabrir
+# =============================================================================
+def _requisicao(caminho: str, params: dict, usuario) -> WSGIRequest:
+    """GET interno para chamar uma view como se viesse do navegador do usuário."""
+    host = settings.SITE_DOMAIN or "localhost"
+    nome, _, porta = host.partition(":")
+    request = WSGIRequest({
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": caminho,
+        "QUERY_STRING": urlencode(params),
+        "SERVER_NAME": nome,
+        "SERVER_PORT": porta or ("443" if settings.SITE_PROTOCOL == "https" else "80"),
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "wsgi.url_scheme": settings.SITE_PROTOCOL,
+        "wsgi.input": BytesIO(),
+    })
+    request.user = usuario
+    return request
+
+
+def _capturar(rota: str, params: dict, usuario) -> HttpResponse:
+    caminho = reverse(rota)
+    match = resolve(caminho)
+    request = _requisicao(caminho, params, usuario)
+    if asyncio.iscoroutinefunction(match.func):
+        response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+    else:
+        response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+    return response
+
+
+def _conteudo(response) -> bytes:
+    if getattr(response, "streaming", False):
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def agregados_dashboard(ano: int, mes: int) -> dict:
+    """Agregados do mês que o dashboard mostra (só os do mês: saldo/devedores são de todo o histórico)."""
+    kpis = services.kpis_mes(mes, ano).mes
+    return {
+        "kpis": {"m3": kpis.m3, "faturamento": kpis.faturamento, "romaneios": kpis.romaneios},
+        "top_clientes_mes": services.top_clientes_mes(mes, ano),
+        "vendas_por_madeira": services.vendas_por_madeira(mes, ano),
+    }
+
+
+def _gravar_snapshots(fechamento: FechamentoPeriodo, usuario) -> list[str]:
+    """Grava os snapshots do mês; devolve os "relatorio.formato" que falharam."""
+    params = {"mes": str(fechamento.mes), "ano": str(fechamento.ano)}
+    falhas = []
+    for relatorio, rotas in RELATORIOS.items():
+        for formato, rota in rotas.items():
+            pedido = {**params, PARAM_PARCIAL: "1"} if formato == "html" else params
+            response = _capturar(rota, pedido, usuario)
+            if response.status_code != 200:
+                falhas.append(f"{relatorio}.{formato}")
+                continue
+            SnapshotRelatorio.objects.create(
+                fechamento=fechamento,
+                relatorio=relatorio,
+                formato=formato,
+                conteudo=_conteudo(response),
+                content_type=response.get("Content-Type", ""),
+                content_disposition=response.get("Content-Disposition", ""),
+            )
+
+    dados = agregados_dashboard(fechamento.ano, fechamento.mes)
+    SnapshotRelatorio.objects.create(
+        fechamento=fechamento,
+        relatorio=DASHBOARD,
+        formato="json",
+        conteudo=json.dumps(dados, cls=DjangoJSONEncoder).encode("utf-8"),
+        content_type="application/json",
+    )
+    return falhas
+
+
+def fechar_mes(ano: int, mes: int, usuario) -> tuple[FechamentoPeriodo, list[str]]:
+    """
+    Fecha o mês (só meses anteriores ao corrente) e grava os snapshots.
+
+    O fechamento é gravado (e confirmado) antes dos snapshots: as edições do mês já ficam
+    bloqueadas enquanto os relatórios são gerados. Se a geração quebrar, o mês é reaberto.
+    Devolve (fechamento, formatos que ficaram sem snapshot).
+    """
+    if not _mes_passado(ano, mes):
+        raise FechamentoInvalido("Só é possível fechar meses anteriores ao mês corrente.")
+    try:
+        with transaction.atomic():
+            fechamento = FechamentoPeriodo.objects.create(ano=ano, mes=mes, fechado_por=usuario)
+    except IntegrityError:
+        raise FechamentoInvalido(f"O mês {mes:02d}/{ano} já está fechado.")
+
+    try:
+        with transaction.atomic():
+            falhas = _gravar_snapshots(fechamento, usuario)
+    except BaseException:
+        fechamento.delete()
+        raise
+    return fechamento, falhas
+
+
+def reabrir_mes(ano: int, mes: int) -> bool:
+    """Reabre o mês (apaga o fechamento e os snapshots). False se não estava fechado."""
+    apagados, _por_model = FechamentoPeriodo.objects.filter(ano=ano, mes=mes).delete()
+    return bool(apagados)
+
+
+def meses_para_fechar(dias: int) -> list[date]:
+    """Meses com romaneio ou pagamento, ainda abertos, terminados há pelo menos `dias` dias."""
+    limite = timezone.localdate() - timedelta(days=dias)
+    meses = {
+        *Romaneio.objects.filter(data_romaneio__lt=limite).dates("data_romaneio", "month"),
+        *Pagamento.objects.filter(data_pagamento__lt=limite).dates("data_pagamento", "month"),
+    }
+    fechados = set(FechamentoPeriodo.objects.values_list("ano", "mes"))
+    return sorted(
+        m for m in meses
+        if services.limites_mes(m.month, m.year)[1] <= limite and (m.year, m.month) not in fechados
+    )
+
+
+# =============================================================================
+# Servir os snapshots
+# =============================================================================
+def mes_do_pedido(request) -> tuple[int, int] | None:
+    """(ano, mes) se o pedido é só do mês (mes e ano preenchidos, nenhum outro filtro) e o mês já passou."""
+    preenchidos = {
+        chave
+        for chave in request.GET
+        if chave not in PARAMS_IGNORADOS and any(v.strip() for v in request.GET.getlist(chave))
+    }
+    if preenchidos != {"mes", "ano"}:
+        return None
+    try:
+        mes, ano = int(request.GET["mes"]), int(request.GET["ano"])
+    except ValueError:
+        return None
+    # Mês corrente/futuro nunca está fechado: nem consulta
+    return (ano, mes) if _mes_passado(ano, mes) else None
+
+
+def snapshot_do_pedido(request, relatorio: str, formato: str) -> SnapshotRelatorio | None:
+    periodo = mes_do_pedido(request)
+    if periodo is None:
+        return None
+    return periodos.snapshot(*periodo, relatorio, formato)
+
+
+def _resposta_arquivo(snapshot: SnapshotRelatorio) -> HttpResponse:
+    response = HttpResponse(bytes(snapshot.conteudo), content_type=snapshot.content_type)
+    if snapshot.content_disposition:
+        response["Content-Disposition"] = snapshot.content_disposition
+    return response
+
+
+def exportacao_congelada(relatorio: str, formato: str):
+    """Export (sync ou async) que, no mês fechado sem filtros, devolve o arquivo do fechamento."""
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def _view(request, *args, **kwargs):
+                snapshot = await sync_to_async(snapshot_do_pedido)(request, relatorio, formato)
+                if snapshot is not None:
+                    return _resposta_arquivo(snapshot)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def _view(request, *args, **kwargs):
+                snapshot = snapshot_do_pedido(request, relatorio, formato)
+                if snapshot is not None:
+                    return _resposta_arquivo(snapshot)
+                return view(request, *args, **kwargs)
+        return _view
+
+    return decorator
+
+
+class SnapshotMixin:
+    """
+    Para as telas com FragmentoMixin: mês fechado sem filtros -> bloco de resultados do
+    snapshot (com o aviso do fechamento), sem montar queryset/paginação/totais.
+    `contexto_congelado`: variáveis que o template completo usa fora do bloco.
+    """
+    relatorio_congelado: str = ""
+    contexto_congelado: dict = {}
+
+    def get(self, request, *args, **kwargs):
+        snapshot = snapshot_do_pedido(request, self.relatorio_congelado, "html")
+        if snapshot is None:
+            return super().get(request, *args, **kwargs)
+
+        aviso = render_to_string("relatorios/_aviso_fechamento.html", {"fechamento": snapshot.fechamento})
+        resultados = mark_safe(aviso + bytes(snapshot.conteudo).decode("utf-8"))
+        if self.parcial:
+            response = HttpResponse(resultados)
+            patch_vary_headers(response, (CABECALHO_PARCIAL,))
+            return response
+
+        self.object_list = []  # ListView.get_template_names() espera; nada é consultado
+        ano, mes = snapshot.fechamento.ano, snapshot.fechamento.mes
+        context = {
+            "view": self,
+            "parcial": False,
+            "mes": mes,
+            "ano": ano,
+            **self.contexto_congelado,
+            **self.get_contexto_filtros(),
+            "resultados_congelados": resultados,
+        }
+        return self.render_to_response(context)
+
+
+def _decimais(linhas: list[dict], *campos: str) -> list[dict]:
+    return [{**linha, **{c: Decimal(linha[c] or 0) for c in campos}} for linha in linhas]
+
+
+def _kpis(dados: dict) -> services.Kpis:
+    k = dados["kpis"]
+    return services.Kpis(m3=Decimal(k["m3"]), faturamento=Decimal(k["faturamento"]), romaneios=int(k["romaneios"]))
+
+
+def dashboard_congelado(mes: int, ano: int) -> dict | None:
+    """
+    Agregados do mês fechado para o dashboard: top clientes e vendas por madeira; os KPIs
+    (que comparam com o mês anterior e o mesmo mês do ano anterior) só se os três meses
+    estiverem fechados, senão "kpis" é None. None se o mês não está fechado.
+    """
+    if not _mes_passado(ano, mes):
+        return None
+    atual = date(ano, mes, 1)
+    mes_ant, ano_ant = services.mes_anterior(mes, ano)
+    anterior = date(ano_ant, mes_ant, 1)
+    ano_passado = date(ano - 1, mes, 1)
+    congelados = periodos.snapshots_json(DASHBOARD, [atual, anterior, ano_passado])
+    if atual not in congelados:
+        return None
+
+    dados = congelados[atual]
+    kpis = None
+    if anterior in congelados and ano_passado in congelados:
+        kpis = services.KpisDashboard(
+            mes=_kpis(dados), mes_anterior=_kpis(congelados[anterior]), ano_anterior=_kpis(congelados[ano_passado])
+        )
+    return {
+        "kpis": kpis,
+        "top_clientes_mes": _decimais(dados["top_clientes_mes"], "total_comprado"),
+        "vendas_por_madeira": _decimais(dados["vendas_por_madeira"], "total_m3", "total_valor"),
+    }
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.cadastros.models import Cliente, TipoMadeira
+from apps.core.management.commands.benchmark_views import MODOS_CACHE, _caches, _commit_atual, _modos, _percentil
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import ItemRomaneio, Romaneio, UnidadeRomaneio, calcular_m3
+from apps.romaneio.services import recalcular_totais_romaneio
+
+try:  # indisponível no Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+def _rss_pico_kb() -> int:
+    """Pico de RSS do processo (ru_maxrss, em KB no Linux). 0 se indisponível."""
+    if resource is None:
+        return 0
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _conteudo(resp) -> bytes:
+    if getattr(resp, "streaming", False):
+        return b"".join(resp.streaming_content)
+    return resp.content
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark dos exports de relatórios (PDF/Excel/CSV) para períodos sintéticos de tamanho crescente. "
+        "Mede tempo, pico de memória (tracemalloc e RSS) e tamanho do arquivo; falha se regredir além do limite."
+    )
+
+    # (nome, url_name, formato, escopo) — escopo "periodo" usa mes/ano; "romaneio" usa um romaneio grande
+    EXPORTS = (
+        ("ficha_romaneios_csv", "relatorios:ficha_romaneios_export", "csv", "periodo"),
+        ("ficha_romaneios_excel", "relatorios:ficha_romaneios_export_excel", "xlsx", "periodo"),
+        ("ficha_romaneios_pdf", "relatorios:ficha_romaneios_export_pdf", "pdf", "periodo"),
+        ("ficha_madeiras_excel", "relatorios:ficha_madeiras_export_excel", "xlsx", "periodo"),
+        ("ficha_madeiras_pdf", "relatorios:ficha_madeiras_export_pdf", "pdf", "periodo"),
+        ("fluxo_financeiro_excel", "relatorios:fluxo_financeiro_export_excel", "xlsx", "periodo"),
+        ("fluxo_financeiro_pdf", "relatorios:fluxo_financeiro_export_pdf", "pdf", "periodo"),
+        ("romaneio_excel", "relatorios:romaneio_export_excel", "xlsx", "romaneio"),
+        ("romaneio_pdf", "relatorios:romaneio_export_pdf", "pdf", "romaneio"),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            default="100,1000,10000,100000",
+            help="Tamanhos do período (nº de romaneios/itens no mês), separados por vírgula.",
+        )
+        parser.add_argument("--repeticoes", type=int, default=3, help="Execuções cronometradas por export.")
+        parser.add_argument(
+            "--max-linhas-pdf",
+            type=int,
+            default=10_000,
+            help="Acima deste tamanho os PDFs não são gerados (WeasyPrint é O(páginas)). 0 = sem limite.",
+        )
+        parser.add_argument(
+            "--max-unidades-romaneio",
+            type=int,
+            default=5_000,
+            help="Teto de unidades do romaneio usado nos exports individuais.",
+        )
+        parser.add_argument("--exports", default="", help="Filtra exports (nomes separados por vírgula).")
+        parser.add_argument(
+            "--modos",
+            default="sem_cache",
+            help=f"Modos de cache, separados por vírgula ({', '.join(MODOS_CACHE)}). Padrão: sem_cache.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--saida", default="", help="Arquivo JSON de saída (padrão: benchmarks/exports-<data>.json).")
+        parser.add_argument("--baseline", default="", help="JSON de uma execução anterior para checar regressão.")
+        parser.add_argument(
+            "--limite-regressao",
+            type=float,
+            default=20.0,
+            help="Variação máxima (%%) de tempo p50 e memória em relação ao baseline (padrão 20).",
+        )
+        parser.add_argument(
+            "--tolerancia-ms",
+            type=float,
+            default=5.0,
+            help="Diferenças de tempo abaixo disso não contam como regressão (ruído).",
+        )
+        parser.add_argument(
+            "--banco-atual",
+            action="store_true",
+            help="Usa o banco configurado em vez de criar um banco de teste (os dados existentes são APAGADOS).",
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Mantém o banco de teste entre execuções.")
+
+    # -------------------------------------------------------------------------
+    # Massa de dados
+    # -------------------------------------------------------------------------
+    def _semear(self, linhas: int, seed: int, max_unidades: int) -> dict:
+        """Período (mês atual) com ~`linhas` romaneios/itens e um romaneio DETALHADO grande."""
+        call_command("flush", interactive=False, verbosity=0)
+        call_command(
+            "gerar_dados_sinteticos",
+            seed=seed,
+            prefixo="E",
+            meses=1,
+            clientes=max(5, linhas // 50),
+            tipos=20,
+            motoristas=5,
+            romaneiadores=3,
+            romaneios=linhas,
+            itens=linhas,
+            unidades=linhas,
+            pagamentos=max(1, linhas // 5),
+            stdout=StringIO(),
+        )
+
+        n_unidades = max(1, min(linhas, max_unidades))
+        tipos = list(TipoMadeira.objects.order_by("id")[:4])
+        romaneio = Romaneio.objects.create(
+            numero_romaneio="BENCH-EXPORT",
+            data_romaneio=timezone.localdate(),
+            cliente=Cliente.objects.order_by("id").first(),
+            modalidade="DETALHADO",
+        )
+        itens = ItemRomaneio.objects.bulk_create([
+            ItemRomaneio(romaneio=romaneio, tipo_madeira=t, valor_unitario=t.preco_normal) for t in tipos
+        ])
+        unidades = []
+        for i in range(n_unidades):
+            comprimento = Decimal("3.00") + Decimal(i % 30) / 10
+            rodo = Decimal("120.00") + Decimal(i % 140)
+            unidades.append(UnidadeRomaneio(
+                item=itens[i % len(itens)],
+                comprimento=comprimento,
+                rodo=rodo,
+                quantidade_m3=calcular_m3(comprimento, rodo),
+            ))
+        UnidadeRomaneio.objects.bulk_create(unidades, batch_size=2000)
+        recalcular_totais_romaneio(romaneio)
+
+        hoje = timezone.localdate()
+        periodo = {"data_romaneio__year": hoje.year, "data_romaneio__month": hoje.month}
+        return {
+            "romaneio_id": romaneio.pk,
+            "contagens": {
+                "romaneios": Romaneio.objects.filter(**periodo).count(),
+                "itens": ItemRomaneio.objects.filter(**{f"romaneio__{k}": v for k, v in periodo.items()}).count(),
+                "pagamentos": Pagamento.objects.filter(
+                    data_pagamento__year=hoje.year, data_pagamento__month=hoje.month
+                ).count(),
+                "unidades_romaneio": n_unidades,
+            },
+        }
+
+    # -------------------------------------------------------------------------
+    # Medição
+    # -------------------------------------------------------------------------
+    def _medir(self, client: Client, url: str, params: dict, repeticoes: int, limpar: bool = False) -> dict:
+        # Execução com tracemalloc (mais lenta): só memória, fora da cronometragem.
+        # No modo cache_quente é ela que popula o cache.
+        gc.collect()
+        rss_antes = _rss_pico_kb()
+        tracemalloc.start()
+        try:
+            resp = client.get(url, params)
+            conteudo = _conteudo(resp)
+            _, pico_py = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        rss_depois = _rss_pico_kb()
+
+        tempos, queries = [], []
+        for _ in range(max(1, repeticoes)):
+            if limpar:
+                cache.clear()
+            gc.collect()
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                r = client.get(url, params)
+                _conteudo(r)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(len(ctx.captured_queries))
+
+        return {
+            "status": resp.status_code,
+            "bytes": len(conteudo),
+            "queries": max(queries),
+            "p50_ms": round(_percentil(tempos, 50), 2),
+            "p95_ms": round(_percentil(tempos, 95), 2),
+            "media_ms": round(statistics.fmean(tempos), 2),
+            "tracemalloc_pico_kb": round(pico_py / 1024, 1),
+            "rss_pico_kb": rss_depois,
+            # ru_maxrss só cresce: o delta é quanto este export empurrou o pico do processo
+            "rss_delta_kb": max(0, rss_depois - rss_antes),
+        }
+
+    def _regressoes(self, atual: dict, baseline_path: str, limite: float, tolerancia_ms: float) -> list[str]:
+        anterior = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+        base = {(r["linhas"], r["export"], r.get("modo")): r for r in anterior.get("resultados", [])}
+
+        problemas = []
+        for r in atual["resultados"]:
+            # Execuções antigas (sem "modo") mediam com o cache ligado: não são comparáveis
+            b = base.get((r["linhas"], r["export"], r["modo"]))
+            if not b or r.get("pulado") or b.get("pulado") or r["status"] != 200 or b["status"] != 200:
+                continue
+            for campo, folga in (("p50_ms", tolerancia_ms), ("tracemalloc_pico_kb", 0.0)):
+                antes, agora = b[campo], r[campo]
+                if antes and agora - antes > folga and (agora - antes) / antes * 100 > limite:
+                    problemas.append(
+                        f"{r['export']} ({r['linhas']} linhas, {r['modo']}): {campo} {antes} → {agora} "
+                        f"(+{(agora - antes) / antes * 100:.0f}%)"
+                    )
+        return problemas
+
+    def handle(self, *args, **options):
+        try:
+            tamanhos = [int(t) for t in options["linhas"].split(",") if t.strip()]
+        except ValueError:
+            raise CommandError("--linhas deve ser uma lista de inteiros (ex.: 100,1000,10000).")
+        if not tamanhos or min(tamanhos) < 1:
+            raise CommandError("Informe ao menos um tamanho positivo em --linhas.")
+        filtro = {e.strip() for e in options["exports"].split(",") if e.strip()}
+        modos = _modos(options["modos"])
+        if options["baseline"] and not Path(options["baseline"]).exists():
+            raise CommandError(f"Baseline não encontrado: {options['baseline']}")
+
+        try:
+            setup_test_environment()
+            montou_ambiente = True
+        except RuntimeError:
+            montou_ambiente = False
+
+        nome_banco_original = None
+        if not options["banco_atual"]:
+            nome_banco_original = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+
+        hoje = timezone.localdate()
+        max_pdf = options["max_linhas_pdf"]
+        try:
+            resultado = {
+                "meta": {
+                    "commit": _commit_atual(),
+                    "data": datetime.now().isoformat(timespec="seconds"),
+                    "banco": connection.vendor,
+                    "django": django.get_version(),
+                    "python": platform.python_version(),
+                    "repeticoes": options["repeticoes"],
+                    "seed": options["seed"],
+                    "modos": modos,
+                },
+                "tamanhos": {},
+                "resultados": [],
+            }
+
+            User = get_user_model()
+            for linhas in tamanhos:
+                self.stdout.write(self.style.MIGRATE_LABEL(f"Semeando período com {linhas} linhas..."))
+                inicio = time.monotonic()
+                massa = self._semear(linhas, options["seed"], options["max_unidades_romaneio"])
+                resultado["tamanhos"][str(linhas)] = massa["contagens"]
+                self.stdout.write(f"  pronto em {time.monotonic() - inicio:.1f}s: {massa['contagens']}")
+
+                user = User.objects.create_superuser("benchmark", "benchmark@example.com", "benchmark")
+                Romaneio.objects.filter(pk=massa["romaneio_id"]).update(usuario_cadastro=user)
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+
+                for nome, url_name, formato, escopo in self.EXPORTS:
+                    if filtro and nome not in filtro:
+                        continue
+                    pulado = formato == "pdf" and max_pdf and linhas > max_pdf
+                    if escopo == "romaneio":
+                        url, params = reverse(url_name, kwargs={"romaneio_id": massa["romaneio_id"]}), {}
+                    else:
+                        url, params = reverse(url_name), {"mes": hoje.month, "ano": hoje.year}
+
+                    for modo in modos:
+                        r = {"export": nome, "formato": formato, "linhas": linhas, "modo": modo}
+                        if pulado:
+                            r.update({"status": None, "pulado": True})
+                            resultado["resultados"].append(r)
+                            self.stdout.write(f"  {nome:<24} {modo:<13} pulado (> --max-linhas-pdf {max_pdf})")
+                            continue
+
+                        timeout, limpar = MODOS_CACHE[modo]
+                        cache.clear()
+                        with _caches(timeout):
+                            r.update(self._medir(client, url, params, options["repeticoes"], limpar))
+                        resultado["resultados"].append(r)
+
+                        estilo = self.style.SUCCESS if r["status"] == 200 else self.style.ERROR
+                        self.stdout.write(estilo(
+                            f"  {nome:<24} {modo:<13} status {r['status']}  p50 {r['p50_ms']:>10.1f} ms  "
+                            f"py {r['tracemalloc_pico_kb'] / 1024:>7.1f} MB  "
+                            f"rss {r['rss_pico_kb'] / 1024:>7.1f} MB  {r['bytes'] / 1024:>9.1f} KB"
+                        ))
+        finally:
+            cache.clear()
+            if nome_banco_original is not None:
+                connection.creation.destroy_test_db(nome_banco_original, verbosity=0, keepdb=options["keepdb"])
+            if montou_ambiente:
+                teardown_test_environment()
+
+        saida = Path(options["saida"] or f"benchmarks/exports-{datetime.now():%Y%m%d-%H%M%S}.json")
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {saida}"))
+
+        if options["baseline"]:
+            problemas = self._regressoes(
+                resultado, options["baseline"], options["limite_regressao"], options["tolerancia_ms"]
+            )
+            if problemas:
+                for p in problemas:
+                    self.stderr.write(self.style.ERROR(f"  REGRESSÃO {p}"))
+                raise CommandError(
+                    f"{len(problemas)} export(s) acima do limite de {options['limite_regressao']:.0f}% em relação ao baseline."
+                )
+            self.stdout.write(self.style.SUCCESS(f"Sem regressões acima de {options['limite_regressao']:.0f}%."))
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.relatorios.parquet import LOTE_PADRAO, TABELAS, PyarrowIndisponivel, exportar_tabela
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta romaneios, itens, unidades e pagamentos em Parquet, particionados por ano/mês "
+        "(<destino>/<tabela>/ano=AAAA/mes=MM/dados.parquet). Por padrão só regrava os meses "
+        "alterados desde o último export (ver _manifesto.json no destino)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("destino", help="Diretório de saída.")
+        parser.add_argument(
+            "--tabela", action="append", choices=TABELAS, dest="tabelas",
+            help="Exporta só esta tabela (pode repetir). Padrão: todas.",
+        )
+        parser.add_argument("--completo", action="store_true", help="Regrava todos os meses, ignorando o manifesto.")
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO, help="Linhas por lote/row group.")
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser maior que zero.")
+
+        for nome in options["tabelas"] or TABELAS:
+            try:
+                resultado = exportar_tabela(
+                    options["destino"], nome, completo=options["completo"], lote=options["lote"]
+                )
+            except PyarrowIndisponivel as exc:
+                raise CommandError(str(exc))
+
+            self.stdout.write(
+                f"{nome}: {len(resultado.gravados)} mês(es) gravado(s), {resultado.linhas} linha(s); "
+                f"{len(resultado.removidos)} removido(s); {resultado.inalterados} inalterado(s)."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Export Parquet concluído em {options['destino']}."))
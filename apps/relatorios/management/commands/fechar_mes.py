@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.relatorios.fechamento import FechamentoInvalido, fechar_mes, meses_para_fechar, reabrir_mes
+
+
+def _mes(valor: str) -> date:
+    try:
+        ano, mes = valor.split("-")
+        return date(int(ano), int(mes), 1)
+    except ValueError:
+        raise CommandError(f"Mês inválido: {valor!r} (use AAAA-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fecha meses (AAAA-MM): romaneios e pagamentos do mês ficam bloqueados e os relatórios "
+        "do mês (fichas, fluxo, exports e agregados do dashboard) são congelados em snapshots. "
+        "--antigos N fecha todos os meses abertos terminados há pelo menos N dias; --reabrir "
+        "desfaz o fechamento e apaga os snapshots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("meses", nargs="*", help="Meses no formato AAAA-MM.")
+        parser.add_argument(
+            "--usuario", help="Usuário que fecha o mês (os relatórios são gerados com ele). Obrigatório ao fechar."
+        )
+        parser.add_argument(
+            "--antigos", type=int, metavar="DIAS", help="Fecha os meses abertos terminados há pelo menos DIAS dias."
+        )
+        parser.add_argument("--reabrir", action="store_true", help="Reabre os meses informados.")
+
+    def handle(self, *args, **options):
+        meses = [_mes(valor) for valor in options["meses"]]
+
+        if options["reabrir"]:
+            if not meses:
+                raise CommandError("Informe os meses a reabrir.")
+            for mes in meses:
+                if reabrir_mes(mes.year, mes.month):
+                    self.stdout.write(f"{mes:%m/%Y} reaberto.")
+                else:
+                    self.stdout.write(f"{mes:%m/%Y} não estava fechado.")
+            return
+
+        if options["antigos"] is not None:
+            if options["antigos"] < 0:
+                raise CommandError("--antigos deve ser zero ou positivo.")
+            meses = sorted({*meses, *meses_para_fechar(options["antigos"])})
+        if not meses:
+            self.stdout.write("Nenhum mês para fechar.")
+            return
+
+        if not options["usuario"]:
+            raise CommandError("Informe --usuario para fechar meses.")
+        try:
+            usuario = get_user_model().objects.get(username=options["usuario"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Usuário {options['usuario']!r} não encontrado.")
+
+        for mes in meses:
+            try:
+                fechamento, falhas = fechar_mes(mes.year, mes.month, usuario)
+            except FechamentoInvalido as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f"{fechamento} fechado."))
+            if falhas:
+                self.stdout.write(
+                    self.style.WARNING(f"  Sem snapshot (calculados na hora): {', '.join(falhas)}.")
+                )
@@ -0,0 +1,241 @@
+"""
+Export colunar (Parquet, via pyarrow) de romaneios, itens, unidades e pagamentos para análise.
+
+Layout no destino (particionamento estilo Hive, lido direto por pyarrow.dataset, DuckDB,
+Spark, Power BI...):
+
+    <destino>/romaneios/ano=2026/mes=03/dados.parquet
+    <destino>/itens/ano=2026/mes=03/dados.parquet
+    ...
+    <destino>/_manifesto.json
+
+As colunas são as mesmas da API NDJSON (views_api.RECURSOS); ano/mes vêm do caminho.
+Cada mês é lido em lotes por keyset (id > último id) com .values_list(): as tuplas viram
+colunas (zip) e cada lote vira um RecordBatch, sem instanciar models. Os tipos Arrow saem
+dos campos do model (DecimalField -> decimal128 com a mesma precisão, DateField -> date32...).
+
+Incremental: o manifesto guarda, por tabela e mês, a versão dos dados exportados (escopo
+"mes:<AAAA-MM>" + GERAL de apps.core.versoes, e o cadastro de onde vêm os nomes, quando a
+tabela tem nomes). Só os meses com versão diferente são regravados; meses que ficaram
+vazios têm o arquivo removido. A versão é lida ANTES dos dados: uma gravação no meio do
+export só faz o mês sair de novo na próxima execução.
+
+pyarrow é dependência opcional (importado só aqui dentro das funções).
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Iterable
+
+from apps.core import versoes
+
+from . import services
+from .views_api import RECURSOS, Recurso, _lotes_keyset
+
+LOTE_PADRAO = 10_000
+MANIFESTO = "_manifesto.json"
+ARQUIVO = "dados.parquet"
+COMPRESSAO = "zstd"
+
+# Cadastros de onde vêm colunas de nome: renomear um cliente/madeira regrava a tabela toda
+DEPENDENCIAS = {
+    "romaneios": (versoes.CLIENTE,),
+    "itens": (versoes.TIPO_MADEIRA,),
+    "unidades": (),
+    "pagamentos": (versoes.CLIENTE,),
+}
+TABELAS = tuple(RECURSOS)
+
+
+class PyarrowIndisponivel(RuntimeError):
+    pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise PyarrowIndisponivel("pyarrow não está instalado (pip install pyarrow).") from exc
+    return pa, pq
+
+
+# =============================================================================
+# Esquema
+# =============================================================================
+def _campo_model(model, caminho: str):
+    """Campo do model no fim de um caminho do ORM (ex.: "romaneio__cliente_id")."""
+    *relacoes, nome = caminho.split("__")
+    for relacao in relacoes:
+        model = model._meta.get_field(relacao).related_model
+    return model._meta.get_field(nome)
+
+
+def _tipo_arrow(pa, campo):
+    tipo = campo.get_internal_type()
+    if tipo == "DecimalField":
+        return pa.decimal128(campo.max_digits, campo.decimal_places)
+    if tipo == "DateField":
+        return pa.date32()
+    if tipo == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if tipo in ("CharField", "TextField"):
+        return pa.string()
+    if tipo == "BooleanField":
+        return pa.bool_()
+    return pa.int64()  # ids, FKs e inteiros
+
+
+def esquema(pa, recurso: Recurso):
+    model = recurso.queryset().model
+    return pa.schema(
+        [
+            pa.field(chave, _tipo_arrow(pa, _campo_model(model, caminho)), nullable=chave != "id")
+            for chave, caminho in recurso.campos
+        ]
+    )
+
+
+def _assinatura(recurso: Recurso) -> str:
+    """Muda quando as colunas mudam: aí todos os meses da tabela são regravados."""
+    return ",".join(chave for chave, _caminho in recurso.campos)
+
+
+# =============================================================================
+# Escrita
+# =============================================================================
+def _lote_arrow(pa, schema, linhas: list[tuple]):
+    """Lista de tuplas do values_list -> RecordBatch (transpõe com zip, uma coluna por campo)."""
+    colunas = zip(*linhas)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(valores, type=coluna.type) for valores, coluna in zip(colunas, schema)], schema=schema
+    )
+
+
+def escrever(qs, recurso: Recurso, destino, *, lote: int = LOTE_PADRAO) -> int:
+    """
+    Grava o queryset (já filtrado) num arquivo Parquet, um row group por lote.
+    `destino` é um caminho ou um arquivo binário aberto. Devolve o número de linhas.
+    """
+    pa, pq = _pyarrow()
+    schema = esquema(pa, recurso)
+    orm = [caminho for _chave, caminho in recurso.campos]
+    total = 0
+    with pq.ParquetWriter(destino, schema, compression=COMPRESSAO) as writer:
+        for linhas in _lotes_keyset(qs, orm, lote):
+            writer.write_batch(_lote_arrow(pa, schema, linhas))
+            total += len(linhas)
+    return total
+
+
+def _gravar_mes(qs, recurso: Recurso, arquivo: Path, lote: int) -> int:
+    """Grava o mês em arquivo temporário e troca de uma vez; mês vazio remove a partição."""
+    if not qs.exists():
+        if arquivo.exists():
+            arquivo.unlink()
+        return 0
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    temporario = arquivo.with_name(arquivo.name + ".tmp")
+    try:
+        total = escrever(qs, recurso, temporario, lote=lote)
+    except BaseException:
+        temporario.unlink(missing_ok=True)
+        raise
+    os.replace(temporario, arquivo)
+    return total
+
+
+# =============================================================================
+# Manifesto e meses alterados
+# =============================================================================
+def ler_manifesto(raiz: Path) -> dict:
+    try:
+        return json.loads((raiz / MANIFESTO).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _gravar_manifesto(raiz: Path, manifesto: dict) -> None:
+    temporario = raiz / (MANIFESTO + ".tmp")
+    temporario.write_text(json.dumps(manifesto, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(temporario, raiz / MANIFESTO)
+
+
+def versoes_dos_meses(nome: str, meses: Iterable[date]) -> dict[str, str]:
+    """'AAAA-MM' -> versão dos dados do mês para a tabela (uma consulta em VersaoDados)."""
+    meses = sorted(set(meses))
+    dependencias = DEPENDENCIAS.get(nome, ())
+    v = dict(versoes.carimbo(*(versoes.escopo_mes(mes) for mes in meses), *dependencias).versoes)
+    comum = ".".join(str(v[escopo]) for escopo in (versoes.GERAL, *dependencias))
+    return {f"{mes:%Y-%m}": f"{comum}.{v[versoes.escopo_mes(mes)]}" for mes in meses}
+
+
+def meses_pendentes(exportados: dict[str, str], atuais: dict[str, str]) -> list[str]:
+    return [mes for mes in sorted(atuais) if exportados.get(mes) != atuais[mes]]
+
+
+def _mes(chave: str) -> date:
+    ano, mes = chave.split("-")
+    return date(int(ano), int(mes), 1)
+
+
+def _arquivo(raiz: Path, nome: str, mes: date) -> Path:
+    return raiz / nome / f"ano={mes.year}" / f"mes={mes.month:02d}" / ARQUIVO
+
+
+@dataclass
+class ResultadoTabela:
+    tabela: str
+    gravados: dict[str, int] = field(default_factory=dict)  # 'AAAA-MM' -> linhas
+    removidos: list[str] = field(default_factory=list)
+    inalterados: int = 0
+
+    @property
+    def linhas(self) -> int:
+        return sum(self.gravados.values())
+
+
+def exportar_tabela(raiz, nome: str, *, completo: bool = False, lote: int = LOTE_PADRAO) -> ResultadoTabela:
+    """Exporta os meses alterados de uma tabela (todos com completo=True) e atualiza o manifesto."""
+    _pyarrow()  # falha antes de tocar no destino
+    raiz = Path(raiz)
+    raiz.mkdir(parents=True, exist_ok=True)
+    recurso = RECURSOS[nome]
+    manifesto = ler_manifesto(raiz)
+    anterior = manifesto.get(nome) or {}
+    if completo or anterior.get("colunas") != _assinatura(recurso):
+        anterior = {}
+    exportados = dict(anterior.get("meses") or {})
+
+    # Meses com dados agora + meses já exportados (podem ter ficado vazios)
+    com_dados = recurso.queryset().order_by().dates(recurso.campo_data, "month")
+    atuais = versoes_dos_meses(nome, [*com_dados, *map(_mes, exportados)])
+
+    resultado = ResultadoTabela(tabela=nome)
+    pendentes = meses_pendentes(exportados, atuais)
+    resultado.inalterados = len(atuais) - len(pendentes)
+    for chave in pendentes:
+        mes = _mes(chave)
+        inicio, fim = services.limites_mes(mes.month, mes.year)
+        qs = recurso.queryset().filter(
+            **{f"{recurso.campo_data}__gte": inicio, f"{recurso.campo_data}__lt": fim}
+        )
+        linhas = _gravar_mes(qs, recurso, _arquivo(raiz, nome, mes), lote)
+        if linhas:
+            resultado.gravados[chave] = linhas
+            exportados[chave] = atuais[chave]
+        else:
+            resultado.removidos.append(chave)
+            exportados.pop(chave, None)
+        # Manifesto a cada mês: uma execução interrompida recomeça de onde parou
+        manifesto[nome] = {"colunas": _assinatura(recurso), "meses": exportados}
+        _gravar_manifesto(raiz, manifesto)
+
+    if not pendentes and nome not in manifesto:
+        manifesto[nome] = {"colunas": _assinatura(recurso), "meses": exportados}
+        _gravar_manifesto(raiz, manifesto)
+    return resultado
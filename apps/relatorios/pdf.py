@@ -0,0 +1,359 @@
+"""
+Geração dos PDFs (WeasyPrint) num pool de processos já aquecidos.
+
+HTML(string=...).write_pdf() do zero refaz, a cada export, a descoberta de fontes (fontconfig)
+e o parse do CSS; num PDF pequeno (um romaneio) isso é a maior parte do tempo. Aqui:
+
+- cada processo importa o WeasyPrint uma vez, cria uma FontConfiguration usada por todos os
+  documentos e já sobe com o <style> dos templates relatorios/*_pdf.html compilado. O <style>
+  do HTML recebido sai do documento e entra como a folha compilada (cache pelo texto do CSS:
+  um template novo ou alterado é compilado no primeiro uso e reaproveitado depois);
+- a view manda (html, base_url) por um Pipe para um processo ocioso e espera no máximo
+  PDF_TIMEOUT segundos. Cada processo tem limite de memória (PDF_MEMORY_LIMIT_MB, RLIMIT_AS,
+  só Unix). PDF que trava, estoura a memória ou derruba o processo vira FalhaPdf na view; o
+  processo é descartado, outro sobe no lugar e o worker web segue atendendo;
+- imagens e folhas referenciadas (STATIC_URL/MEDIA_URL) são lidas direto do disco, com cache
+  em memória (ArquivosLocais): nada de requisição HTTP ao próprio site (nginx/TLS por arquivo,
+  e deadlock com todos os workers ocupados). URLs externas são recusadas.
+
+PDF_WORKERS=0 (settings_test): renderiza no próprio processo, com a FontConfiguration e o
+cache de CSS por thread, mas sem timeout nem limite de memória.
+"""
+from __future__ import annotations
+
+import atexit
+import functools
+import mimetypes
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+
+TEMPLATES_PDF = Path(__file__).resolve().parent / "templates" / "relatorios"
+_ESTILO = re.compile(r"<style>(.*?)</style>", re.S | re.I)
+# Folhas compiladas guardadas por processo/thread (os templates são poucos; o limite só
+# protege contra CSS gerado dinamicamente)
+MAX_ESTILOS = 64
+# Bytes de imagens/CSS/fontes guardados por processo
+MAX_CACHE_ARQUIVOS = 32 * 1024 * 1024
+
+
+class FalhaPdf(RuntimeError):
+    pass
+
+
+def estilos_dos_templates() -> list[str]:
+    """CSS dos <style> dos templates de PDF (não têm tags de template: o texto renderizado é o mesmo)."""
+    estilos = []
+    for arquivo in sorted(TEMPLATES_PDF.glob("*_pdf.html")):
+        estilos += [css.strip() for css in _ESTILO.findall(arquivo.read_text(encoding="utf-8"))]
+    return estilos
+
+
+# =============================================================================
+# Arquivos locais (url_fetcher do WeasyPrint)
+# =============================================================================
+_arquivos_em_cache: dict[str, tuple[tuple[int, int], bytes]] = {}
+_bytes_em_cache = 0
+_lock_arquivos = threading.Lock()
+
+
+def _ler(arquivo: Path) -> bytes:
+    """Conteúdo do arquivo, do cache enquanto mtime/tamanho não mudam (o logo pode ser trocado)."""
+    global _bytes_em_cache
+    info = arquivo.stat()
+    assinatura = (info.st_mtime_ns, info.st_size)
+    chave = str(arquivo)
+    em_cache = _arquivos_em_cache.get(chave)
+    if em_cache is not None and em_cache[0] == assinatura:
+        return em_cache[1]
+    conteudo = arquivo.read_bytes()
+    with _lock_arquivos:
+        if _bytes_em_cache + len(conteudo) > MAX_CACHE_ARQUIVOS:
+            _arquivos_em_cache.clear()
+            _bytes_em_cache = 0
+        if len(conteudo) <= MAX_CACHE_ARQUIVOS:
+            anterior = _arquivos_em_cache.get(chave)
+            _bytes_em_cache += len(conteudo) - (len(anterior[1]) if anterior else 0)
+            _arquivos_em_cache[chave] = (assinatura, conteudo)
+    return conteudo
+
+
+@dataclass(frozen=True)
+class ArquivosLocais:
+    """
+    url_fetcher: URLs do próprio site sob STATIC_URL (STATIC_ROOT, STATICFILES_DIRS, static/ dos
+    apps) ou MEDIA_URL (MEDIA_ROOT) viram leitura do arquivo; o resto (outro host, file:,
+    caminho fora desses diretórios) é recusado e o WeasyPrint segue sem o recurso. Picklable:
+    vai pronto para os processos do pool, que não têm o Django configurado.
+    """
+    prefixos: tuple[tuple[str, tuple[str, ...]], ...]  # (prefixo da URL, diretórios em ordem)
+    hosts: frozenset[str]
+    base_url: str  # das folhas pré-compiladas (url() relativo no <style>)
+
+    @classmethod
+    def das_settings(cls) -> ArquivosLocais:
+        static = [settings.STATIC_ROOT] if settings.STATIC_ROOT else []
+        prefixos = []
+        for entrada in getattr(settings, "STATICFILES_DIRS", ()):
+            if isinstance(entrada, (list, tuple)):  # ("prefixo", diretório)
+                prefixos.append((f"{settings.STATIC_URL}{entrada[0].strip('/')}/", (str(entrada[1]),)))
+            else:
+                static.append(entrada)
+        static += [os.path.join(app.path, "static") for app in apps.get_app_configs()]
+        prefixos.append((settings.STATIC_URL, tuple(str(d) for d in static if os.path.isdir(d))))
+        if settings.MEDIA_URL and settings.MEDIA_ROOT:
+            prefixos.append((settings.MEDIA_URL, (str(settings.MEDIA_ROOT),)))
+
+        hosts = {h for h in settings.ALLOWED_HOSTS if not h.startswith((".", "*"))}
+        if settings.SITE_DOMAIN:
+            hosts.add(settings.SITE_DOMAIN)
+        return cls(
+            prefixos=tuple(sorted(prefixos, key=lambda p: len(p[0]), reverse=True)),
+            hosts=frozenset(hosts),
+            base_url=f"{settings.SITE_PROTOCOL}://{settings.SITE_DOMAIN or 'localhost'}/",
+        )
+
+    def caminho(self, url: str, hosts: tuple[str, ...] = ()) -> Path | None:
+        """Arquivo local da URL, ou None se a URL não é de static/media do próprio site."""
+        partes = urlsplit(url)
+        if partes.scheme not in ("http", "https"):
+            return None
+        caminho_url = unquote(partes.path)
+        local = partes.netloc in self.hosts or partes.netloc in hosts
+        for prefixo, diretorios in self.prefixos:
+            if "://" in prefixo:  # STATIC_URL/MEDIA_URL absolutos (CDN servindo os mesmos arquivos)
+                alvo = f"{partes.scheme}://{partes.netloc}{caminho_url}"
+            elif local:
+                alvo = caminho_url
+            else:
+                continue
+            if not alvo.startswith(prefixo):
+                continue
+            relativo = alvo[len(prefixo):]
+            for diretorio in diretorios:
+                raiz = Path(diretorio).resolve()
+                arquivo = (raiz / relativo).resolve()
+                if arquivo.is_relative_to(raiz) and arquivo.is_file():
+                    return arquivo
+            return None
+        return None
+
+    def __call__(self, url: str, timeout: int = 10, ssl_context=None, hosts: tuple[str, ...] = ()) -> dict:
+        if url.startswith("data:"):
+            from weasyprint import default_url_fetcher
+
+            return default_url_fetcher(url)
+        arquivo = self.caminho(url, hosts)
+        if arquivo is None:
+            raise ValueError(f"URL recusada no PDF (só arquivos de static/media do site): {url}")
+        return {
+            "string": _ler(arquivo),
+            "mime_type": mimetypes.guess_type(arquivo.name)[0] or "application/octet-stream",
+            "redirected_url": url,
+        }
+
+
+# =============================================================================
+# Renderização (dentro do processo do pool ou, sem pool, na thread da view)
+# =============================================================================
+class _Renderizador:
+    """WeasyPrint aquecido: uma FontConfiguration e as folhas de estilo já compiladas."""
+
+    def __init__(self, estilos=(), arquivos: ArquivosLocais | None = None):
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        self._CSS, self._HTML = CSS, HTML
+        self.arquivos = arquivos or ArquivosLocais.das_settings()
+        self.fontes = FontConfiguration()
+        self._folhas: dict[str, object] = {}
+        for css in estilos:
+            self.folha(css)
+
+    def folha(self, texto: str):
+        folha = self._folhas.get(texto)
+        if folha is None:
+            if len(self._folhas) >= MAX_ESTILOS:
+                self._folhas.clear()
+            folha = self._folhas[texto] = self._CSS(
+                string=texto, base_url=self.arquivos.base_url, url_fetcher=self.arquivos, font_config=self.fontes
+            )
+        return folha
+
+    def pdf(self, html: str, base_url: str | None) -> bytes:
+        folhas = [self.folha(css.strip()) for css in _ESTILO.findall(html)]
+        # O host do pedido também é "o próprio site" (base_url vem de build_absolute_uri)
+        buscar = functools.partial(self.arquivos, hosts=(urlsplit(base_url or "").netloc,))
+        documento = self._HTML(string=_ESTILO.sub("", html), base_url=base_url, url_fetcher=buscar)
+        return documento.write_pdf(stylesheets=folhas, font_config=self.fontes)
+
+
+def _limitar_memoria(megabytes: int) -> None:
+    try:
+        import resource
+    except ImportError:  # Windows: sem RLIMIT_AS, vale só o timeout
+        return
+    limite = megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+
+def _trabalhador(conexao, estilos: list[str], arquivos: ArquivosLocais, limite_memoria_mb: int) -> None:
+    """
+    Laço do processo do pool: recebe (html, base_url) e responde ("ok", pdf), ("erro", mensagem)
+    ou ("fim", mensagem) quando o processo vai encerrar depois da resposta.
+    """
+    if limite_memoria_mb:
+        _limitar_memoria(limite_memoria_mb)
+    try:
+        renderizador, erro = _Renderizador(estilos, arquivos), ""
+    except Exception as exc:  # WeasyPrint ausente/sem bibliotecas nativas: responde o erro a cada pedido
+        renderizador, erro = None, f"WeasyPrint não está disponível neste servidor: {exc}"
+
+    while True:
+        try:
+            pedido = conexao.recv()
+        except (EOFError, OSError):
+            return
+        if pedido is None:
+            return
+        if renderizador is None:
+            conexao.send(("erro", erro))
+            continue
+        try:
+            conexao.send(("ok", renderizador.pdf(*pedido)))
+        except MemoryError:
+            # O heap pode ter ficado em mau estado: o pool sobe outro processo
+            conexao.send(("fim", f"memória esgotada (limite de {limite_memoria_mb} MB)"))
+            return
+        except Exception as exc:
+            conexao.send(("erro", f"{type(exc).__name__}: {exc}"))
+
+
+# =============================================================================
+# Pool de processos
+# =============================================================================
+class _Processo:
+    def __init__(self, contexto, estilos: list[str], arquivos: ArquivosLocais, limite_memoria_mb: int):
+        self.conexao, lado_filho = contexto.Pipe()
+        self.processo = contexto.Process(
+            target=_trabalhador,
+            args=(lado_filho, estilos, arquivos, limite_memoria_mb),
+            name="romaneios-pdf",
+            daemon=True,
+        )
+        self.processo.start()
+        lado_filho.close()
+        self.perdido = False  # travou, morreu ou vai encerrar: não recebe outro pedido
+
+    def encerrar(self) -> None:
+        self.processo.kill()
+        self.processo.join(timeout=5)
+        self.conexao.close()
+
+
+class PoolPdf:
+    """
+    `tamanho` processos (spawn: não herdam conexões de banco nem threads do worker web),
+    iniciados já na criação para aquecerem enquanto a view ainda monta o HTML.
+    """
+
+    def __init__(self, tamanho: int, timeout: float, limite_memoria_mb: int = 0):
+        self.timeout = timeout
+        self._contexto = multiprocessing.get_context("spawn")
+        self._estilos = estilos_dos_templates()
+        self._arquivos = ArquivosLocais.das_settings()
+        self._limite = limite_memoria_mb
+        self._ociosos: queue.LifoQueue[_Processo] = queue.LifoQueue()  # o mais quente primeiro
+        for _ in range(tamanho):
+            self._ociosos.put(self._novo())
+
+    def _novo(self) -> _Processo:
+        return _Processo(self._contexto, self._estilos, self._arquivos, self._limite)
+
+    def _executar(self, processo: _Processo, html: str, base_url: str | None) -> bytes:
+        # Só volta a ser reutilizável com uma resposta completa: timeout, processo morto ou
+        # qualquer interrupção no meio deixariam uma resposta atrasada no pipe
+        processo.perdido = True
+        try:
+            processo.conexao.send((html, base_url))
+            if not processo.conexao.poll(self.timeout):
+                raise FalhaPdf(f"o PDF não ficou pronto em {self.timeout:g}s")
+            status, resultado = processo.conexao.recv()
+        except (EOFError, OSError):
+            raise FalhaPdf("o processo de geração de PDF terminou inesperadamente")
+        processo.perdido = status == "fim"
+        if status != "ok":
+            raise FalhaPdf(resultado)
+        return resultado
+
+    def gerar(self, html: str, base_url: str | None = None) -> bytes:
+        try:
+            processo = self._ociosos.get(timeout=self.timeout)
+        except queue.Empty:
+            raise FalhaPdf("todos os processos de geração de PDF estão ocupados")
+        try:
+            if not processo.processo.is_alive():
+                processo.encerrar()
+                processo = self._novo()
+            return self._executar(processo, html, base_url)
+        finally:
+            if processo.perdido:
+                processo.encerrar()
+                processo = self._novo()
+            self._ociosos.put(processo)
+
+    def encerrar(self) -> None:
+        while True:
+            try:
+                processo = self._ociosos.get_nowait()
+            except queue.Empty:
+                return
+            processo.encerrar()
+
+
+_pool: PoolPdf | None = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _pool_pdf() -> PoolPdf | None:
+    """Pool do processo, criado no primeiro PDF; None = renderizar na própria thread (PDF_WORKERS=0)."""
+    global _pool
+    tamanho = int(getattr(settings, "PDF_WORKERS", 2))
+    if tamanho <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = PoolPdf(
+                tamanho,
+                timeout=float(getattr(settings, "PDF_TIMEOUT", 60)),
+                limite_memoria_mb=int(getattr(settings, "PDF_MEMORY_LIMIT_MB", 1024)),
+            )
+            atexit.register(_pool.encerrar)
+    return _pool
+
+
+def _renderizador_local() -> _Renderizador:
+    renderizador = getattr(_local, "renderizador", None)
+    if renderizador is None:
+        renderizador = _local.renderizador = _Renderizador(estilos_dos_templates())
+    return renderizador
+
+
+def gerar_pdf(html: str, base_url: str | None = None) -> bytes:
+    """PDF do HTML renderizado. FalhaPdf se não deu (WeasyPrint indisponível, erro, timeout, memória)."""
+    pool = _pool_pdf()
+    if pool is not None:
+        return pool.gerar(html, base_url)
+    try:
+        return _renderizador_local().pdf(html, base_url)
+    except Exception as exc:
+        raise FalhaPdf(f"{type(exc).__name__}: {exc}") from exc
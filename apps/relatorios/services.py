@@ -0,0 +1,308 @@
+"""
+Dados do dashboard (relatorios e core).
+
+Os KPIs do mês, do mês anterior e do mesmo mês do ano anterior saem de UMA consulta em
+romaneios (agregação condicional: FILTER (WHERE ...) no PostgreSQL, CASE no SQLite), e o
+saldo a receber de UMA consulta em clientes (vendas e pagamentos por subquery agregada),
+no lugar de duas consultas por cliente via Cliente.saldo_atual.
+
+As séries mensais (tendência de 12 a 60 meses) saem de um GROUP BY por mês em romaneios e
+outro em pagamentos; cada mês fechado fica em cache com a versão do próprio mês
+("mes:<AAAA-MM>" em apps.core.versoes), então só o mês corrente e os meses alterados
+voltam ao banco.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from apps.cadastros.models import Cliente
+from apps.core import versoes
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import ItemRomaneio, Romaneio
+
+ZERO_M3 = Decimal("0.000")
+ZERO_VALOR = Decimal("0.00")
+
+
+# =============================================================================
+# Períodos
+# =============================================================================
+def limites_mes(mes: int, ano: int) -> tuple[date, date] | None:
+    """[primeiro dia do mês, primeiro dia do mês seguinte); None se mês/ano inválidos."""
+    try:
+        inicio = date(ano, mes, 1)
+    except (TypeError, ValueError):
+        return None
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def mes_anterior(mes: int, ano: int) -> tuple[int, int]:
+    return (12, ano - 1) if mes == 1 else (mes - 1, ano)
+
+
+def _filtro_periodo(campo: str, limites: tuple[date, date] | None) -> Q | None:
+    if limites is None:
+        return None
+    return Q(**{f"{campo}__gte": limites[0], f"{campo}__lt": limites[1]})
+
+
+# =============================================================================
+# KPIs do mês + comparativos
+# =============================================================================
+@dataclass(frozen=True)
+class Kpis:
+    m3: Decimal = ZERO_M3
+    faturamento: Decimal = ZERO_VALOR
+    romaneios: int = 0
+
+
+@dataclass(frozen=True)
+class Variacao:
+    """Variação percentual contra o mês anterior e contra o mesmo mês do ano anterior (None = sem base)."""
+    mes_anterior: Decimal | None
+    ano_anterior: Decimal | None
+
+
+def variacao_percentual(atual, anterior) -> Decimal | None:
+    if not anterior:
+        return None
+    return ((Decimal(atual) - Decimal(anterior)) * 100 / Decimal(anterior)).quantize(Decimal("0.1"))
+
+
+@dataclass(frozen=True)
+class KpisDashboard:
+    mes: Kpis
+    mes_anterior: Kpis
+    ano_anterior: Kpis
+
+    def _variacao(self, campo: str) -> Variacao:
+        atual = getattr(self.mes, campo)
+        return Variacao(
+            mes_anterior=variacao_percentual(atual, getattr(self.mes_anterior, campo)),
+            ano_anterior=variacao_percentual(atual, getattr(self.ano_anterior, campo)),
+        )
+
+    @property
+    def variacoes(self) -> dict[str, Variacao]:
+        return {campo: self._variacao(campo) for campo in ("m3", "faturamento", "romaneios")}
+
+
+def kpis_mes(mes: int, ano: int) -> KpisDashboard:
+    """m³, faturamento e nº de romaneios do mês, do mês anterior e do mesmo mês do ano anterior (1 consulta)."""
+    periodos = {
+        "mes": limites_mes(mes, ano),
+        "mes_anterior": limites_mes(*mes_anterior(mes, ano)),
+        "ano_anterior": limites_mes(mes, ano - 1),
+    }
+    filtros = {
+        nome: _filtro_periodo("data_romaneio", limites) for nome, limites in periodos.items() if limites is not None
+    }
+    if "mes" not in filtros:
+        return KpisDashboard(Kpis(), Kpis(), Kpis())
+
+    agregados = {}
+    onde = Q()
+    for nome, filtro in filtros.items():
+        agregados[f"{nome}_m3"] = Sum("m3_total", filter=filtro)
+        agregados[f"{nome}_valor"] = Sum("valor_total", filter=filtro)
+        agregados[f"{nome}_qtd"] = Count("id", filter=filtro)
+        onde |= filtro
+
+    # O WHERE restringe às linhas dos três meses (índice em data_romaneio); cada agregado filtra o seu
+    linha = Romaneio.objects.filter(onde).aggregate(**agregados)
+
+    def kpis(nome: str) -> Kpis:
+        if nome not in filtros:
+            return Kpis()
+        return Kpis(
+            m3=linha[f"{nome}_m3"] or ZERO_M3,
+            faturamento=linha[f"{nome}_valor"] or ZERO_VALOR,
+            romaneios=linha[f"{nome}_qtd"] or 0,
+        )
+
+    return KpisDashboard(mes=kpis("mes"), mes_anterior=kpis("mes_anterior"), ano_anterior=kpis("ano_anterior"))
+
+
+# =============================================================================
+# Saldo a receber
+# =============================================================================
+@dataclass(frozen=True)
+class Devedor:
+    id: int
+    nome: str
+    saldo_atual: Decimal
+
+
+def _soma_por_cliente(qs, campo: str):
+    """Subquery escalar: soma de `campo` do cliente da linha externa (0 se não houver)."""
+    soma = qs.filter(cliente=OuterRef("pk")).order_by().values("cliente").annotate(total=Sum(campo)).values("total")
+    return Coalesce(
+        Subquery(soma, output_field=DecimalField(max_digits=17, decimal_places=2)),
+        Value(ZERO_VALOR),
+        output_field=DecimalField(max_digits=17, decimal_places=2),
+    )
+
+
+def devedores() -> list[Devedor]:
+    """
+    Clientes com saldo negativo (pagamentos - vendas, mesma regra de Cliente.saldo_atual),
+    do mais devedor para o menos, numa consulta.
+    """
+    linhas = (
+        Cliente.objects.annotate(
+            _vendas=_soma_por_cliente(Romaneio.objects, "valor_total"),
+            _pagamentos=_soma_por_cliente(Pagamento.objects, "valor"),
+        )
+        .annotate(_saldo=F("_pagamentos") - F("_vendas"))
+        .filter(_saldo__lt=0)
+        .order_by("_saldo", "nome")
+        .values_list("id", "nome", "_saldo")
+    )
+    return [Devedor(id=pk, nome=nome, saldo_atual=saldo) for pk, nome, saldo in linhas]
+
+
+def saldo_a_receber(lista: list[Devedor]) -> Decimal:
+    return abs(sum((d.saldo_atual for d in lista), ZERO_VALOR))
+
+
+# =============================================================================
+# Rankings do mês e anos disponíveis
+# =============================================================================
+def anos_com_romaneio() -> list[int]:
+    return [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
+
+
+def top_clientes_mes(mes: int, ano: int, limite: int = 5) -> list[dict]:
+    filtro = _filtro_periodo("data_romaneio", limites_mes(mes, ano))
+    if filtro is None:
+        return []
+    return list(
+        Romaneio.objects.filter(filtro)
+        .values("cliente__nome")
+        .annotate(total_comprado=Sum("valor_total"))
+        .order_by("-total_comprado")[:limite]
+    )
+
+
+def vendas_por_madeira(mes: int, ano: int, limite: int = 10) -> list[dict]:
+    filtro = _filtro_periodo("romaneio__data_romaneio", limites_mes(mes, ano))
+    if filtro is None:
+        return []
+    return list(
+        ItemRomaneio.objects.filter(filtro)
+        .values("tipo_madeira__nome")
+        .annotate(
+            total_m3=Sum("quantidade_m3_total"),
+            total_valor=Sum("valor_total"),
+        )
+        .order_by("-total_m3")[:limite]
+    )
+
+
+# =============================================================================
+# Séries mensais (tendência)
+# =============================================================================
+SERIE_MESES_PADRAO = 12
+SERIE_MESES_MAX = 60
+
+
+def _mes_seguinte(inicio: date) -> date:
+    return date(inicio.year + 1, 1, 1) if inicio.month == 12 else date(inicio.year, inicio.month + 1, 1)
+
+
+def meses_da_serie(meses: int, ate: date) -> list[date]:
+    """Primeiro dia de cada um dos `meses` meses terminando no mês de `ate` (ordem crescente)."""
+    atual = ate.replace(day=1)
+    lista = [atual]
+    for _ in range(meses - 1):
+        mes, ano = mes_anterior(atual.month, atual.year)
+        atual = date(ano, mes, 1)
+        lista.append(atual)
+    return lista[::-1]
+
+
+def _ponto(mes: date, m3=None, faturamento=None, pagamentos=None) -> dict:
+    # SUM no SQLite perde as casas decimais: normaliza para a escala dos campos
+    faturamento = Decimal(faturamento or 0).quantize(ZERO_VALOR)
+    pagamentos = Decimal(pagamentos or 0).quantize(ZERO_VALOR)
+    return {
+        "mes": mes.isoformat()[:7],  # AAAA-MM (o %Y do strftime não completa anos < 1000)
+        "m3": Decimal(m3 or 0).quantize(ZERO_M3),
+        "faturamento": faturamento,
+        "pagamentos": pagamentos,
+        # Quanto o saldo a receber cresceu no mês (negativo = recebeu mais do que vendeu)
+        "a_receber": faturamento - pagamentos,
+    }
+
+
+def _calcular_meses(inicio: date, fim: date) -> dict[date, dict]:
+    """Pontos de [inicio, fim): um GROUP BY mês em romaneios e outro em pagamentos."""
+    vendas = {
+        linha["mes"]: linha
+        for linha in Romaneio.objects.filter(data_romaneio__gte=inicio, data_romaneio__lt=fim)
+        .annotate(mes=TruncMonth("data_romaneio"))
+        .order_by()
+        .values("mes")
+        .annotate(m3=Sum("m3_total"), faturamento=Sum("valor_total"))
+    }
+    pagamentos = dict(
+        Pagamento.objects.filter(data_pagamento__gte=inicio, data_pagamento__lt=fim)
+        .annotate(mes=TruncMonth("data_pagamento"))
+        .order_by()
+        .values("mes")
+        .annotate(total=Sum("valor"))
+        .values_list("mes", "total")
+    )
+    pontos = {}
+    for mes in set(vendas) | set(pagamentos):
+        venda = vendas.get(mes, {})
+        pontos[mes] = _ponto(mes, venda.get("m3"), venda.get("faturamento"), pagamentos.get(mes))
+    return pontos
+
+
+def serie_mensal(meses: int = SERIE_MESES_PADRAO, ate: date | None = None) -> list[dict]:
+    """
+    m³, faturamento, pagamentos e novo saldo a receber por mês, dos `meses` meses até `ate`
+    (padrão: mês corrente). Meses fechados vêm do cache quando a versão do mês não mudou.
+    """
+    hoje = timezone.localdate()
+    meses = max(1, min(int(meses), SERIE_MESES_MAX))
+    ate = min(ate or hoje, hoje)
+    # A série não pode começar antes de janeiro do ano 1: `ate` cedo demais é adiantado
+    minimo = meses - 1 + 12  # índice (ano * 12 + mês - 1) do último mês de uma série iniciada em 01/0001
+    if ate.year * 12 + ate.month - 1 < minimo:
+        ate = date(minimo // 12, minimo % 12 + 1, 1)
+    lista = meses_da_serie(meses, ate)
+    mes_corrente = hoje.replace(day=1)
+    timeout = getattr(settings, "SERIES_CACHE_TIMEOUT", 604800)
+
+    pontos: dict[date, dict] = {}
+    chaves: dict[date, str] = {}
+    fechados = [mes for mes in lista if mes < mes_corrente]
+    if timeout and fechados:
+        v = dict(versoes.carimbo(*(versoes.escopo_mes(mes) for mes in fechados)).versoes)
+        chaves = {
+            mes: f"relatorios:serie:{mes:%Y-%m}:{v[versoes.GERAL]}.{v[versoes.escopo_mes(mes)]}" for mes in fechados
+        }
+        em_cache = cache.get_many(list(chaves.values()))
+        pontos = {mes: em_cache[chave] for mes, chave in chaves.items() if chave in em_cache}
+
+    faltando = [mes for mes in lista if mes not in pontos]
+    if faltando:
+        calculados = _calcular_meses(faltando[0], _mes_seguinte(faltando[-1]))
+        for mes in faltando:
+            pontos[mes] = calculados.get(mes) or _ponto(mes)
+        novos = {chaves[mes]: pontos[mes] for mes in faltando if mes in chaves}
+        if novos:
+            cache.set_many(novos, timeout)
+
+    return [pontos[mes] for mes in lista]
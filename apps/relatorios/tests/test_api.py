@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.models import TokenApi
+from apps.core.tokens import criar_token
+from apps.relatorios.views_fluxo_financeiro import _dados_fluxo
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+    create_unidade_romaneio,
+    create_user,
+)
+
+
+def _linhas(resp) -> list[dict]:
+    corpo = b"".join(resp.streaming_content).decode()
+    return [json.loads(linha) for linha in corpo.splitlines()]
+
+
+class ApiNdjsonTests(TestCase):
+    def setUp(self):
+        self.user = create_user(username="bi_user", password="12345678")
+        _token, self.chave = criar_token(self.user, "BI")
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {self.chave}"}
+
+        self.ana = create_cliente(nome="Ana")
+        self.beto = create_cliente(nome="Beto")
+        self.pinus = create_tipo_madeira(nome="PINUS API", preco_normal=Decimal("10.00"))
+        self.eucalipto = create_tipo_madeira(nome="EUCALIPTO API", preco_normal=Decimal("20.00"))
+
+        self.r1 = self._romaneio("api-1", self.ana, date(2026, 3, 2), self.pinus, "1.500")
+        self.r2 = self._romaneio("api-2", self.beto, date(2026, 3, 10), self.eucalipto, "2.000")
+        self.r3 = self._romaneio("api-3", self.ana, date(2026, 4, 1), self.pinus, "0.250")
+        create_item_romaneio(
+            romaneio=self.r1, tipo_madeira=self.pinus, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("1")
+        )
+        create_pagamento(cliente=self.ana, valor=Decimal("7.50"), data_pagamento=date(2026, 3, 2))
+
+    def _romaneio(self, numero, cliente, data, tipo, m3):
+        rom = create_romaneio(numero_romaneio=numero, cliente=cliente, data_romaneio=data)
+        create_item_romaneio(romaneio=rom, tipo_madeira=tipo, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal(m3))
+        rom.refresh_from_db()
+        return rom
+
+    def _get(self, nome, **params):
+        return self.client.get(reverse(f"relatorios:{nome}"), params, **self.auth)
+
+    def test_exige_token(self):
+        url = reverse("relatorios:api_romaneios")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer errado").status_code, 401)
+
+        # sessão não vale nessas rotas; token revogado também não
+        self.client.login(username="bi_user", password="12345678")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        TokenApi.objects.update(ativo=False)
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 401)
+
+    def test_romaneios_em_ndjson_com_decimais_como_string(self):
+        resp = self._get("api_romaneios", mes="", ano="2026")
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        linhas = _linhas(resp)
+
+        self.assertEqual([l["numero_romaneio"] for l in linhas], ["api-1", "api-2", "api-3"])
+        self.assertEqual(linhas[0]["m3_total"], "2.500")
+        self.assertEqual(linhas[0]["valor_total"], str(self.r1.valor_total))
+        self.assertEqual(linhas[0]["data_romaneio"], "2026-03-02")
+        self.assertEqual(linhas[0]["cliente_nome"], "Ana")
+
+    @override_settings(API_NDJSON_BATCH_SIZE=2)
+    def test_lotes_por_keyset_e_continuacao(self):
+        # token + ultimo_uso + 2 lotes (2 linhas + 1 linha)
+        with self.assertNumQueries(4):
+            linhas = _linhas(self._get("api_romaneios", mes="", ano=""))
+        self.assertEqual(len(linhas), 3)
+
+        linhas = _linhas(self._get("api_romaneios", mes="", ano="", depois=self.r1.pk, limite=1))
+        self.assertEqual([l["id"] for l in linhas], [self.r2.pk])
+
+    def test_filtros_das_fichas(self):
+        linhas = _linhas(self._get("api_romaneios", mes="3", ano="2026", tipo_madeira_id=self.pinus.pk))
+        self.assertEqual([l["id"] for l in linhas], [self.r1.pk])  # dois itens de pinus, uma linha
+
+        linhas = _linhas(self._get("api_itens", data_inicio="2026-03-05", data_fim="2026-04-01"))
+        self.assertEqual({l["romaneio_id"] for l in linhas}, {self.r2.pk, self.r3.pk})
+
+        linhas = _linhas(self._get("api_itens", mes="", ano="", cliente=self.ana.pk, tipo_madeira_id=self.pinus.pk))
+        self.assertEqual(len(linhas), 3)
+        self.assertEqual(linhas[0]["valor_unitario"], "10.00")
+
+        self.assertEqual(self._get("api_romaneios", data_inicio="03/2026").status_code, 400)
+
+    def test_unidades_e_pagamentos(self):
+        item = self.r3.itens.get()
+        create_unidade_romaneio(item=item, quantidade_m3=Decimal("0.125"))
+        linhas = _linhas(self._get("api_unidades", mes="4", ano="2026"))
+        self.assertEqual([(l["item_id"], l["quantidade_m3"]) for l in linhas], [(item.pk, "0.125")])
+
+        linhas = _linhas(self._get("api_pagamentos", mes="3", ano="2026"))
+        self.assertEqual([(l["cliente_nome"], l["valor"]) for l in linhas], [("Ana", "7.50")])
+
+    def test_fluxo_igual_a_tela(self):
+        params = {"mes": "3", "ano": "2026"}
+        linhas = _linhas(self._get("api_fluxo", **params))
+
+        esperado = _dados_fluxo(RequestFactory().get("/", params))["movimentacoes"]
+        self.assertEqual(
+            [(l["data"], l["cliente_nome"], l["tipo"], l["saldo_atual"]) for l in linhas],
+            [
+                (m.data.isoformat(), m.cliente_nome, "venda" if m.total is not None else "pagamento", str(m.saldo_atual))
+                for m in esperado
+            ],
+        )
+
+
+class CriarTokenApiCommandTests(TestCase):
+    def test_cria_e_revoga(self):
+        create_user(username="bi_cmd", password="12345678")
+        out = StringIO()
+        call_command("criar_token_api", "bi_cmd", nome="Power BI", stdout=out)
+
+        chave = out.getvalue().strip().splitlines()[-1]
+        token = TokenApi.objects.get()
+        self.assertEqual(token.prefixo, chave[:8])
+        self.assertNotEqual(token.chave_hash, chave)
+
+        call_command("criar_token_api", "bi_cmd", revogar=token.prefixo, stdout=StringIO())
+        token.refresh_from_db()
+        self.assertFalse(token.ativo)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+
+class BenchmarkExportsCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _rodar(self, *args) -> dict:
+        saida = self.dir / "exports.json"
+        call_command(
+            "benchmark_exports",
+            "--banco-atual",
+            "--linhas", "30",
+            "--repeticoes", "1",
+            "--exports", "ficha_romaneios_csv,romaneio_excel,ficha_madeiras_pdf",
+            "--max-linhas-pdf", "10",
+            "--saida", str(saida),
+            *args,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+        return json.loads(saida.read_text(encoding="utf-8"))
+
+    def test_mede_tempo_memoria_e_tamanho(self):
+        dados = self._rodar()
+        por_export = {r["export"]: r for r in dados["resultados"]}
+
+        csv = por_export["ficha_romaneios_csv"]
+        self.assertEqual(csv["status"], 200)
+        self.assertGreater(csv["bytes"], 0)
+        self.assertGreater(csv["tracemalloc_pico_kb"], 0)
+        self.assertEqual(por_export["romaneio_excel"]["status"], 200)
+        self.assertTrue(por_export["ficha_madeiras_pdf"]["pulado"])  # acima de --max-linhas-pdf
+        self.assertEqual(dados["tamanhos"]["30"]["unidades_romaneio"], 30)
+
+    def test_falha_quando_regride_alem_do_limite(self):
+        baseline = self._rodar()
+        for r in baseline["resultados"]:
+            if r["status"] == 200:
+                r["p50_ms"] = 0.01
+                r["tracemalloc_pico_kb"] = 0.01
+        caminho = self.dir / "baseline.json"
+        caminho.write_text(json.dumps(baseline), encoding="utf-8")
+
+        with self.assertRaises(CommandError):
+            self._rodar("--baseline", str(caminho), "--tolerancia-ms", "0")
+
+    def test_sem_cache_mesmo_com_os_caches_ligados(self):
+        with override_settings(REPORT_CACHE_TIMEOUT=600, FRAGMENT_CACHE_TIMEOUT=86400, SERIES_CACHE_TIMEOUT=604800):
+            dados = self._rodar("--modos", "sem_cache,cache_quente", "--exports", "fluxo_financeiro_excel")
+        excel = {r["modo"]: r for r in dados["resultados"]}
+        self.assertLess(excel["cache_quente"]["queries"], excel["sem_cache"]["queries"])
+
+    def test_baseline_sem_modo_nao_e_comparado(self):
+        baseline = self._rodar()
+        for r in baseline["resultados"]:
+            del r["modo"]
+            if r["status"] == 200:
+                r["p50_ms"] = 0.01
+        caminho = self.dir / "baseline.json"
+        caminho.write_text(json.dumps(baseline), encoding="utf-8")
+        self._rodar("--baseline", str(caminho), "--tolerancia-ms", "0")
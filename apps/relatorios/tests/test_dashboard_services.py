@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.relatorios import services
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+)
+
+
+class KpisMesTests(TestCase):
+    def setUp(self):
+        self.cliente = create_cliente(nome="Cliente KPI")
+        self.tm = create_tipo_madeira(nome="KPI MADEIRA", preco_normal=Decimal("10.00"))
+
+    def _romaneio(self, numero: str, data: date, m3: str):
+        rom = create_romaneio(numero_romaneio=numero, cliente=self.cliente, data_romaneio=data)
+        create_item_romaneio(
+            romaneio=rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal(m3)
+        )
+
+    def test_mes_anterior_e_ano_anterior_numa_consulta(self):
+        self._romaneio("k-1", date(2026, 3, 5), "4.000")
+        self._romaneio("k-2", date(2026, 3, 31), "2.000")
+        self._romaneio("k-3", date(2026, 2, 28), "3.000")  # mês anterior
+        self._romaneio("k-4", date(2025, 3, 1), "12.000")  # mesmo mês do ano anterior
+        self._romaneio("k-5", date(2026, 4, 1), "99.000")  # fora
+
+        with self.assertNumQueries(1):
+            kpis = services.kpis_mes(3, 2026)
+
+        self.assertEqual(kpis.mes, services.Kpis(Decimal("6.000"), Decimal("60.00"), 2))
+        self.assertEqual(kpis.mes_anterior.romaneios, 1)
+        self.assertEqual(kpis.ano_anterior.faturamento, Decimal("120.00"))
+        self.assertEqual(kpis.variacoes["m3"].mes_anterior, Decimal("100.0"))
+        self.assertEqual(kpis.variacoes["faturamento"].ano_anterior, Decimal("-50.0"))
+
+    def test_janeiro_compara_com_dezembro_e_mes_invalido(self):
+        self._romaneio("k-6", date(2025, 12, 10), "1.000")
+        kpis = services.kpis_mes(1, 2026)
+        self.assertEqual(kpis.mes_anterior.romaneios, 1)
+        self.assertEqual(kpis.variacoes["romaneios"].mes_anterior, Decimal("-100.0"))
+        self.assertIsNone(kpis.variacoes["romaneios"].ano_anterior)  # sem base de comparação
+        with self.assertNumQueries(0):
+            self.assertEqual(services.kpis_mes(13, 2026).mes, services.Kpis())
+
+
+class DevedoresTests(TestCase):
+    def test_mesmo_saldo_de_cliente_saldo_atual(self):
+        tm = create_tipo_madeira(nome="DEV MADEIRA", preco_normal=Decimal("10.00"))
+        devendo = create_cliente(nome="Devendo")
+        rom = create_romaneio(numero_romaneio="d-1", cliente=devendo)
+        create_item_romaneio(romaneio=rom, tipo_madeira=tm, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("2.000"))
+        create_pagamento(cliente=devendo, valor=Decimal("5.00"))
+        create_pagamento(cliente=devendo, valor=Decimal("1.00"))
+        credito = create_cliente(nome="Credito")
+        create_pagamento(cliente=credito, valor=Decimal("10.00"))
+        create_cliente(nome="Zerado")
+
+        with self.assertNumQueries(1):
+            lista = services.devedores()
+
+        self.assertEqual([(d.nome, d.saldo_atual) for d in lista], [("Devendo", devendo.saldo_atual)])
+        self.assertEqual(services.saldo_a_receber(lista), Decimal("14.00"))
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.models import FechamentoPeriodo, SnapshotRelatorio
+from apps.financeiro.forms import PagamentoForm
+from apps.financeiro.models import Pagamento
+from apps.relatorios import fechamento
+from apps.romaneio.forms import RomaneioForm
+from apps.romaneio.models import Romaneio
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+    create_user,
+)
+
+
+def _mes_fechavel() -> date:
+    """Primeiro dia de dois meses atrás (sempre passado, nunca o corrente)."""
+    return (timezone.localdate().replace(day=1) - timedelta(days=40)).replace(day=1)
+
+
+class FechamentoBaseTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user(username="fecha", password="12345678")
+        self.client.login(username="fecha", password="12345678")
+        self.mes = _mes_fechavel()
+        self.cliente = create_cliente(nome="Cliente Fechamento")
+        self.pinus = create_tipo_madeira(nome="PINUS FECHAMENTO", preco_normal=Decimal("10.00"))
+        self.romaneio = create_romaneio(
+            numero_romaneio="fc-1", cliente=self.cliente, data_romaneio=self.mes + timedelta(days=4)
+        )
+        create_item_romaneio(
+            romaneio=self.romaneio, tipo_madeira=self.pinus,
+            valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("2.000"),
+        )
+        self.pagamento = create_pagamento(
+            cliente=self.cliente, valor=Decimal("5.00"), data_pagamento=self.mes + timedelta(days=6)
+        )
+        self.params = {"mes": str(self.mes.month), "ano": str(self.mes.year)}
+
+    def _fechar(self):
+        return fechamento.fechar_mes(self.mes.year, self.mes.month, self.user)
+
+
+class FecharMesTests(FechamentoBaseTestCase):
+    def test_grava_snapshots_e_recusa_mes_corrente_ou_repetido(self):
+        fechado, falhas = self._fechar()
+
+        formatos = set(fechado.snapshots.values_list("relatorio", "formato"))
+        for relatorio in fechamento.RELATORIOS:
+            self.assertIn((relatorio, "html"), formatos)
+            self.assertIn((relatorio, "xlsx"), formatos)
+            # PDF depende do WeasyPrint: ou tem snapshot ou está nas falhas
+            self.assertTrue((relatorio, "pdf") in formatos or f"{relatorio}.pdf" in falhas)
+        self.assertIn((fechamento.DASHBOARD, "json"), formatos)
+        html = SnapshotRelatorio.objects.get(fechamento=fechado, relatorio="ficha_romaneios", formato="html")
+        self.assertIn("fc-1", bytes(html.conteudo).decode("utf-8"))
+
+        with self.assertRaises(fechamento.FechamentoInvalido):
+            self._fechar()
+        hoje = timezone.localdate()
+        with self.assertRaises(fechamento.FechamentoInvalido):
+            fechamento.fechar_mes(hoje.year, hoje.month, self.user)
+
+    def test_comando_fecha_e_reabre(self):
+        saida = StringIO()
+        call_command("fechar_mes", f"{self.mes:%Y-%m}", usuario="fecha", stdout=saida)
+        self.assertIn("fechado", saida.getvalue())
+        self.assertTrue(FechamentoPeriodo.objects.filter(ano=self.mes.year, mes=self.mes.month).exists())
+
+        with self.assertRaises(CommandError):
+            call_command("fechar_mes", f"{self.mes:%Y-%m}", usuario="fecha", stdout=StringIO())
+
+        call_command("fechar_mes", f"{self.mes:%Y-%m}", reabrir=True, stdout=StringIO())
+        self.assertFalse(FechamentoPeriodo.objects.exists())
+        self.assertFalse(SnapshotRelatorio.objects.exists())
+
+    def test_antigos_lista_meses_abertos_terminados(self):
+        self.assertIn(self.mes, fechamento.meses_para_fechar(0))
+        self.assertNotIn(self.mes, fechamento.meses_para_fechar(400))
+
+
+class BloqueioEdicaoTests(FechamentoBaseTestCase):
+    def _dados_romaneio(self, data):
+        return {
+            "numero_romaneio": "fc-1",
+            "data_romaneio": data.isoformat(),
+            "cliente": self.cliente.pk,
+            "tipo_romaneio": self.romaneio.tipo_romaneio,
+            "modalidade": self.romaneio.modalidade,
+        }
+
+    def test_forms_recusam_mes_fechado_ate_reabrir(self):
+        self._fechar()
+        hoje = timezone.localdate()
+
+        # Nem mover para fora do mês fechado, nem lançar nele
+        form = RomaneioForm(self._dados_romaneio(hoje), instance=self.romaneio)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()["data_romaneio"][0].code, "periodo_fechado")
+        self.assertFalse(RomaneioForm(self._dados_romaneio(self.mes)).is_valid())
+
+        form = PagamentoForm(
+            {"data_pagamento": hoje.isoformat(), "cliente": self.cliente.pk, "valor": "9.00",
+             "tipo_pagamento": self.pagamento.tipo_pagamento},
+            instance=self.pagamento,
+        )
+        self.assertIn("data_pagamento", form.errors)
+
+        fechamento.reabrir_mes(self.mes.year, self.mes.month)
+        self.assertTrue(RomaneioForm(self._dados_romaneio(hoje), instance=self.romaneio).is_valid())
+
+    def test_exclusao_bloqueada(self):
+        self._fechar()
+        self.client.post(reverse("romaneio:romaneio_delete", args=[self.romaneio.pk]))
+        self.client.post(reverse("financeiro:pagamento_delete", args=[self.pagamento.pk]))
+        self.assertTrue(Romaneio.objects.filter(pk=self.romaneio.pk).exists())
+        self.assertTrue(Pagamento.objects.filter(pk=self.pagamento.pk).exists())
+
+
+class ServirSnapshotTests(FechamentoBaseTestCase):
+    def test_tela_e_export_vem_do_snapshot(self):
+        self._fechar()
+        # Alteração "por fora" (sem passar pelos forms) não aparece no relatório congelado
+        Romaneio.objects.filter(pk=self.romaneio.pk).update(numero_romaneio="fc-alterado")
+
+        resp = self.client.get(reverse("relatorios:ficha_romaneios"), self.params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context["resultados_congelados"])
+        self.assertContains(resp, "relatório congelado no fechamento")
+        self.assertContains(resp, "fc-1")
+        self.assertNotContains(resp, "fc-alterado")
+
+        resp = self.client.get(reverse("relatorios:ficha_madeiras"), {**self.params, "partial": "1"})
+        self.assertContains(resp, "relatório congelado no fechamento")
+
+        # Com outro filtro, cálculo normal
+        resp = self.client.get(reverse("relatorios:ficha_romaneios"), {**self.params, "cliente": self.cliente.pk})
+        self.assertContains(resp, "fc-alterado")
+
+        snapshot = SnapshotRelatorio.objects.get(relatorio="fluxo_financeiro", formato="xlsx")
+        resp = self.client.get(reverse("relatorios:fluxo_financeiro_export_excel"), self.params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, bytes(snapshot.conteudo))
+
+    def test_dashboard_usa_agregados_congelados(self):
+        self._fechar()
+        Romaneio.objects.filter(pk=self.romaneio.pk).delete()
+
+        resp = self.client.get(reverse("relatorios:dashboard"), self.params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([c["cliente__nome"] for c in resp.context["top_clientes_mes"]], ["Cliente Fechamento"])
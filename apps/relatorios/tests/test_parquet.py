@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.core.tokens import criar_token
+from apps.relatorios import parquet
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+    create_user,
+)
+
+TEM_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+class ParquetBaseTestCase(TestCase):
+    def setUp(self):
+        self.cliente = create_cliente(nome="Cliente Parquet")
+        self.pinus = create_tipo_madeira(nome="PINUS PARQUET", preco_normal=Decimal("10.00"))
+        self.marco = self._romaneio("pq-1", date(2026, 3, 2), "1.500")
+        self.abril = self._romaneio("pq-2", date(2026, 4, 10), "2.000")
+        create_pagamento(cliente=self.cliente, valor=Decimal("7.50"), data_pagamento=date(2026, 3, 5))
+
+        self.destino = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.destino, ignore_errors=True)
+
+    def _romaneio(self, numero, data, m3):
+        rom = create_romaneio(numero_romaneio=numero, cliente=self.cliente, data_romaneio=data)
+        create_item_romaneio(
+            romaneio=rom, tipo_madeira=self.pinus, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal(m3)
+        )
+        rom.refresh_from_db()
+        return rom
+
+
+class VersoesDosMesesTests(ParquetBaseTestCase):
+    def test_so_o_mes_alterado_fica_pendente(self):
+        meses = [date(2026, 3, 1), date(2026, 4, 1)]
+        antes = parquet.versoes_dos_meses("romaneios", meses)
+        self.assertEqual(parquet.meses_pendentes(antes, antes), [])
+
+        self.abril.desconto = Decimal("1.00")
+        self.abril.save()
+        depois = parquet.versoes_dos_meses("romaneios", meses)
+        self.assertEqual(parquet.meses_pendentes(antes, depois), ["2026-04"])
+
+        # Nome do cliente está nas linhas: renomear regrava a tabela de romaneios, não a de unidades
+        unidades = parquet.versoes_dos_meses("unidades", meses)
+        self.cliente.nome = "Cliente Renomeado"
+        self.cliente.save()
+        renomeado = parquet.versoes_dos_meses("romaneios", meses)
+        self.assertEqual(parquet.meses_pendentes(depois, renomeado), ["2026-03", "2026-04"])
+        self.assertEqual(parquet.meses_pendentes(unidades, parquet.versoes_dos_meses("unidades", meses)), [])
+
+
+@unittest.skipIf(TEM_PYARROW, "pyarrow instalado")
+class SemPyarrowTests(ParquetBaseTestCase):
+    def test_comando_e_endpoint_avisam(self):
+        with self.assertRaises(CommandError):
+            call_command("exportar_parquet", str(self.destino), stdout=StringIO())
+        self.assertFalse((self.destino / parquet.MANIFESTO).exists())
+
+        user = create_user(username="pq_sem", password="12345678")
+        _token, chave = criar_token(user, "BI")
+        resp = self.client.get(
+            reverse("relatorios:api_parquet_romaneios"), {"mes": "", "ano": ""}, HTTP_AUTHORIZATION=f"Bearer {chave}"
+        )
+        self.assertEqual(resp.status_code, 501)
+
+
+@unittest.skipUnless(TEM_PYARROW, "pyarrow não instalado")
+class ExportParquetTests(ParquetBaseTestCase):
+    def _ler(self, tabela, ano, mes):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(self.destino / tabela / f"ano={ano}" / f"mes={mes:02d}" / parquet.ARQUIVO)
+
+    def test_particoes_tipos_e_incremental(self):
+        call_command("exportar_parquet", str(self.destino), lote=1, stdout=StringIO())
+
+        marco = self._ler("romaneios", 2026, 3)
+        self.assertEqual(marco.column("numero_romaneio").to_pylist(), ["pq-1"])
+        self.assertEqual(marco.column("m3_total").to_pylist(), [self.marco.m3_total])
+        self.assertEqual(str(marco.schema.field("m3_total").type), "decimal128(10, 3)")
+        self.assertEqual(self._ler("pagamentos", 2026, 3).num_rows, 1)
+        self.assertEqual(self._ler("itens", 2026, 4).column("romaneio_id").to_pylist(), [self.abril.pk])
+
+        # Nada mudou: nenhum mês regravado
+        resultado = parquet.exportar_tabela(self.destino, "romaneios")
+        self.assertEqual((resultado.gravados, resultado.inalterados), ({}, 2))
+
+        # Abril mudou de mês (vai para março): os dois são regravados, abril fica vazio e sai
+        self.abril.data_romaneio = date(2026, 3, 20)
+        self.abril.save()
+        resultado = parquet.exportar_tabela(self.destino, "romaneios")
+        self.assertEqual(resultado.gravados, {"2026-03": 2})
+        self.assertEqual(resultado.removidos, ["2026-04"])
+        self.assertFalse((self.destino / "romaneios" / "ano=2026" / "mes=04" / parquet.ARQUIVO).exists())
+        self.assertEqual(set(parquet.ler_manifesto(self.destino)["romaneios"]["meses"]), {"2026-03"})
+
+    def test_endpoint_com_filtros(self):
+        import pyarrow.parquet as pq
+
+        user = create_user(username="pq_api", password="12345678")
+        _token, chave = criar_token(user, "BI")
+        resp = self.client.get(
+            reverse("relatorios:api_parquet_romaneios"), {"mes": "4", "ano": "2026"}, HTTP_AUTHORIZATION=f"Bearer {chave}"
+        )
+        self.assertEqual(resp.status_code, 200)
+        tabela = pq.read_table(BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(tabela.column("id").to_pylist(), [self.abril.pk])
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, override_settings
+
+from apps.relatorios import pdf
+
+HTML_MINIMO = "<html><head><style>body { font-size: 9pt; }</style></head><body><p>teste</p></body></html>"
+
+
+class EstilosDosTemplatesTests(SimpleTestCase):
+    def test_css_renderizado_e_o_pre_compilado(self):
+        estilos = pdf.estilos_dos_templates()
+        templates = sorted(arquivo.name for arquivo in pdf.TEMPLATES_PDF.glob("*_pdf.html"))
+        self.assertEqual(len(estilos), len(templates))
+
+        for nome in templates:
+            html = render_to_string(f"relatorios/{nome}", {})
+            for css in pdf._ESTILO.findall(html):
+                self.assertIn(css.strip(), estilos, nome)
+
+
+class PoolPdfTests(SimpleTestCase):
+    def _pool(self, **kwargs):
+        pool = pdf.PoolPdf(1, **kwargs)
+        self.addCleanup(pool.encerrar)
+        return pool
+
+    def _gerar(self, pool):
+        """PDF, ou a mensagem de erro quando o WeasyPrint não tem as bibliotecas nativas aqui."""
+        try:
+            return pool.gerar(HTML_MINIMO)
+        except pdf.FalhaPdf as exc:
+            self.assertIn("WeasyPrint", str(exc))
+            return None
+
+    def test_processo_morto_e_substituido(self):
+        pool = self._pool(timeout=60)
+        resultado = self._gerar(pool)
+        if resultado is not None:
+            self.assertTrue(resultado.startswith(b"%PDF"))
+
+        processo = pool._ociosos.get()
+        processo.processo.kill()
+        processo.processo.join()
+        pool._ociosos.put(processo)
+        self.assertEqual(self._gerar(pool) is None, resultado is None)
+        self.assertIsNot(pool._ociosos.queue[0], processo)
+
+    def test_timeout_descarta_o_processo(self):
+        pool = self._pool(timeout=0.001)  # nem dá tempo de o processo subir
+        antigo = pool._ociosos.queue[0]
+        with self.assertRaisesMessage(pdf.FalhaPdf, "não ficou pronto"):
+            pool.gerar(HTML_MINIMO)
+        self.assertFalse(antigo.processo.is_alive())
+        self.assertIsNot(pool._ociosos.queue[0], antigo)
+
+
+class ArquivosLocaisTests(SimpleTestCase):
+    def setUp(self):
+        self.media = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        (self.media / "logo.png").write_bytes(b"\x89PNG-logo")
+        with override_settings(MEDIA_ROOT=self.media, SITE_DOMAIN="romaneios.exemplo"):
+            self.arquivos = pdf.ArquivosLocais.das_settings()
+
+    def test_resolve_static_e_media_do_proprio_site(self):
+        self.assertEqual(
+            self.arquivos.caminho("https://romaneios.exemplo/media/logo.png"), (self.media / "logo.png").resolve()
+        )
+        # Host do pedido (base_url da view)
+        self.assertIsNotNone(self.arquivos.caminho("http://testserver/media/logo.png", hosts=("testserver",)))
+        self.assertEqual(
+            self.arquivos.caminho("http://romaneios.exemplo/static/css/base.css"),
+            (Path(settings.BASE_DIR) / "static" / "css" / "base.css").resolve(),
+        )
+
+    def test_recusa_externas_e_fora_dos_diretorios(self):
+        for url in (
+            "https://outro.site/media/logo.png",
+            "file:///etc/passwd",
+            "http://romaneios.exemplo/media/../../etc/passwd",
+            "http://romaneios.exemplo/media/%2e%2e/segredo.txt",
+            "http://romaneios.exemplo/admin/",
+            "http://romaneios.exemplo/media/nao-existe.png",
+        ):
+            self.assertIsNone(self.arquivos.caminho(url), url)
+        with self.assertRaises(ValueError):
+            self.arquivos("https://outro.site/logo.png")
+
+    def test_bytes_em_cache_ate_o_arquivo_mudar(self):
+        url = "https://romaneios.exemplo/media/logo.png"
+        primeiro = self.arquivos(url)
+        self.assertEqual((primeiro["string"], primeiro["mime_type"]), (b"\x89PNG-logo", "image/png"))
+        self.assertIs(self.arquivos(url)["string"], primeiro["string"])
+
+        (self.media / "logo.png").write_bytes(b"\x89PNG-logo-novo")
+        self.assertEqual(self.arquivos(url)["string"], b"\x89PNG-logo-novo")
+
+    def test_vai_para_o_processo_do_pool(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.arquivos)), self.arquivos)
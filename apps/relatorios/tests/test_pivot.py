@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.relatorios.views_pivot import _dados_pivot, _matriz
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_romaneio,
+    create_tipo_madeira,
+    create_user,
+)
+
+
+class PivotTests(TestCase):
+    def setUp(self):
+        self.ana = create_cliente(nome="Ana")
+        self.beto = create_cliente(nome="Beto")
+        self.pinus = create_tipo_madeira(nome="PINUS", preco_normal=Decimal("10.00"))
+        self.eucalipto = create_tipo_madeira(nome="EUCALIPTO", preco_normal=Decimal("20.00"))
+
+        self._item("p-1", self.ana, date(2026, 1, 10), self.pinus, "1.500", "10.00")
+        self._item("p-2", self.beto, date(2026, 1, 20), self.pinus, "0.500", "10.00")
+        self._item("p-3", self.ana, date(2026, 3, 5), self.eucalipto, "2.000", "20.00")
+        self._item("p-4", self.ana, date(2025, 12, 31), self.pinus, "9.000", "10.00")  # outro ano
+
+    def _item(self, numero, cliente, data, tipo, m3, preco):
+        rom = create_romaneio(numero_romaneio=numero, cliente=cliente, data_romaneio=data)
+        create_item_romaneio(
+            romaneio=rom, tipo_madeira=tipo, valor_unitario=Decimal(preco), quantidade_m3_total=Decimal(m3)
+        )
+
+    def _dados(self, **params):
+        return _dados_pivot(RequestFactory().get("/", {"ano": "2026", **params}))
+
+    def test_matriz_e_subtotais_numa_consulta(self):
+        # GROUP BY madeira, mês + anos disponíveis (REPORT_CACHE_TIMEOUT=0 nos testes)
+        with self.assertNumQueries(2):
+            dados = self._dados()
+
+        linhas, totais_mes, total_geral = _matriz(dados, "m3")
+        self.assertEqual([nome for nome, _celulas, _total in linhas], ["EUCALIPTO", "PINUS"])
+        self.assertEqual(linhas[1][1][0], Decimal("2.000"))
+        self.assertEqual(linhas[0][2], Decimal("2.000"))
+        self.assertEqual(totais_mes[:3], [Decimal("2.000"), Decimal("0.000"), Decimal("2.000")])
+        self.assertEqual(total_geral, Decimal("4.000"))
+
+        _linhas, _totais, total_valor = _matriz(dados, "valor")
+        self.assertEqual(total_valor, Decimal("60.00"))
+        self.assertEqual(dados["anos"], [2025, 2026])
+
+    def test_linhas_por_cliente(self):
+        linhas, totais_mes, _total = _matriz(self._dados(linhas="cliente"), "m3")
+        self.assertEqual([(nome, total) for nome, _c, total in linhas], [("Ana", Decimal("3.500")), ("Beto", Decimal("0.500"))])
+        self.assertEqual(totais_mes[0], Decimal("2.000"))
+
+    def test_views_e_exports(self):
+        url = reverse("relatorios:pivot")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        create_user(username="pivot_user", password="12345678")
+        self.client.login(username="pivot_user", password="12345678")
+
+        resp = self.client.get(url, {"ano": "2026", "medida": "valor"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["total_geral"], Decimal("60.00"))
+
+        resp = self.client.get(reverse("relatorios:pivot_export_csv"), {"ano": "2026"})
+        linhas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(linhas[0].split(";")[0], "Tipo de madeira")
+        self.assertEqual(linhas[-1].split(";")[-1], "4.000")
+        self.assertEqual(len(linhas), 4)  # cabeçalho + 2 madeiras + total
+
+        resp = self.client.get(reverse("relatorios:pivot_export_excel"), {"ano": "2026", "linhas": "cliente"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("spreadsheetml", resp["Content-Type"])
+
+    def test_ano_fora_do_intervalo_cai_no_ano_corrente(self):
+        self.assertEqual(self._dados(ano="0")["ano"], timezone.localdate().year)
+        self.assertEqual(self._dados(ano="9999")["ano"], timezone.localdate().year)
+
+        create_user(username="pivot_ano", password="12345678")
+        self.client.login(username="pivot_ano", password="12345678")
+        for nome in ("relatorios:pivot", "relatorios:pivot_export_csv", "relatorios:pivot_export_excel"):
+            self.assertEqual(self.client.get(reverse(nome), {"ano": "9999"}).status_code, 200, nome)
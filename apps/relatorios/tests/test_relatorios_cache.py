@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.relatorios.cache import filtros_normalizados
+from apps.tests.factories import create_cliente, create_pagamento, create_user
+
+
+class FiltrosNormalizadosTests(SimpleTestCase):
+    def test_ordem_e_paginacao_nao_importam(self):
+        rf = RequestFactory()
+        a = filtros_normalizados(rf.get("/", {"mes": "3", "ano": "2025", "page": "2"}))
+        b = filtros_normalizados(rf.get("/", {"ano": "2025", "mes": "3"}))
+        self.assertEqual(a, b)
+
+    def test_vazio_e_diferente_de_ausente(self):
+        rf = RequestFactory()
+        self.assertNotEqual(filtros_normalizados(rf.get("/", {"mes": ""})), filtros_normalizados(rf.get("/")))
+
+
+@override_settings(REPORT_CACHE_TIMEOUT=600)
+class CacheRelatoriosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        create_user(username="rel_cache", password="12345678")
+        self.client.login(username="rel_cache", password="12345678")
+        self.cliente = create_cliente(nome="Cliente Cache")
+        create_pagamento(cliente=self.cliente, valor=Decimal("50.00"))
+
+    def _queries(self, url_name) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse(url_name))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_export_reaproveita_contexto_da_tela(self):
+        sem_cache = self._queries("relatorios:fluxo_financeiro_export_excel")
+        cache.clear()
+
+        self._queries("relatorios:fluxo_financeiro")  # calcula e guarda
+        com_cache = self._queries("relatorios:fluxo_financeiro_export_excel")
+        self.assertLess(com_cache, sem_cache)
+
+    def test_gravacao_invalida_cache(self):
+        resp = self.client.get(reverse("relatorios:fluxo_financeiro"))
+        self.assertEqual(resp.context["pagamentos"], Decimal("50.00"))
+
+        create_pagamento(cliente=self.cliente, valor=Decimal("25.00"))
+
+        resp = self.client.get(reverse("relatorios:fluxo_financeiro"))
+        self.assertEqual(resp.context["pagamentos"], Decimal("75.00"))
+
+    def test_periodo_implicito_acompanha_a_virada_do_mes(self):
+        create_pagamento(cliente=self.cliente, valor=Decimal("10.00"), data_pagamento=date(2025, 1, 20))
+        create_pagamento(cliente=self.cliente, valor=Decimal("7.00"), data_pagamento=date(2025, 2, 3))
+
+        with mock.patch("django.utils.timezone.localdate", return_value=date(2025, 1, 31)):
+            resp = self.client.get(reverse("relatorios:fluxo_financeiro"))
+        self.assertEqual(resp.context["pagamentos"], Decimal("10.00"))
+
+        # Mesma URL sem mes/ano no mês seguinte: não serve o relatório de janeiro
+        with mock.patch("django.utils.timezone.localdate", return_value=date(2025, 2, 1)):
+            resp = self.client.get(reverse("relatorios:fluxo_financeiro"))
+        self.assertEqual(resp.context["pagamentos"], Decimal("7.00"))
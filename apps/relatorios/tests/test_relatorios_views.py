@@ -333,6 +333,45 @@ class RelatorioFichaMadeirasTests(TestCase):
         self.assertEqual(resp.context["total_m3"], Decimal("1.000"))
         self.assertEqual(resp.context["total_itens"], Decimal("10.00"))
 
+    def test_ficha_madeiras_agrupada_com_subtotais(self):
+        outro = create_cliente(nome="Outro Cliente")
+        rom = create_romaneio(numero_romaneio="7002", cliente=outro, data_romaneio=self.today)
+        create_item_romaneio(romaneio=rom, tipo_madeira=self.tm_a, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("0.500"))
+
+        for modo, esperado in (
+            ("madeira", [("ANGICO", "Cliente Madeira", 0), ("ANGICO", "Outro Cliente", 0), ("ANGICO", "", 1),
+                         ("IPÊ", "Cliente Madeira", 0), ("IPÊ", "", 1)]),
+            ("cliente", [("Cliente Madeira", "ANGICO", 0), ("Cliente Madeira", "IPÊ", 0), ("Cliente Madeira", "", 1),
+                         ("Outro Cliente", "ANGICO", 0), ("Outro Cliente", "", 1)]),
+        ):
+            resp = self.client.get(reverse("relatorios:ficha_madeiras"), {"mes": self.mes, "ano": self.ano, "modo": modo})
+            grupos = resp.context["grupos"]
+            self.assertEqual([(g.grupo, g.subgrupo, g.nivel) for g in grupos], esperado)
+            self.assertEqual(resp.context["total_m3"], Decimal("3.500"))
+            self.assertEqual(resp.context["qtd_itens"], 3)
+
+        self.assertEqual(grupos[2].m3, Decimal("3.000"))  # subtotal do "Cliente Madeira"
+
+    def test_ficha_madeiras_paginada_por_keyset(self):
+        from apps.relatorios import views_ficha_madeira
+
+        original = views_ficha_madeira.FICHA_MADEIRAS_PAGE_SIZE
+        views_ficha_madeira.FICHA_MADEIRAS_PAGE_SIZE = 1
+        self.addCleanup(setattr, views_ficha_madeira, "FICHA_MADEIRAS_PAGE_SIZE", original)
+
+        params = {"mes": self.mes, "ano": self.ano, "sort": "m3", "dir": "desc"}
+        resp = self.client.get(reverse("relatorios:ficha_madeiras"), params)
+        pagina = resp.context["pagina"]
+        self.assertEqual([r.tipo_madeira_id for r in pagina.itens], [self.tm_b.id])
+        self.assertFalse(pagina.tem_anterior)
+        self.assertEqual(resp.context["total_m3"], Decimal("3.000"))  # período todo, não a página
+
+        resp = self.client.get(reverse("relatorios:ficha_madeiras"), {**params, "depois": pagina.proximo})
+        pagina = resp.context["pagina"]
+        self.assertEqual([r.tipo_madeira_id for r in pagina.itens], [self.tm_a.id])
+        self.assertFalse(pagina.tem_proximo)
+        self.assertTrue(pagina.tem_anterior)
+
     def test_export_excel_returns_xlsx(self):
         resp = self.client.get(
             reverse("relatorios:ficha_madeiras_export_excel"),
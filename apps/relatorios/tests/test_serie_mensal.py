@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.relatorios import services
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_pagamento,
+    create_romaneio,
+    create_tipo_madeira,
+    create_user,
+)
+
+
+class SerieMensalTests(TestCase):
+    def setUp(self):
+        self.cliente = create_cliente(nome="Cliente Série")
+        self.tm = create_tipo_madeira(nome="SERIE MADEIRA", preco_normal=Decimal("10.00"))
+        self.meses = services.meses_da_serie(12, timezone.localdate())
+        self.passado = self.meses[-3]  # mês fechado
+
+        self.rom = self._romaneio("s-1", self.passado.replace(day=15), "2.000")
+        self._romaneio("s-2", self.meses[-1], "1.000")
+        create_pagamento(cliente=self.cliente, valor=Decimal("5.00"), data_pagamento=self.passado.replace(day=20))
+
+    def _romaneio(self, numero, data, m3):
+        rom = create_romaneio(numero_romaneio=numero, cliente=self.cliente, data_romaneio=data)
+        create_item_romaneio(
+            romaneio=rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal(m3)
+        )
+        return rom
+
+    def test_um_group_by_por_fonte(self):
+        with self.assertNumQueries(2):
+            serie = services.serie_mensal(12)
+
+        self.assertEqual([p["mes"] for p in serie], [f"{m:%Y-%m}" for m in self.meses])
+        ponto = serie[-3]
+        self.assertEqual(ponto["m3"], Decimal("2.000"))
+        self.assertEqual(ponto["faturamento"], Decimal("20.00"))
+        self.assertEqual(ponto["pagamentos"], Decimal("5.00"))
+        self.assertEqual(ponto["a_receber"], Decimal("15.00"))
+        self.assertEqual(serie[-1]["faturamento"], Decimal("10.00"))
+        self.assertEqual(serie[0]["faturamento"], Decimal("0.00"))
+
+    @override_settings(SERIES_CACHE_TIMEOUT=600)
+    def test_meses_fechados_em_cache_ate_mudar_a_versao(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        services.serie_mensal(12)
+
+        # carimbo dos meses fechados + os dois GROUP BY só do mês corrente
+        with self.assertNumQueries(3):
+            self.assertEqual(services.serie_mensal(12)[-3]["faturamento"], Decimal("20.00"))
+
+        create_item_romaneio(
+            romaneio=self.rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"), quantidade_m3_total=Decimal("1.000")
+        )
+        self.assertEqual(services.serie_mensal(12)[-3]["faturamento"], Decimal("30.00"))
+
+    def test_endpoint(self):
+        url = reverse("relatorios:serie_mensal")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        create_user(username="serie_user", password="12345678")
+        self.client.login(username="serie_user", password="12345678")
+        data = self.client.get(url, {"meses": "999"}).json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["meses"], services.SERIE_MESES_MAX)
+        self.assertEqual(data["serie"][-3]["a_receber"], "15.00")
+
+    def test_ate_cedo_demais_comeca_em_janeiro_do_ano_1(self):
+        create_user(username="serie_ate", password="12345678")
+        self.client.login(username="serie_ate", password="12345678")
+        url = reverse("relatorios:serie_mensal")
+
+        data = self.client.get(url, {"ate": "0001-01"}).json()
+        self.assertEqual(data["meses"], services.SERIE_MESES_PADRAO)
+        self.assertEqual((data["serie"][0]["mes"], data["serie"][-1]["mes"]), ("0001-01", "0001-12"))
+
+        resp = self.client.get(url, {"meses": "60", "ate": "0001-03"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["serie"][0]["mes"], "0001-01")
@@ -6,6 +6,8 @@ app_name = "relatorios"
 urlpatterns = [
     # Dashboard resumido (home dos relatórios)
     path("", views.DashboardView.as_view(), name="dashboard"),
+    # Séries mensais (painel de tendência do dashboard, JSON)
+    path("analytics/serie-mensal/", views.serie_mensal, name="serie_mensal"),
 
     # =========================
     # Ficha de Romaneios
@@ -41,4 +43,24 @@ urlpatterns = [
     # Saldo de Clientes
     # =========================
     path("saldo-clientes/", views.RelatorioSaldoClientesView.as_view(), name="saldo_clientes"),
-]
\ No newline at end of file
+
+    # =========================
+    # Tabela dinâmica (madeira/cliente × mês)
+    # =========================
+    path("pivot/", views.RelatorioPivotView.as_view(), name="pivot"),
+    path("pivot/export/csv/", views.pivot_export_csv, name="pivot_export_csv"),
+    path("pivot/export/excel/", views.pivot_export_excel, name="pivot_export_excel"),
+
+    # =========================
+    # API de leitura (NDJSON em streaming, token por usuário) para BI
+    # =========================
+    path("api/romaneios/", views.api_ndjson, {"recurso": "romaneios"}, name="api_romaneios"),
+    path("api/itens/", views.api_ndjson, {"recurso": "itens"}, name="api_itens"),
+    path("api/unidades/", views.api_ndjson, {"recurso": "unidades"}, name="api_unidades"),
+    path("api/pagamentos/", views.api_ndjson, {"recurso": "pagamentos"}, name="api_pagamentos"),
+    path("api/fluxo/", views.api_fluxo, name="api_fluxo"),
+    path("api/parquet/romaneios/", views.api_parquet, {"recurso": "romaneios"}, name="api_parquet_romaneios"),
+    path("api/parquet/itens/", views.api_parquet, {"recurso": "itens"}, name="api_parquet_itens"),
+    path("api/parquet/unidades/", views.api_parquet, {"recurso": "unidades"}, name="api_parquet_unidades"),
+    path("api/parquet/pagamentos/", views.api_parquet, {"recurso": "pagamentos"}, name="api_parquet_pagamentos"),
+]
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count, Sum
-from django.views.generic import TemplateView
+from functools import partial
 
-from apps.cadastros.models import Cliente
-from apps.romaneio.models import ItemRomaneio, Romaneio
+from asgiref.sync import sync_to_async
+from django.views.generic import View
+from django.views.generic.base import ContextMixin, TemplateResponseMixin
+
+from apps.core.assincrono import LoginObrigatorioMixin, em_paralelo
+
+from . import fechamento, services
 
 from .views_ficha_romaneio import (
     RelatorioRomaneiosView,
@@ -33,64 +36,62 @@ from .views_saldo_cliente import (
     RelatorioSaldoClientesView,
 )
 
+from .views_serie_mensal import (
+    serie_mensal,
+)
 
-class DashboardView(LoginRequiredMixin, TemplateView):
-    template_name = "relatorios/dashboard.html"
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        mes, ano = get_mes_ano(self.request)
-
-        romaneios_mes = Romaneio.objects.filter(
-            data_romaneio__month=mes,
-            data_romaneio__year=ano,
-        )
-
-        totais_mes = romaneios_mes.aggregate(
-            total_m3=Sum("m3_total"),
-            total_valor=Sum("valor_total"),
-            qtd_romaneios=Count("id"),
-        )
-
-        context["mes"] = mes
-        context["ano"] = ano
-        context["meses"] = range(1, 13)
-        anos = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
-        context["anos"] = anos or [ano]
-        context["total_m3_mes"] = totais_mes["total_m3"] or 0
-        context["total_faturado_mes"] = totais_mes["total_valor"] or 0
-        context["qtd_romaneios_mes"] = totais_mes["qtd_romaneios"] or 0
+from .views_api import (
+    api_fluxo,
+    api_ndjson,
+    api_parquet,
+)
 
-        # Saldo total a receber (somatório dos clientes com saldo negativo)
-        todos_clientes = Cliente.objects.all()
-        saldos_negativos = [c.saldo_atual for c in todos_clientes if c.saldo_atual < 0]
-        context["saldo_total_receber"] = abs(sum(saldos_negativos)) if saldos_negativos else 0
+from .views_pivot import (
+    RelatorioPivotView,
+    pivot_export_csv,
+    pivot_export_excel,
+)
 
-        # Top 5 devedores
-        context["maiores_devedores"] = sorted(
-            (c for c in todos_clientes if c.saldo_atual < 0),
-            key=lambda c: c.saldo_atual,
-        )[:5]
 
-        # Top 5 clientes do mês por valor comprado
-        context["top_clientes_mes"] = (
-            romaneios_mes.values("cliente__nome")
-            .annotate(total_comprado=Sum("valor_total"))
-            .order_by("-total_comprado")[:5]
-        )
+# =============================================================================
+# Dashboard (async: as consultas independentes rodam em paralelo)
+# =============================================================================
+class DashboardView(LoginObrigatorioMixin, TemplateResponseMixin, ContextMixin, View):
+    template_name = "relatorios/dashboard.html"
 
-        # Top 10 tipos de madeira por m³ no mês
-        context["vendas_por_madeira"] = (
-            ItemRomaneio.objects.filter(
-                romaneio__data_romaneio__month=mes,
-                romaneio__data_romaneio__year=ano,
-            )
-            .values("tipo_madeira__nome")
-            .annotate(
-                total_m3=Sum("quantidade_m3_total"),
-                total_valor=Sum("valor_total"),
-            )
-            .order_by("-total_m3")[:10]
+    async def get(self, request, *args, **kwargs):
+        mes, ano = get_mes_ano(request)
+        # Mês fechado: agregados do mês vêm do snapshot; saldo/devedores são sempre atuais
+        congelado = await sync_to_async(fechamento.dashboard_congelado)(mes, ano) or {}
+        consultas = {
+            "kpis": partial(services.kpis_mes, mes, ano),
+            "anos": services.anos_com_romaneio,
+            "devedores": services.devedores,
+            "top_clientes_mes": partial(services.top_clientes_mes, mes, ano),
+            "vendas_por_madeira": partial(services.vendas_por_madeira, mes, ano),
+        }
+        dados = {chave: valor for chave, valor in congelado.items() if valor is not None}
+        dados.update(await em_paralelo(**{k: f for k, f in consultas.items() if k not in dados}))
+        kpis = dados["kpis"]
+
+        context = self.get_context_data(
+            mes=mes,
+            ano=ano,
+            meses=range(1, 13),
+            anos=dados["anos"] or [ano],
+            total_m3_mes=kpis.mes.m3,
+            total_faturado_mes=kpis.mes.faturamento,
+            qtd_romaneios_mes=kpis.mes.romaneios,
+            # Comparativos: mês anterior e mesmo mês do ano anterior
+            kpis=kpis,
+            variacoes=kpis.variacoes,
+            # Saldo total a receber (somatório dos clientes com saldo negativo)
+            saldo_total_receber=services.saldo_a_receber(dados["devedores"]),
+            # Top 5 devedores
+            maiores_devedores=dados["devedores"][:5],
+            # Top 5 clientes do mês por valor comprado
+            top_clientes_mes=dados["top_clientes_mes"],
+            # Top 10 tipos de madeira por m³ no mês
+            vendas_por_madeira=dados["vendas_por_madeira"],
         )
-
-        return context
\ No newline at end of file
+        return self.render_to_response(context)
@@ -0,0 +1,346 @@
+"""
+API de leitura para ferramentas de BI: NDJSON (um objeto JSON por linha) em streaming e Parquet.
+
+Rotas (GET, "Authorization: Bearer <token>", ver apps.core.tokens):
+  - api/romaneios/, api/itens/, api/unidades/, api/pagamentos/: linhas na ordem de id,
+    lidas em lotes por keyset (WHERE id > último id do lote anterior ... LIMIT lote) com
+    .values_list(...): sem OFFSET, sem instanciar models, memória de um lote.
+    Para continuar uma carga: ?depois=<último id recebido>; ?limite=N corta a resposta.
+  - api/fluxo/: movimentações (vendas + pagamentos) em ordem de data com o saldo por
+    cliente, os mesmos filtros da tela do Fluxo Financeiro.
+  - api/parquet/<recurso>/: as mesmas linhas num arquivo Parquet (pyarrow, opcional; 501
+    se não instalado). Export particionado por ano/mês e incremental: comando exportar_parquet.
+
+Filtros (os mesmos das fichas): mes/ano (ausente = mês atual, "" = todos), ou o intervalo
+data_inicio/data_fim (AAAA-MM-DD, inclusivo); cliente (ou cliente_id), romaneiador,
+numero_romaneio, tipo_romaneio, tipo_madeira_id.
+
+Decimais vão como string (sem perder casas), datas em ISO 8601.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Iterator
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from apps.core.tokens import token_api_obrigatorio
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import ItemRomaneio, Romaneio, UnidadeRomaneio
+
+from . import services
+from .views_fluxo_financeiro import _fluxo_querysets, _get_mes_ano_filtro
+
+CONTENT_TYPE = "application/x-ndjson; charset=utf-8"
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Recurso:
+    queryset: Callable[[], object]
+    # Caminho até o Romaneio ("" no próprio romaneio) para os filtros das fichas; None = só cliente/data
+    romaneio: str | None
+    campo_data: str
+    campos: tuple[tuple[str, str], ...]  # (chave no JSON, campo do values_list); o primeiro é "id"
+
+
+RECURSOS = {
+    "romaneios": Recurso(
+        queryset=lambda: Romaneio.objects.all(),
+        romaneio="",
+        campo_data="data_romaneio",
+        campos=(
+            ("id", "id"),
+            ("numero_romaneio", "numero_romaneio"),
+            ("data_romaneio", "data_romaneio"),
+            ("cliente_id", "cliente_id"),
+            ("cliente_nome", "cliente__nome"),
+            ("motorista_id", "motorista_id"),
+            ("romaneiador_id", "romaneiador_id"),
+            ("tipo_romaneio", "tipo_romaneio"),
+            ("modalidade", "modalidade"),
+            ("desconto", "desconto"),
+            ("m3_total", "m3_total"),
+            ("valor_bruto", "valor_bruto"),
+            ("valor_total", "valor_total"),
+            ("atualizado_em", "data_atualizacao"),
+        ),
+    ),
+    "itens": Recurso(
+        queryset=lambda: ItemRomaneio.objects.all(),
+        romaneio="romaneio__",
+        campo_data="romaneio__data_romaneio",
+        campos=(
+            ("id", "id"),
+            ("romaneio_id", "romaneio_id"),
+            ("numero_romaneio", "romaneio__numero_romaneio"),
+            ("data_romaneio", "romaneio__data_romaneio"),
+            ("cliente_id", "romaneio__cliente_id"),
+            ("tipo_madeira_id", "tipo_madeira_id"),
+            ("tipo_madeira_nome", "tipo_madeira__nome"),
+            ("valor_unitario", "valor_unitario"),
+            ("quantidade_m3_total", "quantidade_m3_total"),
+            ("valor_total", "valor_total"),
+        ),
+    ),
+    "unidades": Recurso(
+        queryset=lambda: UnidadeRomaneio.objects.all(),
+        romaneio="item__romaneio__",
+        campo_data="item__romaneio__data_romaneio",
+        campos=(
+            ("id", "id"),
+            ("item_id", "item_id"),
+            ("romaneio_id", "item__romaneio_id"),
+            ("data_romaneio", "item__romaneio__data_romaneio"),
+            ("tipo_madeira_id", "item__tipo_madeira_id"),
+            ("comprimento", "comprimento"),
+            ("rodo", "rodo"),
+            ("desconto_1", "desconto_1"),
+            ("desconto_2", "desconto_2"),
+            ("quantidade_m3", "quantidade_m3"),
+        ),
+    ),
+    "pagamentos": Recurso(
+        queryset=lambda: Pagamento.objects.all(),
+        romaneio=None,
+        campo_data="data_pagamento",
+        campos=(
+            ("id", "id"),
+            ("data_pagamento", "data_pagamento"),
+            ("cliente_id", "cliente_id"),
+            ("cliente_nome", "cliente__nome"),
+            ("valor", "valor"),
+            ("tipo_pagamento", "tipo_pagamento"),
+            ("descricao", "descricao"),
+            ("atualizado_em", "data_atualizacao"),
+        ),
+    ),
+}
+
+
+def _ndjson(obj: dict) -> str:
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _inteiro(request, nome: str) -> int | None:
+    valor = (request.GET.get(nome) or "").strip()
+    if not valor:
+        return None
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"{nome} deve ser um inteiro.")
+    if numero < 0:
+        raise ParametroInvalido(f"{nome} não pode ser negativo.")
+    return numero
+
+
+def _data(request, nome: str) -> date | None:
+    valor = (request.GET.get(nome) or "").strip()
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f"{nome} deve estar no formato AAAA-MM-DD.")
+
+
+def _filtro_periodo(request, campo: str) -> Q:
+    """data_inicio/data_fim, ou mes/ano como no Fluxo Financeiro (faixas de data usam o índice)."""
+    inicio, fim = _data(request, "data_inicio"), _data(request, "data_fim")
+    if inicio or fim:
+        filtro = Q()
+        if inicio:
+            filtro &= Q(**{f"{campo}__gte": inicio})
+        if fim:
+            filtro &= Q(**{f"{campo}__lte": fim})
+        return filtro
+
+    mes, ano = _get_mes_ano_filtro(request)
+    if mes and ano:
+        limites = services.limites_mes(mes, ano)
+        if limites is None:
+            raise ParametroInvalido("mes/ano inválidos.")
+        return Q(**{f"{campo}__gte": limites[0], f"{campo}__lt": limites[1]})
+    if ano:
+        return Q(**{f"{campo}__gte": date(ano, 1, 1), f"{campo}__lt": date(ano + 1, 1, 1)})
+    if mes:
+        return Q(**{f"{campo}__month": mes})
+    return Q()
+
+
+def _filtrar(recurso: Recurso, request):
+    qs = recurso.queryset().filter(_filtro_periodo(request, recurso.campo_data))
+    p = recurso.romaneio
+
+    cliente_id = _inteiro(request, "cliente") or _inteiro(request, "cliente_id")
+    if cliente_id:
+        qs = qs.filter(**{f"{p or ''}cliente_id": cliente_id})
+    if p is None:
+        return qs
+
+    romaneiador_id = _inteiro(request, "romaneiador")
+    numero_romaneio = (request.GET.get("numero_romaneio") or "").strip()
+    tipo_romaneio = (request.GET.get("tipo_romaneio") or "").strip().upper()
+    tipo_madeira_id = _inteiro(request, "tipo_madeira_id")
+
+    if romaneiador_id:
+        qs = qs.filter(**{f"{p}romaneiador_id": romaneiador_id})
+    if numero_romaneio:
+        qs = qs.filter(**{f"{p}numero_romaneio": numero_romaneio})
+    if tipo_romaneio in {"NORMAL", "COM_FRETE"}:
+        qs = qs.filter(**{f"{p}tipo_romaneio": tipo_romaneio})
+    if tipo_madeira_id:
+        if p == "":
+            # EXISTS em vez de JOIN + DISTINCT: não duplica romaneios e mantém a ordem por id
+            itens = ItemRomaneio.objects.filter(romaneio=OuterRef("pk"), tipo_madeira_id=tipo_madeira_id)
+            qs = qs.filter(Exists(itens))
+        else:
+            qs = qs.filter(**{f"{p.removesuffix('romaneio__')}tipo_madeira_id": tipo_madeira_id})
+    return qs
+
+
+def _lotes_keyset(
+    qs, campos_orm, tamanho: int, depois: int | None = None, limite: int | None = None
+) -> Iterator[list[tuple]]:
+    """
+    Tuplas do values_list(*campos_orm) em lotes de `tamanho`, na ordem de id, por keyset
+    (id > último id do lote anterior): sem OFFSET e sem instanciar models. campos_orm[0] é "id".
+    """
+    tamanho = max(1, tamanho)
+    ultimo = depois
+    restantes = limite
+
+    while restantes is None or restantes > 0:
+        lote = tamanho if restantes is None else min(tamanho, restantes)
+        pagina = qs.filter(id__gt=ultimo) if ultimo is not None else qs
+        linhas = list(pagina.order_by("id").values_list(*campos_orm)[:lote])
+        if linhas:
+            ultimo = linhas[-1][0]
+            yield linhas
+        if restantes is not None:
+            restantes -= len(linhas)
+        if len(linhas) < lote:
+            return
+
+
+def _linhas_keyset(qs, campos, depois: int | None, limite: int | None) -> Iterator[str]:
+    """Linhas em NDJSON, em lotes por keyset de API_NDJSON_BATCH_SIZE."""
+    chaves = [chave for chave, _campo in campos]
+    orm = [campo for _chave, campo in campos]
+    tamanho = getattr(settings, "API_NDJSON_BATCH_SIZE", 2000)
+    for linhas in _lotes_keyset(qs, orm, tamanho, depois, limite):
+        for linha in linhas:
+            yield _ndjson(dict(zip(chaves, linha)))
+
+
+def _ordem_fluxo(mov: dict) -> tuple:
+    """Mesma chave de ordenação de _build_movimentacoes (pagamento antes da venda no mesmo dia)."""
+    return mov["data"], mov["cliente_nome"], mov["numero_romaneio"] or ""
+
+
+def _linhas_fluxo(request) -> Iterator[str]:
+    """
+    Vendas e pagamentos intercalados por (data, cliente, nº romaneio), como na tela do
+    Fluxo Financeiro, com o saldo por cliente acumulado durante o streaming.
+    """
+    vendas_qs, pagamentos_qs = _fluxo_querysets(request)
+    vendas = (
+        {"data": d, "cliente_id": c, "cliente_nome": nome or "", "tipo": "venda",
+         "numero_romaneio": str(numero), "m3": m3, "total": total, "credito": None}
+        for d, c, nome, numero, m3, total in vendas_qs.order_by("data_romaneio", "cliente__nome", "numero_romaneio")
+        .values_list("data_romaneio", "cliente_id", "cliente__nome", "numero_romaneio", "m3_total", "valor_total")
+        .iterator()
+    )
+    pagamentos = (
+        {"data": d, "cliente_id": c, "cliente_nome": nome or "", "tipo": "pagamento",
+         "numero_romaneio": None, "m3": None, "total": None, "credito": valor}
+        for d, c, nome, valor in pagamentos_qs.order_by("data_pagamento", "cliente__nome", "id")
+        .values_list("data_pagamento", "cliente_id", "cliente__nome", "valor")
+        .iterator()
+    )
+
+    saldos: dict[int, Decimal] = {}
+    for mov in heapq.merge(pagamentos, vendas, key=_ordem_fluxo):
+        saldo = saldos.get(mov["cliente_id"], Decimal("0.00"))
+        if mov["total"] is not None:
+            saldo -= mov["total"] or 0
+        else:
+            saldo += mov["credito"] or 0
+        saldos[mov["cliente_id"]] = mov["saldo_atual"] = Decimal(saldo).quantize(Decimal("0.01"))
+        yield _ndjson(mov)
+
+
+def _resposta(linhas: Iterator[str]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(linhas, content_type=CONTENT_TYPE)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@require_GET
+@token_api_obrigatorio
+def api_ndjson(request, recurso: str):
+    """Streaming NDJSON de um recurso (romaneios, itens, unidades, pagamentos)."""
+    definicao = RECURSOS[recurso]
+    try:
+        qs = _filtrar(definicao, request)
+        depois = _inteiro(request, "depois")
+        limite = _inteiro(request, "limite")
+    except ParametroInvalido as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+    return _resposta(_linhas_keyset(qs, definicao.campos, depois, limite))
+
+
+@require_GET
+@token_api_obrigatorio
+def api_fluxo(request):
+    """Streaming NDJSON do Fluxo Financeiro (mesmos filtros da tela)."""
+    try:
+        _inteiro(request, "cliente_id")
+        _inteiro(request, "tipo_madeira_id")
+    except ParametroInvalido as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+    return _resposta(_linhas_fluxo(request))
+
+
+@require_GET
+@token_api_obrigatorio
+def api_parquet(request, recurso: str):
+    """Um arquivo Parquet do recurso com os mesmos filtros (sem partições; ver apps.relatorios.parquet)."""
+    from .parquet import PyarrowIndisponivel, escrever
+
+    definicao = RECURSOS[recurso]
+    try:
+        qs = _filtrar(definicao, request)
+    except ParametroInvalido as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+
+    # Em disco, não em memória: o arquivo pode ter anos de dados
+    descritor, caminho = tempfile.mkstemp(suffix=".parquet")
+    os.close(descritor)
+    try:
+        escrever(qs, definicao, caminho)
+        arquivo = open(caminho, "rb")
+    except PyarrowIndisponivel as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=501)
+    finally:
+        os.unlink(caminho)  # o descritor aberto continua válido até o FileResponse fechar
+
+    response = FileResponse(
+        arquivo, as_attachment=True, filename=f"{recurso}.parquet", content_type="application/vnd.apache.parquet"
+    )
+    response["Cache-Control"] = "no-store"
+    return response
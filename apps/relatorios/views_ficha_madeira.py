@@ -1,22 +1,42 @@
 from __future__ import annotations
 
-from django.contrib.auth.decorators import login_required
+from dataclasses import dataclass
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
+from django.db import connection
+from django.db.models import F, Sum
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.views.generic import TemplateView
 
 from apps.cadastros.models import Cliente, TipoMadeira
-from apps.romaneio.models import ItemRomaneio, Romaneio
-
+from apps.core.assincrono import login_obrigatorio, renderizar
+from apps.core.paginacao import paginar_keyset, paginar_ultima, querystring_sem_cursor, resumo_lista
+from apps.core.parcial import FragmentoMixin
+from apps.romaneio.models import ItemRomaneio
+
+from . import services
+from .cache import contexto_em_cache
+from .fechamento import SnapshotMixin, exportacao_congelada
+from .pdf import FalhaPdf, gerar_pdf
 from .views_ficha_romaneio import get_mes_ano, _safe_filename  # reutiliza helpers
 
 
-def _madeiras_queryset(request):
+FICHA_MADEIRAS_PAGE_SIZE = 100
+
+# Modo agrupado: nível externo -> nível interno (id, nome) do ROLLUP
+AGRUPAMENTOS = {
+    "madeira": (("tipo_madeira_id", "tipo_madeira__nome"), ("romaneio__cliente_id", "romaneio__cliente__nome")),
+    "cliente": (("romaneio__cliente_id", "romaneio__cliente__nome"), ("tipo_madeira_id", "tipo_madeira__nome")),
+}
+
+
+def _madeiras_filtrado(request):
     """
-    QuerySet base da Ficha de Madeiras (por item), aplicando filtros e ordenação.
+    QuerySet base da Ficha de Madeiras (por item), aplicando os filtros (sem ordenação).
 
     Filtros (GET):
       - mes, ano (obrigatórios com fallback)
@@ -24,10 +44,6 @@ def _madeiras_queryset(request):
       - numero_romaneio (opcional)
       - tipo_romaneio (opcional: NORMAL|COM_FRETE)
       - tipo_madeira_id (opcional: FK -> TipoMadeira)
-
-    Ordenação (GET):
-      - sort: data|numero|madeira|tipo|valor_unit|m3|total
-      - dir: asc|desc
     """
     mes, ano = get_mes_ano(request)
 
@@ -36,10 +52,6 @@ def _madeiras_queryset(request):
     tipo_romaneio = (request.GET.get("tipo_romaneio") or "").strip().upper()
     tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
 
-    sort = (request.GET.get("sort") or "data").strip().lower()
-    direction = (request.GET.get("dir") or "asc").strip().lower()
-    desc = direction == "desc"
-
     qs = (
         ItemRomaneio.objects.filter(
             romaneio__data_romaneio__month=mes,
@@ -61,7 +73,18 @@ def _madeiras_queryset(request):
     if tipo_madeira_id:
         qs = qs.filter(tipo_madeira_id=tipo_madeira_id)
 
-    # ===== ordenação (mapeada para campos do ORM) =====
+    return qs
+
+
+def _ordenacao_madeiras(request) -> list[str]:
+    """
+    Ordenação (GET) mapeada para campos do ORM, terminando em "id" (estável e usável como keyset):
+      - sort: data|numero|madeira|tipo|valor_unit|m3|total
+      - dir: asc|desc
+    """
+    sort = (request.GET.get("sort") or "data").strip().lower()
+    direction = (request.GET.get("dir") or "asc").strip().lower()
+
     sort_map = {
         "data": "romaneio__data_romaneio",
         "numero": "romaneio__numero_romaneio",
@@ -72,77 +95,244 @@ def _madeiras_queryset(request):
         "total": "valor_total",
     }
     field = sort_map.get(sort, "romaneio__data_romaneio")
-    if desc:
+    if direction == "desc":
         field = f"-{field}"
 
     # tie-breakers para ficar estável
-    return qs.order_by(
+    return [
         field,
         "romaneio__data_romaneio",
         "romaneio__numero_romaneio",
         "tipo_madeira__nome",
         "id",
-    )
+    ]
+
+
+def _madeiras_queryset(request):
+    """QuerySet da Ficha de Madeiras com filtros e ordenação (exports: todas as linhas)."""
+    return _madeiras_filtrado(request).order_by(*_ordenacao_madeiras(request))
+
+
+def _dados_madeiras(request) -> dict:
+    """
+    Todas as linhas + totais da Ficha de Madeiras (exports Excel/PDF, em cache).
+    Os totais são somados na mesma passada que carrega as linhas.
+    """
+    def calcular() -> dict:
+        mes, ano = get_mes_ano(request)
+        rows = list(_madeiras_queryset(request))
+
+        cliente_id = (request.GET.get("cliente") or request.GET.get("cliente_id") or "").strip()
+        cliente_nome = "Todos"
+        if cliente_id:
+            c = Cliente.objects.filter(pk=cliente_id).first()
+            if c:
+                cliente_nome = c.nome
+
+        tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
+        tipo_madeira_nome = "Todas"
+        if tipo_madeira_id:
+            tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
+            if tm:
+                tipo_madeira_nome = tm.nome
+
+        return {
+            "rows": rows,
+            "mes": mes,
+            "ano": ano,
+            "total_m3": sum((item.quantidade_m3_total or 0 for item in rows), Decimal("0.000")),
+            "total_itens": sum((item.valor_total or 0 for item in rows), Decimal("0.00")),
+            "cliente_nome": cliente_nome,
+            "tipo_madeira_nome": tipo_madeira_nome,
+        }
+
+    return contexto_em_cache("ficha_madeiras", request, calcular)
+
+
+def _pagina_madeiras(request) -> dict:
+    """
+    Uma página (keyset, ?depois= / ?antes=) da ficha por item + contagem e totais do período
+    numa única agregação. Em cache por filtros + cursor.
+    """
+    def calcular() -> dict:
+        qs = _madeiras_filtrado(request)
+        totais = resumo_lista(qs, total_m3=Sum("quantidade_m3_total"), total_itens=Sum("valor_total"))
+        ordenacao = _ordenacao_madeiras(request)
+        if request.GET.get("ultima") and totais["qtd"]:
+            pagina = paginar_ultima(qs, ordenacao, FICHA_MADEIRAS_PAGE_SIZE, totais["qtd"])
+        else:
+            pagina = paginar_keyset(
+                qs,
+                ordenacao,
+                FICHA_MADEIRAS_PAGE_SIZE,
+                depois=request.GET.get("depois"),
+                antes=request.GET.get("antes"),
+            )
+            pagina.count = totais["qtd"]
+        return {
+            "pagina": pagina,
+            "qtd_itens": totais["qtd"],
+            "total_m3": totais["total_m3"] or 0,
+            "total_itens": totais["total_itens"] or 0,
+        }
 
+    return contexto_em_cache("ficha_madeiras_pagina", request, calcular)
 
-class RelatorioMadeirasView(LoginRequiredMixin, TemplateView):
+
+# =============================================================================
+# Modo agrupado (subtotais por madeira/cliente no SQL)
+# =============================================================================
+@dataclass(frozen=True)
+class LinhaGrupo:
+    """Linha do agrupamento: nivel 0 = detalhe, 1 = subtotal do grupo externo, 2 = total geral."""
+    nivel: int
+    grupo: str
+    subgrupo: str
+    m3: Decimal
+    valor: Decimal
+    itens: int
+
+
+def _sql_agrupado(request, agrupar: str) -> tuple[str, list]:
+    """
+    SQL das linhas + subtotais + total geral em UMA consulta sobre os itens filtrados:
+    GROUP BY ROLLUP no PostgreSQL; nos demais bancos, os três níveis em UNION ALL.
+    """
+    (g1_id, g1_nome), (g2_id, g2_nome) = AGRUPAMENTOS[agrupar]
+    base = (
+        _madeiras_filtrado(request)
+        .order_by()
+        .values(
+            g1_id=F(g1_id), g1_nome=F(g1_nome), g2_id=F(g2_id), g2_nome=F(g2_nome),
+            m3=F("quantidade_m3_total"), valor=F("valor_total"),
+        )
+    )
+    base_sql, base_params = base.query.sql_with_params()
+    somas = "SUM(b.m3) AS m3, SUM(b.valor) AS valor, COUNT(*) AS itens"
+
+    if connection.vendor == "postgresql":
+        sql = f"""
+            SELECT b.g1_id, b.g1_nome, b.g2_id, b.g2_nome, {somas},
+                   GROUPING(b.g1_id) + GROUPING(b.g2_id) AS nivel
+            FROM ({base_sql}) b
+            GROUP BY ROLLUP ((b.g1_id, b.g1_nome), (b.g2_id, b.g2_nome))
+        """
+        params = list(base_params)
+    else:
+        sql = f"""
+            SELECT b.g1_id, b.g1_nome, b.g2_id, b.g2_nome, {somas}, 0 AS nivel
+            FROM ({base_sql}) b GROUP BY b.g1_id, b.g1_nome, b.g2_id, b.g2_nome
+            UNION ALL
+            SELECT b.g1_id, b.g1_nome, NULL, NULL, {somas}, 1
+            FROM ({base_sql}) b GROUP BY b.g1_id, b.g1_nome
+            UNION ALL
+            SELECT NULL, NULL, NULL, NULL, {somas}, 2
+            FROM ({base_sql}) b
+        """
+        params = list(base_params) * 3
+
+    # detalhes do grupo, depois o subtotal dele; total geral por último
+    ordem = "CASE WHEN r.nivel = 2 THEN 1 ELSE 0 END, r.g1_nome, r.g1_id, r.nivel, r.g2_nome, r.g2_id"
+    return f"SELECT * FROM ({sql}) r ORDER BY {ordem}", params
+
+
+def _grupos_madeiras(request, agrupar: str) -> dict:
+    """Linhas agrupadas (com subtotais) e o total geral, da mesma consulta. Em cache."""
+    def calcular() -> dict:
+        sql, params = _sql_agrupado(request, agrupar)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            resultado = cursor.fetchall()
+
+        linhas = [
+            LinhaGrupo(
+                nivel=int(nivel),
+                grupo=g1_nome or "",
+                subgrupo=g2_nome or "",
+                m3=Decimal(str(m3 or 0)).quantize(Decimal("0.001")),
+                valor=Decimal(str(valor or 0)).quantize(Decimal("0.01")),
+                itens=itens,
+            )
+            for _g1, g1_nome, _g2, g2_nome, m3, valor, itens, nivel in resultado
+        ]
+        total = next((linha for linha in linhas if linha.nivel == 2), None)
+        return {
+            "grupos": [linha for linha in linhas if linha.nivel < 2],
+            "qtd_itens": total.itens if total else 0,
+            "total_m3": total.m3 if total else 0,
+            "total_itens": total.valor if total else 0,
+        }
+
+    return contexto_em_cache(f"ficha_madeiras_grupos_{agrupar}", request, calcular)
+
+
+class RelatorioMadeirasView(LoginRequiredMixin, SnapshotMixin, FragmentoMixin, TemplateView):
+    """
+    Ficha de Madeiras em dois modos (GET "modo"):
+      - itens (padrão): uma linha por item, paginada por keyset
+      - madeira|cliente: agrupada, com subtotais por madeira (ou cliente) e total geral
+    """
     template_name = "relatorios/ficha_madeiras.html"
+    template_fragmento = "relatorios/_ficha_madeiras_resultados.html"
+    relatorio_congelado = "ficha_madeiras"
+    contexto_congelado = {"modo": "itens", "cliente_id": ""}
+
+    def get_contexto_filtros(self):
+        return {
+            "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
+            "tipos_madeira": TipoMadeira.objects.order_by("nome"),
+            "meses": range(1, 13),
+            "anos": services.anos_com_romaneio() or [timezone.localdate().year],
+        }
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
         mes, ano = get_mes_ano(self.request)
-        qs = _madeiras_queryset(self.request)
+        modo = self.request.GET.get("modo") if self.request.GET.get("modo") in AGRUPAMENTOS else "itens"
 
-        cliente_id = (self.request.GET.get("cliente") or self.request.GET.get("cliente_id") or "").strip()
+        if modo == "itens":
+            dados = _pagina_madeiras(self.request)
+            pagina = dados["pagina"]
+            context.update({"rows": pagina.itens, "pagina": pagina, "grupos": []})
+        else:
+            dados = _grupos_madeiras(self.request, modo)
+            context.update({"rows": [], "pagina": None, "grupos": dados["grupos"]})
 
-        totais = qs.aggregate(
-            total_m3=Sum("quantidade_m3_total"),
-            total_itens=Sum("valor_total"),
-        )
+        cliente_id = (self.request.GET.get("cliente") or self.request.GET.get("cliente_id") or "").strip()
 
         context.update({
-            "rows": qs,
+            "modo": modo,
+            "filtros_qs": querystring_sem_cursor(self.request),
             "mes": mes,
             "ano": ano,
             "cliente_id": cliente_id or "",
-            "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
-            "tipos_madeira": TipoMadeira.objects.order_by("nome"),
-            "meses": range(1, 13),
-            "anos": [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")] or [timezone.localdate().year],
-            "total_m3": totais["total_m3"] or 0,
-            "total_itens": totais["total_itens"] or 0,
+            "qtd_itens": dados["qtd_itens"],
+            "total_m3": dados["total_m3"],
+            "total_itens": dados["total_itens"],
             "sort": (self.request.GET.get("sort") or "data"),
             "dir": (self.request.GET.get("dir") or "asc"),
         })
         return context
 
 
-@login_required
-def ficha_madeiras_export_excel(request):
+@login_obrigatorio
+@exportacao_congelada("ficha_madeiras", "xlsx")
+async def ficha_madeiras_export_excel(request):
     """Exporta a Ficha de Madeiras (ItemRomaneio) para Excel, respeitando filtros/ordenação."""
+    dados = await sync_to_async(_dados_madeiras)(request)
+    return await renderizar(_planilha_madeiras, dados)
+
+
+def _planilha_madeiras(dados: dict) -> HttpResponse:
+    """Monta o .xlsx (só CPU: roda no pool de renderização)."""
     from io import BytesIO
 
     from openpyxl import Workbook
     from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
     from openpyxl.utils import get_column_letter
 
-    mes, ano = get_mes_ano(request)
-    qs = _madeiras_queryset(request)
-
-    cliente_id = (request.GET.get("cliente") or request.GET.get("cliente_id") or "").strip()
-    cliente_nome = "Todos"
-    if cliente_id:
-        c = Cliente.objects.filter(pk=cliente_id).first()
-        if c:
-            cliente_nome = c.nome
-
-    tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
-    tipo_madeira_nome = "Todas"
-    if tipo_madeira_id:
-        tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
-        if tm:
-            tipo_madeira_nome = tm.nome
+    mes, ano = dados["mes"], dados["ano"]
+    cliente_nome, tipo_madeira_nome = dados["cliente_nome"], dados["tipo_madeira_nome"]
 
     brand_fill = PatternFill("solid", fgColor="246B29")
     head_fill = PatternFill("solid", fgColor="EEF3EF")
@@ -190,7 +380,7 @@ def ficha_madeiras_export_excel(request):
     ws.auto_filter.ref = f"A{header_row}:G{header_row}"
 
     row = header_row + 1
-    for idx, item in enumerate(qs, start=1):
+    for idx, item in enumerate(dados["rows"], start=1):
         r = item.romaneio
 
         ws.cell(row=row, column=1, value=r.data_romaneio).number_format = "dd/mm/yyyy"
@@ -246,34 +436,27 @@ def ficha_madeiras_export_excel(request):
     return response
 
 
-@login_required
-def ficha_madeiras_export_pdf(request):
+@login_obrigatorio
+@exportacao_congelada("ficha_madeiras", "pdf")
+async def ficha_madeiras_export_pdf(request):
     """Exporta a Ficha de Madeiras (ItemRomaneio) para PDF via WeasyPrint, respeitando filtros/ordenação."""
-    mes, ano = get_mes_ano(request)
-    qs = _madeiras_queryset(request)
+    dados = await sync_to_async(_dados_madeiras)(request)
+    return await renderizar(_pdf_madeiras, request, dados)
 
-    cliente_id = (request.GET.get("cliente") or request.GET.get("cliente_id") or "").strip()
-    cliente_nome = "Todos"
-    if cliente_id:
-        c = Cliente.objects.filter(pk=cliente_id).first()
-        if c:
-            cliente_nome = c.nome
 
-    tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
-    tipo_madeira_nome = "Todas"
-    if tipo_madeira_id:
-        tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
-        if tm:
-            tipo_madeira_nome = tm.nome
+def _pdf_madeiras(request, dados: dict) -> HttpResponse:
+    """Template + WeasyPrint (só CPU: roda no pool de renderização)."""
+    mes, ano = dados["mes"], dados["ano"]
+    cliente_nome, tipo_madeira_nome = dados["cliente_nome"], dados["tipo_madeira_nome"]
 
     context = {
-        "rows": list(qs),
+        "rows": dados["rows"],
         "mes": mes,
         "ano": ano,
         "cliente_nome": cliente_nome,
         "tipo_madeira_nome": tipo_madeira_nome,
-        "total_m3": qs.aggregate(s=Sum("quantidade_m3_total"))["s"] or 0,
-        "total_itens": qs.aggregate(s=Sum("valor_total"))["s"] or 0,
+        "total_m3": dados["total_m3"],
+        "total_itens": dados["total_itens"],
         "now": timezone.localtime(),
     }
 
@@ -281,9 +464,8 @@ def ficha_madeiras_export_pdf(request):
     base_url = request.build_absolute_uri("/")
 
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_string, base_url=base_url).write_pdf()
-    except Exception as exc:
+        pdf_bytes = gerar_pdf(html_string, base_url)
+    except FalhaPdf as exc:
         return HttpResponse(
             f"Falha ao gerar PDF. Erro: {exc}",
             status=500,
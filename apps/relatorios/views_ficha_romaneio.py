@@ -5,6 +5,7 @@ import re
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import connection
 from django.db.models import IntegerField, Sum
 from django.db.models.expressions import RawSQL
 from django.http import HttpResponse
@@ -14,7 +15,14 @@ from django.utils import timezone
 from django.views.generic import ListView
 
 from apps.cadastros.models import Cliente, Romaneiador, TipoMadeira
+from apps.core import versoes
+from apps.core.paginacao import KeysetPaginationMixin
+from apps.core.parcial import FragmentoMixin
 from apps.romaneio.models import Romaneio
+from apps.romaneio.services import carimbo_romaneio
+
+from .fechamento import SnapshotMixin, exportacao_congelada
+from .pdf import FalhaPdf, gerar_pdf
 
 
 def get_mes_ano(request) -> tuple[int, int]:
@@ -37,6 +45,17 @@ def _safe_filename(value: str) -> str:
     return value or "arquivo"
 
 
+# Nº Romaneio como inteiro (só dígitos) para ordenar; a página (keyset) sempre executa a
+# expressão, então há uma versão para o SQLite dos testes/desenvolvimento
+NUMERO_INT_SQL = {
+    "postgresql": "CASE WHEN numero_romaneio ~ '^[0-9]+$' THEN numero_romaneio::integer ELSE 2147483647 END",
+    "sqlite": (
+        "CASE WHEN numero_romaneio <> '' AND numero_romaneio NOT GLOB '*[^0-9]*' "
+        "THEN CAST(numero_romaneio AS INTEGER) ELSE 2147483647 END"
+    ),
+}
+
+
 def _romaneios_queryset(request):
     """
     Queryset base para Ficha de Romaneios (por ROMANEIO):
@@ -53,10 +72,6 @@ def _romaneios_queryset(request):
     numero_romaneio = (request.GET.get("numero_romaneio") or "").strip()
     tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
 
-    sort = (request.GET.get("sort") or "data").strip().lower()
-    direction = (request.GET.get("dir") or "asc").strip().lower()
-    desc = direction == "desc"
-
     qs = Romaneio.objects.select_related("cliente", "motorista", "romaneiador").filter(
         data_romaneio__month=mes,
         data_romaneio__year=ano,
@@ -81,15 +96,19 @@ def _romaneios_queryset(request):
 
     # Ordenação numérica segura do Nº Romaneio (CharField no banco).
     # Cast direto para IntegerField quebra quando o valor contém ponto ou letras (ex: "3107.1").
-    # Solução: usa CASE/WHEN com regex no Postgres — converte para integer só se for dígitos puros,
-    # caso contrário retorna NULL (vai para o final na ordenação ASC).
-    qs = qs.annotate(
-        numero_int=RawSQL(
-            "CASE WHEN numero_romaneio ~ '^[0-9]+$' THEN numero_romaneio::integer ELSE NULL END",
-            [],
-            output_field=IntegerField(),
-        )
-    )
+    # Solução: usa CASE/WHEN com regex no Postgres (GLOB no SQLite) — converte para integer só se for dígitos puros,
+    # caso contrário retorna o maior integer (vai para o final na ordenação ASC e para o começo
+    # na DESC, como NULL faria, mas sem NULL: o valor entra no cursor da paginação por keyset).
+    numero_sql = NUMERO_INT_SQL.get(connection.vendor, NUMERO_INT_SQL["sqlite"])
+    qs = qs.annotate(numero_int=RawSQL(numero_sql, [], output_field=IntegerField()))
+
+    return qs.order_by(*_ordenacao_romaneios(request))
+
+
+def _ordenacao_romaneios(request) -> list[str]:
+    """Ordenação sort/dir da ficha, terminando em "id" (também é a chave da paginação)."""
+    sort = (request.GET.get("sort") or "data").strip().lower()
+    direction = (request.GET.get("dir") or "asc").strip().lower()
 
     sort_map = {
         "cliente": "cliente__nome",
@@ -99,47 +118,55 @@ def _romaneios_queryset(request):
         "total": "valor_total",
     }
     field = sort_map.get(sort, "data_romaneio")
-    if desc:
+    if direction == "desc":
         field = f"-{field}"
 
     # tie-breakers estáveis (não "brigam" com o primeiro critério)
-    return qs.order_by(field, "data_romaneio", "numero_int", "id")
+    return [field, "data_romaneio", "numero_int", "id"]
 
 
-class RelatorioRomaneiosView(LoginRequiredMixin, ListView):
+class RelatorioRomaneiosView(LoginRequiredMixin, SnapshotMixin, FragmentoMixin, KeysetPaginationMixin, ListView):
     model = Romaneio
     template_name = "relatorios/ficha_romaneios.html"
+    template_fragmento = "relatorios/_ficha_romaneios_resultados.html"
+    relatorio_congelado = "ficha_romaneios"
     context_object_name = "romaneios"
     paginate_by = 50
 
     def get_queryset(self):
         return _romaneios_queryset(self.request)
 
+    def get_ordenacao_keyset(self):
+        return _ordenacao_romaneios(self.request)
+
+    def get_resumo_agregados(self):
+        return {
+            "total_m3": Sum("m3_total"),
+            "total_valor_liquido": Sum("valor_total"),
+            "total_valor_bruto": Sum("valor_bruto"),
+        }
+
+    def get_contexto_filtros(self):
+        anos = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
+        return {
+            "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
+            "romaneiadores": Romaneiador.objects.filter(ativo=True).order_by("nome"),
+            "tipos_madeira": TipoMadeira.objects.order_by("nome"),
+            "meses": range(1, 13),
+            "anos": anos or [timezone.localdate().year],
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         mes, ano = get_mes_ano(self.request)
 
         context["mes"] = mes
         context["ano"] = ano
-        context["clientes"] = Cliente.objects.filter(ativo=True).order_by("nome")
-        context["romaneiadores"] = Romaneiador.objects.filter(ativo=True).order_by("nome")
-        context["tipos_madeira"] = TipoMadeira.objects.order_by("nome")
-        context["meses"] = range(1, 13)
-
-        anos = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
-        context["anos"] = anos or [timezone.localdate().year]
-
-        # Totais do período (mesmos filtros da listagem)
-        rom_qs = _romaneios_queryset(self.request).order_by()  # remove order_by (não afeta filtros)
 
-        totais = rom_qs.aggregate(
-            total_m3=Sum("m3_total"),
-            total_valor_liquido=Sum("valor_total"),
-            total_valor_bruto=Sum("valor_bruto"),
-        )
-        context["total_m3_periodo"] = totais["total_m3"] or 0
-        context["total_valor_periodo"] = totais["total_valor_liquido"] or 0
-        context["total_valor_bruto_periodo"] = totais["total_valor_bruto"] or 0
+        # Totais do período (mesmos filtros da listagem), na mesma consulta da contagem
+        context["total_m3_periodo"] = self.resumo["total_m3"] or 0
+        context["total_valor_periodo"] = self.resumo["total_valor_liquido"] or 0
+        context["total_valor_bruto_periodo"] = self.resumo["total_valor_bruto"] or 0
 
         context["sort"] = (self.request.GET.get("sort") or "data")
         context["dir"] = (self.request.GET.get("dir") or "asc")
@@ -220,6 +247,7 @@ def ficha_romaneios_export(request):
 
 
 @login_required
+@exportacao_congelada("ficha_romaneios", "xlsx")
 def ficha_romaneios_export_excel(request):
     """Exporta a Ficha de Romaneios (por ROMANEIO) para Excel, respeitando filtros e ordenação."""
     from io import BytesIO
@@ -360,6 +388,7 @@ def ficha_romaneios_export_excel(request):
 
 
 @login_required
+@exportacao_congelada("ficha_romaneios", "pdf")
 def ficha_romaneios_export_pdf(request):
     """Exporta a Ficha de Romaneios (por ROMANEIO) para PDF via WeasyPrint, respeitando filtros e ordenação."""
     mes, ano = get_mes_ano(request)
@@ -405,9 +434,8 @@ def ficha_romaneios_export_pdf(request):
     base_url = request.build_absolute_uri("/")
 
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_string, base_url=base_url).write_pdf()
-    except Exception as exc:
+        pdf_bytes = gerar_pdf(html_string, base_url)
+    except FalhaPdf as exc:
         return HttpResponse(
             f"Falha ao gerar PDF. Erro: {exc}",
             status=500,
@@ -429,6 +457,12 @@ def romaneio_export_excel(request, romaneio_id: int):
     from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
     from openpyxl.utils import get_column_letter
 
+    # GET condicional antes do prefetch e da montagem da planilha
+    carimbo = carimbo_romaneio(romaneio_id, extra="xlsx")
+    nao_modificado = versoes.resposta_condicional(request, carimbo)
+    if nao_modificado is not None:
+        return nao_modificado
+
     romaneio = (
         Romaneio.objects.select_related("cliente", "motorista", "usuario_cadastro")
         .prefetch_related("itens__tipo_madeira", "itens__unidades")
@@ -627,12 +661,18 @@ def romaneio_export_excel(request, romaneio_id: int):
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return response
+    return versoes.aplicar_validadores(response, carimbo)
 
 
 @login_required
 def romaneio_export_pdf(request, romaneio_id: int):
     """Exporta UM romaneio para PDF (impressão) usando WeasyPrint."""
+    # GET condicional antes do prefetch e do render (WeasyPrint é a parte cara)
+    carimbo = carimbo_romaneio(romaneio_id, extra="pdf")
+    nao_modificado = versoes.resposta_condicional(request, carimbo)
+    if nao_modificado is not None:
+        return nao_modificado
+
     romaneio = get_object_or_404(
         Romaneio.objects.select_related("cliente", "motorista", "usuario_cadastro").prefetch_related(
             "itens__tipo_madeira", "itens__unidades"
@@ -647,6 +687,8 @@ def romaneio_export_pdf(request, romaneio_id: int):
         item.atualizar_totais(save=True, atualizar_romaneio=False)
 
     romaneio.atualizar_totais(save=True)
+    # Se a conferência corrigiu algum total, a versão mudou: o ETag enviado deve ser o novo
+    carimbo = carimbo_romaneio(romaneio_id, extra="pdf")
 
     context = {
         "romaneio": romaneio,
@@ -658,17 +700,8 @@ def romaneio_export_pdf(request, romaneio_id: int):
     base_url = request.build_absolute_uri("/")
 
     try:
-        from weasyprint import HTML
-    except Exception as exc:
-        return HttpResponse(
-            f"WeasyPrint não está disponível neste servidor. Erro: {exc}",
-            status=500,
-            content_type="text/plain; charset=utf-8",
-        )
-
-    try:
-        pdf_bytes = HTML(string=html_string, base_url=base_url).write_pdf()
-    except Exception as exc:
+        pdf_bytes = gerar_pdf(html_string, base_url)
+    except FalhaPdf as exc:
         return HttpResponse(
             f"Falha ao gerar PDF. Erro: {exc}",
             status=500,
@@ -678,4 +711,4 @@ def romaneio_export_pdf(request, romaneio_id: int):
     filename = _safe_filename(f"romaneio_{romaneio.numero_romaneio}.pdf")
     response = HttpResponse(pdf_bytes, content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return versoes.aplicar_validadores(response, carimbo)
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from decimal import Decimal
 from typing import Iterable
 
-from django.contrib.auth.decorators import login_required
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Sum
 from django.http import HttpResponse
@@ -13,9 +13,14 @@ from django.utils import timezone
 from django.views.generic import TemplateView
 
 from apps.cadastros.models import TipoMadeira, Cliente
+from apps.core.assincrono import login_obrigatorio, renderizar
+from apps.core.parcial import FragmentoMixin
 from apps.financeiro.models import Pagamento
 from apps.romaneio.models import Romaneio
 
+from .cache import contexto_em_cache
+from .fechamento import SnapshotMixin, exportacao_congelada
+from .pdf import FalhaPdf, gerar_pdf
 from .views_ficha_romaneio import _safe_filename, get_mes_ano
 
 
@@ -223,22 +228,72 @@ def _build_movimentacoes(vendas_qs: Iterable[Romaneio], pagamentos_qs: Iterable[
     return movs_com_saldo
 
 
+def _anos_fluxo() -> list[int]:
+    """Anos com romaneio ou pagamento (opções do filtro de ano)."""
+    anos_romaneios  = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
+    anos_pagamentos = [d.year for d in Pagamento.objects.dates("data_pagamento", "year", order="ASC")]
+    return sorted(set(anos_romaneios + anos_pagamentos)) or [timezone.localdate().year]
+
+
+def _dados_fluxo(request) -> dict:
+    """
+    KPIs + movimentações do fluxo para os filtros do request.
+    Fica no cache de relatórios e é o mesmo para a tela e para os exports Excel/PDF.
+    """
+    def calcular() -> dict:
+        mes, ano = _get_mes_ano_filtro(request)
+        vendas_qs, pagamentos_qs = _fluxo_querysets(request)
+
+        vendas_total     = vendas_qs.aggregate(total=Sum("valor_total")).get("total") or 0
+        pagamentos_total = pagamentos_qs.aggregate(total=Sum("valor")).get("total") or 0
+
+        madeira_nome = ""
+        tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
+        if tipo_madeira_id:
+            tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
+            if tm:
+                madeira_nome = tm.nome
+
+        cliente_id = (request.GET.get("cliente_id") or request.GET.get("cliente") or "").strip()
+        cliente_nome = ""
+        if cliente_id:
+            cliente_nome = Cliente.objects.filter(pk=cliente_id).values_list("nome", flat=True).first() or ""
+
+        return {
+            "mes": mes,
+            "ano": ano,
+            "vendas_total": vendas_total,
+            "pagamentos_total": pagamentos_total,
+            "saldo": pagamentos_total - vendas_total,
+            "movimentacoes": _build_movimentacoes(vendas_qs, pagamentos_qs),
+            "madeira_nome": madeira_nome,
+            "cliente_nome": cliente_nome,
+        }
+
+    return contexto_em_cache("fluxo_financeiro", request, calcular)
+
+
 # =============================================================================
 # View (HTML)
 # =============================================================================
-class RelatorioFluxoView(LoginRequiredMixin, TemplateView):
+class RelatorioFluxoView(LoginRequiredMixin, SnapshotMixin, FragmentoMixin, TemplateView):
     template_name = "relatorios/fluxo_financeiro.html"
+    template_fragmento = "relatorios/_fluxo_financeiro_resultados.html"
+    relatorio_congelado = "fluxo_financeiro"
+
+    def get_contexto_filtros(self):
+        return {
+            "meses": range(1, 13),
+            "anos": _anos_fluxo(),
+            "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
+            "tipos_madeira": TipoMadeira.objects.order_by("nome"),
+        }
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        mes, ano = _get_mes_ano_filtro(self.request)
-
-        vendas_qs, pagamentos_qs = _fluxo_querysets(self.request)
-
-        vendas_total     = vendas_qs.aggregate(total=Sum("valor_total")).get("total") or 0
-        pagamentos_total = pagamentos_qs.aggregate(total=Sum("valor")).get("total") or 0
+        dados = _dados_fluxo(self.request)
 
-        saldo_mes = pagamentos_total - vendas_total
+        saldo_mes = dados["saldo"]
         if saldo_mes > 0:
             saldo_mes_classe = "text-success"
         elif saldo_mes < 0:
@@ -246,30 +301,21 @@ class RelatorioFluxoView(LoginRequiredMixin, TemplateView):
         else:
             saldo_mes_classe = "text-secondary"
 
-        # anos disponíveis
-        anos_romaneios  = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
-        anos_pagamentos = [d.year for d in Pagamento.objects.dates("data_pagamento", "year", order="ASC")]
-        anos = sorted(set(anos_romaneios + anos_pagamentos)) or [timezone.localdate().year]
-
-        movimentacoes = _build_movimentacoes(vendas_qs, pagamentos_qs)
-
         context.update(
             {
                 # None → template exibe "Todos"
-                "mes": mes,
-                "ano": ano,
-                "meses": range(1, 13),
-                "anos": anos,
-                "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
+                "mes": dados["mes"],
+                "ano": dados["ano"],
                 "cliente_id": (self.request.GET.get("cliente_id") or self.request.GET.get("cliente") or "").strip(),
-                "tipos_madeira": TipoMadeira.objects.order_by("nome"),
+                "cliente_nome": dados["cliente_nome"],
+                "madeira_nome": dados["madeira_nome"],
                 # KPIs
-                "vendas": vendas_total,
-                "pagamentos": pagamentos_total,
+                "vendas": dados["vendas_total"],
+                "pagamentos": dados["pagamentos_total"],
                 "saldo_mes": saldo_mes,
                 "saldo_mes_classe": saldo_mes_classe,
                 # Tabela única
-                "movimentacoes": movimentacoes,
+                "movimentacoes": dados["movimentacoes"],
                 # Filtros extras
                 "numero_romaneio": (self.request.GET.get("numero_romaneio") or "").strip(),
                 "tipo_madeira_id": (self.request.GET.get("tipo_madeira_id") or "").strip(),
@@ -282,25 +328,27 @@ class RelatorioFluxoView(LoginRequiredMixin, TemplateView):
 # =============================================================================
 # Exports
 # =============================================================================
-@login_required
-def fluxo_financeiro_export_excel(request):
+@login_obrigatorio
+@exportacao_congelada("fluxo_financeiro", "xlsx")
+async def fluxo_financeiro_export_excel(request):
     """
     Exporta o Fluxo Financeiro do período em Excel.
     """
+    dados = await sync_to_async(_dados_fluxo)(request)
+    return await renderizar(_planilha_fluxo, request, dados)
+
+
+def _planilha_fluxo(request, dados: dict) -> HttpResponse:
+    """Monta o .xlsx (só CPU: roda no pool de renderização)."""
     from io import BytesIO
 
     from openpyxl import Workbook
     from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
     from openpyxl.utils import get_column_letter
 
-    mes, ano = _get_mes_ano_filtro(request)
-    vendas_qs, pagamentos_qs = _fluxo_querysets(request)
-
-    vendas_total     = vendas_qs.aggregate(total=Sum("valor_total")).get("total") or 0
-    pagamentos_total = pagamentos_qs.aggregate(total=Sum("valor")).get("total") or 0
-    saldo = pagamentos_total - vendas_total
-
-    movimentacoes = _build_movimentacoes(vendas_qs, pagamentos_qs)
+    mes, ano = dados["mes"], dados["ano"]
+    vendas_total, pagamentos_total, saldo = dados["vendas_total"], dados["pagamentos_total"], dados["saldo"]
+    movimentacoes = dados["movimentacoes"]
 
     brand_fill = PatternFill("solid", fgColor="246B29")
     head_fill  = PatternFill("solid", fgColor="EEF3EF")
@@ -337,13 +385,7 @@ def fluxo_financeiro_export_excel(request):
     ws.row_dimensions[1].height = 28
 
     numero_romaneio = (request.GET.get("numero_romaneio") or "").strip()
-    tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
-
-    madeira_nome = "Todas"
-    if tipo_madeira_id:
-        tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
-        if tm:
-            madeira_nome = tm.nome
+    madeira_nome = dados["madeira_nome"] or "Todas"
 
     ws.merge_cells("A2:D2")
     ws["A2"] = f"Filtro Nº Romaneio: {numero_romaneio if numero_romaneio else '—'}  |  Madeira: {madeira_nome}"
@@ -416,36 +458,29 @@ def fluxo_financeiro_export_excel(request):
     return response
 
 
-@login_required
-def fluxo_financeiro_export_pdf(request):
+@login_obrigatorio
+@exportacao_congelada("fluxo_financeiro", "pdf")
+async def fluxo_financeiro_export_pdf(request):
     """
     Exporta o Fluxo Financeiro do período para PDF via WeasyPrint.
     """
-    mes, ano = _get_mes_ano_filtro(request)
-    vendas_qs, pagamentos_qs = _fluxo_querysets(request)
-
-    vendas_total     = vendas_qs.aggregate(total=Sum("valor_total")).get("total") or 0
-    pagamentos_total = pagamentos_qs.aggregate(total=Sum("valor")).get("total") or 0
-    saldo = pagamentos_total - vendas_total
+    dados = await sync_to_async(_dados_fluxo)(request)
+    return await renderizar(_pdf_fluxo, request, dados)
 
-    tipo_madeira_id = (request.GET.get("tipo_madeira_id") or "").strip()
-    madeira_nome = ""
-    if tipo_madeira_id:
-        tm = TipoMadeira.objects.filter(pk=tipo_madeira_id).first()
-        if tm:
-            madeira_nome = tm.nome
 
-    movimentacoes = _build_movimentacoes(vendas_qs, pagamentos_qs)
+def _pdf_fluxo(request, dados: dict) -> HttpResponse:
+    """Template + WeasyPrint (só CPU: roda no pool de renderização)."""
+    mes, ano = dados["mes"], dados["ano"]
 
     context = {
         "mes": mes,
         "ano": ano,
-        "vendas_total": vendas_total,
-        "pagamentos_total": pagamentos_total,
-        "saldo": saldo,
-        "movimentacoes": movimentacoes,
+        "vendas_total": dados["vendas_total"],
+        "pagamentos_total": dados["pagamentos_total"],
+        "saldo": dados["saldo"],
+        "movimentacoes": dados["movimentacoes"],
         "numero_romaneio": (request.GET.get("numero_romaneio") or "").strip(),
-        "madeira_nome": madeira_nome,
+        "madeira_nome": dados["madeira_nome"],
         "now": timezone.localtime(),
     }
 
@@ -453,9 +488,8 @@ def fluxo_financeiro_export_pdf(request):
     base_url    = request.build_absolute_uri("/")
 
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html_string, base_url=base_url).write_pdf()
-    except Exception as exc:
+        pdf_bytes = gerar_pdf(html_string, base_url)
+    except FalhaPdf as exc:
         return HttpResponse(
             f"Falha ao gerar PDF. Erro: {exc}",
             status=500,
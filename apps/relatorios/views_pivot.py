@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.generic import TemplateView
+
+from apps.core.assincrono import login_obrigatorio, renderizar
+from apps.romaneio.models import ItemRomaneio
+
+from . import services
+from .cache import contexto_em_cache
+from .views_ficha_romaneio import _safe_filename
+
+# linhas da matriz: chave do GET -> (campos do GROUP BY, rótulo)
+DIMENSOES = {
+    "madeira": (("tipo_madeira_id", "tipo_madeira__nome"), "Tipo de madeira"),
+    "cliente": (("romaneio__cliente_id", "romaneio__cliente__nome"), "Cliente"),
+}
+MEDIDAS = {
+    "m3": ("M³", Decimal("0.001")),
+    "valor": ("R$", Decimal("0.01")),
+}
+MESES_ROTULO = ("Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez")
+
+
+@dataclass
+class LinhaPivot:
+    id: int | None
+    nome: str
+    m3: list[Decimal] = field(default_factory=lambda: [Decimal("0.000")] * 12)
+    valor: list[Decimal] = field(default_factory=lambda: [Decimal("0.00")] * 12)
+
+    @property
+    def total_m3(self) -> Decimal:
+        return sum(self.m3, Decimal("0.000"))
+
+    @property
+    def total_valor(self) -> Decimal:
+        return sum(self.valor, Decimal("0.00"))
+
+
+def _parametros(request) -> tuple[int, str, str, str]:
+    """ano, dimensão das linhas, medida exibida e tipo de romaneio (valores fora da lista caem no padrão)."""
+    hoje = timezone.localdate()
+    try:
+        ano = int(request.GET.get("ano") or hoje.year)
+    except (TypeError, ValueError):
+        ano = hoje.year
+    if not date.min.year <= ano < date.max.year:  # o filtro usa date(ano + 1, 1, 1)
+        ano = hoje.year
+    linhas = request.GET.get("linhas") if request.GET.get("linhas") in DIMENSOES else "madeira"
+    medida = request.GET.get("medida") if request.GET.get("medida") in MEDIDAS else "m3"
+    tipo_romaneio = (request.GET.get("tipo_romaneio") or "").strip()
+    return ano, linhas, medida, tipo_romaneio
+
+
+def _dados_pivot(request) -> dict:
+    """
+    Matriz (linhas × 12 meses) do ano, com m³ e R$ dos itens, numa única consulta agrupada
+    (ItemRomaneio ⨝ Romaneio, GROUP BY dimensão, mês). Subtotais de linha e coluna saem da própria matriz.
+    R$ = soma dos itens (o desconto é do romaneio, não do item).
+    """
+    def calcular() -> dict:
+        ano, linhas, _medida, tipo_romaneio = _parametros(request)
+        (campo_id, campo_nome), _rotulo = DIMENSOES[linhas]
+
+        qs = ItemRomaneio.objects.filter(
+            romaneio__data_romaneio__gte=date(ano, 1, 1),
+            romaneio__data_romaneio__lt=date(ano + 1, 1, 1),
+        )
+        if tipo_romaneio:
+            qs = qs.filter(romaneio__tipo_romaneio=tipo_romaneio)
+
+        grupos = (
+            qs.annotate(mes=ExtractMonth("romaneio__data_romaneio"))
+            .order_by()
+            .values(campo_id, campo_nome, "mes")
+            .annotate(m3=Sum("quantidade_m3_total"), valor=Sum("valor_total"))
+        )
+
+        matriz: dict[int | None, LinhaPivot] = {}
+        for g in grupos:
+            linha = matriz.get(g[campo_id])
+            if linha is None:
+                linha = matriz[g[campo_id]] = LinhaPivot(id=g[campo_id], nome=g[campo_nome] or "—")
+            linha.m3[g["mes"] - 1] += g["m3"] or 0
+            linha.valor[g["mes"] - 1] += g["valor"] or 0
+
+        return {
+            "ano": ano,
+            "linhas": sorted(matriz.values(), key=lambda linha: linha.nome.lower()),
+            "anos": services.anos_com_romaneio() or [ano],
+        }
+
+    return contexto_em_cache("pivot", request, calcular)
+
+
+def _matriz(dados: dict, medida: str) -> tuple[list[tuple[str, list[Decimal], Decimal]], list[Decimal], Decimal]:
+    """(linhas [(nome, células, total)], totais por mês, total geral) da medida pedida, já arredondados."""
+    passo = MEDIDAS[medida][1]
+    linhas = []
+    colunas = [Decimal(0)] * 12
+    for linha in dados["linhas"]:
+        celulas = [Decimal(v).quantize(passo) for v in getattr(linha, medida)]
+        colunas = [c + v for c, v in zip(colunas, celulas)]
+        linhas.append((linha.nome, celulas, sum(celulas, Decimal(0)).quantize(passo)))
+    colunas = [c.quantize(passo) for c in colunas]
+    return linhas, colunas, sum(colunas, Decimal(0)).quantize(passo)
+
+
+# =============================================================================
+# View (HTML)
+# =============================================================================
+class RelatorioPivotView(LoginRequiredMixin, TemplateView):
+    template_name = "relatorios/pivot.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        _ano, linhas_dim, medida, tipo_romaneio = _parametros(self.request)
+        dados = _dados_pivot(self.request)
+        linhas, totais_mes, total_geral = _matriz(dados, medida)
+
+        context.update({
+            "ano": dados["ano"],
+            "anos": dados["anos"],
+            "linhas_dim": linhas_dim,
+            "dimensoes": [(chave, rotulo) for chave, (_campos, rotulo) in DIMENSOES.items()],
+            "rotulo_linhas": DIMENSOES[linhas_dim][1],
+            "medida": medida,
+            "medidas": [(chave, rotulo) for chave, (rotulo, _passo) in MEDIDAS.items()],
+            "casas": 3 if medida == "m3" else 2,
+            "tipo_romaneio": tipo_romaneio,
+            "meses_rotulo": MESES_ROTULO,
+            "linhas": linhas,
+            "totais_mes": totais_mes,
+            "total_geral": total_geral,
+        })
+        return context
+
+
+# =============================================================================
+# Exports (a matriz, não as linhas de item)
+# =============================================================================
+def _linhas_export(dados: dict, medida: str, rotulo_linhas: str):
+    linhas, totais_mes, total_geral = _matriz(dados, medida)
+    yield [rotulo_linhas, *MESES_ROTULO, "Total"]
+    for nome, celulas, total in linhas:
+        yield [nome, *celulas, total]
+    yield ["TOTAL", *totais_mes, total_geral]
+
+
+class _Eco:
+    """Buffer que só devolve o que o csv.writer escreveu (para StreamingHttpResponse)."""
+
+    def write(self, valor):
+        return valor
+
+
+@login_required
+def pivot_export_csv(request):
+    """Exporta a matriz em CSV (;), linha a linha."""
+    ano, linhas_dim, medida, _tipo = _parametros(request)
+    dados = _dados_pivot(request)
+    writer = csv.writer(_Eco(), delimiter=";")
+
+    response = StreamingHttpResponse(
+        (writer.writerow(linha) for linha in _linhas_export(dados, medida, DIMENSOES[linhas_dim][1])),
+        content_type="text/csv; charset=utf-8",
+    )
+    filename = _safe_filename(f"pivot_{linhas_dim}_{medida}_{ano}.csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_obrigatorio
+async def pivot_export_excel(request):
+    """Exporta a matriz em Excel (.xlsx, modo write-only)."""
+    dados = await sync_to_async(_dados_pivot)(request)
+    return await renderizar(_planilha_pivot, request, dados)
+
+
+def _planilha_pivot(request, dados: dict) -> HttpResponse:
+    """Monta o .xlsx (só CPU: roda no pool de renderização)."""
+    from io import BytesIO
+
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    ano, linhas_dim, medida, _tipo = _parametros(request)
+    formato = "0.000" if medida == "m3" else '"R$" #,##0.00'
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(f"{linhas_dim.title()} x Mês {ano}")
+    ws.freeze_panes = "B2"
+
+    linhas = list(_linhas_export(dados, medida, DIMENSOES[linhas_dim][1]))
+    for indice, linha in enumerate(linhas):
+        negrito = indice in (0, len(linhas) - 1)  # cabeçalho e totais
+        celulas = []
+        for coluna, valor in enumerate(linha):
+            cell = WriteOnlyCell(ws, value=float(valor) if isinstance(valor, Decimal) else valor)
+            if negrito:
+                cell.font = Font(bold=True)
+            if coluna > 0 and indice > 0:
+                cell.number_format = formato
+            celulas.append(cell)
+        ws.append(celulas)
+
+    output = BytesIO()
+    wb.save(output)
+
+    filename = _safe_filename(f"pivot_{linhas_dim}_{medida}_{ano}.xlsx")
+    response = HttpResponse(
+        output.getvalue(),
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from . import services
+
+
+def _parse_ate(valor: str) -> date | None:
+    """`AAAA-MM` → primeiro dia do mês; vazio/inválido → None (mês corrente)."""
+    try:
+        ano, mes = (int(p) for p in (valor or "").split("-"))
+        return date(ano, mes, 1)
+    except (TypeError, ValueError):
+        return None
+
+
+@login_required
+def serie_mensal(request):
+    """
+    Endpoint AJAX: séries mensais para o painel de tendência do dashboard.
+
+    GET params:
+      - meses (padrão 12, máx. 60)
+      - ate (AAAA-MM, padrão mês corrente)
+    """
+    try:
+        meses = int(request.GET.get("meses") or services.SERIE_MESES_PADRAO)
+    except (TypeError, ValueError):
+        meses = services.SERIE_MESES_PADRAO
+
+    pontos = services.serie_mensal(meses, _parse_ate(request.GET.get("ate")))
+    # Decimais como string para não perder precisão
+    serie = [{chave: str(valor) for chave, valor in ponto.items()} for ponto in pontos]
+    return JsonResponse({"success": True, "meses": len(serie), "serie": serie})
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.forms import BaseInlineFormSet, inlineformset_factory
 
 from apps.cadastros.models import Cliente, Motorista, Romaneiador, TipoMadeira
+from apps.core.fechamento import validar_aberto
 from .models import ItemRomaneio, Romaneio, UnidadeRomaneio
 
 
@@ -49,6 +50,17 @@ class RomaneioForm(forms.ModelForm):
         if self.instance and self.instance.pk and self.instance.data_romaneio:
             self.fields["data_romaneio"].initial = self.instance.data_romaneio.strftime("%Y-%m-%d")
 
+    def clean(self):
+        cleaned = super().clean()
+        # Mês fechado: nem lançar nele, nem alterar (ou tirar de lá) um romaneio dele.
+        # A instância ainda tem a data antiga (o form só a atualiza depois do clean).
+        data_anterior = self.instance.data_romaneio if self.instance.pk else None
+        try:
+            validar_aberto(cleaned.get("data_romaneio"), data_anterior)
+        except ValidationError as exc:
+            self.add_error("data_romaneio", exc)
+        return cleaned
+
 
 # ================= ITEM ROMANEIO =================
 class ItemRomaneioForm(forms.ModelForm):
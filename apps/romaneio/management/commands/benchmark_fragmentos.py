@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.cadastros.models import Cliente, TipoMadeira
+from apps.core.management.commands.benchmark_views import _commit_atual, _percentil
+from apps.romaneio.models import ItemRomaneio, Romaneio, UnidadeRomaneio, calcular_m3
+from apps.romaneio.services import recalcular_totais_romaneio
+
+# (modo, FRAGMENT_CACHE_TIMEOUT, limpar o cache antes de cada requisição)
+MODOS = (
+    ("sem_cache", 0, False),
+    ("cache_frio", 600, True),
+    ("cache_quente", 600, False),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do cache de fragmentos por romaneio: lista com uma página de romaneios e detalhe de um "
+        "romaneio DETALHADO grande, sem cache, com cache frio e com cache quente. Mede tempo (p50/p95) e queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, default=20, help="Romaneios no mês (a lista mostra 20 por página).")
+        parser.add_argument("--unidades", type=int, default=500, help="Unidades (toras) do romaneio do detalhe.")
+        parser.add_argument("--repeticoes", type=int, default=20, help="Requisições medidas por cenário/modo.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--saida", default="", help="Arquivo JSON de saída (padrão: benchmarks/fragmentos-<data>.json)."
+        )
+        parser.add_argument(
+            "--banco-atual",
+            action="store_true",
+            help="Usa o banco configurado em vez de criar um banco de teste (os dados existentes são APAGADOS).",
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Mantém o banco de teste entre execuções.")
+
+    # -------------------------------------------------------------------------
+    # Massa de dados
+    # -------------------------------------------------------------------------
+    def _semear(self, linhas: int, n_unidades: int, seed: int) -> Romaneio:
+        """Mês atual com `linhas` romaneios e um romaneio DETALHADO com `n_unidades` toras."""
+        call_command("flush", interactive=False, verbosity=0)
+        call_command(
+            "gerar_dados_sinteticos",
+            seed=seed,
+            prefixo="F",
+            meses=1,
+            clientes=5,
+            tipos=10,
+            motoristas=3,
+            romaneiadores=2,
+            romaneios=linhas,
+            itens=linhas * 2,
+            unidades=linhas,
+            pagamentos=1,
+            stdout=StringIO(),
+        )
+
+        tipos = list(TipoMadeira.objects.order_by("id")[:5])
+        romaneio = Romaneio.objects.create(
+            numero_romaneio="BENCH-FRAG",
+            data_romaneio=timezone.localdate(),
+            cliente=Cliente.objects.order_by("id").first(),
+            modalidade="DETALHADO",
+        )
+        itens = ItemRomaneio.objects.bulk_create([
+            ItemRomaneio(romaneio=romaneio, tipo_madeira=t, valor_unitario=t.preco_normal) for t in tipos
+        ])
+        unidades = []
+        for i in range(n_unidades):
+            comprimento = Decimal("3.00") + Decimal(i % 30) / 10
+            rodo = Decimal("120.00") + Decimal(i % 140)
+            unidades.append(UnidadeRomaneio(
+                item=itens[i % len(itens)],
+                comprimento=comprimento,
+                rodo=rodo,
+                quantidade_m3=calcular_m3(comprimento, rodo),
+            ))
+        UnidadeRomaneio.objects.bulk_create(unidades, batch_size=2000)
+        recalcular_totais_romaneio(romaneio)
+        return romaneio
+
+    # -------------------------------------------------------------------------
+    # Medição
+    # -------------------------------------------------------------------------
+    def _medir(self, client: Client, url: str, repeticoes: int, limpar: bool) -> dict:
+        client.get(url)  # aquecimento (no modo quente, popula o cache)
+
+        tempos, queries, status = [], [], None
+        for _ in range(repeticoes):
+            if limpar:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                resp = client.get(url)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(len(ctx.captured_queries))
+            status = resp.status_code
+
+        return {
+            "status": status,
+            "n": repeticoes,
+            "queries": max(queries),
+            "p50_ms": round(_percentil(tempos, 50), 2),
+            "p95_ms": round(_percentil(tempos, 95), 2),
+            "media_ms": round(statistics.fmean(tempos), 2),
+        }
+
+    def handle(self, *args, **options):
+        try:
+            setup_test_environment()
+            montou_ambiente = True
+        except RuntimeError:
+            montou_ambiente = False
+
+        nome_banco_original = None
+        if not options["banco_atual"]:
+            nome_banco_original = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+
+        try:
+            resultado = {
+                "meta": {
+                    "commit": _commit_atual(),
+                    "data": datetime.now().isoformat(timespec="seconds"),
+                    "banco": connection.vendor,
+                    "cache": cache.__class__.__name__,
+                    "django": django.get_version(),
+                    "python": platform.python_version(),
+                    "repeticoes": options["repeticoes"],
+                    "linhas": options["linhas"],
+                    "unidades": options["unidades"],
+                },
+                "resultados": [],
+            }
+
+            self.stdout.write(self.style.MIGRATE_LABEL("Semeando..."))
+            romaneio = self._semear(options["linhas"], options["unidades"], options["seed"])
+            user = get_user_model().objects.create_superuser("benchmark", "benchmark@example.com", "benchmark")
+            romaneio.usuario_cadastro = user
+            romaneio.save(update_fields=["usuario_cadastro"])
+
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            cenarios = (
+                ("lista", reverse("romaneio:romaneio_list")),
+                ("detalhe", reverse("romaneio:romaneio_detail", kwargs={"pk": romaneio.pk})),
+            )
+
+            for cenario, url in cenarios:
+                for modo, timeout, limpar in MODOS:
+                    cache.clear()
+                    with override_settings(FRAGMENT_CACHE_TIMEOUT=timeout):
+                        r = self._medir(client, url, options["repeticoes"], limpar)
+                    r.update({"cenario": cenario, "modo": modo})
+                    resultado["resultados"].append(r)
+                    estilo = self.style.SUCCESS if r["status"] == 200 else self.style.ERROR
+                    self.stdout.write(estilo(
+                        f"  {cenario:<8} {modo:<13} status {r['status']}  queries {r['queries']:>3}  "
+                        f"p50 {r['p50_ms']:>8.1f} ms  p95 {r['p95_ms']:>8.1f} ms"
+                    ))
+        finally:
+            cache.clear()
+            if nome_banco_original is not None:
+                connection.creation.destroy_test_db(nome_banco_original, verbosity=0, keepdb=options["keepdb"])
+            if montou_ambiente:
+                teardown_test_environment()
+
+        saida = Path(options["saida"] or f"benchmarks/fragmentos-{datetime.now():%Y%m%d-%H%M%S}.json")
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {saida}"))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.27 on 2026-10-19 05:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('romaneio', '0010_romaneio_romaneiador'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequisicaoIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100)),
+                ('rota', models.CharField(max_length=200)),
+                ('payload_hash', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(default=200)),
+                ('resposta', models.JSONField(default=dict)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('romaneio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='romaneio.romaneio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requisicoes_idempotentes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Requisição Idempotente',
+                'verbose_name_plural': 'Requisições Idempotentes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='requisicaoidempotente',
+            constraint=models.UniqueConstraint(fields=('usuario', 'chave'), name='uniq_requisicao_idempotente_usuario_chave'),
+        ),
+    ]
@@ -13,6 +13,25 @@ QTD_M3_STEP = Decimal("0.001")
 VALOR_STEP = Decimal("0.01")
 
 
+def calcular_m3(comprimento, rodo, desconto_1=None, desconto_2=None) -> Decimal | None:
+    """
+    Fórmula do modo detalhado (m³ líquido de uma tora):
+      ((rodo / 4)² × comprimento − desc1 × desc2 × comprimento) / 1.000.000
+    Retorna None se faltar rôdo ou comprimento.
+    """
+    if rodo is None or comprimento is None:
+        return None
+
+    desc1 = desconto_1 or Decimal("0.00")
+    desc2 = desconto_2 or Decimal("0.00")
+
+    parte_rodo = ((rodo / Decimal("4")) ** 2 * comprimento) / Decimal("1000000")
+    parte_desconto = (desc1 * desc2 * comprimento) / Decimal("1000000")
+    m3_liquida = parte_rodo - parte_desconto
+
+    return m3_liquida.quantize(QTD_M3_STEP, rounding=ROUND_HALF_UP)
+
+
 class Romaneio(models.Model):
     """
     Romaneio único (Simples/Detalhado).
@@ -122,11 +141,13 @@ class Romaneio(models.Model):
 
         liquido = (bruto * self._get_fator_desconto()).quantize(VALOR_STEP, rounding=ROUND_HALF_UP)
 
+        mudou = (self.valor_bruto, self.valor_total, self.m3_total) != (bruto, liquido, m3)
         self.valor_bruto = bruto
         self.valor_total = liquido
         self.m3_total = m3
 
-        if save:
+        # Sem mudança não grava: evita UPDATE à toa e não muda a versão dos dados (ETag)
+        if save and mudou:
             super().save(update_fields=["valor_bruto", "valor_total", "m3_total"])
 
 
@@ -196,6 +217,7 @@ class ItemRomaneio(models.Model):
         - SIMPLES: usa quantidade_m3_total informada
         """
         modalidade = self._get_modalidade_romaneio()
+        antes = (self.quantidade_m3_total, self.valor_total)
 
         if modalidade == "DETALHADO":
             totais = self.unidades.aggregate(total_m3=Sum("quantidade_m3"))
@@ -211,7 +233,7 @@ class ItemRomaneio(models.Model):
             self.quantidade_m3_total * (self.valor_unitario or Decimal("0.00"))
         ).quantize(VALOR_STEP, rounding=ROUND_HALF_UP)
 
-        if save:
+        if save and (self.quantidade_m3_total, self.valor_total) != antes:
             super().save(update_fields=["quantidade_m3_total", "valor_total"])
 
         if atualizar_romaneio and self.romaneio_id:
@@ -295,17 +317,7 @@ class UnidadeRomaneio(models.Model):
         Calcula o m³ pela fórmula do modo detalhado.
         Retorna None se faltar dados necessários.
         """
-        if self.rodo is None or self.comprimento is None:
-            return None
-
-        desc1 = self.desconto_1 or Decimal("0.00")
-        desc2 = self.desconto_2 or Decimal("0.00")
-
-        parte_rodo = ((self.rodo / Decimal("4")) ** 2 * self.comprimento) / Decimal("1000000")
-        parte_desconto = (desc1 * desc2 * self.comprimento) / Decimal("1000000")
-        m3_liquida = parte_rodo - parte_desconto
-
-        return m3_liquida.quantize(QTD_M3_STEP, rounding=ROUND_HALF_UP)
+        return calcular_m3(self.comprimento, self.rodo, self.desconto_1, self.desconto_2)
 
     def save(self, *args, **kwargs):
         # No DETALHADO, só recalcula pela fórmula se quantidade_m3 estiver vazia/zerada.
@@ -325,4 +337,45 @@ class UnidadeRomaneio(models.Model):
         item = self.item
         super().delete(*args, **kwargs)
         if item:
-            item.atualizar_totais(save=True, atualizar_romaneio=True)
\ No newline at end of file
+            item.atualizar_totais(save=True, atualizar_romaneio=True)
+
+
+class RequisicaoIdempotente(models.Model):
+    """
+    Registro de submissões da API JSON de romaneios com chave de idempotência.
+
+    Um reenvio com a mesma chave (mesmo usuário) devolve a resposta original
+    sem executar a gravação de novo. O hash do corpo evita reaproveitar a
+    chave para um payload diferente.
+    """
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="requisicoes_idempotentes",
+    )
+    chave = models.CharField(max_length=100)
+    rota = models.CharField(max_length=200)
+    payload_hash = models.CharField(max_length=64)
+
+    romaneio = models.ForeignKey(
+        Romaneio,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    status_code = models.PositiveSmallIntegerField(default=200)
+    resposta = models.JSONField(default=dict)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Requisição Idempotente"
+        verbose_name_plural = "Requisições Idempotentes"
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "chave"], name="uniq_requisicao_idempotente_usuario_chave"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.chave} ({self.rota})"
@@ -0,0 +1,706 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from apps.cadastros.models import TipoMadeira
+from apps.core import versoes
+
+from .forms import ItemRomaneioForm, RomaneioForm, UnidadeRomaneioForm
+from .models import ItemRomaneio, RequisicaoIdempotente, Romaneio, UnidadeRomaneio
+
+UNIDADES_PAGE_SIZE = 50
+UNIDADES_PAGE_SIZE_MAX = 500
+
+UNIDADE_CAMPOS = ("comprimento", "rodo", "desconto_1", "desconto_2", "quantidade_m3")
+
+
+# =============================================================================
+# Leitura (resumo por item + páginas de unidades)
+# =============================================================================
+def itens_com_resumo(qs):
+    """
+    Anota cada item com o resumo das unidades calculado no SQL:
+      - qtd_unidades: quantidade de toras
+      - m3_unidades: soma do m³ das toras
+
+    Evita carregar (prefetch) todas as unidades só para exibir contagens/totais.
+    """
+    return qs.annotate(
+        qtd_unidades=Count("unidades"),
+        m3_unidades=Sum("unidades__quantidade_m3"),
+    )
+
+
+def _decimal_str(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def serializar_unidade(row: dict) -> dict:
+    """Unidade em formato JSON (Decimals como string para não perder precisão)."""
+    data = {"id": row["id"]}
+    for campo in UNIDADE_CAMPOS:
+        data[campo] = _decimal_str(row.get(campo))
+    return data
+
+
+def pagina_unidades(item_id: int, page=1, page_size=UNIDADES_PAGE_SIZE) -> dict:
+    """
+    Retorna uma página de unidades de um item, sem instanciar models
+    (usa .values()).
+    """
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        page_size = UNIDADES_PAGE_SIZE
+    page_size = max(1, min(page_size, UNIDADES_PAGE_SIZE_MAX))
+
+    qs = UnidadeRomaneio.objects.filter(item_id=item_id).order_by("id").values("id", *UNIDADE_CAMPOS)
+    paginator = Paginator(qs, page_size)
+    page_obj = paginator.get_page(page)
+
+    return {
+        "item_id": item_id,
+        "page": page_obj.number,
+        "num_pages": paginator.num_pages,
+        "count": paginator.count,
+        "page_size": page_size,
+        "unidades": [serializar_unidade(row) for row in page_obj.object_list],
+    }
+
+
+def carimbo_romaneio(romaneio_id: int, *, extra: str = "") -> versoes.Carimbo:
+    """
+    Validador (ETag/Last-Modified) do detalhe e dos exports de UM romaneio: a versão do
+    próprio romaneio (cabeçalho, itens e unidades) + a dos cadastros exibidos nele.
+    Uma consulta ao registro de versões, sem tocar em itens/unidades.
+    """
+    return versoes.carimbo(
+        versoes.escopo_romaneio(romaneio_id),
+        versoes.CLIENTE,
+        versoes.MOTORISTA,
+        versoes.ROMANEIADOR,
+        versoes.TIPO_MADEIRA,
+        extra=extra,
+    )
+
+
+def anotar_versao_fragmento(romaneios) -> None:
+    """
+    Marca cada romaneio com `versao_fragmento` (versão do romaneio + dos cadastros exibidos
+    na linha), usada na chave do {% cache %} das linhas da lista. Uma consulta para a página toda.
+    """
+    romaneios = list(romaneios)
+    if not romaneios:
+        return
+    c = versoes.carimbo(*(versoes.escopo_romaneio(r.pk) for r in romaneios), versoes.CLIENTE, versoes.MOTORISTA)
+    v = dict(c.versoes)
+    comum = f"{v[versoes.CLIENTE]}.{v[versoes.MOTORISTA]}.{v[versoes.GERAL]}"
+    for r in romaneios:
+        r.versao_fragmento = f"{v[versoes.escopo_romaneio(r.pk)]}.{comum}"
+
+
+# =============================================================================
+# Escrita (delta por item)
+# =============================================================================
+@dataclass
+class DeltaUnidades:
+    """
+    Alterações das unidades de UM item, já validadas:
+      - criar: instâncias novas (ainda não salvas)
+      - atualizar: instâncias existentes com campos alterados
+      - remover: ids a excluir
+    """
+
+    item: ItemRomaneio
+    criar: list[UnidadeRomaneio] = field(default_factory=list)
+    atualizar: list[UnidadeRomaneio] = field(default_factory=list)
+    remover: list[int] = field(default_factory=list)
+
+    @property
+    def vazio(self) -> bool:
+        return not (self.criar or self.atualizar or self.remover)
+
+
+def _form_errors_text(form) -> str:
+    partes = []
+    for campo, erros in form.errors.items():
+        label = campo if campo != "__all__" else "unidade"
+        partes.append(f"{label}: {' '.join(erros)}")
+    return "; ".join(partes)
+
+
+def _completar_m3(unidade: UnidadeRomaneio, detalhado: bool) -> None:
+    """Mesma regra de UnidadeRomaneio.save(): calcula o m³ pela fórmula se vier vazio/zerado."""
+    if not detalhado:
+        return
+    if unidade.quantidade_m3 is None or unidade.quantidade_m3 <= Decimal("0.000"):
+        m3_calc = unidade.calcular_m3_detalhado()
+        if m3_calc is not None:
+            unidade.quantidade_m3 = m3_calc
+
+
+def parse_delta_unidades(item: ItemRomaneio, data: dict | None, *, detalhado: bool | None = None) -> DeltaUnidades:
+    """
+    Valida um delta de unidades no formato:
+      {
+        "criar":     [{"comprimento": "3.00", "rodo": "40.00", ...}],
+        "atualizar": [{"id": 10, "rodo": "42.00", ...}],
+        "remover":   [11, 12]
+      }
+
+    Cada unidade é validada com UnidadeRomaneioForm (mesmas regras do formulário).
+    Levanta ValidationError com a lista de problemas encontrados.
+
+    `detalhado` permite informar a modalidade nova quando ela muda na mesma
+    gravação (padrão: modalidade atual do romaneio do item).
+    """
+    delta = DeltaUnidades(item=item)
+    if not data:
+        return delta
+    if not isinstance(data, dict):
+        raise ValidationError("Formato inválido para as alterações das unidades.")
+
+    if detalhado is None:
+        detalhado = item._get_modalidade_romaneio() == "DETALHADO"
+    erros: list[str] = []
+
+    remover = data.get("remover") or []
+    atualizar = data.get("atualizar") or []
+    criar = data.get("criar") or []
+    if not all(isinstance(v, list) for v in (remover, atualizar, criar)):
+        raise ValidationError("Formato inválido para as alterações das unidades.")
+
+    try:
+        remover_ids = {int(pk) for pk in remover}
+    except (TypeError, ValueError):
+        raise ValidationError("Lista de unidades a remover contém ids inválidos.")
+
+    ids_atualizar = []
+    for entrada in atualizar:
+        try:
+            ids_atualizar.append(int(entrada.get("id")))
+        except (AttributeError, TypeError, ValueError):
+            erros.append("Unidade sem id válido na lista de alterações.")
+
+    # Uma única query para todas as unidades referenciadas no delta
+    existentes = {
+        u.pk: u
+        for u in UnidadeRomaneio.objects.filter(item_id=item.pk, pk__in=remover_ids | set(ids_atualizar))
+    }
+
+    faltando = (remover_ids | set(ids_atualizar)) - set(existentes)
+    if faltando:
+        erros.append(f"Unidade(s) não encontrada(s) neste item: {', '.join(map(str, sorted(faltando)))}.")
+
+    for entrada in atualizar:
+        try:
+            pk = int(entrada.get("id"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if pk in remover_ids or pk not in existentes:
+            continue
+
+        instance = existentes[pk]
+        payload = {campo: getattr(instance, campo) for campo in UNIDADE_CAMPOS}
+        payload.update({k: v for k, v in entrada.items() if k in UNIDADE_CAMPOS})
+        if "quantidade_m3" not in entrada and any(k in entrada for k in UNIDADE_CAMPOS):
+            # Medidas mudaram sem m³ explícito: recalcula pela fórmula
+            payload["quantidade_m3"] = None
+
+        form = UnidadeRomaneioForm(data=_form_data(payload, instance, detalhado), instance=instance)
+        if not form.is_valid():
+            erros.append(f"Unidade #{pk}: {_form_errors_text(form)}")
+            continue
+        delta.atualizar.append(form.save(commit=False))
+
+    for n, entrada in enumerate(criar, start=1):
+        if not isinstance(entrada, dict):
+            erros.append(f"Nova unidade {n}: formato inválido.")
+            continue
+        unidade = UnidadeRomaneio(item=item)
+        payload = {campo: entrada.get(campo) for campo in UNIDADE_CAMPOS}
+        form = UnidadeRomaneioForm(data=_form_data(payload, unidade, detalhado), instance=unidade)
+        if not form.is_valid():
+            erros.append(f"Nova unidade {n}: {_form_errors_text(form)}")
+            continue
+        delta.criar.append(form.save(commit=False))
+
+    if erros:
+        raise ValidationError(erros)
+
+    delta.remover = sorted(remover_ids)
+    return delta
+
+
+def _form_data(payload: dict, instance: UnidadeRomaneio, detalhado: bool) -> dict:
+    """
+    Prepara o dict para o UnidadeRomaneioForm.
+    No DETALHADO, se o m³ não vier informado, calcula pela fórmula antes de validar
+    (o form exige quantidade_m3 > 0).
+    """
+    data = {k: ("" if v is None else str(v)) for k, v in payload.items()}
+    if detalhado and not data.get("quantidade_m3"):
+        tmp = UnidadeRomaneio(
+            comprimento=_to_decimal_or_none(data.get("comprimento")),
+            rodo=_to_decimal_or_none(data.get("rodo")),
+            desconto_1=_to_decimal_or_none(data.get("desconto_1")),
+            desconto_2=_to_decimal_or_none(data.get("desconto_2")),
+        )
+        m3 = tmp.calcular_m3_detalhado()
+        if m3 is not None:
+            data["quantidade_m3"] = str(m3)
+    return data
+
+
+def _to_decimal_or_none(value) -> Decimal | None:
+    try:
+        return Decimal(str(value)) if value not in (None, "") else None
+    except Exception:
+        return None
+
+
+def aplicar_delta_unidades(delta: DeltaUnidades, *, atualizar_totais: bool = True) -> None:
+    """
+    Persiste o delta com operações em lote (bulk_create/bulk_update/delete)
+    e recalcula os totais do item (e do romaneio) UMA vez ao final.
+
+    Observação: bulk_* não chama UnidadeRomaneio.save(); por isso a regra do
+    m³ pela fórmula é aplicada aqui e os totais são recalculados explicitamente.
+    """
+    item = delta.item
+    detalhado = item._get_modalidade_romaneio() == "DETALHADO"
+
+    if delta.remover:
+        UnidadeRomaneio.objects.filter(item_id=item.pk, pk__in=delta.remover).delete()
+
+    if delta.atualizar:
+        for unidade in delta.atualizar:
+            _completar_m3(unidade, detalhado)
+        UnidadeRomaneio.objects.bulk_update(delta.atualizar, list(UNIDADE_CAMPOS))
+
+    if delta.criar:
+        for unidade in delta.criar:
+            unidade.item = item
+            _completar_m3(unidade, detalhado)
+        UnidadeRomaneio.objects.bulk_create(delta.criar)
+
+    if delta.vazio:
+        return
+    if atualizar_totais:
+        item.atualizar_totais(save=True, atualizar_romaneio=True)
+    # bulk_* não dispara post_save (e os totais podem não mudar, ex.: só o comprimento)
+    versoes.incrementar_romaneios([item.romaneio_id])
+
+
+# =============================================================================
+# Gravação em lote (API JSON)
+# =============================================================================
+ROMANEIO_CAMPOS = (
+    "numero_romaneio",
+    "data_romaneio",
+    "cliente",
+    "motorista",
+    "romaneiador",
+    "tipo_romaneio",
+    "modalidade",
+)
+ITEM_CAMPOS = ("tipo_madeira", "valor_unitario", "quantidade_m3_total")
+
+
+@dataclass
+class _ItemPlano:
+    """Item validado e o que fazer com suas unidades."""
+
+    item: ItemRomaneio
+    novo: bool
+    unidades: list[UnidadeRomaneio] = field(default_factory=list)
+    substituir_unidades: bool = False
+    delta: DeltaUnidades | None = None
+
+
+def _dados_romaneio(instance: Romaneio | None) -> dict:
+    """Valores atuais do cabeçalho (base para atualização parcial)."""
+    if instance is None or not instance.pk:
+        return {}
+    dados = {}
+    for campo in ROMANEIO_CAMPOS:
+        attname = Romaneio._meta.get_field(campo).attname
+        dados[campo] = getattr(instance, attname)
+    return dados
+
+
+def _validar_unidades_lista(entradas, detalhado: bool, rotulo: str, erros: dict) -> list[UnidadeRomaneio]:
+    if not isinstance(entradas, list):
+        erros.setdefault(rotulo, []).append("Lista de unidades inválida.")
+        return []
+
+    unidades = []
+    for n, entrada in enumerate(entradas, start=1):
+        if not isinstance(entrada, dict):
+            erros.setdefault(rotulo, []).append(f"Unidade {n}: formato inválido.")
+            continue
+        unidade = UnidadeRomaneio()
+        payload = {campo: entrada.get(campo) for campo in UNIDADE_CAMPOS}
+        form = UnidadeRomaneioForm(data=_form_data(payload, unidade, detalhado), instance=unidade)
+        if not form.is_valid():
+            erros.setdefault(rotulo, []).append(f"Unidade {n}: {_form_errors_text(form)}")
+            continue
+        unidades.append(form.save(commit=False))
+    return unidades
+
+
+def _validar_itens(romaneio: Romaneio, itens_data, remover_ids: set[int], detalhado: bool, erros: dict) -> list[_ItemPlano]:
+    if not isinstance(itens_data, list):
+        erros.setdefault("itens", []).append("Informe a lista de itens.")
+        return []
+
+    existentes = {}
+    if romaneio.pk:
+        existentes = {i.pk: i for i in romaneio.itens.select_related("romaneio")}
+
+    faltando = remover_ids - set(existentes)
+    if faltando:
+        erros.setdefault("remover_itens", []).append(
+            f"Item(ns) não encontrado(s) neste romaneio: {', '.join(map(str, sorted(faltando)))}."
+        )
+
+    # Preço padrão da madeira (uma query para todos os itens)
+    tipos_ids = {e.get("tipo_madeira") for e in itens_data if isinstance(e, dict) and e.get("tipo_madeira")}
+    tipos = TipoMadeira.objects.in_bulk([t for t in tipos_ids if str(t).isdigit()])
+
+    planos: list[_ItemPlano] = []
+    for n, entrada in enumerate(itens_data):
+        rotulo = f"itens[{n}]"
+        if not isinstance(entrada, dict):
+            erros.setdefault(rotulo, []).append("Formato inválido.")
+            continue
+
+        item_id = entrada.get("id")
+        if item_id is not None:
+            try:
+                instance = existentes[int(item_id)]
+            except (KeyError, TypeError, ValueError):
+                erros.setdefault(rotulo, []).append(f"Item {item_id} não pertence a este romaneio.")
+                continue
+            if instance.pk in remover_ids:
+                erros.setdefault(rotulo, []).append(f"Item {item_id} está marcado para remoção.")
+                continue
+            dados = {campo: getattr(instance, ItemRomaneio._meta.get_field(campo).attname) for campo in ITEM_CAMPOS}
+        else:
+            instance = ItemRomaneio()
+            dados = {}
+
+        dados.update({k: v for k, v in entrada.items() if k in ITEM_CAMPOS})
+        if detalhado and not dados.get("quantidade_m3_total"):
+            # No DETALHADO o total vem das unidades (form usa placeholder 0.001)
+            dados["quantidade_m3_total"] = "0.000"
+        if not dados.get("valor_unitario"):
+            tm = tipos.get(int(dados["tipo_madeira"])) if str(dados.get("tipo_madeira", "")).isdigit() else None
+            if tm is not None:
+                dados["valor_unitario"] = tm.get_preco(romaneio.tipo_romaneio)
+
+        form = ItemRomaneioForm(data={k: ("" if v is None else str(v)) for k, v in dados.items()}, instance=instance)
+        if not form.is_valid():
+            erros.setdefault(rotulo, []).append(_form_errors_text(form))
+            continue
+
+        plano = _ItemPlano(item=form.save(commit=False), novo=instance.pk is None)
+
+        unidades = entrada.get("unidades")
+        if detalhado:
+            if isinstance(unidades, dict) and not plano.novo:
+                try:
+                    plano.delta = parse_delta_unidades(plano.item, unidades, detalhado=True)
+                except ValidationError as exc:
+                    erros.setdefault(rotulo, []).extend(exc.messages)
+            elif unidades is not None:
+                plano.unidades = _validar_unidades_lista(unidades, True, rotulo, erros)
+                plano.substituir_unidades = not plano.novo
+                if not plano.unidades and rotulo not in erros:
+                    erros.setdefault(rotulo, []).append(
+                        "No modo DETALHADO, cada tipo de madeira deve ter pelo menos uma unidade."
+                    )
+            elif plano.novo:
+                erros.setdefault(rotulo, []).append(
+                    "No modo DETALHADO, cada tipo de madeira deve ter pelo menos uma unidade."
+                )
+
+        planos.append(plano)
+
+    # Mesmas regras do BaseItemRomaneioFormSet: ao menos 1 item e sem madeira duplicada
+    tocados = {p.item.pk for p in planos if p.item.pk}
+    tipos_finais = [p.item.tipo_madeira_id for p in planos] + [
+        i.tipo_madeira_id for pk, i in existentes.items() if pk not in tocados and pk not in remover_ids
+    ]
+    if not tipos_finais and not any(k.startswith("itens") for k in erros):
+        erros.setdefault("itens", []).append("O romaneio precisa ter pelo menos um item (tipo de madeira).")
+    duplicados = {t for t in tipos_finais if tipos_finais.count(t) > 1}
+    if duplicados:
+        nomes = ", ".join(sorted(tm.nome for tm in TipoMadeira.objects.filter(pk__in=duplicados)))
+        erros.setdefault("itens", []).append(f"Tipo(s) de madeira duplicado(s) neste romaneio: {nomes}.")
+
+    return planos
+
+
+def recalcular_totais_em_lote(romaneio_ids, *, chunk_size: int = 1000) -> int:
+    """
+    Recalcula itens e romaneios em lote, com as mesmas regras de
+    ItemRomaneio.atualizar_totais() / Romaneio.atualizar_totais():
+
+      - DETALHADO: quantidade_m3_total do item = soma das unidades
+      - valor_total do item = m³ × valor unitário (2 casas)
+      - romaneio: m³ e bruto somados dos itens, líquido com desconto
+
+    Tudo em UPDATEs set-based (4 comandos por bloco de romaneios), sem trazer
+    linhas para o Python. No PostgreSQL (numeric) o arredondamento é o mesmo do
+    Decimal ROUND_HALF_UP para valores positivos. Retorna quantos romaneios
+    foram recalculados.
+    """
+    ids = sorted(set(romaneio_ids))
+    total = 0
+    for inicio in range(0, len(ids), chunk_size):
+        bloco = ids[inicio:inicio + chunk_size]
+
+        soma_unidades = (
+            UnidadeRomaneio.objects.filter(item_id=OuterRef("pk"))
+            .order_by()
+            .values("item_id")
+            .annotate(s=Sum("quantidade_m3"))
+            .values("s")
+        )
+        ItemRomaneio.objects.filter(romaneio_id__in=bloco, romaneio__modalidade="DETALHADO").update(
+            quantidade_m3_total=Coalesce(Subquery(soma_unidades), Value(Decimal("0.000")), output_field=DecimalField())
+        )
+        ItemRomaneio.objects.filter(romaneio_id__in=bloco).update(
+            valor_total=Round(F("quantidade_m3_total") * F("valor_unitario"), 2, output_field=DecimalField())
+        )
+
+        itens = ItemRomaneio.objects.filter(romaneio_id=OuterRef("pk")).order_by().values("romaneio_id")
+        Romaneio.objects.filter(pk__in=bloco).update(
+            m3_total=Coalesce(
+                Subquery(itens.annotate(s=Sum("quantidade_m3_total")).values("s")),
+                Value(Decimal("0.000")),
+                output_field=DecimalField(),
+            ),
+            valor_bruto=Coalesce(
+                Subquery(itens.annotate(s=Sum("valor_total")).values("s")),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(),
+            ),
+        )
+        Romaneio.objects.filter(pk__in=bloco).update(
+            valor_total=Round(
+                F("valor_bruto") * (Value(Decimal("100.00")) - F("desconto")) / Value(Decimal("100.00")),
+                2,
+                output_field=DecimalField(),
+            )
+        )
+        # UPDATE em lote não dispara post_save: incrementa as versões aqui (mesma transação)
+        versoes.incrementar_romaneios(bloco)
+        total += len(bloco)
+    return total
+
+
+def recalcular_totais_romaneio(romaneio: Romaneio) -> None:
+    """Recalcula itens e totais de um romaneio (ver recalcular_totais_em_lote)."""
+    recalcular_totais_em_lote([romaneio.pk])
+    romaneio.refresh_from_db(fields=["m3_total", "valor_bruto", "valor_total"])
+
+
+def salvar_romaneio_json(data, *, instance: Romaneio | None = None, usuario=None) -> Romaneio:
+    """
+    Cria/atualiza um romaneio com itens e unidades a partir de um dict (JSON).
+
+    Formato:
+      {
+        "numero_romaneio": "11613", "data_romaneio": "2026-01-31", "cliente": 1,
+        "motorista": null, "romaneiador": null,
+        "tipo_romaneio": "NORMAL", "modalidade": "DETALHADO",
+        "itens": [
+          {"tipo_madeira": 3, "valor_unitario": "10.00",
+           "unidades": [{"comprimento": "4.00", "rodo": "30.00"}]},
+          {"id": 7, "unidades": {"criar": [...], "atualizar": [...], "remover": [...]}}
+        ],
+        "remover_itens": [8]
+      }
+
+    Na atualização, campos omitidos mantêm o valor atual; itens não citados
+    permanecem. "unidades" como lista substitui as toras do item; como dict é
+    um delta (mesmo formato de parse_delta_unidades).
+
+    Tudo é validado antes de gravar (ValidationError com dict de erros).
+    A gravação usa operações em lote e recalcula os totais uma única vez.
+    Deve rodar dentro de uma transação.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({"__all__": ["Corpo da requisição deve ser um objeto JSON."]})
+
+    erros: dict[str, list[str]] = {}
+
+    dados = _dados_romaneio(instance)
+    dados.update({k: v for k, v in data.items() if k in ROMANEIO_CAMPOS})
+    form = RomaneioForm(
+        data={k: ("" if v is None else str(v)) for k, v in dados.items()},
+        instance=instance,
+    )
+    if not form.is_valid():
+        for campo, msgs in form.errors.items():
+            erros.setdefault(campo, []).extend(msgs)
+        raise ValidationError(erros)
+
+    romaneio = form.save(commit=False)
+    detalhado = romaneio.modalidade == "DETALHADO"
+
+    try:
+        remover_ids = {int(pk) for pk in (data.get("remover_itens") or [])}
+    except (TypeError, ValueError):
+        erros.setdefault("remover_itens", []).append("Lista de itens a remover contém ids inválidos.")
+        remover_ids = set()
+
+    itens_data = data.get("itens")
+    if itens_data is None and romaneio.pk:
+        itens_data = []
+    planos = _validar_itens(romaneio, itens_data, remover_ids, detalhado, erros)
+
+    if erros:
+        raise ValidationError(erros)
+
+    # ===== gravação =====
+    if romaneio.pk is None and usuario is not None:
+        romaneio.usuario_cadastro = usuario
+    romaneio.save()
+
+    if remover_ids:
+        ItemRomaneio.objects.filter(romaneio=romaneio, pk__in=remover_ids).delete()
+
+    novos = [p.item for p in planos if p.novo]
+    for item in novos:
+        item.romaneio = romaneio
+    if novos:
+        ItemRomaneio.objects.bulk_create(novos)
+
+    alterados = [p.item for p in planos if not p.novo]
+    if alterados:
+        ItemRomaneio.objects.bulk_update(alterados, list(ITEM_CAMPOS))
+
+    if detalhado:
+        substituir = [p.item.pk for p in planos if p.substituir_unidades]
+        remover_unidades = [pk for p in planos if p.delta for pk in p.delta.remover]
+        if substituir or remover_unidades:
+            UnidadeRomaneio.objects.filter(item__romaneio=romaneio).filter(
+                Q(item_id__in=substituir) | Q(pk__in=remover_unidades)
+            ).delete()
+
+        atualizar_unidades = [u for p in planos if p.delta for u in p.delta.atualizar]
+        for unidade in atualizar_unidades:
+            _completar_m3(unidade, True)
+        if atualizar_unidades:
+            UnidadeRomaneio.objects.bulk_update(atualizar_unidades, list(UNIDADE_CAMPOS))
+
+        criar_unidades = []
+        for p in planos:
+            for unidade in p.unidades + (p.delta.criar if p.delta else []):
+                unidade.item = p.item
+                _completar_m3(unidade, True)
+                criar_unidades.append(unidade)
+        if criar_unidades:
+            UnidadeRomaneio.objects.bulk_create(criar_unidades)
+
+    recalcular_totais_romaneio(romaneio)
+    return romaneio
+
+
+# =============================================================================
+# Idempotência
+# =============================================================================
+def hash_payload(rota: str, corpo: bytes) -> str:
+    return hashlib.sha256(rota.encode() + b"\n" + (corpo or b"")).hexdigest()
+
+
+class ChaveIdempotenciaConflito(Exception):
+    """A chave já foi usada por este usuário com outro conteúdo/rota."""
+
+
+def executar_idempotente(*, usuario, chave: str | None, rota: str, corpo: bytes, executar):
+    """
+    Executa `executar()` (que retorna (status_code, resposta, romaneio)) numa
+    transação, registrando o resultado sob a chave de idempotência.
+
+    Retorna (status_code, resposta, reaproveitada):
+      - chave nova: executa e grava o resultado junto, na mesma transação
+      - chave já usada com o mesmo conteúdo: devolve o resultado original
+        sem executar de novo
+      - chave já usada com outro conteúdo: ChaveIdempotenciaConflito
+
+    Se `executar()` levantar exceção (ex.: ValidationError), nada é gravado
+    (nem a chave), então o cliente pode corrigir e reenviar.
+    Sem chave, apenas executa na transação.
+    """
+    with transaction.atomic():
+        if not chave:
+            status_code, resposta, _romaneio = executar()
+            return status_code, resposta, False
+
+        digest = hash_payload(rota, corpo)
+
+        # get_or_create trata a corrida: a 2ª requisição espera o commit da 1ª
+        # (índice único) e então encontra o registro já gravado.
+        registro, criado = RequisicaoIdempotente.objects.select_for_update().get_or_create(
+            usuario=usuario,
+            chave=chave,
+            defaults={"rota": rota, "payload_hash": digest},
+        )
+        if not criado:
+            if registro.payload_hash != digest:
+                raise ChaveIdempotenciaConflito(chave)
+            return registro.status_code, registro.resposta, True
+
+        status_code, resposta, romaneio = executar()
+
+        registro.status_code = status_code
+        registro.resposta = resposta
+        registro.romaneio = romaneio
+        registro.save(update_fields=["status_code", "resposta", "romaneio"])
+        return status_code, resposta, False
+
+
+def serializar_romaneio(romaneio: Romaneio) -> dict:
+    """Representação compacta (Decimals como string) com os totais calculados."""
+    itens = itens_com_resumo(romaneio.itens.order_by("id")).values(
+        "id",
+        "tipo_madeira_id",
+        "valor_unitario",
+        "quantidade_m3_total",
+        "valor_total",
+        "qtd_unidades",
+    )
+    return {
+        "id": romaneio.pk,
+        "numero_romaneio": romaneio.numero_romaneio,
+        "data_romaneio": romaneio.data_romaneio.isoformat(),
+        "cliente": romaneio.cliente_id,
+        "tipo_romaneio": romaneio.tipo_romaneio,
+        "modalidade": romaneio.modalidade,
+        "m3_total": str(romaneio.m3_total),
+        "valor_bruto": str(romaneio.valor_bruto),
+        "valor_total": str(romaneio.valor_total),
+        "itens": [
+            {
+                "id": i["id"],
+                "tipo_madeira": i["tipo_madeira_id"],
+                "valor_unitario": str(i["valor_unitario"]),
+                "quantidade_m3_total": str(i["quantidade_m3_total"]),
+                "valor_total": str(i["valor_total"]),
+                "qtd_unidades": i["qtd_unidades"],
+            }
+            for i in itens
+        ],
+    }
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class BenchmarkFragmentosCommandTests(TestCase):
+    def test_mede_lista_e_detalhe_nos_tres_modos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = Path(tmp) / "fragmentos.json"
+            call_command(
+                "benchmark_fragmentos",
+                "--banco-atual",
+                "--linhas", "3",
+                "--unidades", "10",
+                "--repeticoes", "2",
+                "--saida", str(saida),
+                stdout=StringIO(),
+            )
+            dados = json.loads(saida.read_text(encoding="utf-8"))
+
+        por_chave = {(r["cenario"], r["modo"]): r for r in dados["resultados"]}
+        self.assertEqual(len(por_chave), 6)
+        for r in dados["resultados"]:
+            self.assertEqual(r["status"], 200)
+        # cache quente: a consulta dos itens do detalhe não roda
+        self.assertLess(por_chave[("detalhe", "cache_quente")]["queries"], por_chave[("detalhe", "sem_cache")]["queries"])
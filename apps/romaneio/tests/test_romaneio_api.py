@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.tokens import criar_token
+from apps.romaneio.models import RequisicaoIdempotente, Romaneio, UnidadeRomaneio
+from apps.tests.factories import create_cliente, create_tipo_madeira, create_user
+
+
+class RomaneioApiTests(TestCase):
+    def setUp(self):
+        self.user = create_user(username="api_rom", password="12345678")
+        # Cliente da balança/tablet: só o token, sem sessão nem cookie/token CSRF
+        _token, chave = criar_token(self.user, "Balança", escrita=True)
+        self.client = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f"Bearer {chave}")
+
+        self.cliente = create_cliente(nome="Cliente API")
+        self.tm = create_tipo_madeira(nome="MADEIRA API", preco_normal=Decimal("10.00"))
+        self.tm2 = create_tipo_madeira(nome="MADEIRA API 2", preco_normal=Decimal("20.00"))
+
+    def _payload(self, **extra) -> dict:
+        payload = {
+            "numero_romaneio": "7001",
+            "data_romaneio": timezone.localdate().isoformat(),
+            "cliente": self.cliente.pk,
+            "tipo_romaneio": "NORMAL",
+            "modalidade": "DETALHADO",
+            "itens": [
+                {
+                    "tipo_madeira": self.tm.pk,
+                    "unidades": [
+                        {"comprimento": "4.00", "rodo": "30.00", "quantidade_m3": "0.500"},
+                        {"comprimento": "4.00", "rodo": "400.00"},  # m³ pela fórmula: 0.040
+                    ],
+                },
+            ],
+        }
+        payload.update(extra)
+        return payload
+
+    def _post(self, payload, url=None, **headers):
+        return self.client.post(
+            url or reverse("romaneio:api_romaneio_create"),
+            data=json.dumps(payload),
+            content_type="application/json",
+            **headers,
+        )
+
+    def test_cria_romaneio_com_totais(self):
+        resp = self._post(self._payload())
+        self.assertEqual(resp.status_code, 201)
+
+        data = resp.json()["romaneio"]
+        self.assertEqual(data["m3_total"], "0.540")
+        self.assertEqual(data["valor_total"], "5.40")  # preço padrão da madeira (10,00)
+        self.assertEqual(data["itens"][0]["qtd_unidades"], 2)
+
+        rom = Romaneio.objects.get(numero_romaneio="7001")
+        self.assertEqual(rom.usuario_cadastro_id, self.user.pk)
+        self.assertEqual(rom.m3_total, Decimal("0.540"))
+
+    def test_erros_de_validacao_nao_gravam(self):
+        payload = self._payload(itens=[{"tipo_madeira": self.tm.pk, "unidades": []}])
+        resp = self._post(payload, HTTP_IDEMPOTENCY_KEY="k-erro")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("itens[0]", resp.json()["errors"])
+
+        self.assertFalse(Romaneio.objects.exists())
+        self.assertFalse(RequisicaoIdempotente.objects.exists())
+
+    def test_reenvio_com_mesma_chave_nao_reexecuta(self):
+        primeira = self._post(self._payload(), HTTP_IDEMPOTENCY_KEY="k-1")
+        self.assertEqual(primeira.status_code, 201)
+
+        segunda = self._post(self._payload(), HTTP_IDEMPOTENCY_KEY="k-1")
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(Romaneio.objects.count(), 1)
+
+        conflito = self._post(self._payload(numero_romaneio="7002"), HTTP_IDEMPOTENCY_KEY="k-1")
+        self.assertEqual(conflito.status_code, 422)
+
+    def test_atualiza_com_delta_e_novo_item(self):
+        criado = self._post(self._payload()).json()["romaneio"]
+        item_id = criado["itens"][0]["id"]
+        unidade = UnidadeRomaneio.objects.filter(item_id=item_id).order_by("id").first()
+
+        payload = {
+            "itens": [
+                {"id": item_id, "unidades": {"remover": [unidade.pk]}},
+                {"tipo_madeira": self.tm2.pk, "unidades": [{"comprimento": "4.00", "rodo": "30.00", "quantidade_m3": "1.000"}]},
+            ],
+        }
+        url = reverse("romaneio:api_romaneio_update", kwargs={"pk": criado["id"]})
+        resp = self.client.patch(url, data=json.dumps(payload), content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+
+        data = resp.json()["romaneio"]
+        self.assertEqual(data["numero_romaneio"], "7001")
+        self.assertEqual(data["m3_total"], "1.040")
+        self.assertEqual(data["valor_total"], "20.40")  # 0.040 * 10 + 1.000 * 20
+
+    def test_exige_token_de_escrita(self):
+        anonimo = Client(enforce_csrf_checks=True)
+        resp = anonimo.post(
+            reverse("romaneio:api_romaneio_create"), data=json.dumps(self._payload()), content_type="application/json"
+        )
+        self.assertEqual(resp.status_code, 401)
+        self.assertFalse(resp.json()["success"])
+
+        # Sessão do navegador não basta: a API é só por token
+        anonimo.login(username="api_rom", password="12345678")
+        resp = anonimo.post(
+            reverse("romaneio:api_romaneio_create"), data=json.dumps(self._payload()), content_type="application/json"
+        )
+        self.assertEqual(resp.status_code, 401)
+
+        _token, leitura = criar_token(self.user, "BI")
+        resp = self._post(self._payload(), HTTP_AUTHORIZATION=f"Bearer {leitura}")
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(Romaneio.objects.exists())
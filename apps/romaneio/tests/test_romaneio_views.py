@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import json
 from datetime import date
 from decimal import Decimal
 
-from django.test import RequestFactory, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from apps.romaneio.forms import ItemRomaneioFormSet
 from apps.romaneio.models import Romaneio
+from apps.romaneio.services import carimbo_romaneio
 from apps.romaneio.views import RomaneioListView
-from apps.tests.factories import create_cliente, create_romaneio, create_tipo_madeira, create_user
+from apps.tests.factories import (
+    create_cliente,
+    create_item_romaneio,
+    create_romaneio,
+    create_tipo_madeira,
+    create_unidade_romaneio,
+    create_user,
+)
 
 
 class GetPrecoMadeiraEndpointTests(TestCase):
@@ -274,4 +286,187 @@ class RomaneioCreateUpdateViewTests(TestCase):
 
         rom.refresh_from_db()
         self.assertEqual(rom.m3_total, Decimal("3.000"))
-        self.assertEqual(rom.valor_total, Decimal("30.00"))
\ No newline at end of file
+        self.assertEqual(rom.valor_total, Decimal("30.00"))
+
+class UnidadesSobDemandaTests(TestCase):
+    """
+    Unidades (toras) carregadas sob demanda: resumo por item no SQL,
+    páginas via endpoint JSON e edição das toras salvas por delta.
+    """
+
+    def setUp(self):
+        self.user = create_user(username="romu", password="12345678")
+        self.client.login(username="romu", password="12345678")
+
+        self.tm = create_tipo_madeira(nome="MADEIRA UNIDADES", preco_normal=Decimal("10.00"))
+        self.rom = create_romaneio(numero_romaneio="8500", modalidade="DETALHADO", usuario_cadastro=self.user)
+        self.item = create_item_romaneio(romaneio=self.rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"))
+        self.unidades = [
+            create_unidade_romaneio(item=self.item, quantidade_m3=Decimal("0.500")) for _ in range(3)
+        ]
+
+    def test_endpoint_unidades_paginado(self):
+        url = reverse("romaneio:item_unidades", kwargs={"item_id": self.item.pk})
+        resp = self.client.get(url, {"page": 2, "page_size": 2})
+        self.assertEqual(resp.status_code, 200)
+
+        data = resp.json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(data["num_pages"], 2)
+        self.assertEqual([u["id"] for u in data["unidades"]], [self.unidades[2].pk])
+        self.assertEqual(data["unidades"][0]["quantidade_m3"], "0.500")
+
+    def test_endpoint_unidades_exige_login(self):
+        self.client.logout()
+        url = reverse("romaneio:item_unidades", kwargs={"item_id": self.item.pk})
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_detalhe_usa_resumo_sem_carregar_unidades(self):
+        resp = self.client.get(reverse("romaneio:romaneio_detail", kwargs={"pk": self.rom.pk}))
+        self.assertEqual(resp.status_code, 200)
+
+        item = resp.context["itens"][0]
+        self.assertEqual(item.qtd_unidades, 3)
+        self.assertEqual(item.m3_unidades, Decimal("1.500"))
+
+    def _update_payload(self, delta: dict | str) -> dict[str, str]:
+        p = ItemRomaneioFormSet().prefix
+        return {
+            "numero_romaneio": "8500",
+            "data_romaneio": self.rom.data_romaneio.isoformat(),
+            "cliente": str(self.rom.cliente_id),
+            "motorista": "",
+            "tipo_romaneio": "NORMAL",
+            "modalidade": "DETALHADO",
+            f"{p}-TOTAL_FORMS": "1",
+            f"{p}-INITIAL_FORMS": "1",
+            f"{p}-MIN_NUM_FORMS": "1",
+            f"{p}-MAX_NUM_FORMS": "1000",
+            f"{p}-0-id": str(self.item.pk),
+            f"{p}-0-tipo_madeira": str(self.tm.pk),
+            f"{p}-0-quantidade_m3_total": "1.500",
+            f"{p}-0-valor_unitario": "10.00",
+            "unidades-0-TOTAL_FORMS": "0",
+            "unidades-0-INITIAL_FORMS": "0",
+            "unidades-0-MIN_NUM_FORMS": "0",
+            "unidades-0-MAX_NUM_FORMS": "1000",
+            "unidades-0-delta": delta if isinstance(delta, str) else json.dumps(delta),
+        }
+
+    def test_update_aplica_delta_das_unidades_salvas(self):
+        u0, u1, _u2 = self.unidades
+        delta = {
+            "atualizar": [{"id": u0.pk, "quantidade_m3": "1.000"}],
+            "remover": [u1.pk],
+        }
+        resp = self.client.post(
+            reverse("romaneio:romaneio_update", kwargs={"pk": self.rom.pk}),
+            data=self._update_payload(delta),
+        )
+        self.assertEqual(resp.status_code, 302)
+
+        self.rom.refresh_from_db()
+        self.assertEqual(self.item.unidades.count(), 2)
+        self.assertEqual(self.rom.m3_total, Decimal("1.500"))
+        self.assertEqual(self.rom.valor_total, Decimal("15.00"))
+
+    def test_update_delta_invalido_reexibe_formulario(self):
+        resp = self.client.post(
+            reverse("romaneio:romaneio_update", kwargs={"pk": self.rom.pk}),
+            data=self._update_payload({"remover": [999999]}),
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.item.unidades.count(), 3)
+
+
+class GetCondicionalRomaneioTests(TestCase):
+    """Detalhe e exports de um romaneio respondem 304 quando nada mudou."""
+
+    def setUp(self):
+        self.user = create_user(username="rometag", password="12345678")
+        self.client.login(username="rometag", password="12345678")
+
+        self.tm = create_tipo_madeira(nome="MADEIRA ETAG", preco_normal=Decimal("10.00"))
+        self.rom = create_romaneio(numero_romaneio="8600", modalidade="DETALHADO", usuario_cadastro=self.user)
+        self.item = create_item_romaneio(romaneio=self.rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"))
+        self.unidade = create_unidade_romaneio(item=self.item, quantidade_m3=Decimal("0.500"))
+
+    def _revalidar(self, url_name: str, kwargs: dict):
+        url = reverse(url_name, kwargs=kwargs)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.has_header("ETag"))
+        return url, resp["ETag"]
+
+    def test_detalhe_304_e_invalidado_pela_unidade(self):
+        url, etag = self._revalidar("romaneio:romaneio_detail", {"pk": self.rom.pk})
+
+        with self.assertNumQueries(3):  # sessão + usuário + registro de versões
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        # Mudança que não altera totais (só o comprimento) também muda a versão
+        self.unidade.comprimento = Decimal("5.00")
+        self.unidade.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_export_excel_304(self):
+        url, etag = self._revalidar("relatorios:romaneio_export_excel", {"romaneio_id": self.rom.pk})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.rom.desconto = Decimal("10.00")
+        self.rom.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_export_pdf_304_sem_renderizar(self):
+        etag = carimbo_romaneio(self.rom.pk, extra="pdf").etag
+        url = reverse("relatorios:romaneio_export_pdf", kwargs={"romaneio_id": self.rom.pk})
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+
+@override_settings(FRAGMENT_CACHE_TIMEOUT=600)
+class FragmentosRomaneioTests(TestCase):
+    """Linhas da lista e tabela de itens do detalhe em cache pela versão do romaneio."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = create_user(username="romfrag", password="12345678")
+        self.client.login(username="romfrag", password="12345678")
+
+        self.tm = create_tipo_madeira(nome="MADEIRA FRAGMENTO", preco_normal=Decimal("10.00"))
+        self.rom = create_romaneio(numero_romaneio="8700", modalidade="DETALHADO", usuario_cadastro=self.user)
+        self.item = create_item_romaneio(romaneio=self.rom, tipo_madeira=self.tm, valor_unitario=Decimal("10.00"))
+        self.unidade = create_unidade_romaneio(item=self.item, quantidade_m3=Decimal("0.500"))
+        self.url_detalhe = reverse("romaneio:romaneio_detail", kwargs={"pk": self.rom.pk})
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx.captured_queries)
+
+    def test_detalhe_reaproveita_itens_e_invalida_na_unidade(self):
+        _, frio = self._get(self.url_detalhe)
+        resp, quente = self._get(self.url_detalhe)
+        self.assertEqual(quente, frio - 1)  # consulta dos itens não roda
+        self.assertContains(resp, "0,500 m³")
+
+        create_unidade_romaneio(item=self.item, quantidade_m3=Decimal("0.250"))
+        resp, _ = self._get(self.url_detalhe)
+        self.assertContains(resp, "0,750 m³")
+        self.assertContains(resp, "2 unidades")
+
+    def test_linha_da_lista_invalida_no_item_e_no_cliente(self):
+        url = reverse("romaneio:romaneio_list")
+        self.assertContains(self._get(url)[0], "R$ 5,00")
+
+        create_unidade_romaneio(item=self.item, quantidade_m3=Decimal("1.000"))
+        self.assertContains(self._get(url)[0], "R$ 15,00")
+
+        self.rom.cliente.nome = "CLIENTE RENOMEADO"
+        self.rom.cliente.save()
+        self.assertContains(self._get(url)[0], "CLIENTE RENOMEADO")
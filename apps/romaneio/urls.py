@@ -6,7 +6,10 @@ from .views import (
     RomaneioUpdateView,
     RomaneioDetailView,
     RomaneioDeleteView,
+    api_romaneio_create,
+    api_romaneio_update,
     get_preco_madeira,
+    item_unidades,
 )
 
 app_name = "romaneio"
@@ -20,4 +23,9 @@ urlpatterns = [
 
     # API utilitária
     path("api/preco-madeira/", get_preco_madeira, name="get_preco_madeira"),
+    path("api/itens/<int:item_id>/unidades/", item_unidades, name="item_unidades"),
+
+    # API JSON de gravação (idempotente via header Idempotency-Key)
+    path("api/romaneios/", api_romaneio_create, name="api_romaneio_create"),
+    path("api/romaneios/<int:pk>/", api_romaneio_update, name="api_romaneio_update"),
 ]
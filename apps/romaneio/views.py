@@ -1,20 +1,42 @@
 from __future__ import annotations
 
+import json
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Sum
 from django.http import JsonResponse
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.views.decorators.http import require_http_methods
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
 
 from apps.cadastros.models import Cliente, TipoMadeira
+from apps.core import versoes
+from apps.core.fechamento import validar_aberto
+from apps.core.paginacao import KeysetPaginationMixin
+from apps.core.parcial import FragmentoMixin, sem_filtros
+from apps.core.tokens import token_escrita_obrigatorio
 
 from .forms import ItemRomaneioFormSet, RomaneioForm, UnidadeRomaneioFormSet
-from .models import Romaneio
+from .models import ItemRomaneio, Romaneio, UnidadeRomaneio
+from .services import (
+    ChaveIdempotenciaConflito,
+    anotar_versao_fragmento,
+    aplicar_delta_unidades,
+    carimbo_romaneio,
+    executar_idempotente,
+    itens_com_resumo,
+    pagina_unidades,
+    parse_delta_unidades,
+    salvar_romaneio_json,
+    serializar_romaneio,
+)
 
 
 # =============================================================================
@@ -37,11 +59,13 @@ def build_tipos_madeira_json() -> dict[str, dict[str, float]]:
 # =============================================================================
 # Listagem
 # =============================================================================
-class RomaneioListView(LoginRequiredMixin, ListView):
+class RomaneioListView(LoginRequiredMixin, FragmentoMixin, KeysetPaginationMixin, ListView):
     model = Romaneio
     template_name = "romaneio/romaneio_list.html"
+    template_fragmento = "romaneio/_romaneio_list_resultados.html"
     context_object_name = "romaneios"
     paginate_by = 20
+    ordenacao_keyset = ("-data_romaneio", "-id")
 
     def get_queryset(self):
         qs = self.model.objects.select_related("cliente", "motorista", "romaneiador").order_by("-data_romaneio", "-id")
@@ -70,7 +94,7 @@ class RomaneioListView(LoginRequiredMixin, ListView):
             qs = qs.filter(data_romaneio__year=ano_int)
         elif mes_int:
             qs = qs.filter(data_romaneio__month=mes_int)
-        elif not self.request.GET:
+        elif sem_filtros(self.request):
             now = timezone.localdate()
             qs = qs.filter(data_romaneio__month=now.month, data_romaneio__year=now.year)
 
@@ -83,19 +107,29 @@ class RomaneioListView(LoginRequiredMixin, ListView):
 
         return qs
 
+    def get_resumo_agregados(self):
+        return {"total_m3": Sum("m3_total"), "total_valor": Sum("valor_total")}
+
+    def get_contexto_filtros(self):
+        anos = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
+        return {
+            "clientes": Cliente.objects.filter(ativo=True).order_by("nome"),
+            "anos": anos or [timezone.localdate().year],
+            "meses": range(1, 13),
+            "modalidades": Romaneio.MODALIDADE_CHOICES,
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context["clientes"] = Cliente.objects.filter(ativo=True).order_by("nome")
-
-        totais = self.object_list.aggregate(total_m3=Sum("m3_total"), total_valor=Sum("valor_total"))
-        context["total_m3_periodo"] = totais["total_m3"] or 0
-        context["total_valor_periodo"] = totais["total_valor"] or 0
+        # contagem e totais do período vêm da mesma consulta (KeysetPaginationMixin)
+        context["total_m3_periodo"] = self.resumo["total_m3"] or 0
+        context["total_valor_periodo"] = self.resumo["total_valor"] or 0
 
-        anos = [d.year for d in Romaneio.objects.dates("data_romaneio", "year", order="ASC")]
-        context["anos"] = anos or [timezone.localdate().year]
-        context["meses"] = range(1, 13)
-        context["modalidades"] = Romaneio.MODALIDADE_CHOICES
+        # Linhas em cache por romaneio (chave = id + versão); ver romaneio_list.html
+        context["fragmento_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        if settings.FRAGMENT_CACHE_TIMEOUT:
+            anotar_versao_fragmento(context["romaneios"])
         return context
 
 
@@ -105,26 +139,37 @@ class RomaneioListView(LoginRequiredMixin, ListView):
 class _RomaneioFormsetsMixin:
     """
     Monta e injeta no context:
-    - ItemRomaneioFormSet
+    - ItemRomaneioFormSet (itens anotados com qtd_unidades/m3_unidades via SQL)
     - UnidadeRomaneioFormSet por item (prefixo estável: unidades-{index})
     - itens_com_unidades: lista de tuplas (item_form, unidade_formset)
     - tipos_madeira_json
+
+    Unidades já salvas NÃO são renderizadas no formset: o template as carrega sob
+    demanda, em páginas, pelo endpoint JSON (romaneio:item_unidades). O formset de
+    unidades só carrega as toras NOVAS; edições/remoções das existentes chegam como
+    delta por item (campo oculto unidades-{index}-delta).
     """
 
+    @staticmethod
+    def _itens_queryset():
+        return itens_com_resumo(ItemRomaneio.objects.select_related("tipo_madeira"))
+
     def _build_item_formset(self):
+        instance = getattr(self, "object", None)
         if self.request.POST:
-            return ItemRomaneioFormSet(self.request.POST, instance=getattr(self, "object", None))
-        return ItemRomaneioFormSet(instance=getattr(self, "object", None))
+            return ItemRomaneioFormSet(self.request.POST, instance=instance, queryset=self._itens_queryset())
+        return ItemRomaneioFormSet(instance=instance, queryset=self._itens_queryset())
 
     def _build_unidades_formsets(self, formset):
         unidades_formsets = []
         for i, item_form in enumerate(formset.forms):
             prefix = f"unidades-{i}"
             instance = item_form.instance if getattr(item_form.instance, "pk", None) else None
+            queryset = UnidadeRomaneio.objects.none()
             if self.request.POST:
-                uf = UnidadeRomaneioFormSet(self.request.POST, instance=instance, prefix=prefix)
+                uf = UnidadeRomaneioFormSet(self.request.POST, instance=instance, prefix=prefix, queryset=queryset)
             else:
-                uf = UnidadeRomaneioFormSet(instance=instance, prefix=prefix)
+                uf = UnidadeRomaneioFormSet(instance=instance, prefix=prefix, queryset=queryset)
             unidades_formsets.append(uf)
         return unidades_formsets
 
@@ -134,9 +179,15 @@ class _RomaneioFormsetsMixin:
         if unidades_formsets is None:
             unidades_formsets = self._build_unidades_formsets(formset)
 
+        # Delta pendente das toras salvas (reexibido se o POST voltar com erros)
+        deltas_unidades = [
+            (self.request.POST.get(f"unidades-{i}-delta") or "") if self.request.POST else ""
+            for i in range(len(formset.forms))
+        ]
+
         context["formset"] = formset
         context["unidades_formsets"] = unidades_formsets
-        context["itens_com_unidades"] = list(zip(formset.forms, unidades_formsets))
+        context["itens_com_unidades"] = list(zip(formset.forms, unidades_formsets, deltas_unidades))
         context["tipos_madeira_json"] = build_tipos_madeira_json()
         return context
 
@@ -188,16 +239,65 @@ class _RomaneioSaveMixin:
                 ok = False
         return ok
 
-    def _save_unidades_for_itens(self, request, itens) -> None:
+    @staticmethod
+    def _item_form_ativo(item_form) -> bool:
+        """Form de item com instância salva e não marcado para exclusão."""
+        if not getattr(item_form.instance, "pk", None):
+            return False
+        cleaned = getattr(item_form, "cleaned_data", None) or {}
+        return not cleaned.get("DELETE", False)
+
+    def _parse_deltas_unidades(self, request, form, formset, unidades_formsets) -> tuple[dict, bool]:
         """
-        Salva unidades para cada item (apenas no DETALHADO).
+        Lê e valida o delta de unidades já salvas de cada item (campo oculto
+        unidades-{index}-delta, JSON). Erros vão para o non_form_errors do
+        formset de unidades do item.
+
+        Retorna ({index: DeltaUnidades}, ok).
+        """
+        deltas = {}
+        if not self._is_detalhado(form):
+            return deltas, True
+
+        ok = True
+        for i, item_form in enumerate(formset.forms):
+            raw = (request.POST.get(f"unidades-{i}-delta") or "").strip()
+            if not raw or not self._item_form_ativo(item_form):
+                continue
+            try:
+                deltas[i] = parse_delta_unidades(item_form.instance, json.loads(raw))
+            except (ValueError, ValidationError) as exc:
+                msgs = exc.messages if isinstance(exc, ValidationError) else ["Alterações das unidades inválidas."]
+                if i < len(unidades_formsets):
+                    unidades_formsets[i]._non_form_errors.extend(msgs)
+                ok = False
+        return deltas, ok
+
+    def _save_unidades_for_itens(self, request, formset, deltas=None) -> None:
+        """
+        Salva unidades para cada item (apenas no DETALHADO):
+        - toras novas via formset (prefixo unidades-{index})
+        - toras existentes via delta (bulk_update/delete)
+
+        Percorre formset.forms (e não o retorno de formset.save(), que só traz
+        itens alterados) para manter o índice do prefixo alinhado ao item.
         """
         if request.POST.get("modalidade") != "DETALHADO":
             return
 
-        for i, item in enumerate(itens):
+        deltas = deltas or {}
+        for i, item_form in enumerate(formset.forms):
+            if not self._item_form_ativo(item_form):
+                continue
+            item = item_form.instance
+
+            if i in deltas:
+                aplicar_delta_unidades(deltas[i], atualizar_totais=False)
+
             prefix = f"unidades-{i}"
-            uf = UnidadeRomaneioFormSet(request.POST, instance=item, prefix=prefix)
+            uf = UnidadeRomaneioFormSet(
+                request.POST, instance=item, prefix=prefix, queryset=UnidadeRomaneio.objects.none()
+            )
             if uf.is_valid():
                 uf.save()
 
@@ -208,7 +308,7 @@ class _RomaneioSaveMixin:
         - SIMPLES: item.atualizar_totais usa quantidade_m3_total informada.
         - DETALHADO: item.atualizar_totais soma unidades.
         """
-        itens_db = romaneio.itens.all().prefetch_related("unidades")
+        itens_db = romaneio.itens.select_related("romaneio")
         for item in itens_db:
             item.atualizar_totais(save=True, atualizar_romaneio=False)
 
@@ -235,7 +335,7 @@ class RomaneioCreateView(LoginRequiredMixin, _RomaneioFormsetsMixin, _RomaneioSa
 
         # Ancorar o inline formset numa instância (mesmo não salva ainda)
         self.object = Romaneio()
-        formset = ItemRomaneioFormSet(request.POST, instance=self.object)
+        formset = ItemRomaneioFormSet(request.POST, instance=self.object, queryset=self._itens_queryset())
 
         # Preview para o template (sempre construímos, mas só validamos no DETALHADO)
         unidades_formsets_preview = self._build_unidades_preview_for_create(request, formset)
@@ -263,10 +363,10 @@ class RomaneioCreateView(LoginRequiredMixin, _RomaneioFormsetsMixin, _RomaneioSa
 
         # Salva itens
         formset.instance = self.object
-        itens = formset.save()
+        formset.save()
 
         # Salva unidades (DETALHADO) e recalcula
-        self._save_unidades_for_itens(request, itens)
+        self._save_unidades_for_itens(request, formset)
         self._recalcular_totais_apos_salvar(self.object)
 
         messages.success(request, f"Romaneio {self.object.numero_romaneio} cadastrado com sucesso!")
@@ -288,14 +388,17 @@ class RomaneioUpdateView(LoginRequiredMixin, _RomaneioFormsetsMixin, _RomaneioSa
         self.object = self.get_object()
         form = self.get_form()
 
-        formset = ItemRomaneioFormSet(request.POST, instance=self.object)
+        formset = ItemRomaneioFormSet(request.POST, instance=self.object, queryset=self._itens_queryset())
         unidades_formsets = self._build_unidades_formsets(formset)
 
         form_valid = form.is_valid()
         formset_valid = formset.is_valid()
 
+        deltas = {}
         if self._is_detalhado(form):
             unidades_valid = all(uf.is_valid() for uf in unidades_formsets)
+            deltas, deltas_valid = self._parse_deltas_unidades(request, form, formset, unidades_formsets)
+            unidades_valid = unidades_valid and deltas_valid
         else:
             unidades_valid = True
 
@@ -311,10 +414,10 @@ class RomaneioUpdateView(LoginRequiredMixin, _RomaneioFormsetsMixin, _RomaneioSa
         # Salva romaneio e itens
         self.object = form.save()
         formset.instance = self.object
-        itens = formset.save()
+        formset.save()
 
         # Salva unidades (DETALHADO) e recalcula
-        self._save_unidades_for_itens(request, itens)
+        self._save_unidades_for_itens(request, formset, deltas)
         self._recalcular_totais_apos_salvar(self.object)
 
         messages.success(request, f"Romaneio {self.object.numero_romaneio} atualizado com sucesso!")
@@ -326,6 +429,14 @@ class RomaneioDeleteView(LoginRequiredMixin, DeleteView):
     template_name = "romaneio/romaneio_confirm_delete.html"
     success_url = reverse_lazy("romaneio:romaneio_list")
 
+    def form_valid(self, form):
+        try:
+            validar_aberto(self.object.data_romaneio)
+        except ValidationError as exc:
+            messages.error(self.request, exc.messages[0])
+            return redirect(self.get_success_url())
+        return super().form_valid(form)
+
     def delete(self, request, *args, **kwargs):
         messages.success(request, "Romaneio excluído com sucesso!")
         return super().delete(request, *args, **kwargs)
@@ -336,9 +447,26 @@ class RomaneioDetailView(LoginRequiredMixin, DetailView):
     template_name = "romaneio/romaneio_detail.html"
     context_object_name = "romaneio"
 
+    def get(self, request, *args, **kwargs):
+        # GET condicional: 304 antes de buscar o romaneio/itens quando o navegador já tem esta versão.
+        # Mensagens pendentes (ex.: após salvar) precisam ser exibidas: nesse caso renderiza sempre.
+        self.carimbo = carimbo_romaneio(kwargs["pk"], extra=f"html:{request.user.pk}")
+        if not len(messages.get_messages(request)):
+            nao_modificado = versoes.resposta_condicional(request, self.carimbo)
+            if nao_modificado is not None:
+                return nao_modificado
+        return versoes.aplicar_validadores(super().get(request, *args, **kwargs), self.carimbo)
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("cliente", "motorista", "romaneiador", "usuario_cadastro")
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["itens"] = self.object.itens.select_related("tipo_madeira").prefetch_related("unidades")
+        # Resumo das unidades vem do SQL; as toras são carregadas sob demanda (JSON paginado)
+        # Queryset preguiçoso: com a tabela de itens em cache (mesma versão) ele nem é executado
+        context["itens"] = itens_com_resumo(self.object.itens.select_related("tipo_madeira"))
+        context["fragmento_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        context["versao_itens"] = self.carimbo.versao
         return context
 
 
@@ -360,4 +488,81 @@ def get_preco_madeira(request):
     except TipoMadeira.DoesNotExist:
         return JsonResponse({"success": False, "error": "Tipo de madeira não encontrado"}, status=404)
     except Exception as e:
-        return JsonResponse({"success": False, "error": str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+@login_required
+def item_unidades(request, item_id: int):
+    """
+    Endpoint AJAX: unidades (toras) de um item, paginadas.
+
+    GET params:
+      - page (padrão 1)
+      - page_size (padrão 50, máx. 500)
+    """
+    item = get_object_or_404(ItemRomaneio.objects.only("id"), pk=item_id)
+    data = pagina_unidades(item.pk, page=request.GET.get("page") or 1, page_size=request.GET.get("page_size"))
+    return JsonResponse({"success": True, **data})
+
+
+def _api_salvar_romaneio(request, instance: Romaneio | None = None) -> JsonResponse:
+    """
+    Grava o romaneio a partir do corpo JSON, numa única transação.
+
+    Header opcional `Idempotency-Key`: reenvios com a mesma chave (e o mesmo
+    corpo) devolvem a resposta original sem gravar de novo.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"success": False, "error": "JSON inválido."}, status=400)
+
+    status_ok = 200 if instance is not None else 201
+
+    def executar():
+        romaneio = salvar_romaneio_json(data, instance=instance, usuario=request.user)
+        return status_ok, {"success": True, "romaneio": serializar_romaneio(romaneio)}, romaneio
+
+    chave = (request.headers.get("Idempotency-Key") or "").strip()[:100]
+    try:
+        status_code, resposta, reaproveitada = executar_idempotente(
+            usuario=request.user,
+            chave=chave or None,
+            rota=f"{request.method} {request.path}",
+            corpo=request.body,
+            executar=executar,
+        )
+    except ValidationError as exc:
+        erros = exc.message_dict if hasattr(exc, "error_dict") else {"__all__": exc.messages}
+        return JsonResponse({"success": False, "errors": erros}, status=400)
+    except ChaveIdempotenciaConflito:
+        return JsonResponse(
+            {"success": False, "error": "Idempotency-Key já utilizada com outro conteúdo."},
+            status=422,
+        )
+
+    response = JsonResponse(resposta, status=status_code)
+    if reaproveitada:
+        response["Idempotent-Replayed"] = "true"
+    return response
+
+
+@token_escrita_obrigatorio
+@require_http_methods(["POST"])
+def api_romaneio_create(request):
+    """
+    Endpoint JSON: cria romaneio com itens e unidades (formato em
+    services.salvar_romaneio_json). Responde 201 com os totais calculados.
+    Autenticação por token com escrita (Authorization: Bearer), sem sessão nem CSRF.
+    """
+    return _api_salvar_romaneio(request)
+
+
+@token_escrita_obrigatorio
+@require_http_methods(["POST", "PUT", "PATCH"])
+def api_romaneio_update(request, pk: int):
+    """
+    Endpoint JSON: atualiza romaneio (campos omitidos mantêm o valor atual).
+    """
+    romaneio = get_object_or_404(Romaneio, pk=pk)
+    return _api_salvar_romaneio(request, instance=romaneio)
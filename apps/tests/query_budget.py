@@ -0,0 +1,94 @@
+"""
+Orçamento de queries por URL.
+
+Cada entrada da tabela diz quantas queries uma URL pode fazer com a massa pequena e com a
+massa grande. O teste mede as duas e falha quando:
+  - o orçamento de algum tamanho é estourado; ou
+  - o nº de queries cresce com a massa (N+1), a menos que a entrada declare `cresce=True`.
+
+A mensagem de falha lista as queries agrupadas por assinatura (mesmo SQL, parâmetros
+diferentes), com as mais repetidas primeiro — normalmente é ali que está o laço.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core.middleware import assinatura_sql
+
+
+@dataclass(frozen=True)
+class Orcamento:
+    url_name: str
+    pequeno: int
+    grande: int
+    # kwargs da URL resolvidos na hora da medição (ex.: pk do primeiro romaneio)
+    kwargs: Callable[[], dict] | None = None
+    params: dict = field(default_factory=dict)
+    status: int = 200
+    # N+1 conhecido e ainda não corrigido: permite crescer até `grande`
+    cresce: bool = False
+    # RawSQL específico do PostgreSQL (não roda no SQLite dos testes)
+    apenas_postgres: bool = False
+
+    def url(self) -> str:
+        return reverse(self.url_name, kwargs=self.kwargs() if self.kwargs else None)
+
+
+@dataclass
+class Medicao:
+    orcamento: Orcamento
+    status: int
+    queries: list[str]
+
+    @property
+    def total(self) -> int:
+        return len(self.queries)
+
+
+def medir(client, orcamento: Orcamento) -> Medicao:
+    url = orcamento.url()  # resolver kwargs consulta o banco: fica fora da contagem
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(url, orcamento.params)
+    return Medicao(orcamento, resp.status_code, [q["sql"] for q in ctx.captured_queries])
+
+
+def relatorio_queries(queries: list[str], limite: int = 10) -> str:
+    """Queries agrupadas por assinatura, mais repetidas primeiro."""
+    contagem = Counter(assinatura_sql(sql) for sql in queries)
+    exemplo = {}
+    for sql in queries:
+        exemplo.setdefault(assinatura_sql(sql), sql)
+
+    linhas = []
+    for assinatura, vezes in contagem.most_common(limite):
+        linhas.append(f"    {vezes:>4}x  {exemplo[assinatura][:300]}")
+    if len(contagem) > limite:
+        linhas.append(f"    ... e mais {len(contagem) - limite} assinatura(s)")
+    return "\n".join(linhas)
+
+
+def verificar(pequena: Medicao, grande: Medicao) -> list[str]:
+    """Problemas encontrados para uma URL (lista vazia = dentro do orçamento)."""
+    o = pequena.orcamento
+    problemas = []
+
+    for medicao, limite, rotulo in ((pequena, o.pequeno, "massa pequena"), (grande, o.grande, "massa grande")):
+        if medicao.status != o.status:
+            problemas.append(f"status {medicao.status} (esperado {o.status}) na {rotulo}")
+        elif medicao.total > limite:
+            problemas.append(
+                f"{medicao.total} queries na {rotulo} (orçamento {limite}):\n{relatorio_queries(medicao.queries)}"
+            )
+
+    if not o.cresce and grande.total > pequena.total:
+        problemas.append(
+            f"queries crescem com a massa: {pequena.total} → {grande.total} (provável N+1):\n"
+            f"{relatorio_queries(grande.queries)}"
+        )
+    return problemas
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.cadastros.models import Cliente, Motorista, TipoMadeira
+from apps.financeiro.models import Pagamento
+from apps.romaneio.models import Romaneio
+from apps.tests.factories import create_user
+from apps.tests.query_budget import Orcamento, medir, verificar
+
+
+def _pk(model):
+    return lambda: {"pk": model.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+_HOJE = timezone.localdate()
+_PERIODO = {"mes": _HOJE.month, "ano": _HOJE.year}
+
+# Massa pequena e o que é acrescentado para formar a massa grande (mesmo mês corrente)
+MASSA_PEQUENA = dict(clientes=3, tipos=3, motoristas=2, romaneiadores=1, romaneios=6, itens=10, unidades=30, pagamentos=4)
+MASSA_EXTRA = dict(clientes=9, tipos=6, motoristas=4, romaneiadores=2, romaneios=30, itens=60, unidades=150, pagamentos=20)
+
+ORCAMENTOS = [
+    # ----- relatórios -----
+    # sessão/usuário + KPIs (3 meses, agregação condicional) + devedores + anos + top clientes + madeiras
+    Orcamento("relatorios:dashboard", 7, 7, params=_PERIODO),
+    # sessão/usuário + página (keyset) + contagem/totais numa consulta + filtros + anos
+    Orcamento("relatorios:ficha_romaneios", 8, 8, params=_PERIODO),
+    Orcamento("relatorios:ficha_madeiras", 7, 7, params=_PERIODO),
+    Orcamento("relatorios:fluxo_financeiro", 10, 10, params=_PERIODO),
+    # fragmento (?partial=1): sem as opções dos filtros (clientes, madeiras, anos...)
+    Orcamento("relatorios:ficha_romaneios", 4, 4, params={**_PERIODO, "partial": "1"}),
+    Orcamento("relatorios:ficha_madeiras", 4, 4, params={**_PERIODO, "partial": "1"}),
+    Orcamento("relatorios:fluxo_financeiro", 6, 6, params={**_PERIODO, "partial": "1"}),
+    # N+1 conhecido: filtra/ordena pela property saldo_atual (2 queries por cliente)
+    Orcamento("relatorios:saldo_clientes", 15, 51, cresce=True),
+    # sessão/usuário + matriz (um GROUP BY madeira, mês) + anos
+    Orcamento("relatorios:pivot", 4, 4, params={"ano": _HOJE.year}),
+    Orcamento("core:dashboard", 4, 4, params=_PERIODO),  # sessão/usuário (base.html) + KPIs + devedores
+    # ----- romaneios -----
+    Orcamento("romaneio:romaneio_list", 6, 6),  # contagem e totais do período na mesma consulta
+    Orcamento("romaneio:romaneio_list", 4, 4, params={"partial": "1"}),  # fragmento: sem clientes/anos
+    Orcamento("romaneio:romaneio_create", 9, 9),
+    # sessão/usuário + registro de versões (ETag) + romaneio c/ cadastros + itens c/ resumo
+    Orcamento("romaneio:romaneio_detail", 5, 5, kwargs=_pk(Romaneio)),
+    Orcamento("romaneio:romaneio_update", 12, 12, kwargs=_pk(Romaneio)),
+    # ----- financeiro -----
+    Orcamento("financeiro:pagamento_list", 5, 5),  # contagem e total do período na mesma consulta
+    Orcamento("financeiro:pagamento_create", 3, 3),
+    Orcamento("financeiro:pagamento_update", 4, 4, kwargs=_pk(Pagamento)),
+    # ----- cadastros -----
+    Orcamento("cadastros:cliente_list", 10, 28, cresce=True),  # N+1 conhecido (saldo_atual no template)
+    Orcamento("cadastros:cliente_create", 2, 2),
+    Orcamento("cadastros:cliente_update", 3, 3, kwargs=_pk(Cliente)),
+    Orcamento("cadastros:cliente_delete", 7, 7, kwargs=_pk(Cliente)),
+    Orcamento("cadastros:tipo_madeira_list", 4, 4),
+    Orcamento("cadastros:tipo_madeira_create", 2, 2),
+    Orcamento("cadastros:tipo_madeira_update", 3, 3, kwargs=_pk(TipoMadeira)),
+    Orcamento("cadastros:tipo_madeira_delete", 3, 3, kwargs=_pk(TipoMadeira)),
+    Orcamento("cadastros:motorista_list", 4, 4),
+    Orcamento("cadastros:motorista_create", 2, 2),
+    Orcamento("cadastros:motorista_update", 3, 3, kwargs=_pk(Motorista)),
+    Orcamento("cadastros:motorista_delete", 3, 3, kwargs=_pk(Motorista)),
+    Orcamento("cadastros:usuario_list", 4, 4),
+    Orcamento("cadastros:usuario_create", 2, 2),
+]
+
+
+class QueryBudgetTests(TestCase):
+    """Orçamento de queries das URLs do smoke test (ver apps/tests/query_budget.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(username="orcamento", password="12345678", is_staff=True, is_superuser=True)
+        cls._semear("P", MASSA_PEQUENA)
+
+    @classmethod
+    def _semear(cls, prefixo: str, qtd: dict):
+        call_command("gerar_dados_sinteticos", seed=7, prefixo=prefixo, meses=1, stdout=StringIO(), **qtd)
+        # o detalhe do romaneio exibe o usuário de cadastro
+        Romaneio.objects.filter(usuario_cadastro__isnull=True).update(usuario_cadastro=cls.user)
+
+    def test_urls_dentro_do_orcamento(self):
+        self.client.login(username="orcamento", password="12345678")
+        orcamentos = [o for o in ORCAMENTOS if connection.vendor == "postgresql" or not o.apenas_postgres]
+
+        # Por posição: a mesma URL aparece com parâmetros diferentes (página completa e fragmento)
+        pequenas = [medir(self.client, o) for o in orcamentos]
+        self._semear("G", MASSA_EXTRA)
+        grandes = [medir(self.client, o) for o in orcamentos]
+
+        for o, pequena, grande in zip(orcamentos, pequenas, grandes):
+            rotulo = f"{o.url_name} {o.params}" if o.params else o.url_name
+            with self.subTest(url=rotulo):
+                problemas = verificar(pequena, grande)
+                if problemas:
+                    self.fail(f"{rotulo}:\n  " + "\n  ".join(problemas))
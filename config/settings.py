@@ -105,16 +105,21 @@ INSTALLED_APPS = [
 # =========================
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Métricas por requisição (SQL/template/total); inerte se REQUEST_METRICS_ENABLED=False
+    "apps.core.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Profiling sob demanda (staff + token assinado); custo zero sem o token
+    "apps.core.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 # =========================
 # Templates
@@ -150,6 +155,64 @@ DATABASES = {
     }
 }
 
+# =========================
+# Cache
+# =========================
+# CACHE_BACKEND:
+#   - locmem (padrão): memória do processo — ok para 1 worker / desenvolvimento;
+#   - file: diretório compartilhado entre os workers do gunicorn (CACHE_LOCATION);
+#   - redis: servidor Redis/compatível (CACHE_LOCATION=redis://host:6379/1; requer o pacote `redis`).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").strip().lower()
+_CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "romaneios"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", str(BASE_DIR / "cache")),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+_cache_engine, _cache_location = _CACHE_BACKENDS.get(CACHE_BACKEND, _CACHE_BACKENDS["locmem"])
+CACHES = {
+    "default": {
+        "BACKEND": _cache_engine,
+        "LOCATION": os.getenv("CACHE_LOCATION", _cache_location),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+        "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "romaneios"),
+    }
+}
+
+# Cache de resultados dos relatórios (apps.relatorios.cache); 0 desliga
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", "600"))
+# Fragmentos de template por romaneio (linhas da lista, tabela de itens do detalhe); 0 desliga.
+# A chave inclui a versão do romaneio, então o timeout só limita memória.
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", "86400"))
+# Pontos de meses fechados das séries mensais do dashboard (chave com a versão do mês); 0 desliga
+SERIES_CACHE_TIMEOUT = int(os.getenv("SERIES_CACHE_TIMEOUT", "604800"))
+# Listas paginadas por keyset: sem totais a calcular, acima deste número de linhas estimadas
+# pelo planejador (EXPLAIN, só PostgreSQL) a contagem exibida é a estimativa; 0 = sempre COUNT(*)
+KEYSET_APPROX_COUNT_THRESHOLD = int(os.getenv("KEYSET_APPROX_COUNT_THRESHOLD", "50000"))
+
+# API NDJSON (BI): linhas por consulta do streaming (lotes por keyset em id)
+API_NDJSON_BATCH_SIZE = int(os.getenv("API_NDJSON_BATCH_SIZE", "2000"))
+
+# =========================
+# Views assíncronas (ASGI)
+# =========================
+# Threads (por processo) para as consultas em paralelo do dashboard; cada uma mantém a sua
+# conexão com o banco (CONN_MAX_AGE). 0 = consultas em sequência na thread da requisição.
+ASYNC_QUERY_THREADS = int(os.getenv("ASYNC_QUERY_THREADS", "4"))
+# Threads (por processo) para montar Excel/PDF dos exports; limita a CPU/memória gasta em
+# renderização simultânea. 0 = renderiza na thread da requisição.
+REPORT_RENDER_THREADS = int(os.getenv("REPORT_RENDER_THREADS", "2"))
+
+# =========================
+# PDF (WeasyPrint)
+# =========================
+# Processos (por worker web) que geram os PDFs, já com fontes e CSS dos templates carregados
+# (apps.relatorios.pdf). 0 = gera no próprio processo, sem timeout nem limite de memória.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+# Segundos por PDF; acima disso o processo é descartado e a view responde erro
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))
+# Limite de memória (espaço de endereçamento) de cada processo de PDF, em MB; 0 = sem limite
+PDF_MEMORY_LIMIT_MB = int(os.getenv("PDF_MEMORY_LIMIT_MB", "1024"))
+
 # =========================
 # Senhas
 # =========================
@@ -226,6 +289,19 @@ LOGGING = {
     "root": {"handlers": ["console"], "level": "DEBUG" if DEBUG else "INFO"},
 }
 
+# Métricas por requisição (apps.core.middleware.RequestMetricsMiddleware)
+REQUEST_METRICS_ENABLED = env_bool("REQUEST_METRICS_ENABLED", False)
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS", "1000"))
+REQUEST_METRICS_TOP_SQL = int(os.getenv("REQUEST_METRICS_TOP_SQL", "5"))
+REQUEST_METRICS_N_PLUS_ONE_MIN = int(os.getenv("REQUEST_METRICS_N_PLUS_ONE_MIN", "3"))
+
+# Profiling sob demanda (apps.core.profiling): página /core/profiling/ para staff
+PROFILING_ENABLED = env_bool("PROFILING_ENABLED", True)
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles")))
+PROFILING_MAX_DUMPS = int(os.getenv("PROFILING_MAX_DUMPS", "20"))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600"))
+PROFILING_TOP_N = int(os.getenv("PROFILING_TOP_N", "30"))
+
 # =========================
 # Debug helpers
 # =========================
@@ -23,4 +23,16 @@ EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 # Segurança: durante testes não precisa forçar HTTPS redirect
 SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
-CSRF_COOKIE_SECURE = False
\ No newline at end of file
+CSRF_COOKIE_SECURE = False
+# Cache de relatórios desligado: o rollback do TestCase desfaz as versões dos dados, mas
+# não limpa o cache, então um teste poderia ler o resultado de outro. Os testes do cache
+# ligam explicitamente (e limpam o cache).
+REPORT_CACHE_TIMEOUT = 0
+FRAGMENT_CACHE_TIMEOUT = 0
+SERIES_CACHE_TIMEOUT = 0
+# Views async sem threads extras: dados criados na transação do TestCase só são visíveis
+# na conexão da thread da requisição.
+ASYNC_QUERY_THREADS = 0
+REPORT_RENDER_THREADS = 0
+# PDF no próprio processo: os testes do pool criam o seu
+PDF_WORKERS = 0